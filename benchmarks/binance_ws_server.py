@@ -0,0 +1,190 @@
+"""
+Servidor WebSocket local que imita el stream de klines de Binance
+
+Acepta conexiones en /ws, responde a SUBSCRIBE/UNSUBSCRIBE como Binance
+({"result": null, "id": n}) y envía a cada conexión los mensajes kline de los
+streams a los que está suscrita. Con kline_stream() un KlineStreamConsumer se
+conecta a este servidor, así se prueba el buffer de BinanceDataFetcher
+(siembra por REST, actualizaciones, huecos y reconexiones) sin red.
+
+OHLCVClient sustituye al cliente REST de Binance (fetchOHLCV) con unas velas
+fijas y cuenta las llamadas.
+"""
+import asyncio
+import json
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def kline_message(symbol, interval, open_time, open, high, low, close, volume, closed=False, close_time=None):
+    """
+    Evento kline con el formato de Binance (precios y volumen como texto)
+
+    Parameters:
+    - symbol: símbolo del stream ("btcusdt")
+    - open_time: apertura de la vela en ms
+    - closed: la vela está cerrada (x)
+    """
+    return {
+        "e": "kline",
+        "E": int(open_time),
+        "s": symbol.upper(),
+        "k": {
+            "t": int(open_time),
+            "T": int(close_time if close_time is not None else open_time),
+            "s": symbol.upper(),
+            "i": interval,
+            "o": str(open),
+            "h": str(high),
+            "l": str(low),
+            "c": str(close),
+            "v": str(volume),
+            "x": bool(closed),
+        },
+    }
+
+
+class OHLCVClient:
+    """
+    Cliente REST falso: fetchOHLCV sobre unas filas [time ms, open, high, low, close, volume]
+    """
+
+    def __init__(self, rows):
+        self.rows = [list(fila) for fila in rows]
+        self.calls = 0
+
+    def fetchOHLCV(self, symbol, timeframe, since=None, limit=500, params=None):
+        self.calls += 1
+        tiempos = np.array([fila[0] for fila in self.rows])
+        if since is not None:
+            desde = int(np.searchsorted(tiempos, since))
+            return self.rows[desde:desde + limit]
+        return self.rows[-limit:]
+
+
+class KlineStubServer:
+    """
+    Servidor de klines en su propio event loop (127.0.0.1, puerto libre por defecto)
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.connections = 0
+        self.requests = []
+        self._suscripciones = {}
+        self._loop = None
+        self._hilo = None
+        self._servidor = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def _atender(self, conexion):
+        self.connections += 1
+        streams = self._suscripciones[conexion] = set()
+        try:
+            async for mensaje in conexion:
+                peticion = json.loads(mensaje)
+                self.requests.append(peticion)
+                if peticion.get("method") == "SUBSCRIBE":
+                    streams.update(peticion.get("params", []))
+                elif peticion.get("method") == "UNSUBSCRIBE":
+                    streams.difference_update(peticion.get("params", []))
+                await conexion.send(json.dumps({"result": None, "id": peticion.get("id")}))
+        except Exception:
+            pass
+        finally:
+            self._suscripciones.pop(conexion, None)
+
+    def subscribed(self):
+        """
+        Streams suscritos por alguna conexión abierta
+        """
+        return self._ejecutar(self._suscritos())
+
+    async def _suscritos(self):
+        return set().union(*self._suscripciones.values()) if self._suscripciones else set()
+
+    def push(self, mensaje):
+        """
+        Envía un evento kline (ver kline_message) a las conexiones suscritas a su stream
+
+        Returns:
+        - Número de conexiones que lo recibieron
+        """
+        return self._ejecutar(self._difundir(mensaje))
+
+    async def _difundir(self, mensaje):
+        stream = f"{mensaje['k']['s'].lower()}@kline_{mensaje['k']['i']}"
+        texto = json.dumps(mensaje)
+        enviados = 0
+        for conexion, streams in list(self._suscripciones.items()):
+            if stream in streams:
+                await conexion.send(texto)
+                enviados += 1
+        return enviados
+
+    def drop_connections(self):
+        """
+        Cierra todas las conexiones abiertas (el consumidor debe reconectar)
+        """
+        return self._ejecutar(self._cerrar_conexiones())
+
+    async def _cerrar_conexiones(self):
+        for conexion in list(self._suscripciones):
+            await conexion.close(code=1001, reason="going away")
+
+    def _ejecutar(self, corrutina):
+        return asyncio.run_coroutine_threadsafe(corrutina, self._loop).result(timeout=5)
+
+    def start(self):
+        from websockets.asyncio.server import serve
+
+        self._loop = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self._loop.run_forever, name="kline-stub", daemon=True)
+        self._hilo.start()
+
+        async def arrancar():
+            return await serve(self._atender, self.host, self.port)
+
+        self._servidor = self._ejecutar(arrancar())
+        self.port = self._servidor.sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        async def parar():
+            self._servidor.close()
+            await self._servidor.wait_closed()
+
+        self._ejecutar(parar())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join(timeout=5)
+        self._loop.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def kline_stream(capacity=1000, idle_seconds=600):
+    """
+    Un KlineStubServer y un KlineStreamConsumer conectado a él
+
+    Yields:
+    - (servidor, consumidor): el consumidor se pasa como stream a BinanceDataFetcher
+    """
+    from src.utils.dataExtractor.BinanceKlineStream import KlineStreamConsumer
+
+    with KlineStubServer() as servidor:
+        consumidor = KlineStreamConsumer(url=servidor.url, capacity=capacity, idle_seconds=idle_seconds)
+        try:
+            yield servidor, consumidor
+        finally:
+            consumidor.close()
@@ -0,0 +1,245 @@
+"""
+Servidor HTTP local que imita el endpoint chart de Yahoo Finance
+
+Sirve /v8/finance/chart/<símbolo>?period1=&period2=&interval= con el mismo
+JSON que Yahoo, a partir de:
+- series sintéticas (SyntheticProvider de stub_provider), o
+- respuestas grabadas: ficheros <símbolo>_<intervalo>.json con la respuesta
+  completa de Yahoo, recortada en cada petición al rango pedido
+
+Con chart_provider() el servicio usa YahooChartDataFetcher contra este servidor,
+así los benchmarks miden también el transporte HTTP (conexiones persistentes,
+decodificación) sin red. error_rate devuelve 429 en una fracción de las
+peticiones para ejercitar los reintentos del planificador de descargas.
+"""
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit, parse_qs, unquote
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stub_provider import SyntheticProvider
+
+_PREFIJO = "/v8/finance/chart/"
+
+
+def chart_payload(symbol, tiempos, open, high, low, close, volume, timezone="UTC", gmtoffset=0):
+    """
+    Respuesta del endpoint chart para unas velas
+
+    Parameters:
+    - tiempos: apertura de cada vela en segundos UTC
+    - open, high, low, close, volume: arrays con los valores (NaN se envía como null)
+    """
+    def _lista(valores):
+        valores = np.asarray(valores, dtype=float)
+        return [None if np.isnan(valor) else valor for valor in valores.tolist()]
+
+    return {
+        "chart": {
+            "result": [{
+                "meta": {"symbol": symbol, "exchangeTimezoneName": timezone, "gmtoffset": gmtoffset},
+                "timestamp": [int(t) for t in tiempos],
+                "indicators": {"quote": [{
+                    "open": _lista(open),
+                    "high": _lista(high),
+                    "low": _lista(low),
+                    "close": _lista(close),
+                    "volume": _lista(volume),
+                }]},
+            }],
+            "error": None,
+        }
+    }
+
+
+def error_payload(code, description):
+    return {"chart": {"result": None, "error": {"code": code, "description": description}}}
+
+
+class SyntheticCharts:
+    """
+    Respuestas a partir de las series sintéticas de un SyntheticProvider
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def chart(self, symbol, interval, period1, period2):
+        serie = self.provider.series(symbol, interval)
+        segundos = ((serie['time'] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)).to_numpy()
+        desde, hasta = np.searchsorted(segundos, [period1, period2])
+        tramo = serie.iloc[desde:hasta]
+        return chart_payload(
+            symbol, segundos[desde:hasta],
+            tramo['open'], tramo['high'], tramo['low'], tramo['close'], tramo['volume']
+        )
+
+
+class RecordedCharts:
+    """
+    Respuestas grabadas de Yahoo: <directorio>/<símbolo>_<intervalo>.json
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _cargar(self, symbol, interval):
+        clave = (symbol, interval)
+        with self._lock:
+            if clave not in self._cache:
+                ruta = self.directory / f"{symbol}_{interval}.json"
+                self._cache[clave] = json.loads(ruta.read_text()) if ruta.exists() else None
+            return self._cache[clave]
+
+    def chart(self, symbol, interval, period1, period2):
+        grabada = self._cargar(symbol, interval)
+        if grabada is None:
+            return None
+        resultado = grabada["chart"]["result"][0]
+        tiempos = np.asarray(resultado.get("timestamp") or [], dtype=np.int64)
+        desde, hasta = np.searchsorted(tiempos, [period1, period2])
+        quote = resultado["indicators"]["quote"][0]
+        meta = resultado.get("meta") or {}
+        return chart_payload(
+            symbol, tiempos[desde:hasta],
+            *(np.asarray(quote[columna][desde:hasta], dtype=float) for columna in ("open", "high", "low", "close", "volume")),
+            timezone=meta.get("exchangeTimezoneName", "UTC"),
+            gmtoffset=meta.get("gmtoffset", 0)
+        )
+
+
+class ChartStubServer:
+    """
+    Servidor del endpoint chart en un hilo (127.0.0.1, puerto libre por defecto)
+    """
+
+    def __init__(self, source, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, seed=0):
+        """
+        Parameters:
+        - source: SyntheticCharts o RecordedCharts
+        - latency: segundos de espera por petición
+        - error_rate: fracción de peticiones que responden 429
+        - seed: semilla de los errores simulados
+        """
+        self.source = source
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._hilo = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 con Content-Length: el cliente reutiliza la conexión
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with servidor._lock:
+                    servidor.connections += 1
+
+            def do_GET(self):
+                servidor._responder(self)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _responder(self, peticion):
+        with self._lock:
+            self.requests += 1
+            fallar = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        partes = urlsplit(peticion.path)
+        if not partes.path.startswith(_PREFIJO):
+            return self._enviar(peticion, 404, error_payload("Not Found", "Ruta no soportada"))
+        if fallar:
+            return self._enviar(peticion, 429, None)
+        symbol = unquote(partes.path[len(_PREFIJO):])
+        params = {clave: valores[0] for clave, valores in parse_qs(partes.query).items()}
+        try:
+            periodo = int(params["period1"]), int(params["period2"])
+            interval = params["interval"]
+        except (KeyError, ValueError):
+            return self._enviar(peticion, 400, error_payload("Bad Request", "period1, period2 e interval son obligatorios"))
+        respuesta = self.source.chart(symbol, interval, *periodo)
+        if respuesta is None:
+            return self._enviar(peticion, 404, error_payload("Not Found", "No data found, symbol may be delisted"))
+        self._enviar(peticion, 200, respuesta)
+
+    @staticmethod
+    def _enviar(peticion, estado, contenido):
+        cuerpo = b"Too Many Requests" if contenido is None else json.dumps(contenido).encode()
+        peticion.send_response(estado)
+        peticion.send_header("Content-Type", "text/plain" if contenido is None else "application/json")
+        peticion.send_header("Content-Length", str(len(cuerpo)))
+        peticion.end_headers()
+        peticion.wfile.write(cuerpo)
+
+    def start(self):
+        self._hilo = threading.Thread(target=self._server.serve_forever, name="chart-stub", daemon=True)
+        self._hilo.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._hilo is not None:
+            self._hilo.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+@contextmanager
+def chart_provider(candles=200_000, latency=0.0, seed=0, error_rate=0.0, recorded=None):
+    """
+    El servicio descarga de Yahoo con YahooChartDataFetcher contra un ChartStubServer local
+
+    Parameters:
+    - candles, seed: series sintéticas (si no se indica recorded)
+    - latency, error_rate: ver ChartStubServer
+    - recorded: directorio con respuestas grabadas (RecordedCharts)
+
+    Yields:
+    - El ChartStubServer (requests y connections cuentan peticiones y conexiones)
+    """
+    from src.utils.dataExtractor import YahooChartClient as modulo_cliente
+    from src.utils.dataExtractor.providers import default_provider
+
+    fuente = RecordedCharts(recorded) if recorded else SyntheticCharts(SyntheticProvider(candles=candles, seed=seed))
+    with ChartStubServer(fuente, latency=latency, error_rate=error_rate, seed=seed) as servidor:
+        cliente = modulo_cliente.YahooChartClient(base_url=servidor.url)
+        compartido = modulo_cliente._compartido
+        modulo_cliente._compartido = cliente
+        try:
+            with default_provider("chart"):
+                yield servidor
+        finally:
+            modulo_cliente._compartido = compartido
+            cliente.close()
@@ -0,0 +1,209 @@
+"""
+Medición, almacenamiento (JSON) y comparación de resultados de benchmarks
+"""
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Versión del formato de los ficheros de resultados
+SCHEMA_VERSION = 1
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def measure(fn, repeat=5, warmup=1, budget=None, setup=None):
+    """
+    Mide fn varias veces y devuelve los segundos de cada ejecución
+
+    Parameters:
+    - fn: función sin argumentos a medir
+    - repeat: número máximo de ejecuciones medidas
+    - warmup: ejecuciones previas sin medir
+    - budget: segundos máximos de medición; se hace al menos una ejecución
+    - setup: función sin argumentos que se llama antes de cada ejecución (sin medir)
+
+    Returns:
+    - Lista de segundos por ejecución
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        fn()
+    tiempos = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+        if budget is not None and sum(tiempos) >= budget:
+            break
+    return tiempos
+
+
+def summarize_timings(tiempos):
+    """
+    Estadísticos de una lista de segundos: min, median, mean, max y stdev
+    """
+    return {
+        "runs": len(tiempos),
+        "min": min(tiempos),
+        "median": statistics.median(tiempos),
+        "mean": statistics.fmean(tiempos),
+        "max": max(tiempos),
+        "stdev": statistics.stdev(tiempos) if len(tiempos) > 1 else 0.0,
+    }
+
+
+def case_id(name, params):
+    """
+    Identificador estable de un caso: nombre[param=valor,...] (parámetros ordenados)
+    """
+    return f"{name}[{','.join(f'{clave}={params[clave]}' for clave in sorted(params))}]"
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def environment():
+    """
+    Datos del entorno de ejecución que se guardan con los resultados
+    """
+    import numpy
+    import pandas
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "commit": _git_commit(),
+    }
+
+
+class BenchmarkRun:
+    """
+    Resultados de una ejecución de la suite
+    """
+
+    def __init__(self, config=None):
+        self.meta = {
+            "schema": SCHEMA_VERSION,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "environment": environment(),
+            "config": config or {},
+        }
+        self.results = []
+
+    def add(self, name, params, tiempos, unit="s", **extra):
+        """
+        Añade un caso medido
+
+        Parameters:
+        - name: nombre del benchmark
+        - params: parámetros del caso (forman su identificador)
+        - tiempos: segundos por ejecución (ver measure)
+        - extra: métricas adicionales del caso (velas/s, peticiones/s...)
+        """
+        resultado = {
+            "id": case_id(name, params),
+            "name": name,
+            "params": params,
+            "unit": unit,
+            **summarize_timings(tiempos),
+            **extra,
+        }
+        self.results.append(resultado)
+        return resultado
+
+    def to_dict(self):
+        return {"meta": self.meta, "results": self.results}
+
+    def save(self, path=None):
+        """
+        Guarda los resultados en JSON (por defecto en benchmarks/results/)
+
+        Returns:
+        - Ruta del fichero escrito
+        """
+        if path is None:
+            marca = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+            commit = self.meta["environment"].get("commit") or "nocommit"
+            path = RESULTS_DIR / f"bench-{marca}-{commit}.json"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2, default=str))
+        return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(actual, baseline, metric="median", threshold=1.10):
+    """
+    Compara dos ejecuciones caso a caso
+
+    Parameters:
+    - actual, baseline: diccionarios de BenchmarkRun.to_dict() (o cargados con load_results)
+    - metric: estadístico que se compara (segundos: menor es mejor)
+    - threshold: cociente actual / baseline a partir del cual un caso es una regresión
+
+    Returns:
+    - Lista de filas (id, baseline, actual, ratio, status) con status
+      "regression", "improvement", "ok", "new" o "missing"
+    """
+    anteriores = {resultado["id"]: resultado for resultado in baseline["results"]}
+    filas = []
+    for resultado in actual["results"]:
+        anterior = anteriores.pop(resultado["id"], None)
+        if anterior is None:
+            filas.append({"id": resultado["id"], "baseline": None, "actual": resultado[metric], "ratio": None, "status": "new"})
+            continue
+        ratio = resultado[metric] / anterior[metric] if anterior[metric] else None
+        if ratio is None:
+            estado = "ok"
+        elif ratio > threshold:
+            estado = "regression"
+        elif ratio < 1 / threshold:
+            estado = "improvement"
+        else:
+            estado = "ok"
+        filas.append({"id": resultado["id"], "baseline": anterior[metric], "actual": resultado[metric], "ratio": ratio, "status": estado})
+    for anterior in anteriores.values():
+        filas.append({"id": anterior["id"], "baseline": anterior[metric], "actual": None, "ratio": None, "status": "missing"})
+    return filas
+
+
+def format_comparison(filas):
+    """
+    Tabla de texto de compare()
+    """
+    def _numero(valor):
+        return "-" if valor is None else f"{valor:.4f}"
+
+    ancho = max([len(fila["id"]) for fila in filas] + [4])
+    lineas = [f"{'case':<{ancho}}  {'baseline':>10}  {'actual':>10}  {'ratio':>7}  status"]
+    for fila in filas:
+        ratio = "-" if fila["ratio"] is None else f"{fila['ratio']:.2f}x"
+        lineas.append(
+            f"{fila['id']:<{ancho}}  {_numero(fila['baseline']):>10}  {_numero(fila['actual']):>10}  {ratio:>7}  {fila['status']}"
+        )
+    return "\n".join(lineas)
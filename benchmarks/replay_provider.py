@@ -0,0 +1,59 @@
+"""
+Grabación y reproducción de las descargas durante los benchmarks
+
+record_provider() graba cada respuesta del proveedor del benchmark (stub o
+chart) en un directorio; replay_provider() hace que el servicio sirva esas
+respuestas con ReplayDataFetcher. Así una misma grabación se usa en varias
+ejecuciones (perfiles, comparaciones con --compare) con los mismos datos y la
+misma latencia (o escalada con speed).
+"""
+from contextlib import contextmanager
+
+from src.utils.dataExtractor import providers
+from src.utils.dataExtractor.RecordReplay import ResponseLog, ReplayDataFetcher, recording_fetcher
+
+
+@contextmanager
+def record_provider(directory, upstream="yfinance"):
+    """
+    El servicio descarga con upstream y graba cada respuesta en directory
+
+    Yields:
+    - El ResponseLog de la grabación
+    """
+    log = ResponseLog(directory)
+    clase = recording_fetcher(providers.provider_class(upstream))
+    anterior_log = clase.__dict__.get('log')
+    clase.log = log
+    anterior = providers.register_provider("record", lambda: clase)
+    try:
+        with providers.default_provider("record"):
+            yield log
+    finally:
+        providers.register_provider("record", anterior)
+        if anterior_log is None:
+            del clase.log
+        else:
+            clase.log = anterior_log
+
+
+@contextmanager
+def replay_provider(directory, speed=0.0, latency=0.0):
+    """
+    El servicio sirve las respuestas grabadas en directory sin red
+
+    Parameters:
+    - speed: divisor de la latencia grabada (0: sin esperar)
+    - latency: segundos añadidos a cada respuesta
+
+    Yields:
+    - El ResponseLog que se reproduce
+    """
+    log = ResponseLog(directory)
+    anterior = ReplayDataFetcher.log, ReplayDataFetcher.speed, ReplayDataFetcher.latency
+    ReplayDataFetcher.log, ReplayDataFetcher.speed, ReplayDataFetcher.latency = log, speed, latency
+    try:
+        with providers.default_provider("replay"):
+            yield log
+    finally:
+        ReplayDataFetcher.log, ReplayDataFetcher.speed, ReplayDataFetcher.latency = anterior
@@ -0,0 +1,300 @@
+"""
+Suite de benchmarks sin conexión
+
+Casos:
+- detection: PullbackDetection.detect_pullbacks por motor y número de velas
+- service: EstrategiaBranV1Service.get_dashboard_data completo (caché fría y caliente)
+- endpoints: throughput y latencia de /api/estrategia-bran-v1/data a través de la app FastAPI
+
+Las velas salen de benchmarks.synthetic y las descargas de Yahoo se sustituyen
+por benchmarks.stub_provider (--provider stub) o se hacen con el cliente HTTP
+del endpoint chart contra el servidor local de benchmarks.chart_server
+(--provider chart), así que no hace falta red y los datos son los mismos en
+cada ejecución. Con --record DIR se graban las respuestas del proveedor y con
+--provider replay --replay DIR se reproducen (ver benchmarks.replay_provider).
+Los resultados se guardan en JSON
+(benchmarks/results/ por defecto) y se pueden comparar con una ejecución anterior:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --quick --suite detection,service
+    python -m benchmarks.run --compare benchmarks/results/bench-<...>.json --threshold 1.2
+    python -m benchmarks.run --provider chart --record /tmp/grabacion
+    python -m benchmarks.run --provider replay --replay /tmp/grabacion --replay-speed 1
+
+Con --compare el proceso termina con código 1 si algún caso es más lento que
+la referencia por encima del umbral.
+"""
+import argparse
+import asyncio
+import logging
+import math
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+# Antes de importar src: sin almacén en disco ni precálculo de la watchlist, y
+# sin límite de peticiones por segundo (el proveedor es local)
+os.environ.setdefault("CANDLE_STORE_ENABLED", "0")
+os.environ.setdefault("PRECOMPUTE_ENABLED", "0")
+os.environ.setdefault("YAHOO_RATE_PER_SECOND", "0")
+
+import numpy as np
+
+from benchmarks.chart_server import chart_provider
+from benchmarks.harness import BenchmarkRun, measure, load_results, compare, format_comparison
+from benchmarks.replay_provider import record_provider, replay_provider
+from benchmarks.stub_provider import offline_provider
+from benchmarks.synthetic import generate_ohlcv
+from src.core.config import PULLBACK_ENGINE
+from src.utils.indicadores.pullback_detection import PullbackDetection, MODES
+
+SUITES = ("detection", "service", "endpoints")
+PROVIDERS = ("stub", "chart", "replay")
+
+# Columnas que _process_candles añade antes de detect_pullbacks
+_COLUMNAS_MARCADORES = ['altos', 'bajos', 'pocAltos', 'pocBajos', 'triangulosAzul', 'ysRosado', 'circulosAzul', 'circulosNaranja']
+
+
+def _preparar(df):
+    df = df.copy()
+    df['parteAlta'] = np.maximum(df['open'], df['close'])
+    df['parteBaja'] = np.minimum(df['open'], df['close'])
+    for columna in _COLUMNAS_MARCADORES:
+        df[columna] = math.nan
+    df['tendencia'] = 0
+    return df
+
+
+def bench_detection(run, sizes, engines, repeat, budget, seed):
+    """
+    detect_pullbacks sobre series sintéticas de cada tamaño, por motor
+    """
+    for n in sizes:
+        base = _preparar(generate_ohlcv(n, seed=seed))
+        for engine in engines:
+            estado = {}
+
+            def setup():
+                estado['df'] = base.copy()
+
+            def detectar():
+                df = estado['df']
+                PullbackDetection(df, minimum_tresure=0.21, mode=engine).detect_pullbacks(df)
+
+            tiempos = measure(detectar, repeat=repeat, warmup=0, budget=budget, setup=setup)
+            resultado = run.add(
+                "detect_pullbacks", {"engine": engine, "candles": n}, tiempos,
+                candles_per_second=n / min(tiempos)
+            )
+            _informar(resultado)
+
+
+def bench_service(run, sizes, repeat, budget):
+    """
+    get_dashboard_data completo con el proveedor sin conexión
+
+    cold: la caché de velas se vacía antes de cada ejecución (descarga por
+    ventanas, detección y serialización); warm: velas ya en caché
+    """
+    from src.services.estrategia_bran_v1.estrategia_bran_v1_service import estrategia_service
+
+    for n in sizes:
+        for response_format in ("records", "columnar"):
+            def llamar():
+                resultado = estrategia_service.get_dashboard_data(
+                    asset="BENCH", interval="1h", limit=n, response_format=response_format
+                )
+                if not resultado.get("success"):
+                    raise RuntimeError(resultado.get("error"))
+
+            for cache in ("cold", "warm"):
+                setup = estrategia_service.candle_cache.clear if cache == "cold" else None
+                tiempos = measure(llamar, repeat=repeat, warmup=1, budget=budget, setup=setup)
+                resultado = run.add(
+                    "get_dashboard_data",
+                    {"engine": PULLBACK_ENGINE, "candles": n, "format": response_format, "cache": cache},
+                    tiempos,
+                    candles_per_second=n / min(tiempos)
+                )
+                _informar(resultado)
+
+
+async def _carga(client, rutas, requests, concurrency):
+    """
+    Lanza requests peticiones (repartidas en rutas) con concurrency en curso a la vez
+
+    Returns:
+    - (segundos totales, latencias por petición, errores)
+    """
+    semaforo = asyncio.Semaphore(concurrency)
+    latencias = []
+    errores = 0
+
+    async def una(ruta):
+        nonlocal errores
+        async with semaforo:
+            inicio = time.perf_counter()
+            respuesta = await client.get(ruta)
+            latencias.append(time.perf_counter() - inicio)
+            if respuesta.status_code not in (200, 304):
+                errores += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(una(rutas[i % len(rutas)]) for i in range(requests)))
+    return time.perf_counter() - inicio, latencias, errores
+
+
+def bench_endpoints(run, limit, requests, concurrency):
+    """
+    Throughput de /data a través de la app (transporte ASGI, sin red)
+
+    same: todas las peticiones iguales (se coalescen en single-flight);
+    distinct: ocho activos distintos; sparse: salida dispersa columnar
+    """
+    import httpx
+    from src.main import app
+
+    base = f"/api/estrategia-bran-v1/data?interval=1h&limit={limit}"
+    escenarios = {
+        "same": [f"{base}&asset=BENCH"],
+        "distinct": [f"{base}&asset=BENCH{i}" for i in range(8)],
+        "sparse": [f"{base}&asset=BENCH{i}&format=columnar&sparse=true" for i in range(8)],
+    }
+
+    async def medir():
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as client:
+            for escenario, rutas in escenarios.items():
+                # Calentamiento: velas en caché y pools arrancados
+                for ruta in rutas:
+                    await client.get(ruta)
+                total, latencias, errores = await _carga(client, rutas, requests, concurrency)
+                latencias.sort()
+                resultado = run.add(
+                    "endpoint_data",
+                    {"scenario": escenario, "candles": limit, "concurrency": concurrency},
+                    latencias,
+                    requests=requests,
+                    errors=errores,
+                    requests_per_second=requests / total,
+                    p95=latencias[int(0.95 * (len(latencias) - 1))],
+                    p99=latencias[int(0.99 * (len(latencias) - 1))]
+                )
+                _informar(resultado)
+
+    asyncio.run(medir())
+
+
+def _informar(resultado):
+    extra = ""
+    if "candles_per_second" in resultado:
+        extra = f"  {resultado['candles_per_second']:,.0f} velas/s"
+    elif "requests_per_second" in resultado:
+        extra = f"  {resultado['requests_per_second']:,.1f} req/s  p95={resultado['p95'] * 1000:.1f}ms"
+    print(f"{resultado['id']:<70} median={resultado['median'] * 1000:10.2f}ms  runs={resultado['runs']}{extra}", flush=True)
+
+
+def _enteros(texto):
+    return [int(valor) for valor in texto.split(",") if valor.strip()]
+
+
+def _lista(texto):
+    return [valor.strip() for valor in texto.split(",") if valor.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks sin conexión de la detección, el servicio y los endpoints")
+    parser.add_argument("--suite", default=",".join(SUITES), help=f"Suites separadas por comas ({', '.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="Tamaños y repeticiones reducidos")
+    parser.add_argument("--sizes", help="Velas de los casos de detection (por defecto 1000,10000,100000)")
+    parser.add_argument("--service-sizes", help="Velas de los casos de service (por defecto 1000,10000)")
+    parser.add_argument("--engines", default="legacy,fast", help="Motores de detection separados por comas")
+    parser.add_argument("--repeat", type=int, default=5, help="Ejecuciones medidas por caso")
+    parser.add_argument("--budget", type=float, default=30.0, help="Segundos máximos de medición por caso")
+    parser.add_argument("--requests", type=int, default=200, help="Peticiones por escenario de endpoints")
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones simultáneas en endpoints")
+    parser.add_argument("--endpoint-limit", type=int, default=1000, help="Velas por petición en endpoints")
+    parser.add_argument("--provider", default="stub", choices=PROVIDERS,
+                        help="stub: descargas sustituidas en memoria; chart: cliente HTTP contra el servidor chart local; "
+                             "replay: respuestas grabadas con --record")
+    parser.add_argument("--recorded", help="Con --provider chart: directorio de respuestas grabadas en lugar de series sintéticas")
+    parser.add_argument("--record", help="Directorio donde grabar las respuestas del proveedor (stub o chart)")
+    parser.add_argument("--replay", help="Con --provider replay: directorio de la grabación")
+    parser.add_argument("--replay-speed", type=float, default=0.0,
+                        help="Con --provider replay: divisor de la latencia grabada (1 = la misma, 0 = sin esperar)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada del proveedor (segundos)")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de las series sintéticas")
+    parser.add_argument("--output", help="Fichero JSON de resultados (por defecto benchmarks/results/bench-<fecha>-<commit>.json)")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con el que comparar")
+    parser.add_argument("--threshold", type=float, default=1.10, help="Cociente actual/referencia que se considera regresión")
+    args = parser.parse_args(argv)
+    # Sin una línea de log por petición durante la medición
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    suites = _lista(args.suite)
+    desconocidas = [suite for suite in suites if suite not in SUITES]
+    if desconocidas:
+        parser.error(f"Suites no soportadas: {desconocidas}. Use {SUITES}")
+    engines = _lista(args.engines)
+    if any(engine not in MODES for engine in engines):
+        parser.error(f"Motores soportados: {MODES}")
+    if args.provider == "replay" and not args.replay:
+        parser.error("--provider replay necesita --replay <directorio>")
+    if args.provider == "replay" and args.record:
+        parser.error("--record no se puede usar con --provider replay")
+    sizes = _enteros(args.sizes) if args.sizes else ([1000, 10000] if args.quick else [1000, 10000, 100000])
+    service_sizes = _enteros(args.service_sizes) if args.service_sizes else ([1000] if args.quick else [1000, 10000])
+    repeat = 3 if args.quick and args.repeat == 5 else args.repeat
+    requests = 50 if args.quick and args.requests == 200 else args.requests
+
+    run = BenchmarkRun(config={
+        "suites": suites,
+        "sizes": sizes,
+        "service_sizes": service_sizes,
+        "engines": engines,
+        "service_engine": PULLBACK_ENGINE,
+        "repeat": repeat,
+        "budget": args.budget,
+        "requests": requests,
+        "concurrency": args.concurrency,
+        "endpoint_limit": args.endpoint_limit,
+        "provider": args.provider,
+        "record": args.record,
+        "replay": args.replay,
+        "replay_speed": args.replay_speed,
+        "latency": args.latency,
+        "seed": args.seed,
+    })
+    velas = max(service_sizes + [args.endpoint_limit]) * 2 + 1000
+    if args.provider == "chart":
+        proveedor = chart_provider(candles=velas, latency=args.latency, seed=args.seed, recorded=args.recorded)
+    elif args.provider == "replay":
+        proveedor = replay_provider(args.replay, speed=args.replay_speed, latency=args.latency)
+    else:
+        proveedor = offline_provider(candles=velas, latency=args.latency, seed=args.seed)
+    # La grabación envuelve al proveedor elegido (fetcher del endpoint chart o de yfinance)
+    grabacion = record_provider(args.record, "chart" if args.provider == "chart" else "yfinance") if args.record else nullcontext()
+    with proveedor, grabacion:
+        if "detection" in suites:
+            bench_detection(run, sizes, engines, repeat, args.budget, args.seed)
+        if "service" in suites:
+            bench_service(run, service_sizes, repeat, args.budget)
+        if "endpoints" in suites:
+            bench_endpoints(run, args.endpoint_limit, requests, args.concurrency)
+
+    ruta = run.save(args.output)
+    print(f"\nResultados guardados en {ruta}")
+
+    if args.compare:
+        filas = compare(run.to_dict(), load_results(args.compare), threshold=args.threshold)
+        print()
+        print(format_comparison(filas))
+        if any(fila["status"] == "regression" for fila in filas):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
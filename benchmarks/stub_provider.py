@@ -0,0 +1,101 @@
+"""
+Proveedor de velas sin conexión para los benchmarks
+
+offline_provider() sustituye la descarga de YahooFinanceDataFetcher (get_data
+y get_data_multi) por series sintéticas: la caché, la historia por ventanas,
+el reagrupado y la detección se ejecutan igual que con Yahoo, pero sin red y
+con datos reproducibles.
+"""
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+from benchmarks.synthetic import generate_ohlcv
+from src.utils.dataExtractor.YahooFinanceDataFetcher import YahooFinanceDataFetcher
+from src.utils.dataExtractor.providers import default_provider
+
+
+class SyntheticProvider:
+    """
+    Series sintéticas por (activo, intervalo), generadas una vez y recortadas en cada petición
+    """
+
+    def __init__(self, candles=200_000, latency=0.0, seed=0):
+        """
+        Parameters:
+        - candles: velas de cada serie (la historia disponible hacia atrás)
+        - latency: segundos de espera por petición, para simular el proveedor
+        - seed: semilla base; cada (activo, intervalo) deriva la suya
+        """
+        self.candles = candles
+        self.latency = latency
+        self.seed = seed
+        self.requests = 0
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def series(self, asset, interval):
+        clave = (asset, interval)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                semilla = self.seed + zlib.crc32(f"{asset}:{interval}".encode())
+                serie = self._series[clave] = generate_ohlcv(self.candles, interval=interval, seed=semilla)
+            self.requests += 1
+        return serie
+
+    def get_data(self, fetcher, start_time=None, end_time=None, limit=500):
+        """
+        Misma firma y resultado que YahooFinanceDataFetcher.get_data
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        serie = self.series(fetcher.asset, fetcher.interval)
+        desde = pd.to_datetime(start_time, unit='ms', utc=True) if start_time else pd.Timestamp(fetcher._calculate_start_date(limit))
+        hasta = pd.to_datetime(end_time, unit='ms', utc=True) if end_time else pd.Timestamp(datetime.now(pytz.UTC))
+        tiempos = serie['time']
+        inicio = int(tiempos.searchsorted(desde))
+        fin = int(tiempos.searchsorted(hasta, side='right'))
+        return serie.iloc[max(inicio, fin - limit):fin].reset_index(drop=True)
+
+    def get_data_multi(self, assets, interval="1h", start_time=None, end_time=None, limit=500):
+        """
+        Misma firma y resultado que YahooFinanceDataFetcher.get_data_multi
+        """
+        return {
+            asset: self.get_data(YahooFinanceDataFetcher(asset=asset, interval=interval), start_time, end_time, limit)
+            for asset in assets
+        }
+
+
+@contextmanager
+def offline_provider(candles=200_000, latency=0.0, seed=0):
+    """
+    Sustituye las descargas de Yahoo Finance por un SyntheticProvider mientras dura el bloque
+
+    Yields:
+    - El SyntheticProvider (requests cuenta las peticiones servidas)
+    """
+    proveedor = SyntheticProvider(candles=candles, latency=latency, seed=seed)
+    get_data = YahooFinanceDataFetcher.get_data
+    get_data_multi = YahooFinanceDataFetcher.__dict__['get_data_multi']
+
+    def _get_data(fetcher, start_time=None, end_time=None, limit=500):
+        return proveedor.get_data(fetcher, start_time, end_time, limit)
+
+    def _get_data_multi(cls, assets, interval="1h", start_time=None, end_time=None, limit=500):
+        return proveedor.get_data_multi(assets, interval, start_time, end_time, limit)
+
+    YahooFinanceDataFetcher.get_data = _get_data
+    YahooFinanceDataFetcher.get_data_multi = classmethod(_get_data_multi)
+    try:
+        with default_provider("yfinance"):
+            yield proveedor
+    finally:
+        YahooFinanceDataFetcher.get_data = get_data
+        YahooFinanceDataFetcher.get_data_multi = get_data_multi
@@ -0,0 +1,107 @@
+"""
+Generador de velas OHLCV sintéticas reproducibles (con semilla)
+
+La serie alterna regímenes de tendencia alcista, bajista y rango, con
+volatilidad agrupada, pequeños huecos entre velas y volumen mayor en las velas
+de más recorrido: lo suficiente para que la detección de pullbacks encuentre
+altos, bajos y POCs con una densidad parecida a la de un mercado real.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+
+# Regímenes de la serie
+TREND_UP, RANGE, TREND_DOWN = 1, 0, -1
+
+
+def generate_ohlcv(n,
+                   interval="1h",
+                   seed=0,
+                   start_price=100.0,
+                   end=None,
+                   volatility=0.002,
+                   regime_length=150,
+                   trend_strength=0.3,
+                   mean_reversion=0.05):
+    """
+    Genera n velas OHLCV con el formato de los fetchers
+
+    Parameters:
+    - n: número de velas
+    - interval: intervalo de las velas (define el eje de tiempos)
+    - seed: semilla; la misma semilla produce la misma serie
+    - start_price: precio de apertura de la primera vela
+    - end: tiempo de apertura de la última vela (por defecto, la vela actual)
+    - volatility: desviación típica media del retorno logarítmico por vela
+    - regime_length: duración media (velas) de cada régimen
+    - trend_strength: deriva de los tramos de tendencia, en desviaciones típicas por vela
+    - mean_reversion: fuerza de la vuelta al precio de anclaje en los tramos de rango
+
+    Returns:
+    - DataFrame con time (UTC), open, high, low, close, volume, buy_volume,
+      sell_volume y volume_delta
+    """
+    rng = np.random.default_rng(seed)
+    duracion = interval_to_timedelta(interval)
+    if end is None:
+        end = pd.Timestamp.now(tz='UTC').floor(duracion)
+    tiempos = pd.date_range(end=pd.Timestamp(end), periods=n, freq=duracion)
+
+    # Volatilidad agrupada: log-volatilidad AR(1) alrededor de volatility
+    choques_vol = rng.normal(0.0, 0.15, n).tolist()
+    ruido = rng.normal(0.0, 1.0, n).tolist()
+    # Regímenes: tramos de longitud geométrica (mínimo 10 velas)
+    sorteo_regimen = rng.choice([TREND_UP, RANGE, TREND_DOWN], size=n).tolist()
+    cambio = (rng.random(n) < 1.0 / max(regime_length, 1)).tolist()
+
+    sigmas = [0.0] * n
+    log_close = [0.0] * n
+    x = math.log(start_price)
+    h = 0.0
+    regimen = RANGE
+    ancla = x
+    duracion_regimen = 0
+    for i in range(n):
+        h = 0.95 * h + choques_vol[i]
+        sigma = volatility * math.exp(h)
+        if cambio[i] and duracion_regimen >= 10:
+            regimen = sorteo_regimen[i]
+            ancla = x
+            duracion_regimen = 0
+        if regimen == RANGE:
+            x += -mean_reversion * (x - ancla) + 0.8 * sigma * ruido[i]
+        else:
+            x += regimen * trend_strength * sigma + sigma * ruido[i]
+        duracion_regimen += 1
+        sigmas[i] = sigma
+        log_close[i] = x
+
+    sigmas = np.array(sigmas)
+    close = np.exp(np.array(log_close))
+    # Apertura: cierre anterior con un pequeño hueco
+    cierre_anterior = np.r_[start_price, close[:-1]]
+    open_ = cierre_anterior * np.exp(rng.normal(0.0, 0.1, n) * sigmas)
+    cuerpo_alto = np.maximum(open_, close)
+    cuerpo_bajo = np.minimum(open_, close)
+    high = cuerpo_alto * np.exp(np.abs(rng.normal(0.0, 0.5, n)) * sigmas)
+    low = cuerpo_bajo * np.exp(-np.abs(rng.normal(0.0, 0.5, n)) * sigmas)
+
+    recorrido = np.log(high / low) / np.maximum(sigmas, 1e-12)
+    volume = np.round(1000.0 * np.exp(rng.normal(0.0, 0.3, n)) * (1.0 + recorrido))
+    compra = np.clip(0.5 + 0.5 * np.tanh(np.log(close / open_) / np.maximum(sigmas, 1e-12)), 0.0, 1.0)
+
+    df = pd.DataFrame({
+        'time': tiempos,
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+        'volume': volume,
+    })
+    df['buy_volume'] = df['volume'] * compra
+    df['sell_volume'] = df['volume'] - df['buy_volume']
+    df['volume_delta'] = df['buy_volume'] - df['sell_volume']
+    return df
@@ -2,10 +2,17 @@
 Inicializador de servicios compartidos
 """
 import logging
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
 
-from .config import MAX_WORKERS, LOGGING_LEVEL, TELEGRAM_BOT_TOKEN
+from .config import (
+    MAX_WORKERS, PROCESS_POOL_WORKERS, LOGGING_LEVEL, TELEGRAM_BOT_TOKEN,
+    YAHOO_RATE_PER_SECOND, YAHOO_BURST, YAHOO_MAX_CONCURRENCY,
+    BINANCE_RATE_PER_SECOND, BINANCE_BURST, BINANCE_MAX_CONCURRENCY,
+    FETCH_RETRIES, FETCH_BACKOFF_BASE_SECONDS, FETCH_BACKOFF_MAX_SECONDS, FETCH_QUEUE_TIMEOUT_SECONDS
+)
+from .pools import TrackedExecutor
+from .fetch_scheduler import FetchScheduler
 # from ..modulos.estrategia_qqe_mod.notificaciones import Notificaciones  # Módulo no existe
 
 # Configurar logging
@@ -17,4 +24,23 @@ executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
 scheduler = BackgroundScheduler()
 # notificaciones = Notificaciones(TELEGRAM_BOT_TOKEN)  # Deshabilitado temporalmente
 
-__all__ = ['executor', 'scheduler', 'logger']  # Removido 'notificaciones'
+# Pools con métricas: I/O en hilos, cálculo en procesos (o en hilos si PROCESS_POOL_WORKERS=0)
+io_pool = TrackedExecutor(executor, MAX_WORKERS, 'io')
+if PROCESS_POOL_WORKERS > 0:
+    cpu_pool = TrackedExecutor(ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS), PROCESS_POOL_WORKERS, 'cpu')
+else:
+    cpu_pool = TrackedExecutor(executor, MAX_WORKERS, 'cpu')
+
+# Límites, prioridades y reintentos de las descargas a cada proveedor
+fetch_scheduler = FetchScheduler(
+    limits={
+        'yahoo': (YAHOO_RATE_PER_SECOND, YAHOO_BURST, YAHOO_MAX_CONCURRENCY),
+        'binance': (BINANCE_RATE_PER_SECOND, BINANCE_BURST, BINANCE_MAX_CONCURRENCY),
+    },
+    retries=FETCH_RETRIES,
+    backoff_base=FETCH_BACKOFF_BASE_SECONDS,
+    backoff_max=FETCH_BACKOFF_MAX_SECONDS,
+    queue_timeout=FETCH_QUEUE_TIMEOUT_SECONDS
+)
+
+__all__ = ['executor', 'scheduler', 'logger', 'io_pool', 'cpu_pool', 'fetch_scheduler']  # Removido 'notificaciones'
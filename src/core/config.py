@@ -22,8 +22,114 @@ TELEGRAM_BOT_TOKEN = "7979473682:AAGrztiOP_LTt7O2K_gw-Y93wvGryX8XCgo"  # Kairen
 SCHEDULER_INTERVAL_HOURS = 1
 SCHEDULER_INTERVAL_MINUTES = 15
 
+# Precálculo tras cada cierre de vela: watchlist "activo:intervalo" separada por comas
+PRECOMPUTE_ENABLED = os.getenv("PRECOMPUTE_ENABLED", "1") == "1"
+PRECOMPUTE_WATCHLIST = os.getenv("PRECOMPUTE_WATCHLIST", "GC=F:1h")
+PRECOMPUTE_LIMIT = int(os.getenv("PRECOMPUTE_LIMIT", 1000))
+PRECOMPUTE_MINIMUM_TRESURE = float(os.getenv("PRECOMPUTE_MINIMUM_TRESURE", 0.21))
+PRECOMPUTE_FORMATS = tuple(os.getenv("PRECOMPUTE_FORMATS", "columnar,records").split(","))
+PRECOMPUTE_DELAY_SECONDS = float(os.getenv("PRECOMPUTE_DELAY_SECONDS", 2))
+PRECOMPUTE_JITTER_SECONDS = float(os.getenv("PRECOMPUTE_JITTER_SECONDS", 5))
+
 # Configuración de logging
 LOGGING_LEVEL = "INFO"
 
-# Configuración de hilos
-MAX_WORKERS = 3
+# Configuración de hilos (I/O) y procesos (cálculo de pullbacks; 0 = usar los hilos)
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", 3))
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", os.cpu_count() or 2))
+
+# Motor de detección de pullbacks: "legacy" (DataFrame fila a fila), "fast" (arrays NumPy)
+# o "verify" (ejecuta ambos y compara)
+PULLBACK_ENGINE = os.getenv("PULLBACK_ENGINE", "legacy")
+# Con el motor legacy, las ventanas de más de estas velas se detectan con el motor fast
+# (mismo resultado): legacy tarda ~1 s por cada 1000 velas y MAX_CANDLES llega a 50000
+PULLBACK_FAST_ABOVE_CANDLES = int(os.getenv("PULLBACK_FAST_ABOVE_CANDLES", 2000))
+
+# Caché de velas OHLCV en memoria
+CANDLE_CACHE_MAX_MB = int(os.getenv("CANDLE_CACHE_MAX_MB", 64))
+CANDLE_CACHE_TAIL_TTL_SECONDS = int(os.getenv("CANDLE_CACHE_TAIL_TTL_SECONDS", 30))
+
+# Historia larga: máximo de velas por petición y ventanas descargándose en paralelo
+MAX_CANDLES = int(os.getenv("MAX_CANDLES", 50000))
+HISTORY_MAX_WORKERS = int(os.getenv("HISTORY_MAX_WORKERS", 4))
+
+# Almacén de velas cerradas en disco (proveedor/activo/intervalo, una columna por fichero)
+CANDLE_STORE_ENABLED = os.getenv("CANDLE_STORE_ENABLED", "1") == "1"
+CANDLE_STORE_DIR = Path(os.getenv("CANDLE_STORE_DIR", BASE_DIR / "data" / "candles"))
+
+# Máximo de velas por backtest y puntos de la curva de capital devuelta
+MAX_BACKTEST_CANDLES = int(os.getenv("MAX_BACKTEST_CANDLES", 500000))
+BACKTEST_MAX_POINTS = int(os.getenv("BACKTEST_MAX_POINTS", 2000))
+
+# Máximo de backtests (series x combinaciones de parámetros) por barrido
+MAX_SWEEP_RUNS = int(os.getenv("MAX_SWEEP_RUNS", 20000))
+
+# Máximo de intervalos por petición del endpoint multi-timeframe
+MAX_TIMEFRAMES = int(os.getenv("MAX_TIMEFRAMES", 8))
+
+# Máximo de pares (activo, intervalo) por petición del endpoint batch
+MAX_BATCH_ITEMS = int(os.getenv("MAX_BATCH_ITEMS", 100))
+
+# Máximo de activos por escaneo del screener
+MAX_SCREENER_ASSETS = int(os.getenv("MAX_SCREENER_ASSETS", 1000))
+# Estados incrementales del screener (activo, intervalo, umbral, proveedor) en memoria (LRU)
+SCREENER_MAX_STATES = int(os.getenv("SCREENER_MAX_STATES", 5000))
+
+# Lista de activos del screener cuando la petición no indica activos (separados por comas)
+SCREENER_WATCHLIST = [
+    activo.strip()
+    for activo in os.getenv("SCREENER_WATCHLIST", "GC=F,SI=F,CL=F,EURUSD=X,GBPUSD=X,USDJPY=X,^GSPC,^NDX,^DJI,MSFT,AAPL").split(",")
+    if activo.strip()
+]
+
+# Streaming (SSE): velas por stream, segundos entre consultas del productor y keep-alive
+STREAM_LIMIT = int(os.getenv("STREAM_LIMIT", 1000))
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", 5))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", 15))
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", 100))
+
+# Espera máxima (segundos) de una petición coalescida con otra idéntica en curso
+SINGLE_FLIGHT_TIMEOUT_SECONDS = float(os.getenv("SINGLE_FLIGHT_TIMEOUT_SECONDS", 30))
+
+# Cabecera Server-Timing con el desglose de tiempos por etapa: en todas las
+# respuestas (1) o solo en las peticiones con la cabecera X-Server-Timing: 1 (0)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "0") == "1"
+
+# Planificador de descargas: peticiones por segundo, ráfaga y peticiones en curso por proveedor
+YAHOO_RATE_PER_SECOND = float(os.getenv("YAHOO_RATE_PER_SECOND", 2))
+YAHOO_BURST = float(os.getenv("YAHOO_BURST", 5))
+YAHOO_MAX_CONCURRENCY = int(os.getenv("YAHOO_MAX_CONCURRENCY", 4))
+BINANCE_RATE_PER_SECOND = float(os.getenv("BINANCE_RATE_PER_SECOND", 10))
+BINANCE_BURST = float(os.getenv("BINANCE_BURST", 20))
+BINANCE_MAX_CONCURRENCY = int(os.getenv("BINANCE_MAX_CONCURRENCY", 8))
+# Reintentos de errores transitorios (backoff exponencial con jitter) y espera máxima en cola (0 = sin límite)
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", 3))
+FETCH_BACKOFF_BASE_SECONDS = float(os.getenv("FETCH_BACKOFF_BASE_SECONDS", 0.5))
+FETCH_BACKOFF_MAX_SECONDS = float(os.getenv("FETCH_BACKOFF_MAX_SECONDS", 8))
+FETCH_QUEUE_TIMEOUT_SECONDS = float(os.getenv("FETCH_QUEUE_TIMEOUT_SECONDS", 60))
+
+# Proveedor de velas de Yahoo: "yfinance" (yf.Ticker por petición) o "chart" (cliente HTTP
+# asíncrono del endpoint chart con un pool de conexiones persistentes compartido)
+YAHOO_PROVIDER = os.getenv("YAHOO_PROVIDER", "yfinance")
+YAHOO_CHART_BASE_URL = os.getenv("YAHOO_CHART_BASE_URL", "https://query2.finance.yahoo.com")
+YAHOO_CHART_MAX_CONNECTIONS = int(os.getenv("YAHOO_CHART_MAX_CONNECTIONS", 20))
+YAHOO_CHART_TIMEOUT_SECONDS = float(os.getenv("YAHOO_CHART_TIMEOUT_SECONDS", 10))
+
+# Proveedor de velas del servicio: yfinance, chart, record (descarga con DATA_RECORD_UPSTREAM y
+# graba cada respuesta en DATA_RECORD_DIR) o replay (sirve lo grabado en DATA_RECORD_DIR sin red).
+# Cada petición puede elegir otro con ?provider= o la cabecera X-Data-Provider
+DATA_PROVIDER = os.getenv("DATA_PROVIDER", YAHOO_PROVIDER)
+DATA_RECORD_DIR = Path(os.getenv("DATA_RECORD_DIR", BASE_DIR / "data" / "recordings"))
+DATA_RECORD_UPSTREAM = os.getenv("DATA_RECORD_UPSTREAM", YAHOO_PROVIDER)
+# Reproducción: velocidad respecto a la latencia grabada (1 = la misma, 2 = la mitad, 0 = sin
+# esperar) y latencia fija añadida a cada respuesta
+DATA_REPLAY_SPEED = float(os.getenv("DATA_REPLAY_SPEED", 1))
+DATA_REPLAY_LATENCY_SECONDS = float(os.getenv("DATA_REPLAY_LATENCY_SECONDS", 0))
+
+# Velas de Binance por WebSocket de klines: las últimas velas se sirven desde un buffer
+# en memoria por (símbolo, intervalo) sin llamadas REST mientras el stream está al día.
+# URL base del WebSocket, velas por buffer y segundos sin lecturas antes de cancelar la suscripción
+BINANCE_STREAM_ENABLED = os.getenv("BINANCE_STREAM_ENABLED", "1") == "1"
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443")
+BINANCE_STREAM_CAPACITY = int(os.getenv("BINANCE_STREAM_CAPACITY", 1000))
+BINANCE_STREAM_IDLE_SECONDS = float(os.getenv("BINANCE_STREAM_IDLE_SECONDS", 600))
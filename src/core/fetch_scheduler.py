@@ -0,0 +1,408 @@
+"""
+Planificador central de las peticiones a los proveedores de datos
+
+Todas las descargas (Yahoo Finance, Binance) pasan por FetchScheduler.call (o
+call_async desde corrutinas), que por proveedor aplica:
+- un token bucket (peticiones por segundo con ráfaga máxima)
+- un máximo de peticiones en curso a la vez
+- una cola por prioridad: interactive (peticiones del dashboard) antes que
+  warmup (precálculo, streams) y esta antes que backfill (backtests,
+  barridos, replays); dentro de cada prioridad, por orden de llegada
+- reintentos de los errores transitorios con backoff exponencial y jitter
+
+La prioridad se toma del contexto (fetch_priority), así no hay que pasarla por
+todas las funciones entre el endpoint y el fetcher. El tiempo que cada petición
+espera turno se publica en bran_fetch_queue_wait_seconds para dimensionar los
+límites.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import registry, MetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Prioridades, de mayor a menor
+INTERACTIVE = "interactive"
+WARMUP = "warmup"
+BACKFILL = "backfill"
+PRIORITIES = (INTERACTIVE, WARMUP, BACKFILL)
+
+# Intervalo máximo (segundos) entre comprobaciones del turno de las llamadas asíncronas
+POLL_SECONDS = 0.02
+
+# Límites de espera en cola (segundos)
+QUEUE_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_prioridad = contextvars.ContextVar("bran_fetch_priority", default=INTERACTIVE)
+
+QUEUE_WAIT_SECONDS = registry.histogram(
+    "bran_fetch_queue_wait_seconds",
+    "Espera de una petición al proveedor hasta obtener turno (token y hueco de concurrencia)",
+    ("provider", "priority"),
+    buckets=QUEUE_WAIT_BUCKETS
+)
+FETCH_RETRIES = registry.counter(
+    "bran_fetch_retries_total",
+    "Reintentos de peticiones al proveedor tras un error transitorio",
+    ("provider",)
+)
+FETCH_FAILURES = registry.counter(
+    "bran_fetch_failures_total",
+    "Peticiones al proveedor fallidas tras agotar los reintentos o sin turno a tiempo (reason)",
+    ("provider", "reason")
+)
+
+
+@contextmanager
+def fetch_priority(prioridad):
+    """
+    Prioridad de las descargas hechas dentro del bloque (y de las tareas que copien el contexto)
+    """
+    if prioridad not in PRIORITIES:
+        raise ValueError(f"Prioridad no soportada: {prioridad}. Use {PRIORITIES}")
+    token = _prioridad.set(prioridad)
+    try:
+        yield
+    finally:
+        _prioridad.reset(token)
+
+
+def current_priority():
+    return _prioridad.get()
+
+
+class FetchQueueTimeout(TimeoutError):
+    """
+    La petición no obtuvo turno en el tiempo máximo de espera en cola
+    """
+
+
+class FetchError(Exception):
+    """
+    La descarga falló (error del proveedor tras los reintentos, sin turno o
+    respuesta no procesable); un DataFrame vacío significa en cambio que el
+    proveedor respondió sin velas
+    """
+
+
+class TokenBucket:
+    """
+    Token bucket: rate tokens por segundo hasta un máximo de burst (rate <= 0: sin límite)
+
+    No es seguro entre hilos por sí solo: lo protege el lock del proveedor
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._actualizado = time.monotonic()
+
+    def _rellenar(self, ahora):
+        if ahora > self._actualizado:
+            self._tokens = min(self.burst, self._tokens + (ahora - self._actualizado) * self.rate)
+            self._actualizado = ahora
+
+    def delay(self, ahora):
+        """
+        Segundos hasta que haya un token disponible (0 si ya lo hay)
+        """
+        if self.rate <= 0:
+            return 0.0
+        self._rellenar(ahora)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self, ahora):
+        if self.rate > 0:
+            self._rellenar(ahora)
+            self._tokens -= 1
+
+    def tokens(self):
+        if self.rate <= 0:
+            return None
+        self._rellenar(time.monotonic())
+        return self._tokens
+
+
+class _Proveedor:
+    """
+    Estado de un proveedor: límites, peticiones en curso, cola y contadores
+    """
+
+    def __init__(self, name, rate, burst, max_concurrency):
+        self.name = name
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.cond = threading.Condition()
+        self.activas = 0
+        # Montículo de [prioridad, orden de llegada]: la cabeza es la siguiente en obtener turno
+        self.cola = []
+        self.en_cola = {prioridad: 0 for prioridad in PRIORITIES}
+        self.esperas = {prioridad: [0, 0.0, 0.0] for prioridad in PRIORITIES}  # peticiones, suma, máximo
+        self.retries = 0
+        self.failures = 0
+        self.timeouts = 0
+
+
+class FetchScheduler:
+    """
+    Limita, ordena por prioridad y reintenta las peticiones a cada proveedor
+    """
+
+    def __init__(self, limits, retries=3, backoff_base=0.5, backoff_max=8.0, queue_timeout=60.0,
+                 default_limits=(0.0, 1.0, 4)):
+        """
+        Parameters:
+        - limits: proveedor -> (peticiones por segundo, ráfaga, peticiones en curso máximas)
+        - retries: reintentos máximos de un error transitorio
+        - backoff_base: espera base (segundos) del primer reintento; se dobla en cada uno
+        - backoff_max: espera máxima (segundos) entre reintentos
+        - queue_timeout: segundos máximos esperando turno (0 o None: sin límite)
+        - default_limits: límites de los proveedores que no están en limits
+        """
+        self.limits = dict(limits)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.queue_timeout = queue_timeout or None
+        self.default_limits = default_limits
+        self._lock = threading.Lock()
+        self._proveedores = {}
+        self._orden = itertools.count()
+        registry.register_collector(self._collect_metrics)
+
+    def _proveedor(self, name):
+        with self._lock:
+            proveedor = self._proveedores.get(name)
+            if proveedor is None:
+                rate, burst, concurrency = self.limits.get(name, self.default_limits)
+                proveedor = self._proveedores[name] = _Proveedor(name, rate, burst, concurrency)
+            return proveedor
+
+    def call(self, provider, fn, *args, retryable=None, **kwargs):
+        """
+        Ejecuta fn(*args, **kwargs) cuando el proveedor tiene turno, reintentando los errores transitorios
+
+        Parameters:
+        - provider: nombre del proveedor ("yahoo", "binance"...)
+        - fn: función que hace la petición; debe lanzar una excepción si falla
+        - retryable: función error -> bool que indica si el error es transitorio
+          (por defecto se reintenta cualquier Exception)
+
+        Returns:
+        - Resultado de fn
+
+        Raises:
+        - FetchQueueTimeout si no obtiene turno en queue_timeout segundos
+        - La última excepción de fn si no es transitoria o se agotan los reintentos
+        """
+        proveedor = self._proveedor(provider)
+        prioridad = _prioridad.get()
+        intento = 0
+        while True:
+            self._adquirir(proveedor, prioridad)
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                espera = self._reintento(proveedor, intento, e, retryable)
+            finally:
+                # El hueco de concurrencia se libera también durante el backoff
+                self._liberar(proveedor)
+            intento += 1
+            time.sleep(espera)
+
+    async def call_async(self, provider, fn, *args, retryable=None, **kwargs):
+        """
+        Igual que call pero fn es una corrutina: espera turno y backoff sin ocupar un hilo
+
+        La espera en cola se hace sondeando el estado del proveedor (comparte
+        cola, tokens y concurrencia con las llamadas síncronas)
+        """
+        proveedor = self._proveedor(provider)
+        prioridad = _prioridad.get()
+        intento = 0
+        while True:
+            await self._adquirir_async(proveedor, prioridad)
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                espera = self._reintento(proveedor, intento, e, retryable)
+            finally:
+                self._liberar(proveedor)
+            intento += 1
+            await asyncio.sleep(espera)
+
+    def _reintento(self, proveedor, intento, error, retryable):
+        """
+        Segundos de espera antes de reintentar; relanza el error si no es transitorio o no quedan reintentos
+        """
+        if intento >= self.retries or (retryable is not None and not retryable(error)):
+            FETCH_FAILURES.inc(provider=proveedor.name, reason="error")
+            with proveedor.cond:
+                proveedor.failures += 1
+            raise error
+        # Full jitter: espera aleatoria entre 0 y base * 2^intento (con tope)
+        espera = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** intento))
+        FETCH_RETRIES.inc(provider=proveedor.name)
+        with proveedor.cond:
+            proveedor.retries += 1
+        logger.info(
+            f"{proveedor.name}: reintento {intento + 1}/{self.retries} en {espera:.2f}s tras {type(error).__name__}: {error}"
+        )
+        return espera
+
+    def _encolar(self, proveedor, prioridad):
+        entrada = [PRIORITIES.index(prioridad), next(self._orden)]
+        with proveedor.cond:
+            heapq.heappush(proveedor.cola, entrada)
+            proveedor.en_cola[prioridad] += 1
+        return entrada
+
+    def _turno(self, proveedor, entrada, ahora):
+        """
+        Con el lock del proveedor: concede el turno a entrada si es la cabeza de
+        la cola, hay hueco de concurrencia y hay token
+
+        Returns:
+        - 0 si lo concede, los segundos hasta el siguiente token si solo falta
+          el token, o None si tiene que esperar a otra petición
+        """
+        if proveedor.cola[0] is not entrada or proveedor.activas >= proveedor.max_concurrency:
+            return None
+        espera = proveedor.bucket.delay(ahora)
+        if espera <= 0:
+            proveedor.bucket.take(ahora)
+            heapq.heappop(proveedor.cola)
+            proveedor.activas += 1
+            return 0
+        return espera
+
+    def _salir_de_cola(self, proveedor, entrada, prioridad, inicio, error=None):
+        """
+        Con el lock del proveedor: quita entrada de la cola (si no obtuvo turno) y registra la espera
+        """
+        proveedor.en_cola[prioridad] -= 1
+        if error is not None:
+            proveedor.cola.remove(entrada)
+            heapq.heapify(proveedor.cola)
+            if isinstance(error, FetchQueueTimeout):
+                proveedor.timeouts += 1
+                FETCH_FAILURES.inc(provider=proveedor.name, reason="queue_timeout")
+        else:
+            esperado = time.monotonic() - inicio
+            estadistica = proveedor.esperas[prioridad]
+            estadistica[0] += 1
+            estadistica[1] += esperado
+            estadistica[2] = max(estadistica[2], esperado)
+            QUEUE_WAIT_SECONDS.observe(esperado, provider=proveedor.name, priority=prioridad)
+        # La nueva cabeza de la cola puede tener turno
+        proveedor.cond.notify_all()
+
+    def _limite_cola(self, proveedor, prioridad, limite, ahora, espera):
+        """
+        Acota la espera al tiempo que queda en cola; lanza FetchQueueTimeout si se agotó
+        """
+        if limite is None:
+            return espera
+        restante = limite - ahora
+        if restante <= 0:
+            raise FetchQueueTimeout(f"{proveedor.name}: sin turno tras {self.queue_timeout}s en cola ({prioridad})")
+        return restante if espera is None else min(espera, restante)
+
+    def _adquirir(self, proveedor, prioridad):
+        """
+        Espera hasta que la petición es la cabeza de la cola, hay hueco de concurrencia y hay token
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.queue_timeout if self.queue_timeout else None
+        entrada = self._encolar(proveedor, prioridad)
+        with proveedor.cond:
+            try:
+                while True:
+                    ahora = time.monotonic()
+                    espera = self._turno(proveedor, entrada, ahora)
+                    if espera == 0:
+                        break
+                    proveedor.cond.wait(self._limite_cola(proveedor, prioridad, limite, ahora, espera))
+            except BaseException as e:
+                self._salir_de_cola(proveedor, entrada, prioridad, inicio, e)
+                raise
+            self._salir_de_cola(proveedor, entrada, prioridad, inicio)
+
+    async def _adquirir_async(self, proveedor, prioridad):
+        """
+        Versión asíncrona de _adquirir: sondea el turno cada POLL_SECONDS como máximo
+        """
+        inicio = time.monotonic()
+        limite = inicio + self.queue_timeout if self.queue_timeout else None
+        entrada = self._encolar(proveedor, prioridad)
+        try:
+            while True:
+                with proveedor.cond:
+                    ahora = time.monotonic()
+                    espera = self._turno(proveedor, entrada, ahora)
+                    if espera == 0:
+                        self._salir_de_cola(proveedor, entrada, prioridad, inicio)
+                        return
+                    espera = self._limite_cola(proveedor, prioridad, limite, ahora, espera)
+                await asyncio.sleep(POLL_SECONDS if espera is None else min(espera, POLL_SECONDS))
+        except BaseException as e:
+            with proveedor.cond:
+                self._salir_de_cola(proveedor, entrada, prioridad, inicio, e)
+            raise
+
+    def _liberar(self, proveedor):
+        with proveedor.cond:
+            proveedor.activas -= 1
+            proveedor.cond.notify_all()
+
+    def stats(self):
+        """
+        Por proveedor: límites, peticiones en curso y en cola, espera en cola por prioridad y reintentos
+        """
+        with self._lock:
+            proveedores = list(self._proveedores.values())
+        resultado = {}
+        for proveedor in proveedores:
+            with proveedor.cond:
+                tokens = proveedor.bucket.tokens()
+                resultado[proveedor.name] = {
+                    'rate_per_second': proveedor.bucket.rate,
+                    'burst': proveedor.bucket.burst,
+                    'tokens': round(tokens, 3) if tokens is not None else None,
+                    'max_concurrency': proveedor.max_concurrency,
+                    'active': proveedor.activas,
+                    'queued': dict(proveedor.en_cola),
+                    'queue_wait': {
+                        prioridad: {
+                            'requests': peticiones,
+                            'avg_seconds': suma / peticiones if peticiones else 0.0,
+                            'max_seconds': maximo
+                        }
+                        for prioridad, (peticiones, suma, maximo) in proveedor.esperas.items()
+                    },
+                    'retries': proveedor.retries,
+                    'failures': proveedor.failures,
+                    'queue_timeouts': proveedor.timeouts
+                }
+        return resultado
+
+    def _collect_metrics(self):
+        """
+        Peticiones en curso y en cola por proveedor (se leen al servir /metrics)
+        """
+        activas = MetricFamily("bran_fetch_active", "Peticiones al proveedor en curso", "gauge", ("provider",))
+        en_cola = MetricFamily("bran_fetch_queued", "Peticiones al proveedor esperando turno", "gauge", ("provider", "priority"))
+        for nombre, stats in self.stats().items():
+            activas.add(stats['active'], nombre)
+            for prioridad, cuenta in stats['queued'].items():
+                en_cola.add(cuenta, nombre, prioridad)
+        return [activas, en_cola]
@@ -0,0 +1,318 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus
+
+Contadores, gauges e histogramas con etiquetas, más "collectors": funciones
+que se evalúan al servir /metrics y leen los contadores que ya llevan otros
+componentes (caché de velas, pools, single-flight, streams).
+
+Los tiempos por etapa (descarga, preparación, detección, serialización...) se
+acumulan en el histograma bran_stage_seconds y, si la petición lo pide, en un
+desglose por petición que se devuelve en la cabecera Server-Timing.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Límites (segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Desglose de tiempos de la petición en curso: etapa -> segundos (None si no se pidió)
+_desglose = contextvars.ContextVar("bran_request_timings", default=None)
+
+
+def _formato_valor(valor):
+    if valor == math.inf:
+        return "+Inf"
+    if valor == -math.inf:
+        return "-Inf"
+    if isinstance(valor, float) and math.isnan(valor):
+        return "NaN"
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _formato_etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    partes = []
+    for nombre, valor in etiquetas:
+        valor = str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        partes.append(f'{nombre}="{valor}"')
+    return "{" + ",".join(partes) + "}"
+
+
+class _Metrica:
+    """
+    Base de las métricas con etiquetas: un valor por combinación de etiquetas
+    """
+    tipo = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def _clave(self, etiquetas):
+        if set(etiquetas) != set(self.labelnames):
+            raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}")
+        return tuple(str(etiquetas[nombre]) for nombre in self.labelnames)
+
+    def samples(self):
+        """
+        Muestras de la métrica: lista de (sufijo, etiquetas, valor)
+        """
+        with self._lock:
+            valores = dict(self._valores)
+        return [
+            ("", list(zip(self.labelnames, clave)), valor)
+            for clave, valor in sorted(valores.items())
+        ]
+
+
+class Counter(_Metrica):
+    tipo = "counter"
+
+    def inc(self, amount=1, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + amount
+
+
+class Gauge(_Metrica):
+    tipo = "gauge"
+
+    def set(self, value, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = value
+
+    def inc(self, amount=1, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metrica):
+    tipo = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        clave = self._clave(labels)
+        with self._lock:
+            serie = self._valores.get(clave)
+            if serie is None:
+                # Cuentas por bucket (no acumuladas), suma y número de observaciones
+                serie = self._valores[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for posicion, limite in enumerate(self.buckets):
+                if value <= limite:
+                    serie[0][posicion] += 1
+                    break
+            serie[1] += value
+            serie[2] += 1
+
+    def samples(self):
+        with self._lock:
+            valores = {clave: (list(cuentas), suma, total) for clave, (cuentas, suma, total) in self._valores.items()}
+        muestras = []
+        for clave, (cuentas, suma, total) in sorted(valores.items()):
+            etiquetas = list(zip(self.labelnames, clave))
+            acumulado = 0
+            for limite, cuenta in zip(self.buckets, cuentas):
+                acumulado += cuenta
+                muestras.append(("_bucket", etiquetas + [("le", _formato_valor(float(limite)))], acumulado))
+            muestras.append(("_bucket", etiquetas + [("le", "+Inf")], total))
+            muestras.append(("_sum", etiquetas, suma))
+            muestras.append(("_count", etiquetas, total))
+        return muestras
+
+
+class MetricFamily:
+    """
+    Métrica calculada por un collector en el momento de servir /metrics
+    """
+
+    def __init__(self, name, documentation, tipo, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.tipo = tipo
+        self.labelnames = tuple(labelnames)
+        self._muestras = []
+
+    def add(self, value, *labelvalues):
+        self._muestras.append(("", list(zip(self.labelnames, labelvalues)), value))
+        return self
+
+    def samples(self):
+        return self._muestras
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas y collectors de la aplicación
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metricas = {}
+        self._collectors = []
+
+    def _registrar(self, metrica):
+        with self._lock:
+            existente = self._metricas.get(metrica.name)
+            if existente is not None:
+                # Reimportar un módulo no debe duplicar (ni reiniciar) la métrica
+                return existente
+            self._metricas[metrica.name] = metrica
+        return metrica
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._registrar(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._registrar(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._registrar(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """
+        Registra una función sin argumentos que devuelve una lista de MetricFamily
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """
+        Todas las métricas en formato de texto de Prometheus (versión 0.0.4)
+        """
+        with self._lock:
+            familias = list(self._metricas.values())
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                familias.extend(collector())
+            except Exception:
+                # Un collector roto no debe tumbar /metrics
+                continue
+        lineas = []
+        for familia in familias:
+            lineas.append(f"# HELP {familia.name} {familia.documentation}")
+            lineas.append(f"# TYPE {familia.name} {familia.tipo}")
+            for sufijo, etiquetas, valor in familia.samples():
+                if valor is None:
+                    continue
+                lineas.append(f"{familia.name}{sufijo}{_formato_etiquetas(etiquetas)} {_formato_valor(valor)}")
+        return "\n".join(lineas) + "\n"
+
+
+# Registro global y métricas compartidas
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "bran_stage_seconds",
+    "Duración de cada etapa del cálculo de una respuesta",
+    ("stage",)
+)
+UPSTREAM_REQUESTS = registry.counter(
+    "bran_upstream_requests_total",
+    "Peticiones al proveedor de datos",
+    ("provider", "kind")
+)
+UPSTREAM_ERRORS = registry.counter(
+    "bran_upstream_errors_total",
+    "Peticiones al proveedor de datos fallidas (error) o sin velas (empty)",
+    ("provider", "kind", "reason")
+)
+HTTP_REQUESTS_IN_FLIGHT = registry.gauge(
+    "bran_http_requests_in_flight",
+    "Peticiones HTTP en curso"
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "bran_http_request_seconds",
+    "Duración de las peticiones HTTP hasta enviar las cabeceras",
+    ("route", "method", "status")
+)
+
+
+def record_stage(stage, seconds):
+    """
+    Acumula la duración de una etapa en el histograma y en el desglose de la petición
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    desglose = _desglose.get()
+    if desglose is not None:
+        desglose[stage] = desglose.get(stage, 0.0) + seconds
+
+
+def record_stages(tiempos):
+    """
+    Registra los tiempos medidos fuera de este proceso (ver timed)
+    """
+    for stage, seconds in (tiempos or {}).items():
+        record_stage(stage, seconds)
+
+
+@contextmanager
+def stage(name):
+    """
+    Mide un bloque como etapa name (histograma y desglose de la petición)
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - inicio)
+
+
+@contextmanager
+def timed(tiempos, name):
+    """
+    Mide un bloque y acumula los segundos en el diccionario tiempos
+
+    Para código que corre en el pool de procesos: los tiempos vuelven con el
+    resultado y el proceso principal los registra con record_stages
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        if tiempos is not None:
+            tiempos[name] = tiempos.get(name, 0.0) + time.perf_counter() - inicio
+
+
+def start_request_timings():
+    """
+    Activa el desglose de tiempos para la petición (contexto) en curso
+
+    Returns:
+        (desglose, token): el diccionario que se irá llenando y el token para reset_request_timings
+    """
+    desglose = {}
+    return desglose, _desglose.set(desglose)
+
+
+def reset_request_timings(token):
+    _desglose.reset(token)
+
+
+def server_timing_header(desglose, total=None) -> str:
+    """
+    Valor de la cabecera Server-Timing (duraciones en milisegundos)
+    """
+    partes = [f"{etapa};dur={segundos * 1000:.1f}" for etapa, segundos in desglose.items()]
+    if total is not None:
+        partes.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(partes)
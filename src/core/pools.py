@@ -0,0 +1,68 @@
+"""
+Ejecución de trabajo bloqueante fuera del event loop de asyncio
+Hilos para I/O (descargas) y procesos para cálculo (detección de pullbacks)
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TrackedExecutor:
+    """
+    Envoltorio de un Executor que mide cuántas tareas esperan turno
+    """
+
+    def __init__(self, executor, workers, name):
+        """
+        Parameters:
+        - executor: ThreadPoolExecutor o ProcessPoolExecutor
+        - workers: número de workers del executor
+        - name: nombre del pool para las métricas
+        """
+        self.executor = executor
+        self.workers = workers
+        self.name = name
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._max_queue_depth = 0
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            self._pending += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._pending - self.workers)
+        futuro = self.executor.submit(fn, *args, **kwargs)
+        futuro.add_done_callback(self._done)
+        return futuro
+
+    def _done(self, _futuro):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Ejecuta fn en el pool y espera su resultado sin bloquear el event loop
+
+        En un pool de hilos fn se ejecuta en una copia del contexto actual (como
+        asyncio.to_thread), así ve las contextvars de la petición
+        """
+        if isinstance(self.executor, ThreadPoolExecutor):
+            fn = functools.partial(contextvars.copy_context().run, fn)
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        """
+        Métricas del pool: workers, tareas pendientes y profundidad de la cola
+        """
+        with self._lock:
+            return {
+                'name': self.name,
+                'workers': self.workers,
+                'pending': self._pending,
+                'queue_depth': max(0, self._pending - self.workers),
+                'max_queue_depth': self._max_queue_depth,
+                'completed': self._completed
+            }
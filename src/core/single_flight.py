@@ -0,0 +1,115 @@
+"""
+Coalescencia de peticiones idénticas concurrentes (single-flight)
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
+
+
+class SingleFlight:
+    """
+    Ejecuta una sola vez una función por clave mientras esté en curso
+
+    La primera llamada con una clave (líder) ejecuta la función; las llamadas
+    con la misma clave que llegan mientras tanto esperan su resultado y lo
+    comparten. Si el líder lanza una excepción, se propaga a todos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_curso = {}
+        self._stats = {'executions': 0, 'shared': 0, 'timeouts': 0}
+
+    def do(self, key, fn, timeout=None):
+        """
+        Ejecuta fn o espera la ejecución en curso para la misma clave
+
+        Parameters:
+        - key: clave hashable que identifica peticiones equivalentes
+        - fn: función sin argumentos a ejecutar
+        - timeout: segundos máximos de espera para las llamadas que no son líder
+
+        Returns:
+        - Resultado de fn (el mismo objeto para todas las llamadas coalescidas)
+
+        Raises:
+        - concurrent.futures.TimeoutError si se agota el tiempo de espera
+        - La excepción lanzada por fn
+        """
+        with self._lock:
+            futuro = self._en_curso.get(key)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._en_curso[key] = futuro
+                self._stats['executions'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if not lider:
+            try:
+                return futuro.result(timeout=timeout)
+            except FuturesTimeoutError:
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise
+
+        try:
+            resultado = fn()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._lock:
+                self._en_curso.pop(key, None)
+
+    async def do_async(self, key, coro_fn, timeout=None):
+        """
+        Versión asíncrona de do(): coro_fn devuelve la corrutina a ejecutar
+
+        El cálculo del líder corre en su propia tarea, por lo que si el líder
+        se cancela (cliente desconectado) las llamadas en espera no se pierden.
+        """
+        with self._lock:
+            futuro = self._en_curso.get(key)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._en_curso[key] = futuro
+                self._stats['executions'] += 1
+            else:
+                self._stats['shared'] += 1
+
+        if lider:
+            tarea = asyncio.ensure_future(coro_fn())
+            tarea.add_done_callback(lambda t: self._resolver(key, futuro, t))
+            return await asyncio.shield(asyncio.wrap_future(futuro))
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(futuro)), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise FuturesTimeoutError()
+
+    def _resolver(self, key, futuro, tarea):
+        with self._lock:
+            self._en_curso.pop(key, None)
+        if tarea.cancelled():
+            futuro.cancel()
+        elif tarea.exception() is not None:
+            futuro.set_exception(tarea.exception())
+        else:
+            futuro.set_result(tarea.result())
+
+    def stats(self):
+        """
+        Contadores de ejecuciones, llamadas compartidas, timeouts y claves en curso
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = len(self._en_curso)
+        return stats
@@ -2,11 +2,40 @@
 Aplicación principal de FastAPI
 Punto de entrada único de la aplicación
 """
+import time
 import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from src.routers import get_api_router
-from src.core.config import PORT, HOST
+from src.core.config import PORT, HOST, PRECOMPUTE_ENABLED, SERVER_TIMING_ENABLED
+from src.core.metrics import (
+    HTTP_REQUESTS_IN_FLIGHT,
+    HTTP_REQUEST_SECONDS,
+    start_request_timings,
+    reset_request_timings,
+    server_timing_header
+)
+from src.services.estrategia_bran_v1.estrategia_bran_v1_service import estrategia_service
+from src.utils.dataExtractor.YahooChartClient import close_shared_chart_client
+from src.utils.dataExtractor.BinanceKlineStream import close_shared_kline_stream
+from src.utils.dataExtractor.providers import use_provider, validate_request_provider
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Arranca el precálculo de la watchlist al iniciar y lo detiene al cerrar
+    (junto con las conexiones del cliente del endpoint chart de Yahoo y del stream de klines de Binance)
+    """
+    if PRECOMPUTE_ENABLED:
+        estrategia_service.precompute.start()
+    yield
+    estrategia_service.precompute.shutdown()
+    close_shared_chart_client()
+    close_shared_kline_stream()
+
 
 # Crear instancia de FastAPI
 app = FastAPI(
@@ -15,7 +44,8 @@ app = FastAPI(
     version="1.0.0",
     docs_url=None,  # Eliminado: /docs
     redoc_url=None,  # Eliminado: /redoc
-    openapi_url=None  # Eliminado: /openapi.json
+    openapi_url=None,  # Eliminado: /openapi.json
+    lifespan=lifespan
 )
 
 # Configurar CORS
@@ -27,6 +57,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    """
+    Mide cada petición (peticiones en curso y latencia por ruta) y, si se
+    pide con X-Server-Timing: 1 o SERVER_TIMING_ENABLED, devuelve el
+    desglose por etapa en la cabecera Server-Timing
+    """
+    desglose, token = start_request_timings()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+    inicio = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if SERVER_TIMING_ENABLED or request.headers.get("x-server-timing") == "1":
+            response.headers["Server-Timing"] = server_timing_header(desglose, time.perf_counter() - inicio)
+        return response
+    finally:
+        HTTP_REQUESTS_IN_FLIGHT.dec()
+        # Plantilla de la ruta (no la URL) para no crear una serie por activo
+        ruta = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - inicio,
+            route=getattr(ruta, "path", "unmatched"),
+            method=request.method,
+            status=status
+        )
+        reset_request_timings(token)
+
+
+@app.middleware("http")
+async def data_provider(request: Request, call_next):
+    """
+    Proveedor de velas de la petición: ?provider= o cabecera X-Data-Provider
+    (yfinance o chart); sin ninguno se usa DATA_PROVIDER. record y replay solo
+    se activan con DATA_PROVIDER
+    """
+    proveedor = request.query_params.get("provider") or request.headers.get("x-data-provider")
+    if not proveedor:
+        return await call_next(request)
+    try:
+        validate_request_provider(proveedor)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"success": False, "error": str(e), "data": None})
+    with use_provider(proveedor):
+        return await call_next(request)
+
+
 # Incluir todos los routers desde el centralizador
 app.include_router(get_api_router())
 
@@ -3,12 +3,14 @@ Centralizador de todos los routers de la API
 """
 from fastapi import APIRouter
 from .estrategia_bran_v1 import router as estrategia_bran_v1_router
+from .metrics import router as metrics_router
 
 # Router principal que agrupa todos los routers
 api_router = APIRouter()
 
-# Incluir solo el router del dashboard
+# Incluir el router del dashboard y el de métricas
 api_router.include_router(estrategia_bran_v1_router)
+api_router.include_router(metrics_router)
 
 
 def get_api_router() -> APIRouter:
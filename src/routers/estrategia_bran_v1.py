@@ -2,12 +2,28 @@
 Router para la Estrategia Bran V1
 Endpoints para el dashboard
 """
-from fastapi import APIRouter, Query
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, Query, Header
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from starlette.requests import Request
-from typing import Optional
+from typing import Optional, List
+from pydantic import BaseModel, Field
 from src.services.estrategia_bran_v1.estrategia_bran_v1_service import estrategia_service
+from src.services.estrategia_bran_v1.response_formats import pack_msgpack, MSGPACK_MEDIA_TYPE
+from src.services.estrategia_bran_v1.screener import SORT_KEYS
+from src.services.estrategia_bran_v1.sweep import SWEEP_SORT_KEYS
+from src.services.estrategia_bran_v1.multi_timeframe import plan_timeframes
+from src.utils.indicadores.pullback_backtest import ENTRY_RULES, DIRECTIONS, STOP_RULES
+from src.core.config import (
+    MAX_CANDLES,
+    MAX_BATCH_ITEMS,
+    MAX_SCREENER_ASSETS,
+    MAX_BACKTEST_CANDLES,
+    BACKTEST_MAX_POINTS,
+    MAX_SWEEP_RUNS,
+    MAX_TIMEFRAMES,
+    SCREENER_WATCHLIST
+)
 
 # Configurar templates
 templates = Jinja2Templates(directory="src/templates")
@@ -16,6 +32,26 @@ templates = Jinja2Templates(directory="src/templates")
 router = APIRouter(tags=["Dashboard"])
 
 
+class BatchItem(BaseModel):
+    """
+    Par (activo, intervalo) del endpoint batch
+    """
+    asset: str = Field(description="Símbolo del activo (ej: GC=F, MSFT, AAPL, EURUSD=X)")
+    interval: str = Field(default="1h", description="Intervalo temporal (1m, 5m, 15m, 1h, 4h, 1d, etc.)")
+
+
+class BatchRequest(BaseModel):
+    """
+    Cuerpo del endpoint batch: los parámetros comunes se aplican a todos los pares
+    """
+    items: List[BatchItem] = Field(min_length=1, max_length=MAX_BATCH_ITEMS)
+    limit: int = Field(default=1000, ge=1, le=MAX_CANDLES, description="Número de velas a obtener por activo")
+    start_time: Optional[int] = Field(default=None, description="Tiempo de inicio en milisegundos")
+    minimum_tresure: float = Field(default=0.21, description="Umbral mínimo para detección de pullbacks")
+    format: str = Field(default="records", pattern="^(records|columnar|msgpack)$", description="Formato de los datos")
+    sparse: bool = Field(default=False, description="Devolver OHLCV y una lista de marcadores")
+
+
 @router.get("/dashboard", response_class=HTMLResponse)
 async def get_dashboard(request: Request):
     """
@@ -30,30 +66,443 @@ async def get_dashboard(request: Request):
 @router.get("/api/estrategia-bran-v1/data")
 async def get_dashboard_data(
     asset: str = Query(default="GC=F", description="Símbolo del activo (ej: GC=F, MSFT, AAPL, EURUSD=X)"),
-    interval: str = Query(default="1h", description="Intervalo temporal (1m, 5m, 15m, 1h, 1d)"),
-    limit: int = Query(default=1000, ge=1, le=1000, description="Número de velas a obtener"),
+    interval: str = Query(default="1h", description="Intervalo temporal (1m, 5m, 15m, 1h, 1d; 2h, 4h, 6h, 8h, 12h y 3d se reagrupan localmente)"),
+    limit: int = Query(default=1000, ge=1, le=MAX_CANDLES, description="Número de velas a obtener"),
     start_time: Optional[int] = Query(default=None, description="Tiempo de inicio en milisegundos"),
-    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks")
+    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks"),
+    response_format: str = Query(
+        default="records",
+        alias="format",
+        pattern="^(records|columnar|msgpack)$",
+        description="Formato de los datos: records, columnar (un array por columna) o msgpack"
+    ),
+    sparse: bool = Query(
+        default=False,
+        description="Devolver solo OHLCV y una lista de marcadores en lugar de columnas de marcadores"
+    ),
+    since: Optional[int] = Query(
+        default=None,
+        description="Devolver solo las velas y marcadores con time >= since (milisegundos)"
+    ),
+    if_none_match: Optional[str] = Header(default=None)
 ):
     """
     Endpoint para obtener datos del mercado con detección de pullbacks
     
+    Las respuestas llevan un ETag: con If-None-Match y sin cambios en las
+    velas se responde 304 sin cuerpo. Con since el cliente recibe solo la
+    cola de la ventana (la vela abierta incluida) para añadirla a la que ya tiene.
+    
     Args:
         asset: Símbolo del activo (ejemplo: GC=F, EURUSD=X, MSFT, AAPL)
         interval: Intervalo temporal (1m, 5m, 15m, 1h, 1d, etc.)
-        limit: Número de velas a obtener (1-1000)
+        limit: Número de velas a obtener (1-MAX_CANDLES; los rangos largos se descargan por ventanas)
         start_time: Tiempo de inicio en milisegundos (opcional)
         minimum_tresure: Umbral mínimo para detección de pullbacks (por defecto 0.21)
+        response_format: Formato de los datos (records, columnar o msgpack)
+        sparse: Si es True, los marcadores van en "markers" como (index, time, marker, price)
+        since: Tiempo en milisegundos desde el que se devuelven velas (opcional)
+        if_none_match: Cabecera If-None-Match con el ETag de una respuesta anterior
+        
+    Returns:
+        JSON (o MessagePack) con los datos del mercado, estadísticas y pullbacks detectados,
+        o 304 Not Modified si el ETag sigue vigente
+    """
+    etag, result = await estrategia_service.get_dashboard_data_conditional_async(
+        asset=asset,
+        interval=interval,
+        limit=limit,
+        start_time=start_time,
+        minimum_tresure=minimum_tresure,
+        response_format=response_format,
+        sparse=sparse,
+        since=since,
+        if_none_match=if_none_match
+    )
+    
+    headers = {"Cache-Control": "no-cache"}
+    if etag is not None:
+        headers["ETag"] = etag
+    if result is None:
+        return Response(status_code=304, headers=headers)
+    if response_format == "msgpack":
+        return Response(content=pack_msgpack(result), media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+    return JSONResponse(content=result, headers=headers)
+
+
+@router.post("/api/estrategia-bran-v1/batch")
+async def get_batch_data(request: BatchRequest):
+    """
+    Endpoint para obtener datos y pullbacks de varios activos en una sola petición
+    
+    Las series sin caché se descargan con una petición multi-ticker por
+    intervalo y la detección se reparte entre los procesos del pool. Un activo
+    que falla no invalida el resto: aparece en "errors" y con success=False
+    en su posición de "results".
+    
+    Args:
+        request: Pares (activo, intervalo) y parámetros comunes (limit, start_time,
+            minimum_tresure, format, sparse) como en /api/estrategia-bran-v1/data
+        
+    Returns:
+        JSON (o MessagePack) con total, succeeded, failed, results y errors
+    """
+    result = await estrategia_service.get_batch_data_async(
+        items=[(item.asset, item.interval) for item in request.items],
+        limit=request.limit,
+        start_time=request.start_time,
+        minimum_tresure=request.minimum_tresure,
+        response_format=request.format,
+        sparse=request.sparse
+    )
+    
+    if request.format == "msgpack":
+        return Response(content=pack_msgpack(result), media_type=MSGPACK_MEDIA_TYPE)
+    return JSONResponse(content=result)
+
+
+@router.get("/api/estrategia-bran-v1/stream")
+async def stream_dashboard_data(
+    request: Request,
+    asset: str = Query(default="GC=F", description="Símbolo del activo (ej: GC=F, MSFT, AAPL, EURUSD=X)"),
+    interval: str = Query(default="1h", description="Intervalo temporal (1m, 5m, 15m, 1h, 4h, 1d, etc.)"),
+    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks")
+):
+    """
+    Endpoint de streaming (Server-Sent Events) de velas y pullbacks
+    
+    Eventos:
+        snapshot: ventana actual en formato columnar (como format=columnar) y rangos
+        update: velas nuevas o revisadas, marcadores añadidos/retirados y rangos
+        stream_error: no se pudieron obtener datos
+    
+    Un único productor por activo/intervalo/umbral sirve a todos los clientes conectados
+    """
+    return StreamingResponse(
+        estrategia_service.stream_events(asset, interval, minimum_tresure, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/api/estrategia-bran-v1/stream-stats")
+async def get_stream_stats():
+    """
+    Endpoint con los productores de streaming activos
+    
+    Returns:
+        JSON con suscriptores, consultas, actualizaciones y desconexiones por stream
+    """
+    return JSONResponse(content=estrategia_service.get_stream_stats())
+
+
+@router.get("/api/estrategia-bran-v1/screener")
+async def get_screener(
+    assets: Optional[str] = Query(default=None, description="Símbolos separados por comas (por defecto la watchlist configurada)"),
+    interval: str = Query(default="1h", description="Intervalo temporal común a todos los activos"),
+    limit: int = Query(default=500, ge=2, le=MAX_CANDLES, description="Velas por activo para el primer escaneo"),
+    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks"),
+    trend: Optional[int] = Query(default=None, ge=-1, le=1, description="Solo activos con esta tendencia (1, -1 o 0)"),
+    max_distance_pct: Optional[float] = Query(default=None, ge=0, description="Solo activos a menos de este % del rangoAlto o rangoBajo"),
+    max_age: Optional[int] = Query(default=None, ge=0, description="Antigüedad máxima (velas) del último marcador"),
+    sort: str = Query(default="dist_alto_pct", pattern=f"^({'|'.join(SORT_KEYS)})$", description="Columna de ordenación"),
+    descending: bool = Query(default=False, description="Orden descendente"),
+    top: Optional[int] = Query(default=None, ge=1, description="Número máximo de filas")
+):
+    """
+    Endpoint del screener: estado de pullbacks de una lista de activos
+    
+    Args:
+        assets: Símbolos separados por comas (ej: GC=F,EURUSD=X,MSFT)
+        interval: Intervalo temporal
+        limit: Velas por activo para el primer escaneo (después solo se procesan las nuevas)
+        minimum_tresure: Umbral mínimo para detección de pullbacks
+        trend, max_distance_pct, max_age: Filtros
+        sort, descending, top: Ordenación y número de filas
+        
+    Returns:
+        JSON con columns, rows (una lista de valores por activo) y errors
+    """
+    lista = [asset.strip() for asset in assets.split(",") if asset.strip()] if assets else None
+    if lista is not None and len(lista) > MAX_SCREENER_ASSETS:
+        return JSONResponse(
+            status_code=422,
+            content={"success": False, "error": f"Máximo {MAX_SCREENER_ASSETS} activos por escaneo", "rows": None}
+        )
+    result = await estrategia_service.get_screener_async(
+        assets=lista,
+        interval=interval,
+        limit=limit,
+        minimum_tresure=minimum_tresure,
+        trend=trend,
+        max_distance_pct=max_distance_pct,
+        max_age=max_age,
+        sort=sort,
+        descending=descending,
+        top=top
+    )
+    return JSONResponse(content=result)
+
+
+@router.get("/api/estrategia-bran-v1/backtest")
+async def get_backtest(
+    asset: str = Query(default="GC=F", description="Símbolo del activo (ej: GC=F, MSFT, AAPL, EURUSD=X)"),
+    interval: str = Query(default="1h", description="Intervalo temporal (1m, 5m, 15m, 1h, 4h, 1d, etc.)"),
+    limit: int = Query(default=5000, ge=3, le=MAX_BACKTEST_CANDLES, description="Número de velas del backtest"),
+    start_time: Optional[int] = Query(default=None, description="Tiempo de inicio en milisegundos"),
+    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks"),
+    entry: str = Query(default="tendencia", pattern=f"^({'|'.join(ENTRY_RULES)})$", description="Regla de entrada"),
+    direction: str = Query(default="both", pattern=f"^({'|'.join(DIRECTIONS)})$", description="Lados operados"),
+    stop: str = Query(default="rango", pattern=f"^({'|'.join(STOP_RULES)})$", description="Stop en rangoBajo/rangoAlto o ninguno"),
+    exit_on_trend: bool = Query(default=False, description="Cerrar la posición cuando la tendencia se gira en contra"),
+    fee: float = Query(default=0.0, ge=0, description="Comisión por lado (fracción del precio, ej: 0.0005)"),
+    slippage: float = Query(default=0.0, ge=0, description="Deslizamiento por lado (fracción del precio)"),
+    max_points: int = Query(default=BACKTEST_MAX_POINTS, ge=2, description="Puntos máximos de la curva de capital")
+):
+    """
+    Endpoint de backtest de las señales de pullbacks
+    
+    Las señales conocidas al cierre de una vela se ejecutan a la apertura de
+    la siguiente; los stops se ejecutan al nivel del rango (o a la apertura si
+    la vela abre más allá)
+    
+    Args:
+        asset, interval, limit, start_time: Velas del backtest
+        minimum_tresure: Umbral mínimo para detección de pullbacks
+        entry: tendencia (giro de tendencia), ruptura (alto/bajo confirmado) o
+            pullback (toque del rango a favor de la tendencia)
+        direction: long, short o both
+        stop: rango o none
+        exit_on_trend: Salida cuando la tendencia se gira en contra
+        fee, slippage: Costes por lado
+        max_points: Puntos de la curva de capital
         
     Returns:
-        JSON con los datos del mercado, estadísticas y pullbacks detectados
+        JSON con summary (retorno, drawdown, win rate, expectancy...), trades y equity
     """
-    result = estrategia_service.get_dashboard_data(
+    result = await estrategia_service.get_backtest_async(
         asset=asset,
         interval=interval,
         limit=limit,
         start_time=start_time,
-        minimum_tresure=minimum_tresure
+        minimum_tresure=minimum_tresure,
+        entry=entry,
+        direction=direction,
+        stop=stop,
+        exit_on_trend=exit_on_trend,
+        fee=fee,
+        slippage=slippage,
+        max_points=max_points
+    )
+    return JSONResponse(content=result)
+
+
+def _lista(texto: str) -> List[str]:
+    return [valor.strip() for valor in texto.split(",") if valor.strip()]
+
+
+@router.get("/api/estrategia-bran-v1/replay")
+async def get_replay(
+    assets: str = Query(default="GC=F", description="Símbolos separados por comas"),
+    interval: str = Query(default="1h", description="Intervalo temporal (1m, 5m, 15m, 1h, 4h, 1d, etc.)"),
+    limit: int = Query(default=5000, ge=3, le=MAX_CANDLES, description="Número de velas del replay por activo"),
+    start_time: Optional[int] = Query(default=None, description="Tiempo de inicio en milisegundos"),
+    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks"),
+    intrabar: bool = Query(default=True, description="Simular la vela abierta (estados intermedios de cada vela)"),
+    include_markers: bool = Query(default=False, description="Incluir la tabla de marcadores de cada activo")
+):
+    """
+    Endpoint de replay vela a vela: repintado y latencia de confirmación de los marcadores
+    
+    Args:
+        assets: Símbolos separados por comas
+        interval, limit, start_time: Velas del replay
+        minimum_tresure: Umbral mínimo para detección de pullbacks
+        intrabar: Si es True cada vela se envía también a medio formar (O-L-H-C u O-H-L-C)
+        include_markers: Devolver first_seen, confirmed_at y removals de cada marcador
+        
+    Returns:
+        JSON con repaint_rate, vanished y latencias por tipo de marcador de cada activo
+    """
+    lista = _lista(assets)
+    if not lista or len(lista) > MAX_BATCH_ITEMS:
+        return JSONResponse(
+            status_code=422,
+            content={"success": False, "error": f"Entre 1 y {MAX_BATCH_ITEMS} activos por replay", "results": None}
+        )
+    result = await estrategia_service.get_replay_async(
+        assets=lista,
+        interval=interval,
+        limit=limit,
+        start_time=start_time,
+        minimum_tresure=minimum_tresure,
+        intrabar=intrabar,
+        include_markers=include_markers
+    )
+    return JSONResponse(content=result)
+
+
+@router.get("/api/estrategia-bran-v1/sweep")
+async def get_sweep(
+    assets: Optional[str] = Query(default=None, description="Símbolos separados por comas (por defecto la watchlist configurada)"),
+    intervals: str = Query(default="1h", description="Intervalos separados por comas"),
+    limit: int = Query(default=5000, ge=3, le=MAX_BACKTEST_CANDLES, description="Número de velas por serie"),
+    start_time: Optional[int] = Query(default=None, description="Tiempo de inicio en milisegundos"),
+    minimum_tresures: str = Query(default="0,0.1,0.21,0.5,1", description="Valores de minimum_tresure separados por comas"),
+    entries: str = Query(default=",".join(ENTRY_RULES), description="Reglas de entrada separadas por comas"),
+    directions: str = Query(default="both", description="Lados operados separados por comas"),
+    stops: str = Query(default="rango", description="Stops separados por comas"),
+    exit_on_trend: str = Query(default="false", pattern="^(true|false|both)$", description="Salida por giro de tendencia: true, false o both"),
+    fee: float = Query(default=0.0, ge=0, description="Comisión por lado (fracción del precio)"),
+    slippage: float = Query(default=0.0, ge=0, description="Deslizamiento por lado (fracción del precio)"),
+    sort: str = Query(default="expectancy", pattern=f"^({'|'.join(SWEEP_SORT_KEYS)})$", description="Métrica de ordenación"),
+    descending: bool = Query(default=True, description="Orden descendente"),
+    min_trades: int = Query(default=0, ge=0, description="Operaciones mínimas por fila"),
+    top: Optional[int] = Query(default=None, ge=1, description="Número máximo de filas de cada tabla")
+):
+    """
+    Endpoint de barrido de parámetros: backtest de cada combinación en cada serie
+    
+    Args:
+        assets, intervals: Series del barrido (producto de ambas listas)
+        limit, start_time: Velas de cada serie
+        minimum_tresures: Valores del umbral de detección
+        entries, directions, stops, exit_on_trend: Reglas del backtest a combinar
+        fee, slippage: Costes por lado
+        sort, descending, min_trades, top: Ordenación y filtrado de las tablas
+        
+    Returns:
+        JSON con ranking (por combinación, agregado entre series) y rows (por serie y combinación)
+    """
+    try:
+        umbrales = [float(valor) for valor in _lista(minimum_tresures)]
+    except ValueError:
+        return JSONResponse(status_code=422, content={"success": False, "error": "minimum_tresures debe ser una lista de números", "rows": None})
+    opciones = {
+        "entries": (_lista(entries), ENTRY_RULES),
+        "directions": (_lista(directions), DIRECTIONS),
+        "stops": (_lista(stops), STOP_RULES),
+    }
+    for nombre, (valores, validos) in opciones.items():
+        invalidos = [valor for valor in valores if valor not in validos]
+        if invalidos or not valores:
+            return JSONResponse(
+                status_code=422,
+                content={"success": False, "error": f"{nombre}: valores válidos {', '.join(validos)}", "rows": None}
+            )
+    exits = {"true": [True], "false": [False], "both": [False, True]}[exit_on_trend]
+    lista = _lista(assets) if assets else SCREENER_WATCHLIST
+    intervalos = _lista(intervals)
+    
+    runs = len(lista) * len(intervalos) * len(umbrales) * len(exits)
+    for valores, _ in opciones.values():
+        runs *= len(valores)
+    if not umbrales or not intervalos or runs > MAX_SWEEP_RUNS:
+        return JSONResponse(
+            status_code=422,
+            content={"success": False, "error": f"El barrido debe tener entre 1 y {MAX_SWEEP_RUNS} backtests", "rows": None}
+        )
+    
+    result = await estrategia_service.get_sweep_async(
+        assets=lista,
+        intervals=intervalos,
+        limit=limit,
+        start_time=start_time,
+        minimum_tresures=umbrales,
+        entries=opciones["entries"][0],
+        directions=opciones["directions"][0],
+        stops=opciones["stops"][0],
+        exits=exits,
+        fee=fee,
+        slippage=slippage,
+        sort=sort,
+        descending=descending,
+        min_trades=min_trades,
+        top=top
     )
+    return JSONResponse(content=result)
+
+
+@router.get("/api/estrategia-bran-v1/multi-timeframe")
+async def get_multi_timeframe(
+    asset: str = Query(default="GC=F", description="Símbolo del activo (ej: GC=F, MSFT, AAPL, EURUSD=X)"),
+    intervals: str = Query(default="15m,1h,4h,1d", description="Intervalos separados por comas (múltiplos del más fino)"),
+    limit: int = Query(default=5000, ge=3, le=MAX_CANDLES, description="Número de velas del intervalo más fino"),
+    start_time: Optional[int] = Query(default=None, description="Tiempo de inicio en milisegundos"),
+    minimum_tresure: float = Query(default=0.21, description="Umbral mínimo para detección de pullbacks"),
+    alignment: Optional[str] = Query(default=None, pattern="^(session|epoch)$", description="Alineación de las velas agregadas"),
+    min_confluence: int = Query(default=2, ge=2, description="Intervalos que deben marcar la misma vela para una confluencia"),
+    include_data: bool = Query(default=True, description="Incluir las velas de cada intervalo")
+):
+    """
+    Endpoint multi-intervalo: una descarga del intervalo más fino y detección por intervalo
     
+    Args:
+        asset: Símbolo del activo
+        intervals: Intervalos separados por comas; los mayores se agregan a partir del más fino
+        limit: Velas del intervalo más fino (la ventana común a todos los intervalos)
+        start_time: Tiempo de inicio en milisegundos (opcional)
+        minimum_tresure: Umbral mínimo para detección de pullbacks
+        alignment: session (apertura de cada sesión) o epoch; por defecto epoch (días UTC) para 1d o más y session para intradía
+        min_confluence: Intervalos distintos necesarios en una confluencia
+        include_data: Si es False solo se devuelven marcadores, rangos y confluencias
+        
+    Returns:
+        JSON con cada intervalo (velas columnar, marcadores y su vela en cada
+        intervalo menor en markers.map) y la tabla de confluencias
+    """
+    intervalos = _lista(intervals)
+    try:
+        intervalos = plan_timeframes(intervalos)
+    except ValueError as e:
+        return JSONResponse(status_code=422, content={"success": False, "error": str(e), "timeframes": None})
+    if len(intervalos) > MAX_TIMEFRAMES:
+        return JSONResponse(
+            status_code=422,
+            content={"success": False, "error": f"Máximo {MAX_TIMEFRAMES} intervalos por petición", "timeframes": None}
+        )
+    result = await estrategia_service.get_multi_timeframe_async(
+        asset=asset,
+        intervals=intervalos,
+        limit=limit,
+        start_time=start_time,
+        minimum_tresure=minimum_tresure,
+        alignment=alignment,
+        min_confluence=min_confluence,
+        include_data=include_data
+    )
     return JSONResponse(content=result)
+
+
+@router.get("/api/estrategia-bran-v1/cache-stats")
+async def get_cache_stats():
+    """
+    Endpoint con los contadores de la caché de velas
+    
+    Returns:
+        JSON con hits, misses, refrescos de cola, expulsiones y memoria usada
+    """
+    return JSONResponse(content=estrategia_service.get_cache_stats())
+
+
+@router.get("/api/estrategia-bran-v1/precompute-stats")
+async def get_precompute_stats():
+    """
+    Endpoint con las métricas del precálculo de la watchlist
+    
+    Returns:
+        JSON con ejecuciones, descartes por solape, fallos, tiempos y próxima ejecución por trabajo
+    """
+    return JSONResponse(content=estrategia_service.get_precompute_stats())
+
+
+@router.get("/api/estrategia-bran-v1/pool-stats")
+async def get_pool_stats():
+    """
+    Endpoint con las métricas de los pools de hilos y procesos y del planificador de descargas
+    
+    Returns:
+        JSON con workers, tareas pendientes y profundidad de cola por pool, y en
+        fetch las peticiones en curso, en cola y la espera en cola por proveedor y prioridad
+    """
+    return JSONResponse(content=estrategia_service.get_pool_stats())
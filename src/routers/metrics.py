@@ -0,0 +1,20 @@
+"""
+Router de métricas en formato Prometheus
+"""
+from fastapi import APIRouter
+from fastapi.responses import Response
+from src.core.metrics import registry, CONTENT_TYPE
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics")
+async def get_metrics():
+    """
+    Endpoint para Prometheus: latencia por etapa y por ruta, aciertos de la
+    caché de velas, errores del proveedor de datos y tareas en curso
+    
+    Returns:
+        Texto en el formato de exposición de Prometheus (0.0.4)
+    """
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
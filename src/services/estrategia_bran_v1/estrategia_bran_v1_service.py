@@ -2,11 +2,85 @@
 Servicio para la estrategia Bran V1
 Maneja la lógica de negocio y obtención de datos de Yahoo Finance (GC=F por defecto)
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import logging
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import numpy as np
 import pandas as pd
 import math
-from src.utils.dataExtractor.YahooFinanceDataFetcher import YahooFinanceDataFetcher
+from src.utils.dataExtractor.providers import provider_class, current_provider
+from src.utils.dataExtractor.CandleCache import CandleCache
+from src.utils.dataExtractor.CandleStore import CandleStore
+from src.utils.dataExtractor.resampling import base_interval, resample_ohlcv
+from src.utils.dataExtractor.intervals import interval_to_timedelta
 from src.utils.indicadores.pullback_detection import PullbackDetection
+from src.utils.indicadores.pullback_backtest import run_backtest
+from src.utils.indicadores.pullback_replay import replay_pullbacks
+from src.services.estrategia_bran_v1.response_formats import (
+    dataframe_to_columnar,
+    markers_payload,
+    compute_etag,
+    etag_matches
+)
+from src.services.estrategia_bran_v1.screener import PullbackScreener, SCREENER_COLUMNS, filter_and_sort
+from src.services.estrategia_bran_v1.precompute import PrecomputeScheduler, parse_watchlist
+from src.services.estrategia_bran_v1.streaming import StreamHub
+from src.services.estrategia_bran_v1.sweep import (
+    SWEEP_COLUMNS,
+    RANKING_COLUMNS,
+    run_sweep,
+    rule_grid,
+    rank_rows,
+    rank_params
+)
+from src.services.estrategia_bran_v1.multi_timeframe import (
+    plan_timeframes,
+    derive_timeframes,
+    analyze_timeframe,
+    map_markers,
+    base_starts,
+    confluence,
+    build_timeframe_payload
+)
+from src.core import io_pool, cpu_pool, scheduler, fetch_scheduler
+from src.core.fetch_scheduler import fetch_priority, BACKFILL
+from src.core.single_flight import SingleFlight
+from src.core.metrics import registry, MetricFamily, stage, timed, record_stages
+from src.core.config import (
+    PULLBACK_ENGINE,
+    PULLBACK_FAST_ABOVE_CANDLES,
+    CANDLE_CACHE_MAX_MB,
+    CANDLE_CACHE_TAIL_TTL_SECONDS,
+    HISTORY_MAX_WORKERS,
+    CANDLE_STORE_ENABLED,
+    CANDLE_STORE_DIR,
+    SCREENER_WATCHLIST,
+    PRECOMPUTE_WATCHLIST,
+    PRECOMPUTE_LIMIT,
+    PRECOMPUTE_MINIMUM_TRESURE,
+    PRECOMPUTE_FORMATS,
+    PRECOMPUTE_DELAY_SECONDS,
+    PRECOMPUTE_JITTER_SECONDS,
+    STREAM_LIMIT,
+    STREAM_POLL_SECONDS,
+    STREAM_HEARTBEAT_SECONDS,
+    STREAM_QUEUE_SIZE,
+    SINGLE_FLIGHT_TIMEOUT_SECONDS,
+    BACKTEST_MAX_POINTS
+)
+
+logger = logging.getLogger(__name__)
+
+
+def detection_engine(candles: int) -> str:
+    """
+    Motor de detección para una ventana: PULLBACK_ENGINE, salvo las ventanas
+    grandes con legacy, que usan fast para no agotar el tiempo de espera
+    """
+    if PULLBACK_ENGINE == "legacy" and candles > PULLBACK_FAST_ABOVE_CANDLES:
+        return "fast"
+    return PULLBACK_ENGINE
 
 
 class EstrategiaBranV1Service:
@@ -17,16 +91,47 @@ class EstrategiaBranV1Service:
     
     def __init__(self):
         """
-        Inicializa el servicio
+        Inicializa el servicio con la caché de velas y la coalescencia de
+        peticiones idénticas, compartidas entre peticiones
         """
-        pass
+        self.candle_cache = CandleCache(
+            max_bytes=CANDLE_CACHE_MAX_MB * 1024 * 1024,
+            tail_ttl=CANDLE_CACHE_TAIL_TTL_SECONDS,
+            history_workers=HISTORY_MAX_WORKERS,
+            store=CandleStore(CANDLE_STORE_DIR) if CANDLE_STORE_ENABLED else None
+        )
+        self.single_flight = SingleFlight()
+        self.screener = PullbackScreener()
+        self.precompute = PrecomputeScheduler(
+            self,
+            scheduler,
+            parse_watchlist(PRECOMPUTE_WATCHLIST),
+            limit=PRECOMPUTE_LIMIT,
+            minimum_tresure=PRECOMPUTE_MINIMUM_TRESURE,
+            formats=PRECOMPUTE_FORMATS,
+            delay_seconds=PRECOMPUTE_DELAY_SECONDS,
+            jitter_seconds=PRECOMPUTE_JITTER_SECONDS,
+            timeout_seconds=SINGLE_FLIGHT_TIMEOUT_SECONDS
+        )
+        self.streams = StreamHub(
+            self,
+            limit=STREAM_LIMIT,
+            poll_seconds=STREAM_POLL_SECONDS,
+            heartbeat_seconds=STREAM_HEARTBEAT_SECONDS,
+            queue_size=STREAM_QUEUE_SIZE,
+            snapshot_timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS
+        )
+        registry.register_collector(self._collect_metrics)
         
     def get_dashboard_data(self, 
                           asset: str = "GC=F", 
                           interval: str = "1h", 
                           limit: int = 1000,
                           start_time: Optional[int] = None,
-                          minimum_tresure: float = 0.21) -> Dict[str, Any]:
+                          minimum_tresure: float = 0.21,
+                          response_format: str = "records",
+                          sparse: bool = False,
+                          since: Optional[int] = None) -> Dict[str, Any]:
         """
         Obtiene datos del mercado y detecta pullbacks para el dashboard
         
@@ -36,17 +141,501 @@ class EstrategiaBranV1Service:
             limit: Número de velas a obtener
             start_time: Tiempo de inicio en milisegundos (opcional)
             minimum_tresure: Umbral mínimo para detección de pullbacks (por defecto 0.21)
+            response_format: "records" (un diccionario por vela) o "columnar" (un array por columna)
+            sparse: Si es True, devuelve OHLCV y una lista de marcadores en lugar de columnas
+            since: Si se indica (ms), solo se devuelven las velas y marcadores con time >= since
             
         Returns:
             Diccionario con los datos del mercado, estadísticas y pullbacks detectados
         """
+        clave = (asset, interval, limit, start_time, minimum_tresure, response_format, sparse, since, current_provider())
+        # Peticiones idénticas en curso comparten un único cálculo
         try:
-            # Crear fetcher para el activo (GC=F por defecto)
-            fetcher = YahooFinanceDataFetcher(asset=asset, interval=interval)
+            return self.single_flight.do(
+                clave,
+                lambda: self._build_dashboard_data(
+                    asset, interval, limit, start_time, minimum_tresure, response_format, sparse, since
+                ),
+                timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS
+            )
+        except FuturesTimeoutError:
+            return {
+                "success": False,
+                "error": f"Tiempo de espera agotado ({SINGLE_FLIGHT_TIMEOUT_SECONDS}s) esperando una petición idéntica en curso",
+                "data": None
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "data": None
+            }
+    
+    async def get_dashboard_data_async(self,
+                                       asset: str = "GC=F",
+                                       interval: str = "1h",
+                                       limit: int = 1000,
+                                       start_time: Optional[int] = None,
+                                       minimum_tresure: float = 0.21,
+                                       response_format: str = "records",
+                                       sparse: bool = False,
+                                       since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Versión asíncrona de get_dashboard_data para los endpoints
+        
+        Descarga y detección se ejecutan fuera del event loop, de modo que una
+        respuesta lenta de Yahoo no bloquea el resto de peticiones
+        """
+        clave = (asset, interval, limit, start_time, minimum_tresure, response_format, sparse, since, current_provider())
+        try:
+            return await self.single_flight.do_async(
+                clave,
+                lambda: self._build_dashboard_data_async(
+                    asset, interval, limit, start_time, minimum_tresure, response_format, sparse, since
+                ),
+                timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS
+            )
+        except FuturesTimeoutError:
+            return {
+                "success": False,
+                "error": f"Tiempo de espera agotado ({SINGLE_FLIGHT_TIMEOUT_SECONDS}s) esperando una petición idéntica en curso",
+                "data": None
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "data": None
+            }
+    
+    async def get_dashboard_data_conditional_async(self,
+                                                   asset: str = "GC=F",
+                                                   interval: str = "1h",
+                                                   limit: int = 1000,
+                                                   start_time: Optional[int] = None,
+                                                   minimum_tresure: float = 0.21,
+                                                   response_format: str = "records",
+                                                   sparse: bool = False,
+                                                   since: Optional[int] = None,
+                                                   if_none_match: Optional[str] = None
+                                                   ) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        get_dashboard_data_async con petición condicional (ETag / If-None-Match)
+        
+        El ETag se calcula con las velas (desde la caché) antes de la detección:
+        si coincide con If-None-Match no se detecta ni se serializa nada. Si no,
+        la respuesta se construye con esas mismas velas (no con otra descarga),
+        o es la precalculada de la watchlist si se calculó con exactamente esas
+        velas, así el cuerpo siempre corresponde a su ETag. Las descargas
+        concurrentes de la misma serie se coalescen (ver _fetch_candles_shared)
+        
+        Args:
+            if_none_match: Valor de la cabecera If-None-Match (opcional)
+            (resto de parámetros como en get_dashboard_data)
+            
+        Returns:
+            (etag, resultado); resultado es None si el cliente ya tiene la versión actual
+        """
+        try:
+            df = await self._fetch_candles_shared(asset, interval, limit, start_time)
+        except FuturesTimeoutError:
+            return None, {
+                "success": False,
+                "error": f"Tiempo de espera agotado ({SINGLE_FLIGHT_TIMEOUT_SECONDS}s) esperando una petición idéntica en curso",
+                "data": None
+            }
+        except Exception as e:
+            return None, {
+                "success": False,
+                "error": str(e),
+                "data": None
+            }
+        if df.empty:
+            # Sin velas no hay versión que validar (ni otra descarga que intentar)
+            return None, {
+                "success": False,
+                "error": "No se pudieron obtener datos del mercado",
+                "data": None
+            }
+        
+        parametros = (asset, interval, limit, start_time, minimum_tresure, response_format, sparse, since)
+        etag = compute_etag(parametros, df)
+        if etag_matches(if_none_match, etag):
+            return etag, None
+        precalculado = self._precomputed(df, asset, interval, minimum_tresure, response_format, sparse, since)
+        if precalculado is not None:
+            return etag, precalculado
+        # Solo se coalescen las peticiones con el mismo ETag (las mismas velas)
+        try:
+            resultado = await self.single_flight.do_async(
+                parametros + (current_provider(), etag),
+                lambda: self._process_candles_async(
+                    df.copy(), asset, interval, minimum_tresure, response_format, sparse, since
+                ),
+                timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS
+            )
+        except FuturesTimeoutError:
+            resultado = {
+                "success": False,
+                "error": f"Tiempo de espera agotado ({SINGLE_FLIGHT_TIMEOUT_SECONDS}s) esperando una petición idéntica en curso",
+                "data": None
+            }
+        return (etag if resultado.get("success") else None), resultado
+    
+    async def get_batch_data_async(self,
+                                   items: List[Tuple[str, str]],
+                                   limit: int = 1000,
+                                   start_time: Optional[int] = None,
+                                   minimum_tresure: float = 0.21,
+                                   response_format: str = "records",
+                                   sparse: bool = False) -> Dict[str, Any]:
+        """
+        Obtiene datos y pullbacks de varios activos en una sola petición
+        
+        Las series que no están en caché se descargan con una petición
+        multi-ticker por intervalo; después cada activo se procesa como en
+        get_dashboard_data_async, con la detección repartida en el pool de procesos
+        
+        Args:
+            items: Lista de pares (activo, intervalo)
+            limit, start_time, minimum_tresure, response_format, sparse: como en get_dashboard_data
             
-            # Obtener datos
-            df = fetcher.get_data(start_time=start_time, end_time=None, limit=limit)
+        Returns:
+            Diccionario con un resultado por par (en el mismo orden) y la lista de errores
+        """
+        try:
+            await io_pool.run(self._prefetch_candles, items, limit, start_time)
+        except Exception as e:
+            # Sin descarga conjunta cada activo descarga su serie por separado
+            logger.warning(f"Error en la descarga multi-ticker: {e}")
+        
+        resultados = await asyncio.gather(*(
+            self.get_dashboard_data_async(
+                asset, interval, limit, start_time, minimum_tresure, response_format, sparse
+            )
+            for asset, interval in items
+        ))
+        
+        results = []
+        errors = []
+        for (asset, interval), resultado in zip(items, resultados):
+            if not resultado.get("success"):
+                # Copia: el resultado puede estar compartido con peticiones coalescidas
+                resultado = {**resultado, "asset": asset, "interval": interval}
+                errors.append({"asset": asset, "interval": interval, "error": resultado.get("error")})
+            results.append(resultado)
+        
+        return {
+            "success": len(errors) < len(items),
+            "total": len(items),
+            "succeeded": len(items) - len(errors),
+            "failed": len(errors),
+            "format": response_format,
+            "results": results,
+            "errors": errors
+        }
+    
+    async def get_screener_async(self,
+                                 assets: Optional[List[str]] = None,
+                                 interval: str = "1h",
+                                 limit: int = 500,
+                                 minimum_tresure: float = 0.21,
+                                 trend: Optional[int] = None,
+                                 max_distance_pct: Optional[float] = None,
+                                 max_age: Optional[int] = None,
+                                 sort: str = "dist_alto_pct",
+                                 descending: bool = False,
+                                 top: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Escanea una lista de activos y devuelve su estado de pullbacks en una tabla compacta
+        
+        Las velas salen de la caché (con descarga multi-ticker para las series
+        frías) y el estado de cada activo se actualiza de forma incremental,
+        así que los escaneos repetidos solo procesan las velas nuevas
+        
+        Args:
+            assets: Lista de símbolos (por defecto SCREENER_WATCHLIST)
+            interval: Intervalo temporal común
+            limit: Número de velas por activo para el primer escaneo
+            minimum_tresure: Umbral mínimo para detección de pullbacks
+            trend, max_distance_pct, max_age: Filtros (ver screener.filter_and_sort)
+            sort: Columna de ordenación
+            descending: Orden descendente
+            top: Número máximo de filas
+            
+        Returns:
+            Diccionario con columns, rows (una lista por activo) y los errores por activo
+        """
+        assets = list(dict.fromkeys(assets or SCREENER_WATCHLIST))
+        items = [(asset, interval) for asset in assets]
+        try:
+            await io_pool.run(self._prefetch_candles, items, limit, None)
+        except Exception as e:
+            logger.warning(f"Error en la descarga multi-ticker: {e}")
+        
+        resultados = await asyncio.gather(
+            *(io_pool.run(self._screen_asset, asset, interval, limit, minimum_tresure) for asset in assets),
+            return_exceptions=True
+        )
+        
+        filas = []
+        errors = []
+        for asset, resultado in zip(assets, resultados):
+            if isinstance(resultado, BaseException):
+                errors.append({"asset": asset, "interval": interval, "error": str(resultado)})
+            elif resultado is None:
+                errors.append({"asset": asset, "interval": interval, "error": "No se pudieron obtener datos del mercado"})
+            else:
+                filas.append(resultado)
+        
+        filas = filter_and_sort(filas, trend, max_distance_pct, max_age, sort, descending, top)
+        return {
+            "success": True,
+            "interval": interval,
+            "total": len(assets),
+            "matched": len(filas),
+            "columns": SCREENER_COLUMNS,
+            "rows": [[fila[columna] for columna in SCREENER_COLUMNS] for fila in filas],
+            "errors": errors
+        }
+    
+    def _screen_asset(self, asset: str, interval: str, limit: int, minimum_tresure: float) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene las velas de un activo y actualiza su estado en el screener
+        """
+        df = self._fetch_candles(asset, interval, limit, None)
+        return self.screener.row(df, asset, interval, minimum_tresure)
+    
+    def _prefetch_candles(self,
+                          items: List[Tuple[str, str]],
+                          limit: int,
+                          start_time: Optional[int]) -> None:
+        """
+        Carga en la caché, con una descarga multi-ticker por intervalo, las
+        series que get_data tendría que descargar completas (I/O)
+        """
+        fetcher_class = provider_class()
+        grupos = {}
+        for asset, interval in items:
+            base = base_interval(interval)
+            if base is None:
+                intervalo, velas = interval, limit
+            else:
+                intervalo, velas = base[0], (limit + 1) * base[1]
+            fetcher = fetcher_class(asset=asset, interval=intervalo)
+            if self.candle_cache.is_cold(fetcher, start_time=start_time, limit=velas):
+                if start_time:
+                    desde = pd.to_datetime(start_time, unit='ms', utc=True)
+                else:
+                    desde = pd.Timestamp(fetcher._calculate_start_date(velas))
+                grupo = grupos.setdefault(intervalo, {'desde': desde, 'fetchers': {}})
+                grupo['desde'] = min(grupo['desde'], desde)
+                grupo['fetchers'][asset] = fetcher
+        
+        ahora = pd.Timestamp.now(tz='UTC')
+        for intervalo, grupo in grupos.items():
+            fetchers, desde = grupo['fetchers'], grupo['desde']
+            if len(fetchers) < 2:
+                continue
+            ventana, _ = next(iter(fetchers.values())).history_limits()
+            if desde < ahora - ventana:
+                # Rango mayor que una petición: cada serie se descarga por ventanas (HistoryLoader)
+                continue
+            # Sin recortar: la caché guarda la serie completa desde el inicio pedido
+            inicio = int(desde.timestamp() * 1000)
+            maximo = math.ceil((ahora - desde) / interval_to_timedelta(intervalo)) + 1
+            frames = fetcher_class.get_data_multi(list(fetchers), intervalo, start_time=inicio, limit=maximo)
+            for asset, frame in frames.items():
+                self.candle_cache.put(fetchers[asset], frame, start_time=inicio)
+    
+    def _build_dashboard_data(self,
+                              asset: str,
+                              interval: str,
+                              limit: int,
+                              start_time: Optional[int],
+                              minimum_tresure: float,
+                              response_format: str,
+                              sparse: bool,
+                              since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Calcula la respuesta del dashboard (descarga, detección y serialización)
+        
+        El resultado se comparte entre peticiones coalescidas, no debe modificarse
+        """
+        try:
+            df = self._fetch_candles(asset, interval, limit, start_time)
+            precalculado = self._precomputed(df, asset, interval, minimum_tresure, response_format, sparse, since)
+            if precalculado is not None:
+                return precalculado
+            resultado, tiempos = self._process_candles_timed(
+                df, asset, interval, minimum_tresure, response_format, sparse, since
+            )
+            record_stages(tiempos)
+            return resultado
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "data": None
+            }
+    
+    async def _build_dashboard_data_async(self,
+                                          asset: str,
+                                          interval: str,
+                                          limit: int,
+                                          start_time: Optional[int],
+                                          minimum_tresure: float,
+                                          response_format: str,
+                                          sparse: bool,
+                                          since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Igual que _build_dashboard_data pero sin bloquear el event loop:
+        la descarga corre en el pool de hilos y la detección en el de procesos
+        """
+        try:
+            df = await io_pool.run(self._fetch_candles, asset, interval, limit, start_time)
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "data": None
+            }
+        precalculado = self._precomputed(df, asset, interval, minimum_tresure, response_format, sparse, since)
+        if precalculado is not None:
+            return precalculado
+        return await self._process_candles_async(df, asset, interval, minimum_tresure, response_format, sparse, since)
+    
+    def _precomputed(self,
+                     df: pd.DataFrame,
+                     asset: str,
+                     interval: str,
+                     minimum_tresure: float,
+                     response_format: str,
+                     sparse: bool,
+                     since: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta precalculada de la watchlist si se construyó con estas mismas
+        velas (solo respuestas completas: sin sparse ni since)
+        """
+        if sparse or since is not None or df.empty:
+            return None
+        return self.precompute.get(df, asset, interval, minimum_tresure, response_format)
+    
+    async def _process_candles_async(self,
+                                     df: pd.DataFrame,
+                                     asset: str,
+                                     interval: str,
+                                     minimum_tresure: float,
+                                     response_format: str,
+                                     sparse: bool,
+                                     since: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Detección y serialización de unas velas ya descargadas en el pool de procesos
+        """
+        try:
+            resultado, tiempos = await cpu_pool.run(
+                EstrategiaBranV1Service._process_candles_timed,
+                df, asset, interval, minimum_tresure, response_format, sparse, since
+            )
+            # Las etapas de la detección se midieron en el proceso del pool
+            record_stages(tiempos)
+            return resultado
+        except Exception as e:
+            return {
+                "success": False,
+                "error": str(e),
+                "data": None
+            }
+    
+    async def _fetch_candles_shared(self,
+                                    asset: str,
+                                    interval: str,
+                                    limit: int,
+                                    start_time: Optional[int]) -> pd.DataFrame:
+        """
+        _fetch_candles en el pool de hilos, coalescida entre peticiones concurrentes
+        
+        Las peticiones que solo difieren en la forma de la respuesta (formato,
+        sparse, since, umbral) comparten la descarga de las velas
+        
+        Returns:
+            DataFrame con datos OHLCV (compartido, no debe modificarse)
+        """
+        return await self.single_flight.do_async(
+            ("candles", asset, interval, limit, start_time, current_provider()),
+            lambda: io_pool.run(self._fetch_candles, asset, interval, limit, start_time),
+            timeout=SINGLE_FLIGHT_TIMEOUT_SECONDS
+        )
+    
+    def _fetch_candles(self,
+                       asset: str,
+                       interval: str,
+                       limit: int,
+                       start_time: Optional[int]) -> pd.DataFrame:
+        """
+        Obtiene las velas del activo (I/O)
+        
+        Los intervalos que Yahoo no ofrece (2h, 4h, 3d...) se construyen a partir
+        de la serie base cacheada, así todos comparten una sola descarga
+        
+        Returns:
+            DataFrame con datos OHLCV (vacío si no hay datos)
+        """
+        base = base_interval(interval)
+        if base is None:
+            # Crear fetcher para el activo (GC=F por defecto)
+            fetcher = provider_class()(asset=asset, interval=interval)
             
+            # Obtener datos (desde la caché; solo se descarga lo que falta)
+            with stage("fetch"):
+                return self.candle_cache.get_data(fetcher, start_time=start_time, end_time=None, limit=limit)
+        
+        intervalo_base, factor = base
+        fetcher = provider_class()(asset=asset, interval=intervalo_base)
+        # Una vela derivada extra para completar la primera vela parcial
+        with stage("fetch"):
+            df = self.candle_cache.get_data(fetcher, start_time=start_time, end_time=None, limit=(limit + 1) * factor)
+        if df.empty:
+            return df
+        with stage("resample"):
+            df = resample_ohlcv(df, interval)
+        return df.tail(limit).reset_index(drop=True)
+    
+    @staticmethod
+    def _process_candles_timed(*args) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        _process_candles que devuelve también los segundos de cada etapa
+        
+        Las métricas registradas dentro del pool de procesos se perderían: el
+        llamante registra los tiempos devueltos con record_stages
+        
+        Returns:
+            (resultado, tiempos): resultado de _process_candles y etapa -> segundos
+        """
+        tiempos = {}
+        resultado = EstrategiaBranV1Service._process_candles(*args, tiempos=tiempos)
+        return resultado, tiempos
+    
+    @staticmethod
+    def _process_candles(df: pd.DataFrame,
+                         asset: str,
+                         interval: str,
+                         minimum_tresure: float,
+                         response_format: str = "records",
+                         sparse: bool = False,
+                         since: Optional[int] = None,
+                         tiempos: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Detecta pullbacks, calcula estadísticas y serializa la respuesta (CPU)
+        
+        Es estático para poder ejecutarse en el pool de procesos. Con sparse=True
+        los datos solo llevan OHLCV y los marcadores van aparte en "markers".
+        Con since la detección y las estadísticas usan toda la ventana, pero
+        solo se serializan las velas (y marcadores) con time >= since.
+        Si se pasa tiempos, acumula en él los segundos de cada etapa
+        (prepare, detect, statistics, serialize)
+        """
+        try:
             if df.empty:
                 return {
                     "success": False,
@@ -54,107 +643,618 @@ class EstrategiaBranV1Service:
                     "data": None
                 }
             
-            # Preparar datos para pullback detection
-            df['parteAlta'] = df.apply(lambda row: max(row['open'], row['close']), axis=1)
-            df['parteBaja'] = df.apply(lambda row: min(row['open'], row['close']), axis=1)
-            df['altos'] = math.nan
-            df['bajos'] = math.nan
-            df['pocAltos'] = math.nan
-            df['pocBajos'] = math.nan
-            df['triangulosAzul'] = math.nan
-            df['ysRosado'] = math.nan
-            df['circulosAzul'] = math.nan
-            df['circulosNaranja'] = math.nan
-            df['tendencia'] = 0
-            
-            # Detectar pullbacks
-            pullback_detector = PullbackDetection(df, minimum_tresure=minimum_tresure)
-            df_with_pullbacks, rangos = pullback_detector.detect_pullbacks(df, minimum_tresure=minimum_tresure)
-            print(df_with_pullbacks.iloc[0])
-            print(rangos)
+            pullback_detector = PullbackDetection(df, minimum_tresure=minimum_tresure, mode=detection_engine(len(df)))
+            marcadores = None
+            if sparse:
+                # Salida dispersa: OHLCV sin columnas de marcadores + lista de marcadores
+                with timed(tiempos, "detect"):
+                    marcadores, rangos = pullback_detector.detect_pullback_markers(df, minimum_tresure=minimum_tresure)
+                df_with_pullbacks = df
+            else:
+                # Preparar datos para pullback detection
+                with timed(tiempos, "prepare"):
+                    df['parteAlta'] = df.apply(lambda row: max(row['open'], row['close']), axis=1)
+                    df['parteBaja'] = df.apply(lambda row: min(row['open'], row['close']), axis=1)
+                    df['altos'] = math.nan
+                    df['bajos'] = math.nan
+                    df['pocAltos'] = math.nan
+                    df['pocBajos'] = math.nan
+                    df['triangulosAzul'] = math.nan
+                    df['ysRosado'] = math.nan
+                    df['circulosAzul'] = math.nan
+                    df['circulosNaranja'] = math.nan
+                    df['tendencia'] = 0
+            
+                # Detectar pullbacks
+                with timed(tiempos, "detect"):
+                    df_with_pullbacks, rangos = pullback_detector.detect_pullbacks(df, minimum_tresure=minimum_tresure)
+            logger.debug(
+                "Pullbacks detectados en %s %s: %d velas, rangos=%s",
+                asset, interval, len(df_with_pullbacks), rangos,
+                extra={"asset": asset, "interval": interval, "candles": len(df_with_pullbacks), "rangos": rangos}
+            )
+            
             # Calcular estadísticas
-            stats = self._calculate_statistics(df_with_pullbacks)
-            
-            # Convertir DataFrame a formato JSON-friendly
-            # Reemplazar NaN, inf y -inf con None antes de convertir
-            import numpy as np
-            df_clean = df_with_pullbacks.copy()
-            
-            # Convertir columnas de tiempo a string antes de convertir a diccionario
-            if 'time' in df_clean.columns:
-                df_clean['time'] = df_clean['time'].apply(lambda x: x.isoformat() if pd.notna(x) and hasattr(x, 'isoformat') else None)
-            if 'siguiente_poc_time' in df_clean.columns:
-                df_clean['siguiente_poc_time'] = df_clean['siguiente_poc_time'].apply(
-                    lambda x: x.isoformat() if pd.notna(x) and hasattr(x, 'isoformat') else None
-                )
-            
-            # Reemplazar todos los valores problemáticos
-            df_clean = df_clean.replace([np.inf, -np.inf], None)
-            df_clean = df_clean.where(pd.notna(df_clean), None)
-            
-            # Convertir a diccionario
-            data_dict = df_clean.to_dict('records')
-            
-            # Limpieza adicional: asegurar que cada valor numérico sea válido para JSON
-            for record in data_dict:
-                # Convertir todos los campos que pueden ser Timestamps
-                for key in ['time', 'siguiente_poc_time']:
-                    if record.get(key) is not None:
-                        try:
-                            # Si es un Timestamp de pandas o datetime, convertirlo
-                            if isinstance(record[key], pd.Timestamp):
-                                record[key] = record[key].isoformat()
-                            elif hasattr(record[key], 'isoformat'):
-                                record[key] = record[key].isoformat()
-                            elif pd.isna(record[key]):
-                                record[key] = None
-                        except (AttributeError, TypeError, ValueError):
-                            record[key] = None
-                
-                # Limpiar todos los campos numéricos y otros tipos
-                for key, value in list(record.items()):
-                    if isinstance(value, float):
-                        if pd.isna(value) or np.isinf(value):
-                            record[key] = None
-                    # Asegurar que cumple_minimo sea booleano
-                    elif key == 'cumple_minimo':
-                        record[key] = bool(value) if value is not None else False
-                    # Convertir cualquier otro Timestamp que pueda haber quedado
-                    elif isinstance(value, pd.Timestamp):
-                        try:
-                            record[key] = value.isoformat()
-                        except:
-                            record[key] = None
+            with timed(tiempos, "statistics"):
+                stats = EstrategiaBranV1Service._calculate_statistics(df_with_pullbacks)
             
-            # Limpiar rangos también
-            rangos_clean = {}
-            for key, value in rangos.items():
-                if isinstance(value, (int, float)):
-                    if pd.isna(value) or value == float('inf') or value == float('-inf'):
-                        rangos_clean[key] = None
-                    else:
-                        rangos_clean[key] = float(value) if not pd.isna(value) else None
+            # Solo las velas desde since (la detección ya usó toda la ventana)
+            df_salida = df_with_pullbacks
+            if since is not None:
+                desde = pd.to_datetime(since, unit='ms', utc=True)
+                primera = int(df_with_pullbacks['time'].searchsorted(desde))
+                df_salida = df_with_pullbacks.iloc[primera:]
+                if sparse:
+                    marcadores = [(tipo, index - primera, precio) for tipo, index, precio in marcadores if index >= primera]
+            
+            with timed(tiempos, "serialize"):
+                # Serializar las velas en el formato pedido
+                if response_format == "records":
+                    data = EstrategiaBranV1Service._to_records(df_salida)
                 else:
-                    rangos_clean[key] = value
+                    data = dataframe_to_columnar(df_salida)
+                
+                # Limpiar rangos también
+                rangos_clean = {}
+                for key, value in rangos.items():
+                    if isinstance(value, (int, float)):
+                        if pd.isna(value) or value == float('inf') or value == float('-inf'):
+                            rangos_clean[key] = None
+                        else:
+                            rangos_clean[key] = float(value) if not pd.isna(value) else None
+                    else:
+                        rangos_clean[key] = value
+                
+                result = {
+                    "success": True,
+                    "asset": asset,
+                    "interval": interval,
+                    "total_candles": len(df_with_pullbacks),
+                    "statistics": stats,
+                    "rangos": rangos_clean,
+                    "format": response_format,
+                    "data": data
+                }
+                if since is not None:
+                    result["since"] = since
+                    result["returned_candles"] = len(df_salida)
+                if sparse:
+                    result["markers"] = markers_payload(df_salida.reset_index(drop=True), marcadores, response_format)
+            return result
             
+        except Exception as e:
             return {
-                "success": True,
-                "asset": asset,
-                "interval": interval,
-                "total_candles": len(df_with_pullbacks),
-                "statistics": stats,
-                "rangos": rangos_clean,
-                "data": data_dict
+                "success": False,
+                "error": str(e),
+                "data": None
             }
+    
+    async def get_backtest_async(self,
+                                 asset: str = "GC=F",
+                                 interval: str = "1h",
+                                 limit: int = 1000,
+                                 start_time: Optional[int] = None,
+                                 minimum_tresure: float = 0.21,
+                                 entry: str = "tendencia",
+                                 direction: str = "both",
+                                 stop: str = "rango",
+                                 exit_on_trend: bool = False,
+                                 fee: float = 0.0,
+                                 slippage: float = 0.0,
+                                 max_points: int = BACKTEST_MAX_POINTS) -> Dict[str, Any]:
+        """
+        Backtest de las señales de pullbacks de un activo (ver pullback_backtest)
+        
+        Args:
+            asset: Símbolo del activo
+            interval: Intervalo temporal
+            limit: Número de velas del backtest
+            start_time: Tiempo de inicio en milisegundos (opcional)
+            minimum_tresure: Umbral mínimo para detección de pullbacks
+            entry: Regla de entrada (tendencia, ruptura o pullback)
+            direction: Lados operados (long, short o both)
+            stop: Stop en rangoBajo/rangoAlto (rango) o sin stop (none)
+            exit_on_trend: Cerrar la posición cuando la tendencia se gira en contra
+            fee: Comisión por lado como fracción del precio
+            slippage: Deslizamiento por lado como fracción del precio
+            max_points: Puntos máximos de la curva de capital devuelta
             
+        Returns:
+            Diccionario con summary, trades (columnar) y equity (columnar, submuestreada)
+        """
+        try:
+            with fetch_priority(BACKFILL):
+                df = await io_pool.run(self._fetch_candles, asset, interval, limit, start_time)
+            return await cpu_pool.run(
+                EstrategiaBranV1Service._process_backtest,
+                df, asset, interval, minimum_tresure, entry, direction, stop, exit_on_trend, fee, slippage, max_points
+            )
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e),
-                "data": None
+                "summary": None
+            }
+    
+    async def get_sweep_async(self,
+                              assets: List[str],
+                              intervals: List[str],
+                              limit: int = 5000,
+                              start_time: Optional[int] = None,
+                              minimum_tresures: List[float] = (0.21,),
+                              entries: List[str] = ("tendencia",),
+                              directions: List[str] = ("both",),
+                              stops: List[str] = ("rango",),
+                              exits: List[bool] = (False,),
+                              fee: float = 0.0,
+                              slippage: float = 0.0,
+                              sort: str = "expectancy",
+                              descending: bool = True,
+                              min_trades: int = 0,
+                              top: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Barrido de parámetros (minimum_tresure y reglas del backtest) sobre varios activos e intervalos
+        
+        Las velas se descargan una vez por serie (multi-ticker para las frías) y
+        se comparten con los procesos del pool mediante memoria compartida
+        (ver sweep.py)
+        
+        Args:
+            assets: Lista de símbolos
+            intervals: Lista de intervalos
+            limit: Número de velas por serie
+            start_time: Tiempo de inicio en milisegundos (opcional)
+            minimum_tresures: Valores de minimum_tresure a probar
+            entries, directions, stops, exits: Reglas del backtest a combinar
+            fee, slippage: Costes por lado
+            sort: Métrica de ordenación
+            descending: Orden descendente
+            min_trades: Operaciones mínimas para aparecer en las tablas
+            top: Número máximo de filas de cada tabla
+            
+        Returns:
+            Diccionario con ranking (combinaciones agregadas entre series),
+            rows (una fila por serie y combinación) y errores
+        """
+        items = [(asset, interval) for asset in dict.fromkeys(assets) for interval in dict.fromkeys(intervals)]
+        # Descargas de fondo: ceden el turno a las peticiones del dashboard
+        with fetch_priority(BACKFILL):
+            try:
+                await io_pool.run(self._prefetch_candles, items, limit, start_time)
+            except Exception as e:
+                logger.warning(f"Error en la descarga multi-ticker: {e}")
+            
+            velas = await asyncio.gather(
+                *(io_pool.run(self._fetch_candles, asset, interval, limit, start_time) for asset, interval in items),
+                return_exceptions=True
+            )
+        series = {}
+        errors = []
+        for (asset, interval), df in zip(items, velas):
+            if isinstance(df, BaseException):
+                errors.append({"asset": asset, "interval": interval, "error": str(df)})
+            elif len(df) < 3:
+                errors.append({"asset": asset, "interval": interval, "error": "No se pudieron obtener datos del mercado"})
+            else:
+                series[(asset, interval)] = df
+        
+        reglas = rule_grid(entries, directions, stops, exits)
+        try:
+            filas, errores_pool = await run_sweep(series, list(minimum_tresures), reglas, fee, slippage, cpu_pool)
+        except Exception as e:
+            return {"success": False, "error": str(e), "rows": None}
+        errors.extend(errores_pool)
+        
+        ranking = rank_rows(rank_params(filas), sort, descending, min_trades, top)
+        filas = rank_rows(filas, sort, descending, min_trades, top)
+        return {
+            "success": bool(series),
+            "series": len(series),
+            "combinations": len(minimum_tresures) * len(reglas),
+            "runs": len(series) * len(minimum_tresures) * len(reglas),
+            "sort": sort,
+            "ranking_columns": RANKING_COLUMNS,
+            "ranking": [[fila[columna] for columna in RANKING_COLUMNS] for fila in ranking],
+            "columns": SWEEP_COLUMNS,
+            "rows": [[fila[columna] for columna in SWEEP_COLUMNS] for fila in filas],
+            "errors": errors
+        }
+    
+    @staticmethod
+    def _process_backtest(df: pd.DataFrame,
+                          asset: str,
+                          interval: str,
+                          minimum_tresure: float,
+                          entry: str,
+                          direction: str,
+                          stop: str,
+                          exit_on_trend: bool,
+                          fee: float,
+                          slippage: float,
+                          max_points: int) -> Dict[str, Any]:
+        """
+        Ejecuta el backtest y serializa la respuesta (CPU, estático para el pool de procesos)
+        """
+        if df.empty or len(df) < 3:
+            return {
+                "success": False,
+                "error": "No se pudieron obtener datos del mercado",
+                "summary": None
             }
+        barras, operaciones, resumen = run_backtest(
+            df['open'].to_numpy(dtype=float),
+            df['high'].to_numpy(dtype=float),
+            df['low'].to_numpy(dtype=float),
+            df['close'].to_numpy(dtype=float),
+            entry=entry,
+            direction=direction,
+            stop=stop,
+            exit_on_trend=exit_on_trend,
+            fee=fee,
+            slippage=slippage,
+            minimum_tresure=minimum_tresure
+        )
+        tiempos = df['time'].reset_index(drop=True)
+        trades = pd.DataFrame(operaciones)
+        trades.insert(0, 'entry_time', tiempos.iloc[operaciones['entry_index']].to_numpy())
+        trades.insert(1, 'exit_time', tiempos.iloc[operaciones['exit_index']].to_numpy())
+        
+        # Curva de capital submuestreada (el máximo drawdown exacto va en summary)
+        n = len(df)
+        puntos = np.unique(np.linspace(0, n - 1, min(n, max(max_points, 2))).astype(np.int64))
+        equity = pd.DataFrame({
+            'time': tiempos.iloc[puntos].to_numpy(),
+            'equity': barras['equity'][puntos],
+            'drawdown': barras['drawdown'][puntos],
+            'position': barras['position'][puntos].astype(np.int64),
+        })
+        return {
+            "success": True,
+            "asset": asset,
+            "interval": interval,
+            "total_candles": n,
+            "params": {
+                "minimum_tresure": minimum_tresure,
+                "entry": entry,
+                "direction": direction,
+                "stop": stop,
+                "exit_on_trend": exit_on_trend,
+                "fee": fee,
+                "slippage": slippage
+            },
+            "summary": resumen,
+            "trades": dataframe_to_columnar(trades),
+            "equity": dataframe_to_columnar(equity)
+        }
+    
+    async def get_multi_timeframe_async(self,
+                                        asset: str = "GC=F",
+                                        intervals: Optional[List[str]] = None,
+                                        limit: int = 5000,
+                                        start_time: Optional[int] = None,
+                                        minimum_tresure: float = 0.21,
+                                        alignment: Optional[str] = None,
+                                        min_confluence: int = 2,
+                                        include_data: bool = True) -> Dict[str, Any]:
+        """
+        Estructura de varios intervalos de un activo con una sola descarga
+        
+        Solo se obtienen las velas del intervalo más fino; el resto se agrega
+        a partir de ellas (misma ventana, velas anidadas) y la detección de
+        cada intervalo corre en paralelo en el pool de procesos
+        
+        Args:
+            asset: Símbolo del activo
+            intervals: Intervalos a analizar (por defecto 15m, 1h, 4h y 1d)
+            limit: Número de velas del intervalo más fino (define la ventana de todos)
+            start_time: Tiempo de inicio en milisegundos (opcional)
+            minimum_tresure: Umbral mínimo para detección de pullbacks
+            alignment: Alineación de las velas agregadas: session, epoch o None (ver resample_ohlcv)
+            min_confluence: Intervalos que deben marcar la misma vela fina para que haya confluencia
+            include_data: Incluir las velas (columnar) de cada intervalo
+            
+        Returns:
+            Diccionario con un resultado por intervalo (marcadores con su vela en
+            cada intervalo menor) y la tabla de confluencias sobre el intervalo fino
+        """
+        try:
+            intervalos = plan_timeframes(intervals or ["15m", "1h", "4h", "1d"])
+        except ValueError as e:
+            return {"success": False, "error": str(e), "timeframes": None}
+        fino = intervalos[0]
+        try:
+            df = await io_pool.run(self._fetch_candles, asset, fino, limit, start_time)
+        except Exception as e:
+            return {"success": False, "error": str(e), "timeframes": None}
+        if df.empty:
+            return {"success": False, "error": "No se pudieron obtener datos del mercado", "timeframes": None}
+        
+        with stage("resample"):
+            marcos = derive_timeframes(df, intervalos, alignment)
+        analisis = await asyncio.gather(*(
+            cpu_pool.run(analyze_timeframe, marcos[interval], minimum_tresure, include_data)
+            for interval in intervalos
+        ))
+        marcadores = {interval: resultado[0] for interval, resultado in zip(intervalos, analisis)}
+        
+        timeframes = {}
+        en_fino = {}
+        for posicion, (interval, (lista, rangos, data)) in enumerate(zip(intervalos, analisis)):
+            menores = {
+                menor: map_markers(marcos[interval], interval, lista, marcos[menor])
+                for menor in intervalos[:posicion + 1]
+            }
+            en_fino[interval] = menores[fino]
+            timeframes[interval] = build_timeframe_payload(
+                interval, marcos[interval], lista, rangos, data, menores, base_starts(marcos[interval], marcos[fino])
+            )
+        
+        tendencias = [timeframes[interval]["rangos"].get("tendencia") for interval in intervalos]
+        return {
+            "success": True,
+            "asset": asset,
+            "base_interval": fino,
+            "intervals": intervalos,
+            "limit": limit,
+            "minimum_tresure": minimum_tresure,
+            "alignment": alignment,
+            "trend": dict(zip(intervalos, tendencias)),
+            "trend_aligned": len(set(tendencias)) == 1 and tendencias[0] in (1, -1),
+            "timeframes": timeframes,
+            "confluence": confluence(marcos[fino], marcadores, en_fino, min_confluence)
+        }
+    
+    async def get_replay_async(self,
+                               assets: List[str],
+                               interval: str = "1h",
+                               limit: int = 5000,
+                               start_time: Optional[int] = None,
+                               minimum_tresure: float = 0.21,
+                               intrabar: bool = True,
+                               include_markers: bool = False) -> Dict[str, Any]:
+        """
+        Replay vela a vela de la detección para medir repintado y latencia de confirmación
+        
+        Args:
+            assets: Lista de símbolos
+            interval: Intervalo temporal
+            limit: Número de velas del replay por activo
+            start_time: Tiempo de inicio en milisegundos (opcional)
+            minimum_tresure: Umbral mínimo para detección de pullbacks
+            intrabar: Simular también la vela abierta (estados intermedios de cada vela)
+            include_markers: Incluir la tabla de marcadores (columnar) de cada activo
+            
+        Returns:
+            Diccionario con un resultado por activo (summary y, opcionalmente, markers) y los errores
+        """
+        assets = list(dict.fromkeys(assets))
+        items = [(asset, interval) for asset in assets]
+        with fetch_priority(BACKFILL):
+            try:
+                await io_pool.run(self._prefetch_candles, items, limit, start_time)
+            except Exception as e:
+                logger.warning(f"Error en la descarga multi-ticker: {e}")
+        
+        async def replay(asset):
+            with fetch_priority(BACKFILL):
+                df = await io_pool.run(self._fetch_candles, asset, interval, limit, start_time)
+            return await cpu_pool.run(
+                EstrategiaBranV1Service._process_replay,
+                df, asset, interval, minimum_tresure, intrabar, include_markers
+            )
+        
+        resultados = await asyncio.gather(*(replay(asset) for asset in assets), return_exceptions=True)
+        results = []
+        errors = []
+        for asset, resultado in zip(assets, resultados):
+            if isinstance(resultado, BaseException):
+                errors.append({"asset": asset, "interval": interval, "error": str(resultado)})
+            elif not resultado.get("success"):
+                errors.append({"asset": asset, "interval": interval, "error": resultado.get("error")})
+            else:
+                results.append(resultado)
+        return {
+            "success": bool(results),
+            "interval": interval,
+            "minimum_tresure": minimum_tresure,
+            "intrabar": intrabar,
+            "results": results,
+            "errors": errors
+        }
+    
+    @staticmethod
+    def _process_replay(df: pd.DataFrame,
+                        asset: str,
+                        interval: str,
+                        minimum_tresure: float,
+                        intrabar: bool,
+                        include_markers: bool) -> Dict[str, Any]:
+        """
+        Ejecuta el replay de un activo y serializa el resultado (CPU, estático para el pool de procesos)
+        """
+        if df.empty or len(df) < 3:
+            return {"success": False, "error": "No se pudieron obtener datos del mercado"}
+        marcadores, resumen = replay_pullbacks(
+            df['open'].to_numpy(dtype=float),
+            df['high'].to_numpy(dtype=float),
+            df['low'].to_numpy(dtype=float),
+            df['close'].to_numpy(dtype=float),
+            minimum_tresure=minimum_tresure,
+            intrabar=intrabar
+        )
+        resultado = {
+            "success": True,
+            "asset": asset,
+            "interval": interval,
+            "summary": resumen
+        }
+        if include_markers:
+            tabla = pd.DataFrame(marcadores)
+            tabla.insert(2, 'time', df['time'].reset_index(drop=True).iloc[marcadores['index']].to_numpy())
+            resultado["markers"] = dataframe_to_columnar(tabla)
+        return resultado
+    
+    def get_pool_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene las métricas de los pools de ejecución
+        
+        Returns:
+            Diccionario con workers, tareas pendientes y profundidad de cola por pool,
+            y en fetch el estado del planificador de descargas por proveedor
+        """
+        return {
+            "io": io_pool.stats(),
+            "cpu": cpu_pool.stats(),
+            "fetch": fetch_scheduler.stats()
+        }
+    
+    def stream_events(self, asset: str, interval: str, minimum_tresure: float = 0.21, is_disconnected=None):
+        """
+        Eventos SSE de velas y marcadores de un activo (ver streaming.StreamHub)
+        
+        Args:
+            asset: Símbolo del activo
+            interval: Intervalo temporal
+            minimum_tresure: Umbral mínimo para detección de pullbacks
+            is_disconnected: Corrutina opcional que indica si el cliente se desconectó
+            
+        Returns:
+            Generador asíncrono de texto text/event-stream
+        """
+        return self.streams.events(asset, interval, minimum_tresure, is_disconnected)
+    
+    def get_stream_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene los productores de streaming activos y sus suscriptores
+        
+        Returns:
+            Diccionario con un elemento por stream
+        """
+        return self.streams.stats()
+    
+    def get_precompute_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene las métricas del precálculo de la watchlist
+        
+        Returns:
+            Diccionario con ejecuciones, descartes por solape, fallos y tiempos por trabajo
+        """
+        return self.precompute.stats()
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        Obtiene los contadores de la caché de velas y de la coalescencia de peticiones
+        
+        Returns:
+            Diccionario con hits, misses, refrescos de cola, memoria usada y peticiones compartidas
+        """
+        stats = self.candle_cache.stats()
+        stats["single_flight"] = self.single_flight.stats()
+        return stats
+    
+    def _collect_metrics(self) -> List[MetricFamily]:
+        """
+        Métricas de /metrics que salen de los contadores de la caché, la
+        coalescencia, los pools y los streams (se leen al servir /metrics)
+        """
+        cache = self.candle_cache.stats()
+        single_flight = self.single_flight.stats()
+        familias = [
+            MetricFamily("bran_candle_cache_requests_total", "Consultas a la caché de velas por resultado", "counter", ("result",))
+                .add(cache["hits"], "hit")
+                .add(cache["misses"], "miss")
+                .add(cache["tail_refreshes"], "tail_refresh"),
+            MetricFamily("bran_candle_cache_hit_ratio", "Fracción de consultas servidas sin descargar", "gauge")
+                .add(cache["hit_ratio"]),
+            MetricFamily("bran_candle_cache_entries", "Series en la caché de velas", "gauge")
+                .add(cache["entries"]),
+            MetricFamily("bran_candle_cache_bytes", "Memoria usada por la caché de velas", "gauge")
+                .add(cache["bytes"]),
+            MetricFamily("bran_single_flight_total", "Cálculos ejecutados y peticiones coalescidas", "counter", ("result",))
+                .add(single_flight["executions"], "executed")
+                .add(single_flight["shared"], "shared")
+                .add(single_flight["timeouts"], "timeout"),
+            MetricFamily("bran_single_flight_in_flight", "Cálculos coalescibles en curso", "gauge")
+                .add(single_flight["in_flight"]),
+        ]
+        pendientes = MetricFamily("bran_pool_tasks_in_flight", "Tareas enviadas al pool sin terminar", "gauge", ("pool",))
+        cola = MetricFamily("bran_pool_queue_depth", "Tareas esperando un worker libre", "gauge", ("pool",))
+        completadas = MetricFamily("bran_pool_tasks_completed_total", "Tareas terminadas por pool", "counter", ("pool",))
+        for pool in (io_pool, cpu_pool):
+            stats = pool.stats()
+            pendientes.add(stats["pending"], stats["name"])
+            cola.add(stats["queue_depth"], stats["name"])
+            completadas.add(stats["completed"], stats["name"])
+        suscriptores = MetricFamily("bran_stream_subscribers", "Suscriptores SSE conectados", "gauge")
+        suscriptores.add(sum(stream["subscribers"] for stream in self.streams.stats()["streams"]))
+        return familias + [pendientes, cola, completadas, suscriptores]
+    
+    @staticmethod
+    def _to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """
+        Convierte el DataFrame a una lista de registros JSON-friendly (formato "records")
+        
+        Args:
+            df: DataFrame con los datos y pullbacks detectados
+            
+        Returns:
+            Lista de diccionarios, uno por vela
+        """
+        # Convertir DataFrame a formato JSON-friendly
+        # Reemplazar NaN, inf y -inf con None antes de convertir
+        import numpy as np
+        df_clean = df.copy()
+        
+        # Convertir columnas de tiempo a string antes de convertir a diccionario
+        if 'time' in df_clean.columns:
+            df_clean['time'] = df_clean['time'].apply(lambda x: x.isoformat() if pd.notna(x) and hasattr(x, 'isoformat') else None)
+        if 'siguiente_poc_time' in df_clean.columns:
+            df_clean['siguiente_poc_time'] = df_clean['siguiente_poc_time'].apply(
+                lambda x: x.isoformat() if pd.notna(x) and hasattr(x, 'isoformat') else None
+            )
+        
+        # Reemplazar todos los valores problemáticos
+        df_clean = df_clean.replace([np.inf, -np.inf], None)
+        df_clean = df_clean.where(pd.notna(df_clean), None)
+        
+        # Convertir a diccionario
+        data_dict = df_clean.to_dict('records')
+        
+        # Limpieza adicional: asegurar que cada valor numérico sea válido para JSON
+        for record in data_dict:
+            # Convertir todos los campos que pueden ser Timestamps
+            for key in ['time', 'siguiente_poc_time']:
+                if record.get(key) is not None:
+                    try:
+                        # Si es un Timestamp de pandas o datetime, convertirlo
+                        if isinstance(record[key], pd.Timestamp):
+                            record[key] = record[key].isoformat()
+                        elif hasattr(record[key], 'isoformat'):
+                            record[key] = record[key].isoformat()
+                        elif pd.isna(record[key]):
+                            record[key] = None
+                    except (AttributeError, TypeError, ValueError):
+                        record[key] = None
+            
+            # Limpiar todos los campos numéricos y otros tipos
+            for key, value in list(record.items()):
+                if isinstance(value, float):
+                    if pd.isna(value) or np.isinf(value):
+                        record[key] = None
+                # Asegurar que cumple_minimo sea booleano
+                elif key == 'cumple_minimo':
+                    record[key] = bool(value) if value is not None else False
+                # Convertir cualquier otro Timestamp que pueda haber quedado
+                elif isinstance(value, pd.Timestamp):
+                    try:
+                        record[key] = value.isoformat()
+                    except:
+                        record[key] = None
+        
+        return data_dict
     
-    def _calculate_statistics(self, df: pd.DataFrame) -> Dict[str, Any]:
+    @staticmethod
+    def _calculate_statistics(df: pd.DataFrame) -> Dict[str, Any]:
         """
         Calcula estadísticas sobre los datos del mercado
         
@@ -0,0 +1,219 @@
+"""
+Análisis de varios intervalos de un activo con una sola descarga
+
+Se descarga (o se lee de la caché) solo la serie del intervalo más fino; los
+intervalos mayores se agregan localmente a partir de ella, así todos cubren
+la misma ventana y sus velas encajan unas dentro de otras. La detección de
+cada intervalo se ejecuta en paralelo en el pool de procesos.
+
+Cada marcador de un intervalo mayor se lleva a los intervalos menores: el
+precio de un marcador es el máximo (altos, pocBajos) o el mínimo (bajos,
+pocAltos) de su vela, que coincide con el de alguna vela menor dentro de ella.
+Con esa correspondencia la confluencia (varios intervalos marcando la misma
+vela del intervalo fino) se calcula en el servidor.
+"""
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.services.estrategia_bran_v1.response_formats import dataframe_to_columnar, markers_payload
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+from src.utils.dataExtractor.resampling import resample_ohlcv
+from src.utils.indicadores.pullback_detection import PullbackDetection
+
+# Columnas de vela que se devuelven por intervalo
+CANDLE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+# Extremo de la vela que marca cada tipo de marcador
+MARKER_SIDES = {
+    'altos': 'high',
+    'pocBajos': 'high',
+    'bajos': 'low',
+    'pocAltos': 'low',
+}
+
+# Unidades de intervalo que se pueden agregar localmente (semanas y meses
+# de calendario no son múltiplos fijos de un intervalo menor)
+_UNIDADES_DERIVABLES = ('m', 'h', 'd')
+
+CONFLUENCE_COLUMNS = ['base_index', 'time', 'side', 'price', 'count', 'intervals', 'markers']
+
+
+def plan_timeframes(intervals: List[str]) -> List[str]:
+    """
+    Ordena los intervalos de menor a mayor y comprueba que se pueden derivar del más fino
+
+    Raises:
+        ValueError si un intervalo no se reconoce, se repite con otro nombre
+        (60m y 1h) o no es múltiplo del más fino
+    """
+    unicos = list(dict.fromkeys(intervals))
+    if not unicos:
+        raise ValueError("Indique al menos un intervalo")
+    duraciones = {interval: interval_to_timedelta(interval).value for interval in unicos}
+    ordenados = sorted(unicos, key=duraciones.get)
+    fino = ordenados[0]
+    for interval in ordenados[1:]:
+        if duraciones[interval] == duraciones[fino]:
+            raise ValueError(f"{interval} y {fino} son el mismo intervalo")
+        if not interval.endswith(_UNIDADES_DERIVABLES) or interval.endswith('mo'):
+            raise ValueError(f"{interval} no se puede construir a partir de {fino}")
+        if duraciones[interval] % duraciones[fino]:
+            raise ValueError(f"{interval} no es múltiplo de {fino}")
+    return ordenados
+
+
+def derive_timeframes(df: pd.DataFrame, intervalos: List[str], alineacion: Optional[str] = None) -> Dict[str, pd.DataFrame]:
+    """
+    Construye cada intervalo a partir de las velas del más fino
+
+    La primera vela de cada intervalo derivado se descarta: puede empezar
+    antes de la ventana descargada (igual que en las velas reagrupadas de /data)
+
+    Args:
+        df: Velas del intervalo intervalos[0]
+        intervalos: Salida de plan_timeframes
+        alineacion: 'session', 'epoch' o None (epoch desde 1d, session en intradía; ver resample_ohlcv)
+    """
+    fino = intervalos[0]
+    marcos = {fino: df.reset_index(drop=True)}
+    for interval in intervalos[1:]:
+        derivado = resample_ohlcv(df, interval, alineacion, base=fino)
+        marcos[interval] = derivado.iloc[1:].reset_index(drop=True) if len(derivado) > 1 else derivado
+    return marcos
+
+
+def analyze_timeframe(df: pd.DataFrame, minimum_tresure: float, include_data: bool = True
+                      ) -> Tuple[List[tuple], Dict[str, Any], Optional[Dict[str, List[Any]]]]:
+    """
+    Detecta los marcadores de un intervalo (se ejecuta en el pool)
+
+    Returns:
+        (marcadores, rangos, data): lista de (tipo, index, precio), rangos y
+        velas en formato columnar (None si include_data es False)
+    """
+    data = dataframe_to_columnar(df[CANDLE_COLUMNS]) if include_data else None
+    if len(df) < 3:
+        return [], {}, data
+    marcadores, rangos = PullbackDetection(df, minimum_tresure=minimum_tresure).detect_pullback_markers(df)
+    return marcadores, rangos, data
+
+
+def _ns(tiempos: pd.Series) -> np.ndarray:
+    return tiempos.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('datetime64[ns]').astype(np.int64)
+
+
+def map_markers(df_alto: pd.DataFrame,
+                interval_alto: str,
+                marcadores: List[tuple],
+                df_bajo: pd.DataFrame) -> List[Optional[int]]:
+    """
+    Vela de df_bajo que corresponde a cada marcador de df_alto
+
+    Es la vela menor, dentro de la vela mayor del marcador, con el máximo
+    (marcadores de máximos) o el mínimo (de mínimos); None si la vela mayor no
+    tiene velas menores en la ventana
+    """
+    if not marcadores:
+        return []
+    tiempos_bajo = _ns(df_bajo['time'])
+    inicios = _ns(df_alto['time'])
+    duracion = interval_to_timedelta(interval_alto).value
+    high = df_bajo['high'].to_numpy(dtype=float)
+    low = df_bajo['low'].to_numpy(dtype=float)
+
+    indices = np.array([index for _, index, _ in marcadores])
+    desde = np.searchsorted(tiempos_bajo, inicios[indices])
+    hasta = np.searchsorted(tiempos_bajo, inicios[indices] + duracion)
+    resultado = []
+    for (tipo, _, _), a, b in zip(marcadores, desde, hasta):
+        tramo = high[a:b] if MARKER_SIDES[tipo] == 'high' else low[a:b]
+        if b <= a or np.isnan(tramo).all():
+            resultado.append(None)
+        elif MARKER_SIDES[tipo] == 'high':
+            resultado.append(int(a + np.nanargmax(tramo)))
+        else:
+            resultado.append(int(a + np.nanargmin(tramo)))
+    return resultado
+
+
+def base_starts(df_alto: pd.DataFrame, df_fino: pd.DataFrame) -> List[int]:
+    """
+    Índice de la primera vela del intervalo fino dentro de cada vela de df_alto
+    """
+    return np.searchsorted(_ns(df_fino['time']), _ns(df_alto['time'])).tolist()
+
+
+def confluence(df_fino: pd.DataFrame,
+               marcadores: Dict[str, List[tuple]],
+               en_fino: Dict[str, List[Optional[int]]],
+               min_count: int = 2) -> Dict[str, List[Any]]:
+    """
+    Velas del intervalo fino marcadas por varios intervalos en el mismo extremo
+
+    Args:
+        df_fino: Velas del intervalo fino
+        marcadores: intervalo -> marcadores (tipo, index, precio)
+        en_fino: intervalo -> vela del intervalo fino de cada marcador (map_markers)
+        min_count: Intervalos distintos necesarios
+
+    Returns:
+        Tabla columnar con CONFLUENCE_COLUMNS ordenada por base_index
+    """
+    grupos = {}
+    for interval, lista in marcadores.items():
+        for (tipo, _, _), base_index in zip(lista, en_fino[interval]):
+            if base_index is None:
+                continue
+            grupo = grupos.setdefault((base_index, MARKER_SIDES[tipo]), {})
+            grupo.setdefault(interval, []).append(tipo)
+
+    claves = sorted(clave for clave, grupo in grupos.items() if len(grupo) >= min_count)
+    tiempos = df_fino['time']
+    tabla = {columna: [] for columna in CONFLUENCE_COLUMNS}
+    for base_index, lado in claves:
+        grupo = grupos[(base_index, lado)]
+        tabla['base_index'].append(base_index)
+        tabla['time'].append(int(tiempos.iloc[base_index].timestamp() * 1000))
+        tabla['side'].append(lado)
+        tabla['price'].append(float(df_fino[lado].iloc[base_index]))
+        tabla['count'].append(len(grupo))
+        tabla['intervals'].append(list(grupo))
+        tabla['markers'].append([f"{interval}:{tipo}" for interval, tipos in grupo.items() for tipo in tipos])
+    return tabla
+
+
+def build_timeframe_payload(interval: str,
+                            df: pd.DataFrame,
+                            marcadores: List[tuple],
+                            rangos: Dict[str, Any],
+                            data: Optional[Dict[str, List[Any]]],
+                            menores: Dict[str, List[Optional[int]]],
+                            inicios_fino: List[int]) -> Dict[str, Any]:
+    """
+    Resultado de un intervalo: velas, marcadores con su vela en cada intervalo menor y rangos
+    """
+    markers = markers_payload(df, marcadores, "columnar")
+    markers["side"] = [MARKER_SIDES[tipo] for tipo, _, _ in marcadores]
+    markers["map"] = menores
+    rangos_clean = {}
+    for clave, valor in rangos.items():
+        if isinstance(valor, (int, float, np.integer, np.floating)) and not isinstance(valor, bool):
+            valor = float(valor)
+            rangos_clean[clave] = valor if np.isfinite(valor) else None
+        else:
+            rangos_clean[clave] = valor
+    if 'tendencia' in rangos_clean and rangos_clean['tendencia'] is not None:
+        rangos_clean['tendencia'] = int(rangos_clean['tendencia'])
+    resultado = {
+        "interval": interval,
+        "candles": len(df),
+        "first_time": int(df['time'].iloc[0].timestamp() * 1000) if len(df) else None,
+        "base_start": inicios_fino,
+        "rangos": rangos_clean,
+        "markers": markers,
+    }
+    if data is not None:
+        resultado["data"] = data
+    return resultado
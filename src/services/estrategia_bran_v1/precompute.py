@@ -0,0 +1,272 @@
+"""
+Precálculo de la watchlist tras cada cierre de vela
+
+Cada (activo, intervalo) de la watchlist es un trabajo del BackgroundScheduler
+que se ejecuta poco después del cierre de la vela abierta: descarga las velas
+(dejando la caché caliente), ejecuta la detección y guarda las respuestas ya
+serializadas junto con la versión de las velas (candles_signature). Una
+petición la recibe cuando sus velas, ya descargadas, son exactamente las del
+precálculo (misma ventana y misma vela abierta), con cualquier limit o
+start_time: la respuesta sería idéntica. En cuanto la vela abierta cambia
+deja de servirse sola, sin plazos de caducidad.
+
+El dashboard, con la fecha de inicio vacía (por defecto), pide las últimas
+PRECOMPUTE_LIMIT velas sin start_time: la misma ventana que el precálculo.
+
+El siguiente cierre se calcula con la última vela recibida, así que los
+trabajos se alinean con las velas reales de cada mercado (velas de acciones
+que empiezan a las :30, sesiones de futuros, etc.).
+"""
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+
+from src.core import cpu_pool
+from src.core.fetch_scheduler import fetch_priority, WARMUP
+from src.core.metrics import record_stages
+from src.services.estrategia_bran_v1.response_formats import candles_signature
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+from src.utils.dataExtractor.providers import current_provider
+
+logger = logging.getLogger(__name__)
+
+
+class _Trabajo:
+    """
+    Estado y métricas de un (activo, intervalo) de la watchlist
+    """
+
+    def __init__(self, asset, interval):
+        self.asset = asset
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.last_seconds = None
+        self.max_seconds = 0.0
+        self.last_run = None
+        self.next_run = None
+        self.last_error = None
+
+    @property
+    def job_id(self):
+        return f"precompute:{self.asset}:{self.interval}"
+
+    def stats(self):
+        return {
+            "asset": self.asset,
+            "interval": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "failures": self.failures,
+            "last_seconds": self.last_seconds,
+            "avg_seconds": self.total_seconds / self.runs if self.runs else None,
+            "max_seconds": self.max_seconds,
+            "last_run": self.last_run.isoformat() if self.last_run is not None else None,
+            "next_run": self.next_run.isoformat() if self.next_run is not None else None,
+            "last_error": self.last_error,
+        }
+
+
+class PrecomputeScheduler:
+    """
+    Programa el precálculo de la watchlist y guarda las respuestas listas para servir
+    """
+
+    def __init__(self,
+                 service,
+                 scheduler,
+                 watchlist: List[Tuple[str, str]],
+                 limit: int = 1000,
+                 minimum_tresure: float = 0.21,
+                 formats: Tuple[str, ...] = ("columnar", "records"),
+                 delay_seconds: float = 2,
+                 jitter_seconds: float = 5,
+                 timeout_seconds: float = 120):
+        """
+        Args:
+            service: EstrategiaBranV1Service (descarga y detección)
+            scheduler: BackgroundScheduler compartido (src.core.scheduler)
+            watchlist: Pares (activo, intervalo) a precalcular
+            limit: Número de velas de las respuestas precalculadas
+            minimum_tresure: Umbral de detección de las respuestas precalculadas
+            formats: Formatos de respuesta que se precalculan
+            delay_seconds: Espera tras el cierre de la vela antes de descargar
+            jitter_seconds: Retraso aleatorio adicional para no lanzar todos los trabajos a la vez
+            timeout_seconds: Tiempo máximo de la detección de un trabajo
+        """
+        self.service = service
+        self.scheduler = scheduler
+        self.limit = limit
+        self.minimum_tresure = minimum_tresure
+        self.formats = tuple(formats)
+        self.delay = timedelta(seconds=delay_seconds)
+        self.jitter_seconds = jitter_seconds
+        self.timeout_seconds = timeout_seconds
+        self._trabajos = {par: _Trabajo(*par) for par in dict.fromkeys(watchlist)}
+        self._resultados = {}
+        self._lock = threading.Lock()
+        self._iniciado_scheduler = False
+
+    def start(self):
+        """
+        Programa la primera ejecución de cada trabajo (inmediata, con jitter) y arranca el scheduler
+        """
+        ahora = pd.Timestamp.now(tz='UTC')
+        for trabajo in self._trabajos.values():
+            self._programar(trabajo, ahora)
+        if not self.scheduler.running:
+            self.scheduler.start()
+            self._iniciado_scheduler = True
+
+    def shutdown(self):
+        for trabajo in self._trabajos.values():
+            try:
+                self.scheduler.remove_job(trabajo.job_id)
+            except Exception:
+                pass
+        if self._iniciado_scheduler and self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+            self._iniciado_scheduler = False
+
+    def get(self,
+            df: pd.DataFrame,
+            asset: str,
+            interval: str,
+            minimum_tresure: float,
+            response_format: str) -> Optional[Dict[str, Any]]:
+        """
+        Respuesta precalculada si se construyó con exactamente estas velas
+
+        Solo respuestas completas: sin sparse ni since
+
+        Args:
+            df: Velas ya descargadas para la petición
+            asset, interval, minimum_tresure, response_format: resto de parámetros de la respuesta
+
+        Returns:
+            La respuesta (compartida, no debe modificarse) o None
+        """
+        with self._lock:
+            entrada = self._resultados.get((asset, interval, minimum_tresure, response_format, current_provider()))
+        if entrada is None:
+            return None
+        firma, resultado = entrada
+        if firma != candles_signature(df):
+            return None
+        return resultado
+
+    def run(self, asset: str, interval: str):
+        """
+        Ejecuta un trabajo: descarga, detección y guardado de las respuestas
+
+        Si el trabajo anterior del mismo par sigue en curso, la ejecución se
+        descarta (y se cuenta en skipped) en lugar de solaparse
+        """
+        trabajo = self._trabajos[(asset, interval)]
+        if not trabajo.lock.acquire(blocking=False):
+            trabajo.skipped += 1
+            return
+        inicio = time.perf_counter()
+        ahora = pd.Timestamp.now(tz='UTC')
+        ultima = None
+        try:
+            # Las descargas del precálculo ceden el turno a las peticiones del dashboard
+            with fetch_priority(WARMUP):
+                df = self.service._fetch_candles(asset, interval, self.limit, None)
+            if df.empty:
+                raise ValueError("No se pudieron obtener datos del mercado")
+            ultima = df['time'].iloc[-1]
+            firma = candles_signature(df)
+            resultados = {}
+            for response_format in self.formats:
+                futuro = cpu_pool.submit(
+                    self.service._process_candles_timed,
+                    df.copy(), asset, interval, self.minimum_tresure, response_format, False
+                )
+                resultado, tiempos = futuro.result(timeout=self.timeout_seconds)
+                record_stages(tiempos)
+                if not resultado.get("success"):
+                    raise ValueError(resultado.get("error"))
+                resultados[response_format] = resultado
+            # Las respuestas solo se sirven a peticiones del mismo proveedor de datos
+            proveedor = current_provider()
+            with self._lock:
+                for response_format, resultado in resultados.items():
+                    clave = (asset, interval, self.minimum_tresure, response_format, proveedor)
+                    self._resultados[clave] = (firma, resultado)
+            trabajo.last_error = None
+        except Exception as e:
+            trabajo.failures += 1
+            trabajo.last_error = str(e)
+            logger.warning(f"Precálculo de {asset} {interval} fallido: {e}")
+        finally:
+            segundos = time.perf_counter() - inicio
+            trabajo.runs += 1
+            trabajo.total_seconds += segundos
+            trabajo.last_seconds = segundos
+            trabajo.max_seconds = max(trabajo.max_seconds, segundos)
+            trabajo.last_run = ahora
+            self._programar(trabajo, ahora, ultima)
+            trabajo.lock.release()
+
+    def _programar(self, trabajo, ahora, ultima=None):
+        """
+        Programa la siguiente ejecución tras el cierre de la vela abierta
+
+        Sin velas, o con el mercado cerrado (la última vela ya cerró), se
+        vuelve a intentar pasado un intervalo
+        """
+        duracion = interval_to_timedelta(trabajo.interval)
+        if ultima is None:
+            siguiente = ahora if trabajo.runs == 0 else ahora + duracion
+        else:
+            cierre = ultima + duracion
+            siguiente = cierre + self.delay if cierre > ahora else ahora + duracion
+        siguiente = siguiente + timedelta(seconds=random.uniform(0, self.jitter_seconds))
+        trabajo.next_run = siguiente
+        self.scheduler.add_job(
+            self.run,
+            trigger='date',
+            run_date=siguiente.to_pydatetime(),
+            args=(trabajo.asset, trabajo.interval),
+            id=trabajo.job_id,
+            replace_existing=True,
+            misfire_grace_time=int(duracion.total_seconds()),
+            max_instances=1
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Métricas por trabajo: ejecuciones, descartes por solape, fallos y tiempos
+        """
+        with self._lock:
+            vigentes = len(self._resultados)
+        return {
+            "jobs": [trabajo.stats() for trabajo in self._trabajos.values()],
+            "results": vigentes,
+            "running": self.scheduler.running,
+        }
+
+
+def parse_watchlist(texto: str) -> List[Tuple[str, str]]:
+    """
+    Convierte "GC=F:1h,EURUSD=X:4h" en [("GC=F", "1h"), ("EURUSD=X", "4h")]
+
+    Un activo sin intervalo usa 1h
+    """
+    pares = []
+    for elemento in texto.split(","):
+        elemento = elemento.strip()
+        if not elemento:
+            continue
+        asset, _, interval = elemento.rpartition(":") if ":" in elemento else (elemento, "", "1h")
+        pares.append((asset.strip(), interval.strip() or "1h"))
+    return pares
@@ -0,0 +1,137 @@
+"""
+Formatos de respuesta para los datos del dashboard
+- records: un diccionario por vela (formato original)
+- columnar: un array por columna, tiempos en epoch-ms y NaN/inf como null
+- msgpack: el formato columnar codificado en MessagePack
+"""
+import hashlib
+from typing import Dict, Any, List, Optional
+import numpy as np
+import pandas as pd
+import msgpack
+
+RESPONSE_FORMATS = ("records", "columnar", "msgpack")
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+
+def _column_to_list(serie: pd.Series) -> List[Any]:
+    """
+    Convierte una columna a lista JSON-friendly de forma vectorizada
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        nulos = serie.isna().to_numpy()
+        valores = serie.to_numpy(dtype='datetime64[ms]').astype(np.int64).astype(object)
+        valores[nulos] = None
+        return valores.tolist()
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_integer_dtype(serie):
+        return serie.tolist()
+    if pd.api.types.is_float_dtype(serie):
+        valores = serie.to_numpy(dtype=float)
+        nulos = ~np.isfinite(valores)
+        if not nulos.any():
+            return valores.tolist()
+        valores = valores.astype(object)
+        valores[nulos] = None
+        return valores.tolist()
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def dataframe_to_columnar(df: pd.DataFrame) -> Dict[str, List[Any]]:
+    """
+    Convierte el DataFrame al formato columnar
+
+    Args:
+        df: DataFrame con los datos y pullbacks detectados
+
+    Returns:
+        Diccionario columna -> lista de valores (tiempos en milisegundos epoch)
+    """
+    return {columna: _column_to_list(df[columna]) for columna in df.columns}
+
+
+def markers_payload(df: pd.DataFrame, marcadores: List[tuple], response_format: str) -> Any:
+    """
+    Serializa la salida dispersa de marcadores en el mismo formato que los datos
+
+    Args:
+        df: DataFrame con la columna time
+        marcadores: lista de (tipo, index, precio) de detect_pullback_markers
+        response_format: records, columnar o msgpack
+
+    Returns:
+        Lista de {"index", "time", "marker", "price"} (records) o un array por campo
+    """
+    indices = [index for _, index, _ in marcadores]
+    columnas = {
+        "index": indices,
+        "time": _column_to_list(df["time"].iloc[indices]),
+        "marker": [tipo for tipo, _, _ in marcadores],
+        "price": _column_to_list(pd.Series([precio for _, _, precio in marcadores], dtype=float)),
+    }
+    if response_format != "records":
+        return columnas
+    tiempos = df["time"].iloc[indices]
+    columnas["time"] = [t.isoformat() if pd.notna(t) else None for t in tiempos]
+    return [dict(zip(columnas, valores)) for valores in zip(*columnas.values())]
+
+
+def pack_msgpack(result: Dict[str, Any]) -> bytes:
+    """
+    Codifica una respuesta (con datos en formato columnar) en MessagePack
+    """
+    return msgpack.packb(result, use_bin_type=True)
+
+
+def candles_signature(df: pd.DataFrame) -> tuple:
+    """
+    Versión de una ventana de velas: primera y última vela, número de velas
+    y OHLCV de la última (la vela abierta cambia sin que cambie su time)
+
+    Args:
+        df: Velas de la ventana
+
+    Returns:
+        Tupla comparable (y hashable) que cambia cuando cambian las velas
+    """
+    if df.empty:
+        return (0,)
+    ultima = df.iloc[-1]
+    return (
+        len(df),
+        int(df['time'].iloc[0].value),
+        int(ultima['time'].value),
+        tuple(float(ultima[columna]) for columna in ('open', 'high', 'low', 'close', 'volume')),
+    )
+
+
+def compute_etag(params: tuple, df: pd.DataFrame) -> str:
+    """
+    ETag fuerte de una respuesta del dashboard
+
+    Depende de los parámetros de la petición y de las velas de la ventana
+    (ver candles_signature)
+
+    Args:
+        params: Parámetros de la petición (asset, interval, limit, ...)
+        df: Velas con las que se construye la respuesta
+
+    Returns:
+        ETag entre comillas
+    """
+    firma = (params,) + candles_signature(df)
+    return '"' + hashlib.sha1(repr(firma).encode()).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indica si la cabecera If-None-Match incluye el ETag (admite listas, * y W/)
+    """
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato.startswith("W/"):
+            candidato = candidato[2:]
+        if candidato == "*" or candidato == etag:
+            return True
+    return False
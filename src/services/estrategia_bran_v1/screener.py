@@ -0,0 +1,220 @@
+"""
+Screener del estado de pullbacks de una lista de activos
+
+Cada (activo, intervalo, minimum_tresure, proveedor) mantiene un IncrementalPullbackDetection:
+en cada escaneo solo se procesan las velas nuevas o revisadas desde el anterior,
+así que un escaneo de cientos de activos con las velas ya en caché solo
+cuesta unas pocas velas por activo. Los estados se guardan en un LRU
+(SCREENER_MAX_STATES): los activos que nadie escanea se acaban expulsando.
+"""
+import math
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional
+
+import pandas as pd
+
+from src.core.config import SCREENER_MAX_STATES
+from src.utils.dataExtractor.providers import current_provider
+from src.utils.indicadores.pullback_engine import MARKER_TYPES
+from src.utils.indicadores.pullback_incremental import IncrementalPullbackDetection
+
+# Columnas de la tabla del screener (en este orden)
+SCREENER_COLUMNS = [
+    "asset",
+    "interval",
+    "time",
+    "close",
+    "tendencia",
+    "rangoAlto",
+    "rangoBajo",
+    "dist_alto_pct",
+    "dist_bajo_pct",
+    "posicion",
+    "last_marker",
+    "last_marker_time",
+    "last_marker_age",
+]
+
+# Columnas por las que se puede ordenar
+SORT_KEYS = ("asset", "tendencia", "dist_alto_pct", "dist_bajo_pct", "posicion", "last_marker_age", "close")
+
+# Marcadores estructurales recordados por activo (por si se retractan los últimos)
+_MARCADORES_RECIENTES = 16
+
+
+class _EstadoActivo:
+    """
+    Detector incremental y últimos marcadores estructurales de un activo
+    """
+    __slots__ = ('detector', 'marcadores', 'lock')
+
+    def __init__(self, minimum_tresure):
+        self.detector = IncrementalPullbackDetection(minimum_tresure=minimum_tresure)
+        self.marcadores = deque(maxlen=_MARCADORES_RECIENTES)
+        self.lock = threading.Lock()
+
+    def reiniciar(self):
+        self.detector = IncrementalPullbackDetection(minimum_tresure=self.detector.minimum_tresure)
+        self.marcadores.clear()
+
+
+class PullbackScreener:
+    """
+    Estado incremental de pullbacks por activo y cálculo de las filas del screener
+    """
+
+    def __init__(self, max_states=SCREENER_MAX_STATES):
+        """
+        Args:
+            max_states: Estados (activo, intervalo, umbral, proveedor) guardados como máximo
+        """
+        self.max_states = max_states
+        self._estados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def row(self, df: pd.DataFrame, asset: str, interval: str, minimum_tresure: float) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza el estado del activo con sus velas y devuelve su fila
+
+        Args:
+            df: DataFrame con time, open, high, low, close ordenado por time
+            asset: Símbolo del activo
+            interval: Intervalo temporal
+            minimum_tresure: Umbral mínimo para detección de pullbacks
+
+        Returns:
+            Diccionario con las columnas de SCREENER_COLUMNS o None si no hay velas
+        """
+        if df.empty:
+            return None
+        # Cada proveedor de datos tiene su propio detector (sus velas no se mezclan)
+        clave = (asset, interval, minimum_tresure, current_provider())
+        with self._lock:
+            estado = self._estados.get(clave)
+            if estado is None:
+                estado = self._estados[clave] = _EstadoActivo(minimum_tresure)
+                while len(self._estados) > self.max_states:
+                    self._estados.popitem(last=False)
+            else:
+                self._estados.move_to_end(clave)
+
+        with estado.lock:
+            ultima = estado.detector.last_time
+            if ultima is not None and df['time'].iloc[0] > ultima:
+                # Hueco entre el estado y las velas recibidas: se empieza de nuevo
+                estado.reiniciar()
+            try:
+                self._actualizar(estado, df)
+            except ValueError:
+                # Revisión más profunda de lo que admite el detector: se reconstruye
+                estado.reiniciar()
+                self._actualizar(estado, df)
+            return self._fila(estado, df, asset, interval)
+
+    @staticmethod
+    def _actualizar(estado, df):
+        """
+        Pasa al detector las velas desde la última recibida (revisada o no) en adelante
+        """
+        ultima = estado.detector.last_time
+        nuevas = df if ultima is None else df[df['time'] >= ultima]
+        for evento in estado.detector.update(nuevas):
+            if evento['marker'] not in MARKER_TYPES:
+                continue
+            marcador = (evento['marker'], evento['index'], evento['time'])
+            if evento['event'] == 'add':
+                estado.marcadores.append(marcador)
+            elif marcador in estado.marcadores:
+                estado.marcadores.remove(marcador)
+
+    @staticmethod
+    def _fila(estado, df, asset, interval):
+        rangos = estado.detector.rangos
+        close = float(df['close'].iloc[-1])
+        alto = _finito(rangos.get('rangoAlto'))
+        bajo = _finito(rangos.get('rangoBajo'))
+        fila = {
+            "asset": asset,
+            "interval": interval,
+            "time": df['time'].iloc[-1].isoformat(),
+            "close": _finito(close),
+            "tendencia": int(rangos.get('tendencia', 0)),
+            "rangoAlto": alto,
+            "rangoBajo": bajo,
+            "dist_alto_pct": None,
+            "dist_bajo_pct": None,
+            "posicion": None,
+            "last_marker": None,
+            "last_marker_time": None,
+            "last_marker_age": None,
+        }
+        if close:
+            if alto is not None:
+                fila["dist_alto_pct"] = (alto - close) / close * 100
+            if bajo is not None:
+                fila["dist_bajo_pct"] = (close - bajo) / close * 100
+        if alto is not None and bajo is not None and alto > bajo:
+            fila["posicion"] = (close - bajo) / (alto - bajo)
+        if estado.marcadores:
+            tipo, index, tiempo = max(estado.marcadores, key=lambda m: m[1])
+            fila["last_marker"] = tipo
+            fila["last_marker_time"] = tiempo.isoformat() if hasattr(tiempo, 'isoformat') else tiempo
+            fila["last_marker_age"] = len(estado.detector) - 1 - index
+        return fila
+
+    def clear(self):
+        with self._lock:
+            self._estados.clear()
+
+    def __len__(self):
+        return len(self._estados)
+
+
+def filter_and_sort(rows: List[Dict[str, Any]],
+                    trend: Optional[int] = None,
+                    max_distance_pct: Optional[float] = None,
+                    max_age: Optional[int] = None,
+                    sort: str = "dist_alto_pct",
+                    descending: bool = False,
+                    top: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Filtra y ordena las filas del screener
+
+    Args:
+        rows: Filas devueltas por PullbackScreener.row
+        trend: Solo activos con esta tendencia (1, -1 o 0)
+        max_distance_pct: Solo activos a menos de este % del rangoAlto o del rangoBajo
+        max_age: Solo activos cuyo último marcador tiene como mucho esta antigüedad (velas)
+        sort: Columna de ordenación (ver SORT_KEYS); los valores nulos van al final
+        descending: Orden descendente
+        top: Número máximo de filas devueltas
+
+    Returns:
+        Lista de filas filtradas y ordenadas
+    """
+    if trend is not None:
+        rows = [fila for fila in rows if fila["tendencia"] == trend]
+    if max_distance_pct is not None:
+        rows = [
+            fila for fila in rows
+            if any(
+                fila[columna] is not None and abs(fila[columna]) <= max_distance_pct
+                for columna in ("dist_alto_pct", "dist_bajo_pct")
+            )
+        ]
+    if max_age is not None:
+        rows = [fila for fila in rows if fila["last_marker_age"] is not None and fila["last_marker_age"] <= max_age]
+
+    con_valor = [fila for fila in rows if fila[sort] is not None]
+    sin_valor = [fila for fila in rows if fila[sort] is None]
+    con_valor.sort(key=lambda fila: fila[sort], reverse=descending)
+    rows = con_valor + sin_valor
+    return rows[:top] if top else rows
+
+
+def _finito(valor):
+    if valor is None:
+        return None
+    valor = float(valor)
+    return valor if math.isfinite(valor) else None
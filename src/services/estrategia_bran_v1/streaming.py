@@ -0,0 +1,324 @@
+"""
+Streaming de velas y eventos de pullbacks (Server-Sent Events)
+
+Un único productor por (activo, intervalo, minimum_tresure) consulta las
+velas (desde la caché), actualiza un IncrementalPullbackDetection y difunde
+a todos los suscriptores solo lo que cambió:
+- snapshot: velas de la ventana con columnas de marcadores (formato columnar)
+- update: velas nuevas o revisadas y marcadores confirmados o retractados
+
+El coste de consulta y detección no depende del número de dashboards conectados.
+Cuando el productor se queda sin suscriptores termina y el stream se retira del
+registro.
+"""
+import asyncio
+import json
+import logging
+import math
+import threading
+from typing import Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from src.core import io_pool
+from src.core.fetch_scheduler import fetch_priority, WARMUP
+from src.utils.dataExtractor.providers import current_provider
+from src.services.estrategia_bran_v1.response_formats import dataframe_to_columnar
+from src.utils.indicadores.pullback_engine import MARKER_COLUMNS
+from src.utils.indicadores.pullback_incremental import IncrementalPullbackDetection
+
+logger = logging.getLogger(__name__)
+
+# Columnas de vela que se envían
+CANDLE_COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume']
+
+
+class CandleStream:
+    """
+    Productor de un (activo, intervalo, minimum_tresure) y sus suscriptores
+    """
+
+    def __init__(self, service, asset, interval, minimum_tresure, limit, poll_seconds, queue_size, on_idle=None):
+        self.service = service
+        self.asset = asset
+        self.interval = interval
+        self.minimum_tresure = minimum_tresure
+        self.limit = limit
+        self.poll_seconds = poll_seconds
+        self.queue_size = queue_size
+        # Se llama con el stream cuando el productor termina sin suscriptores
+        self._on_idle = on_idle
+        self._colas = set()
+        self._lock = threading.Lock()
+        self._listo = asyncio.Event()
+        self._tarea = None
+        self._reiniciar()
+        self.stats = {'polls': 0, 'updates': 0, 'snapshots': 0, 'dropped': 0, 'errors': 0}
+
+    def _reiniciar(self):
+        self._df = None
+        self._detector = IncrementalPullbackDetection(minimum_tresure=self.minimum_tresure)
+        # (marcador, time) -> precio de los marcadores vigentes dentro de la ventana
+        self._marcadores = {}
+
+    @property
+    def running(self):
+        return self._tarea is not None and not self._tarea.done()
+
+    @property
+    def subscribers(self):
+        return len(self._colas)
+
+    def start(self):
+        if not self.running:
+            self._tarea = asyncio.ensure_future(self._producir())
+
+    async def subscribe(self, timeout=None) -> asyncio.Queue:
+        """
+        Registra un suscriptor; su cola empieza con el snapshot actual
+
+        Raises:
+            asyncio.TimeoutError si no hay velas para el snapshot en timeout segundos
+        """
+        cola = asyncio.Queue(maxsize=self.queue_size)
+        self._colas.add(cola)
+        self.start()
+        if not self._listo.is_set():
+            try:
+                await asyncio.wait_for(self._listo.wait(), timeout)
+            except asyncio.TimeoutError:
+                self.unsubscribe(cola)
+                raise
+            if not cola.empty():
+                # Ya recibió el snapshot inicial difundido por el productor
+                return cola
+        with self._lock:
+            cola.put_nowait(('snapshot', self._snapshot()))
+        return cola
+
+    def unsubscribe(self, cola: asyncio.Queue):
+        self._colas.discard(cola)
+
+    async def _producir(self):
+        while self._colas:
+            try:
+                # Consulta periódica: cede el turno a las peticiones del dashboard
+                with fetch_priority(WARMUP):
+                    df = await io_pool.run(self.service._fetch_candles, self.asset, self.interval, self.limit, None)
+                self.stats['polls'] += 1
+                if not df.empty:
+                    evento = await io_pool.run(self._actualizar, df)
+                    self._listo.set()
+                    if evento is not None:
+                        self._difundir(*evento)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.warning(f"Stream {self.asset} {self.interval}: {e}")
+            await asyncio.sleep(self.poll_seconds)
+        # Sin suscriptores: el siguiente productor empieza desde cero
+        self._listo.clear()
+        self._reiniciar()
+        if self._on_idle is not None:
+            self._on_idle(self)
+
+    def _actualizar(self, df: pd.DataFrame):
+        """
+        Incorpora las velas consultadas y calcula el mensaje para los suscriptores
+
+        Returns:
+            ('snapshot' | 'update', datos) o None si no cambió nada
+        """
+        with self._lock:
+            if self._df is not None and df['time'].iloc[0] > self._df['time'].iloc[-1]:
+                # Hueco respecto a lo ya procesado: se reconstruye y se reenvía el snapshot
+                self._reiniciar()
+            if self._df is None:
+                self._aplicar_eventos(self._detector.update(df))
+                self._df = df[CANDLE_COLUMNS].tail(self.limit).reset_index(drop=True)
+                self._recortar_marcadores()
+                self.stats['snapshots'] += 1
+                return 'snapshot', self._snapshot()
+
+            ultima = self._df['time'].iloc[-1]
+            nuevas = df[df['time'] >= ultima][CANDLE_COLUMNS].reset_index(drop=True)
+            anterior = self._df.iloc[-1]
+            cambiadas = nuevas[
+                (nuevas['time'] > ultima)
+                | (nuevas[CANDLE_COLUMNS[1:]] != anterior[CANDLE_COLUMNS[1:]]).any(axis=1)
+            ]
+            if cambiadas.empty:
+                return None
+            try:
+                eventos = self._detector.update(nuevas)
+            except ValueError:
+                # Revisión más profunda de lo que admite el detector
+                self._reiniciar()
+                return self._actualizar(df)
+            eventos = self._aplicar_eventos(eventos)
+            self._df = pd.concat(
+                [self._df[self._df['time'] < nuevas['time'].iloc[0]], nuevas], ignore_index=True
+            ).tail(self.limit).reset_index(drop=True)
+            self._recortar_marcadores()
+            self.stats['updates'] += 1
+            return 'update', {
+                "candles": dataframe_to_columnar(cambiadas),
+                "markers": eventos,
+                "rangos": self._rangos()
+            }
+
+    def _aplicar_eventos(self, eventos):
+        """
+        Actualiza los marcadores vigentes y devuelve los eventos serializables
+        """
+        mensajes = []
+        for evento in eventos:
+            clave = (evento['marker'], evento['time'])
+            if evento['event'] == 'add':
+                self._marcadores[clave] = evento['price']
+            else:
+                self._marcadores.pop(clave, None)
+            mensajes.append({
+                "event": evento['event'],
+                "marker": evento['marker'],
+                "time": int(pd.Timestamp(evento['time']).timestamp() * 1000),
+                "price": evento['price']
+            })
+        return mensajes
+
+    def _recortar_marcadores(self):
+        inicio = self._df['time'].iloc[0]
+        self._marcadores = {clave: precio for clave, precio in self._marcadores.items() if clave[1] >= inicio}
+
+    def _rangos(self):
+        rangos = dict(self._detector.rangos)
+        for clave in ('rangoAlto', 'rangoBajo'):
+            if clave in rangos:
+                valor = float(rangos[clave])
+                rangos[clave] = valor if math.isfinite(valor) else None
+        if 'tendencia' in rangos:
+            rangos['tendencia'] = int(rangos['tendencia'])
+        return rangos
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """
+        Ventana actual en formato columnar, con una columna por tipo de marcador
+        (los círculos se derivan como en detect_pullbacks_arrays)
+        """
+        df = self._df.copy()
+        posiciones = pd.Series(range(len(df)), index=df['time'])
+        for columna in MARKER_COLUMNS:
+            df[columna] = float('nan')
+        for (marcador, tiempo), precio in self._marcadores.items():
+            if tiempo in posiciones.index:
+                df.loc[posiciones[tiempo], marcador] = precio if precio is not None else float('nan')
+        df['circulosAzul'] = np.where(df['bajos'].isna(), df['altos'], df['bajos'])
+        df['circulosNaranja'] = np.where(df['pocBajos'].isna(), df['pocAltos'], df['pocBajos'])
+        return {
+            "asset": self.asset,
+            "interval": self.interval,
+            "data": dataframe_to_columnar(df),
+            "rangos": self._rangos()
+        }
+
+    def _difundir(self, tipo, datos):
+        for cola in list(self._colas):
+            try:
+                cola.put_nowait((tipo, datos))
+            except asyncio.QueueFull:
+                # Suscriptor demasiado lento: se desconecta (al reconectar recibe un snapshot)
+                self.stats['dropped'] += 1
+                self._colas.discard(cola)
+                try:
+                    cola.get_nowait()
+                    cola.put_nowait(('close', None))
+                except (asyncio.QueueEmpty, asyncio.QueueFull):
+                    pass
+
+
+class StreamHub:
+    """
+    Registro de productores por (activo, intervalo, minimum_tresure)
+    """
+
+    def __init__(self, service, limit=1000, poll_seconds=5, heartbeat_seconds=15, queue_size=100, snapshot_timeout=30):
+        """
+        Args:
+            service: EstrategiaBranV1Service (descarga de velas)
+            limit: Velas de la ventana de cada stream
+            poll_seconds: Segundos entre consultas del productor
+            heartbeat_seconds: Segundos sin eventos antes de enviar un comentario de keep-alive
+            queue_size: Mensajes pendientes por suscriptor antes de desconectarlo
+            snapshot_timeout: Espera máxima del primer snapshot
+        """
+        self.service = service
+        self.snapshot_timeout = snapshot_timeout
+        self.limit = limit
+        self.poll_seconds = poll_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.queue_size = queue_size
+        self._streams = {}
+
+    async def events(self, asset: str, interval: str, minimum_tresure: float, is_disconnected=None):
+        """
+        Generador de eventos SSE para un suscriptor
+
+        Args:
+            asset, interval, minimum_tresure: Stream a seguir
+            is_disconnected: Corrutina opcional que indica si el cliente se desconectó
+
+        Yields:
+            Texto en formato text/event-stream
+        """
+        # Un productor por proveedor de datos: hereda el contexto del primer suscriptor
+        clave = (asset, interval, minimum_tresure, current_provider())
+        stream = self._streams.get(clave)
+        if stream is None:
+            stream = self._streams[clave] = CandleStream(
+                self.service, asset, interval, minimum_tresure,
+                self.limit, self.poll_seconds, self.queue_size,
+                on_idle=lambda terminado: self._retirar(clave, terminado)
+            )
+        try:
+            cola = await stream.subscribe(self.snapshot_timeout)
+        except asyncio.TimeoutError:
+            datos = {"success": False, "error": "No se pudieron obtener datos del mercado"}
+            yield f"event: stream_error\ndata: {json.dumps(datos)}\n\n"
+            return
+        try:
+            while True:
+                try:
+                    tipo, datos = await asyncio.wait_for(cola.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                if tipo == 'close':
+                    break
+                yield f"event: {tipo}\ndata: {json.dumps(datos)}\n\n"
+        finally:
+            stream.unsubscribe(cola)
+
+    def _retirar(self, clave, stream):
+        # Solo si sigue registrado (un stream nuevo con la misma clave no se toca)
+        if self._streams.get(clave) is stream:
+            del self._streams[clave]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Productores activos, suscriptores y contadores por stream
+        """
+        return {
+            "streams": [
+                {
+                    "asset": stream.asset,
+                    "interval": stream.interval,
+                    "minimum_tresure": stream.minimum_tresure,
+                    "running": stream.running,
+                    "subscribers": stream.subscribers,
+                    **stream.stats
+                }
+                for stream in self._streams.values()
+            ]
+        }
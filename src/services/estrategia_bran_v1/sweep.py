@@ -0,0 +1,243 @@
+"""
+Barrido de parámetros de la detección y del backtest sobre varios activos
+
+Las velas de cada (activo, intervalo) se copian una sola vez a un bloque de
+memoria compartida (multiprocessing.shared_memory); las tareas del pool de
+procesos solo reciben el nombre del bloque y el número de velas, en lugar de
+serializar los arrays en cada tarea.
+
+Cada tarea es una serie con un minimum_tresure: la detección se ejecuta una
+vez y todas las reglas del backtest (entrada, dirección, stop, salida) se
+evalúan sobre los mismos estados.
+"""
+import asyncio
+import itertools
+from multiprocessing import shared_memory
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.utils.indicadores.pullback_backtest import pullback_states, backtest_states
+
+# Parámetros de cada combinación y métricas de cada fila (en este orden)
+PARAM_COLUMNS = ["minimum_tresure", "entry", "direction", "stop", "exit_on_trend"]
+METRIC_COLUMNS = [
+    "trades",
+    "win_rate",
+    "expectancy",
+    "profit_factor",
+    "total_return",
+    "max_drawdown",
+    "exposure",
+]
+SWEEP_COLUMNS = ["asset", "interval"] + PARAM_COLUMNS + METRIC_COLUMNS
+RANKING_COLUMNS = PARAM_COLUMNS + ["series"] + METRIC_COLUMNS
+
+# Métricas por las que se puede ordenar
+SWEEP_SORT_KEYS = ("expectancy", "total_return", "profit_factor", "win_rate", "max_drawdown", "trades")
+
+# Filas de precios del bloque compartido de cada serie
+_PRECIOS = ('open', 'high', 'low', 'close')
+
+
+class SharedCandles:
+    """
+    Velas OHLC de una serie en memoria compartida (array de 4 x n float64)
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.n = len(df)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(1, 4 * self.n * 8))
+        precios = np.ndarray((4, self.n), dtype=np.float64, buffer=self._shm.buf)
+        for fila, columna in enumerate(_PRECIOS):
+            precios[fila] = df[columna].to_numpy(dtype=float)
+        del precios
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _adjuntar(nombre):
+    """
+    Abre un bloque creado por el proceso principal
+
+    Solo el proceso que lo crea lo libera (unlink). Los workers del pool
+    comparten su resource_tracker, así que el registro al abrirlo no duplica
+    la liberación; en Python >= 3.13 ni siquiera se registra
+    """
+    try:
+        return shared_memory.SharedMemory(name=nombre, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=nombre)
+
+
+def evaluate_series(nombre: str,
+                    n: int,
+                    minimum_tresure: float,
+                    reglas: List[Tuple[str, str, str, bool]],
+                    fee: float,
+                    slippage: float) -> List[Dict[str, Any]]:
+    """
+    Evalúa todas las reglas sobre una serie compartida con un minimum_tresure (se ejecuta en el pool)
+
+    Args:
+        nombre: Nombre del bloque de SharedCandles
+        n: Número de velas de la serie
+        minimum_tresure: Umbral de la detección
+        reglas: Lista de (entry, direction, stop, exit_on_trend)
+        fee, slippage: Costes por lado
+
+    Returns:
+        Lista de diccionarios con PARAM_COLUMNS y METRIC_COLUMNS, uno por regla
+    """
+    shm = _adjuntar(nombre)
+    try:
+        compartido = np.ndarray((4, n), dtype=np.float64, buffer=shm.buf)
+        # Copia local: los arrays de resultados no deben apuntar al bloque compartido
+        open_, high, low, close = np.array(compartido)
+        del compartido
+    finally:
+        shm.close()
+
+    estados = pullback_states(high, low, np.maximum(open_, close), np.minimum(open_, close), minimum_tresure)
+    filas = []
+    for entry, direction, stop, exit_on_trend in reglas:
+        _, _, resumen = backtest_states(
+            estados, open_, high, low, close, entry, direction, stop, exit_on_trend, fee, slippage
+        )
+        filas.append({
+            "minimum_tresure": minimum_tresure,
+            "entry": entry,
+            "direction": direction,
+            "stop": stop,
+            "exit_on_trend": exit_on_trend,
+            **{columna: resumen[columna] for columna in METRIC_COLUMNS},
+        })
+    return filas
+
+
+def rule_grid(entries, directions, stops, exits) -> List[Tuple[str, str, str, bool]]:
+    """
+    Producto cartesiano de las reglas del backtest
+    """
+    return list(itertools.product(entries, directions, stops, exits))
+
+
+async def run_sweep(series: Dict[Tuple[str, str], pd.DataFrame],
+                    minimum_tresures: List[float],
+                    reglas: List[Tuple[str, str, str, bool]],
+                    fee: float,
+                    slippage: float,
+                    pool) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Ejecuta el barrido en el pool: una tarea por (serie, minimum_tresure)
+
+    Args:
+        series: (activo, intervalo) -> DataFrame con OHLC
+        minimum_tresures: Valores del umbral a probar
+        reglas: Reglas del backtest (ver rule_grid)
+        fee, slippage: Costes por lado
+        pool: TrackedExecutor donde se ejecutan las tareas (cpu_pool)
+
+    Returns:
+        (filas, errores): filas con SWEEP_COLUMNS y errores por serie
+    """
+    bloques = {}
+    try:
+        for clave, df in series.items():
+            bloques[clave] = SharedCandles(df)
+        tareas = [
+            (clave, minimum_tresure)
+            for clave in bloques
+            for minimum_tresure in minimum_tresures
+        ]
+        resultados = await asyncio.gather(
+            *(
+                pool.run(evaluate_series, bloques[clave].name, bloques[clave].n, minimum_tresure, reglas, fee, slippage)
+                for clave, minimum_tresure in tareas
+            ),
+            return_exceptions=True
+        )
+    finally:
+        for bloque in bloques.values():
+            bloque.close()
+
+    filas = []
+    errores = []
+    for (clave, minimum_tresure), resultado in zip(tareas, resultados):
+        asset, interval = clave
+        if isinstance(resultado, BaseException):
+            errores.append({
+                "asset": asset,
+                "interval": interval,
+                "minimum_tresure": minimum_tresure,
+                "error": str(resultado)
+            })
+            continue
+        filas.extend({"asset": asset, "interval": interval, **fila} for fila in resultado)
+    return filas, errores
+
+
+def rank_rows(filas: List[Dict[str, Any]],
+              sort: str = "expectancy",
+              descending: bool = True,
+              min_trades: int = 0,
+              top: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Ordena las filas por una métrica (los valores nulos van al final)
+
+    Args:
+        filas: Filas de run_sweep o de rank_params
+        sort: Métrica de ordenación (ver SWEEP_SORT_KEYS)
+        descending: Orden descendente
+        min_trades: Descarta filas con menos operaciones
+        top: Número máximo de filas
+    """
+    filas = [fila for fila in filas if fila["trades"] >= min_trades]
+    con_valor = [fila for fila in filas if fila[sort] is not None]
+    sin_valor = [fila for fila in filas if fila[sort] is None]
+    con_valor.sort(key=lambda fila: fila[sort], reverse=descending)
+    filas = con_valor + sin_valor
+    return filas[:top] if top else filas
+
+
+def rank_params(filas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Agrega las filas por combinación de parámetros (media de las métricas entre series)
+
+    Las operaciones se suman; el resto de métricas es la media de las series
+    con valor. "series" es el número de series de la combinación.
+    """
+    if not filas:
+        return []
+    df = pd.DataFrame(filas)
+    agregado = df.groupby(PARAM_COLUMNS, sort=False, dropna=False).agg(
+        series=("asset", "size"),
+        trades=("trades", "sum"),
+        **{
+            columna: (columna, "mean")
+            for columna in METRIC_COLUMNS
+            if columna != "trades"
+        }
+    ).reset_index()
+    agregado = agregado[RANKING_COLUMNS].astype(object)
+    agregado = agregado.where(pd.notna(agregado), None)
+    return [
+        {
+            columna: (valor.item() if hasattr(valor, "item") else valor)
+            for columna, valor in fila.items()
+        }
+        for fila in agregado.to_dict(orient="records")
+    ]
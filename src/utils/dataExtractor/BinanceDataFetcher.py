@@ -1,14 +1,58 @@
+import logging
+import threading
 import pandas as pd
 from datetime import datetime
 import pytz
 import time
 from binance import BinanceSync as Client
+from src.core import fetch_scheduler
+from src.core.config import BINANCE_STREAM_ENABLED
+from src.core.metrics import stage, UPSTREAM_REQUESTS, UPSTREAM_ERRORS
+from src.utils.dataExtractor.BinanceKlineStream import KLINE_COLUMNS, shared_kline_stream
+
+logger = logging.getLogger(__name__)
+
+# Long-lived clients shared by every fetcher, by name (see shared_binance_client)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def shared_binance_client(name="default", factory=Client):
+    """
+    Shared client registry: one long-lived client per name, created on first use.
+    Reusing it keeps the HTTP session (pooled connections) and the loaded
+    markets instead of building a new client for every fetcher.
+
+    Parameters:
+    - name: Registry key (e.g. one per account or market type)
+    - factory: Callable that builds the client the first time
+
+    Returns:
+    - The shared client
+    """
+    with _clients_lock:
+        client = _clients.get(name)
+        if client is None:
+            client = _clients[name] = factory()
+        return client
+
 
 class BinanceDataFetcher:
-    def __init__(self, asset, interval, client=None):
+    def __init__(self, asset, interval, client=None, stream=None):
+        """
+        Parameters:
+        - asset: CCXT symbol (e.g. "BTC/USDT")
+        - interval: Kline interval (1m, 5m, 1h, 1d...)
+        - client: Binance client (default: the shared one)
+        - stream: KlineStreamConsumer serving the latest klines (default: the shared
+          one when BINANCE_STREAM_ENABLED; False disables it)
+        """
         self.asset = asset
         self.interval = interval
-        self.client = client if client else Client()
+        self.client = client if client else shared_binance_client()
+        if stream is None and BINANCE_STREAM_ENABLED:
+            stream = shared_kline_stream()
+        self.stream = stream or None
 
     def get_data(self, start_time=None, end_time=None, limit=500):
         """
@@ -21,53 +65,103 @@ class BinanceDataFetcher:
         - limit: Number of klines to retrieve (default: 500)
         
         Returns:
-        - DataFrame with kline data
+        - DataFrame with kline data (empty if Binance returns no klines)
+
+        Raises:
+        - fetch_scheduler.FetchError if the request fails
         """
         try:
+            # Latest klines (no end_time) come from the kline stream buffer while it is in sync: no REST call
+            live = self.stream is not None and end_time is None
+            if live:
+                rows = self.stream.read(self.asset, self.interval, start_time, limit)
+                if rows is not None:
+                    return self._ticks_frame(rows)
+
             # fetchOHLCV format: symbol, timeframe, since (optional), limit (optional)
             # El resultado es: [[timestamp, open, high, low, close, volume], ...]
+            # The request waits for its turn in the fetch scheduler (rate limit, priority, retries)
             params = {}
-            if start_time:
-                ohlcv = self.client.fetchOHLCV(
-                    symbol=self.asset,
-                    timeframe=self.interval,
-                    since=start_time,
-                    limit=limit,
-                    params=params
-                )
-            else:
-                ohlcv = self.client.fetchOHLCV(
+            since = {'since': start_time} if start_time else {}
+            with stage("upstream"):
+                ohlcv = fetch_scheduler.call(
+                    "binance",
+                    self._fetch_ohlcv,
                     symbol=self.asset,
                     timeframe=self.interval,
                     limit=limit,
-                    params=params
+                    params=params,
+                    retryable=self.is_transient_error,
+                    **since
                 )
                 
             if not ohlcv:
-                print(f"No data returned for {self.asset} with interval {self.interval}")
+                UPSTREAM_ERRORS.inc(provider="binance", kind="ohlcv", reason="empty")
+                logger.warning(f"No data returned for {self.asset} with interval {self.interval}")
                 return pd.DataFrame()
-            
-            # OHLCV format from CCXT: [timestamp, open, high, low, close, volume]
-            ticks_frame = pd.DataFrame(ohlcv, columns=['time', 'open', 'high', 'low', 'close', 'volume'])
-            ticks_frame['time'] = pd.to_datetime(ticks_frame['time'], unit='ms')
-            ticks_frame[['open', 'high', 'low', 'close', 'volume']] = ticks_frame[['open', 'high', 'low', 'close', 'volume']].astype(float)
-
-            # Para buy_volume y sell_volume, necesitamos hacer una estimación
-            # ya que CCXT no provee esta información directamente
-            # Usaremos el 50% como estimación (esto es una aproximación)
-            ticks_frame['buy_volume'] = ticks_frame['volume'] * 0.5
-            ticks_frame['sell_volume'] = ticks_frame['volume'] * 0.5
-            
-            # Calculate volume delta
-            ticks_frame['volume_delta'] = ticks_frame['buy_volume'] - ticks_frame['sell_volume']
-            
-            return ticks_frame
+
+            if live:
+                # Seed the buffer: from now on the stream keeps it up to date
+                self.stream.seed(self.asset, self.interval, ohlcv, start_time, limit)
+
+            return self._ticks_frame(ohlcv)
             
         except Exception as e:
-            print(f"Error fetching or processing data: {e}")
-            import traceback
-            traceback.print_exc()
-            return pd.DataFrame()
+            logger.exception(f"Error fetching or processing data for {self.asset} {self.interval}: {e}")
+            raise fetch_scheduler.FetchError(f"Error fetching data for {self.asset} {self.interval}: {e}") from e
+
+    @staticmethod
+    def _ticks_frame(ohlcv):
+        """
+        Kline DataFrame from fetchOHLCV rows (or kline stream buffer rows).
+        """
+        # OHLCV format from CCXT: [timestamp, open, high, low, close, volume]
+        ticks_frame = pd.DataFrame(ohlcv, columns=list(KLINE_COLUMNS))
+        ticks_frame['time'] = pd.to_datetime(ticks_frame['time'].astype('int64'), unit='ms')
+        ticks_frame[['open', 'high', 'low', 'close', 'volume']] = ticks_frame[['open', 'high', 'low', 'close', 'volume']].astype(float)
+
+        # Para buy_volume y sell_volume, necesitamos hacer una estimación
+        # ya que CCXT no provee esta información directamente
+        # Usaremos el 50% como estimación (esto es una aproximación)
+        ticks_frame['buy_volume'] = ticks_frame['volume'] * 0.5
+        ticks_frame['sell_volume'] = ticks_frame['volume'] * 0.5
+        
+        # Calculate volume delta
+        ticks_frame['volume_delta'] = ticks_frame['buy_volume'] - ticks_frame['sell_volume']
+        
+        return ticks_frame
+
+    def _fetch_ohlcv(self, **kwargs):
+        """
+        One fetchOHLCV request, counted in the upstream metrics (every retry counts)
+        """
+        UPSTREAM_REQUESTS.inc(provider="binance", kind="ohlcv")
+        try:
+            return self.client.fetchOHLCV(**kwargs)
+        except Exception:
+            UPSTREAM_ERRORS.inc(provider="binance", kind="ohlcv", reason="error")
+            raise
+
+    @staticmethod
+    def is_transient_error(error):
+        """
+        Errors worth retrying: CCXT NetworkError and its subclasses (rate limit,
+        timeouts, exchange unavailable). Exchange errors such as an unknown
+        symbol would fail again and are not retried.
+        """
+        if isinstance(error, (ConnectionError, TimeoutError)):
+            return True
+        return any(cls.__name__ == 'NetworkError' for cls in type(error).__mro__)
+
+    def history_limits(self):
+        """
+        Limits for long history downloads (see HistoryLoader).
+        Each request returns at most 500 klines; Binance has no lookback limit.
+        
+        Returns:
+        - (max time window per request, max lookback or None)
+        """
+        return self.calculate_time_increment(self.interval), None
 
     @staticmethod
     def calculate_time_increment(interval):
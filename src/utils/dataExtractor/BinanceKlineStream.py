@@ -0,0 +1,433 @@
+"""
+Velas de Binance en tiempo real a partir del WebSocket de klines
+
+Un único consumidor mantiene una conexión WebSocket y un buffer circular de
+velas por (símbolo, intervalo). Cada buffer se siembra una vez con la descarga
+REST de BinanceDataFetcher y después se actualiza con los mensajes kline que
+empuja el exchange (la vela en curso llega con su OHLCV acumulado). Mientras
+el buffer está sincronizado, get_data se sirve desde él sin llamadas REST.
+
+Un buffer deja de estar sincronizado cuando se pierde la conexión o llega una
+vela que no es contigua a la última; la siguiente lectura vuelve a sembrarlo
+por REST. Los mensajes que llegan entre esa lectura y la siembra se guardan y
+se aplican sobre la descarga, así no se pierde lo ocurrido durante la llamada REST. Los buffers sin lecturas durante BINANCE_STREAM_IDLE_SECONDS se
+eliminan y se cancela su suscripción.
+
+La URL es configurable (BINANCE_WS_URL) para probar contra un servidor
+WebSocket local (ver benchmarks/binance_ws_server.py).
+"""
+import asyncio
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+
+import numpy as np
+
+from src.core.config import BINANCE_WS_URL, BINANCE_STREAM_CAPACITY, BINANCE_STREAM_IDLE_SECONDS
+from src.core.metrics import registry, MetricFamily
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+
+logger = logging.getLogger(__name__)
+
+# Columnas de las filas de un buffer (las de fetchOHLCV): apertura en ms y OHLCV
+KLINE_COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+# Espera máxima (segundos) entre reconexiones y cada cuánto se revisan los buffers sin lecturas
+_MAX_BACKOFF_SECONDS = 30
+_IDLE_CHECK_SECONDS = 30
+
+
+def stream_symbol(asset):
+    """
+    Símbolo del stream para un símbolo de CCXT: "BTC/USDT" -> "btcusdt"
+    """
+    return asset.split(':')[0].replace('/', '').lower()
+
+
+def stream_name(asset, interval):
+    return f"{stream_symbol(asset)}@kline_{interval}"
+
+
+class KlineBuffer:
+    """
+    Últimas velas de un (símbolo, intervalo) en un array (capacity filas como máximo)
+    """
+
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.capacity = capacity
+        # Salto máximo entre aperturas consecutivas (los meses no tienen duración fija)
+        self._salto = 31 * 86400000 if interval.endswith('M') else int(interval_to_timedelta(interval).total_seconds() * 1000)
+        self._lock = threading.Lock()
+        # El doble de filas: al llenarse se compacta una vez cada capacity velas
+        self._filas = np.empty((2 * capacity, len(KLINE_COLUMNS)), dtype=np.float64)
+        self._n = 0
+        self.synced = False
+        # Primera apertura cubierta y si el buffer tiene la serie desde su primera vela
+        self.desde = None
+        self.completo = False
+        self.last_read = time.monotonic()
+        self.last_message = None
+        self.updates = 0
+        # Mensajes recibidos sin sincronizar tras la última lectura fallida: apertura -> fila
+        self._pendientes = {}
+
+    def seed(self, filas, desde=None, completo=False):
+        """
+        Sustituye el contenido por una descarga REST y marca el buffer como sincronizado
+
+        Parameters:
+        - filas: filas [time ms, open, high, low, close, volume] ordenadas por time
+        - desde: inicio (ms) pedido en la descarga; por defecto la primera vela
+        - completo: la descarga tiene la serie desde su primera vela
+        """
+        filas = np.asarray(filas, dtype=np.float64).reshape(-1, len(KLINE_COLUMNS))
+        with self._lock:
+            if len(filas) > self.capacity:
+                filas = filas[-self.capacity:]
+                desde, completo = None, False
+            self._filas[:len(filas)] = filas
+            self._n = len(filas)
+            self.desde = desde if desde is not None else (int(filas[0, 0]) if len(filas) else None)
+            self.completo = completo
+            self.synced = len(filas) > 0
+            pendientes, self._pendientes = self._pendientes, {}
+            # Lo recibido durante la descarga es igual o más reciente que ella
+            for abierta in sorted(pendientes):
+                if not self.synced:
+                    break
+                self._aplicar(abierta, *pendientes[abierta])
+
+    def apply(self, abierta, open, high, low, close, volume):
+        """
+        Aplica un mensaje kline: actualiza la vela en curso o añade una nueva
+
+        Returns:
+        - False si el mensaje deja el buffer desincronizado (hueco), True en otro caso
+        """
+        with self._lock:
+            self.last_message = time.monotonic()
+            if not self.synced or self._n == 0:
+                # Se aplicará sobre la próxima siembra (solo la última versión de cada vela)
+                self._pendientes[abierta] = (open, high, low, close, volume)
+                if len(self._pendientes) > self.capacity:
+                    del self._pendientes[min(self._pendientes)]
+                return True
+            return self._aplicar(abierta, open, high, low, close, volume)
+
+    def _aplicar(self, abierta, open, high, low, close, volume):
+        # Con el lock tomado y el buffer sincronizado
+        ultima = self._filas[self._n - 1, 0]
+        if abierta < ultima:
+            return True
+        if abierta > ultima + self._salto:
+            # Vela no contigua: faltan velas entre medias
+            self.synced = False
+            return False
+        if abierta > ultima:
+            if self._n == len(self._filas):
+                self._compactar()
+            self._n += 1
+        self._filas[self._n - 1] = (abierta, open, high, low, close, volume)
+        self.updates += 1
+        return True
+
+    def _compactar(self):
+        # Con el lock tomado: se quedan las últimas capacity - 1 filas
+        conservar = self.capacity - 1
+        self._filas[:conservar] = self._filas[self._n - conservar:self._n]
+        self._n = conservar
+        self.desde = int(self._filas[0, 0])
+        self.completo = False
+
+    def read(self, start_time=None, limit=500):
+        """
+        Filas para get_data(start_time, limit) o None si el buffer no las cubre
+
+        Returns:
+        - Copia de las filas: con start_time las primeras limit con time >= start_time
+          (como since/limit de REST); sin start_time las limit más recientes
+        """
+        with self._lock:
+            self.last_read = time.monotonic()
+            if not self.synced:
+                # El llamante irá a REST: solo valen los mensajes posteriores a esta lectura
+                self._pendientes.clear()
+                return None
+            if start_time is not None:
+                if self.desde is None or start_time < self.desde:
+                    return None
+                inicio = int(np.searchsorted(self._filas[:self._n, 0], start_time))
+                return self._filas[inicio:min(inicio + limit, self._n)].copy()
+            if self._n < limit and not self.completo:
+                return None
+            return self._filas[max(0, self._n - limit):self._n].copy()
+
+    def __len__(self):
+        return self._n
+
+
+class KlineStreamConsumer:
+    """
+    Conexión WebSocket de klines compartida por todos los buffers, en su propio event loop
+    """
+
+    def __init__(self, url=BINANCE_WS_URL, capacity=BINANCE_STREAM_CAPACITY, idle_seconds=BINANCE_STREAM_IDLE_SECONDS):
+        """
+        Parameters:
+        - url: URL base del WebSocket (se conecta a <url>/ws)
+        - capacity: velas por buffer
+        - idle_seconds: segundos sin lecturas tras los que un buffer se elimina
+        """
+        self.url = url.rstrip('/')
+        self.capacity = capacity
+        self.idle_seconds = idle_seconds
+        self.connected = False
+        self._lock = threading.Lock()
+        self._buffers = {}
+        self._loop = None
+        self._hilo = None
+        self._ws = None
+        self._cerrado = False
+        self._ids = itertools.count(1)
+        self._stats = {'messages': 0, 'connects': 0, 'disconnects': 0, 'gaps': 0, 'served': 0, 'seeds': 0, 'evicted': 0}
+
+    def _arrancar(self):
+        with self._lock:
+            if self._loop is None and not self._cerrado:
+                loop = asyncio.new_event_loop()
+                hilo = threading.Thread(target=loop.run_forever, name='binance-klines', daemon=True)
+                hilo.start()
+                self._loop, self._hilo = loop, hilo
+                asyncio.run_coroutine_threadsafe(self._consumir(), loop)
+            return self._loop
+
+    def _buffer(self, asset, interval):
+        """
+        Buffer del par; si no existe se crea y se suscribe su stream
+        """
+        nombre = stream_name(asset, interval)
+        with self._lock:
+            buffer = self._buffers.get(nombre)
+            if buffer is not None:
+                return buffer
+            buffer = self._buffers[nombre] = KlineBuffer(interval, self.capacity)
+        loop = self._arrancar()
+        if loop is not None:
+            loop.call_soon_threadsafe(lambda: loop.create_task(self._enviar("SUBSCRIBE", [nombre])))
+        return buffer
+
+    def read(self, asset, interval, start_time=None, limit=500):
+        """
+        Filas [time ms, OHLCV] de las últimas velas desde el buffer, o None si hay que ir a REST
+        """
+        filas = self._buffer(asset, interval).read(start_time, limit)
+        if filas is not None:
+            self._contar('served')
+        return filas
+
+    def seed(self, asset, interval, filas, start_time=None, limit=500):
+        """
+        Siembra el buffer del par con una descarga REST de get_data (end_time None)
+
+        Solo si la descarga llega hasta la vela actual: con start_time la
+        respuesta empieza en start_time y puede quedarse corta por limit
+        """
+        filas = np.asarray(filas, dtype=np.float64).reshape(-1, len(KLINE_COLUMNS))
+        if not len(filas):
+            return
+        buffer = self._buffer(asset, interval)
+        ahora = time.time() * 1000
+        if filas[-1, 0] + 2 * buffer._salto < ahora:
+            return
+        buffer.seed(filas, desde=start_time, completo=start_time is None and len(filas) < limit)
+        self._contar('seeds')
+
+    async def _enviar(self, metodo, streams):
+        ws = self._ws
+        if ws is None or not streams:
+            # Sin conexión: los streams se suscriben al conectar
+            return
+        try:
+            await ws.send(json.dumps({"method": metodo, "params": streams, "id": next(self._ids)}))
+        except Exception as e:
+            logger.warning(f"Stream de klines: error enviando {metodo}: {e}")
+
+    async def _consumir(self):
+        """
+        Conecta, suscribe los streams de los buffers y procesa mensajes; reconecta con backoff
+        """
+        from websockets.asyncio.client import connect
+
+        revision = asyncio.get_running_loop().create_task(self._revisar_inactivos())
+        espera = 1.0
+        try:
+            while not self._cerrado:
+                try:
+                    async with connect(f"{self.url}/ws", ping_interval=20, ping_timeout=20, close_timeout=5) as ws:
+                        self._ws = ws
+                        self.connected = True
+                        self._contar('connects')
+                        espera = 1.0
+                        with self._lock:
+                            streams = list(self._buffers)
+                        await self._enviar("SUBSCRIBE", streams)
+                        async for mensaje in ws:
+                            self._procesar(mensaje)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Stream de klines desconectado: {type(e).__name__}: {e}")
+                finally:
+                    self._desconectado()
+                if self._cerrado:
+                    break
+                # Full jitter para no reconectar todos a la vez
+                await asyncio.sleep(random.uniform(0, espera))
+                espera = min(_MAX_BACKOFF_SECONDS, espera * 2)
+        finally:
+            revision.cancel()
+
+    def _desconectado(self):
+        if self.connected:
+            self._contar('disconnects')
+        self._ws = None
+        self.connected = False
+        # Sin conexión pueden perderse velas: todos los buffers se vuelven a sembrar
+        with self._lock:
+            buffers = list(self._buffers.values())
+        for buffer in buffers:
+            buffer.synced = False
+
+    def _procesar(self, mensaje):
+        try:
+            datos = json.loads(mensaje)
+        except ValueError:
+            return
+        # Streams combinados (/stream?streams=) envuelven el evento en data
+        if isinstance(datos, dict) and 'data' in datos:
+            datos = datos['data']
+        if not isinstance(datos, dict) or datos.get('e') != 'kline':
+            # Respuestas a SUBSCRIBE/UNSUBSCRIBE
+            return
+        kline = datos['k']
+        with self._lock:
+            buffer = self._buffers.get(f"{kline['s'].lower()}@kline_{kline['i']}")
+            self._stats['messages'] += 1
+        if buffer is None:
+            return
+        contiguo = buffer.apply(
+            float(kline['t']), float(kline['o']), float(kline['h']), float(kline['l']), float(kline['c']), float(kline['v'])
+        )
+        if not contiguo:
+            self._contar('gaps')
+
+    async def _revisar_inactivos(self):
+        while True:
+            await asyncio.sleep(min(_IDLE_CHECK_SECONDS, self.idle_seconds))
+            ahora = time.monotonic()
+            with self._lock:
+                inactivos = [nombre for nombre, buffer in self._buffers.items() if ahora - buffer.last_read > self.idle_seconds]
+                for nombre in inactivos:
+                    del self._buffers[nombre]
+                self._stats['evicted'] += len(inactivos)
+            await self._enviar("UNSUBSCRIBE", inactivos)
+
+    def _contar(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self):
+        """
+        Conexión, contadores de mensajes y lecturas, y estado de cada buffer
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            buffers = dict(self._buffers)
+        stats['connected'] = self.connected
+        stats['buffers'] = {
+            nombre: {'candles': len(buffer), 'synced': buffer.synced, 'updates': buffer.updates}
+            for nombre, buffer in buffers.items()
+        }
+        return stats
+
+    def collect_metrics(self):
+        """
+        Métricas de /metrics del consumidor (se leen al servir /metrics)
+        """
+        stats = self.stats()
+        buffers = stats['buffers'].values()
+        return [
+            MetricFamily("bran_kline_stream_connected", "Conexión WebSocket de klines abierta", "gauge")
+                .add(int(stats['connected'])),
+            MetricFamily("bran_kline_stream_messages_total", "Mensajes kline recibidos", "counter")
+                .add(stats['messages']),
+            MetricFamily("bran_kline_stream_reads_total", "Lecturas de get_data por resultado", "counter", ("result",))
+                .add(stats['served'], "buffer")
+                .add(stats['seeds'], "rest_seed"),
+            MetricFamily("bran_kline_stream_buffers", "Buffers de velas por estado", "gauge", ("synced",))
+                .add(sum(1 for buffer in buffers if buffer['synced']), "true")
+                .add(sum(1 for buffer in buffers if not buffer['synced']), "false"),
+        ]
+
+    async def _detener(self):
+        # Cancela el consumidor y las tareas de la conexión y espera a que terminen (cierre limpio del WebSocket)
+        tareas = [tarea for tarea in asyncio.all_tasks() if tarea is not asyncio.current_task()]
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+
+    def close(self):
+        """
+        Cierra la conexión y detiene el loop del consumidor
+        """
+        with self._lock:
+            self._cerrado = True
+            loop, hilo = self._loop, self._hilo
+            self._loop = self._hilo = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._detener(), loop).result(timeout=10)
+        except Exception as e:
+            logger.warning(f"Stream de klines: cierre incompleto: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        hilo.join(timeout=5)
+        loop.close()
+
+
+_compartido = None
+_compartido_lock = threading.Lock()
+
+
+def shared_kline_stream():
+    """
+    Consumidor compartido por todos los BinanceDataFetcher (se crea en el primer uso)
+    """
+    global _compartido
+    with _compartido_lock:
+        if _compartido is None:
+            _compartido = KlineStreamConsumer()
+        return _compartido
+
+
+def _collect_metrics():
+    consumidor = _compartido
+    return consumidor.collect_metrics() if consumidor is not None else []
+
+
+registry.register_collector(_collect_metrics)
+
+
+def close_shared_kline_stream():
+    """
+    Cierra el consumidor compartido si se llegó a crear
+    """
+    global _compartido
+    with _compartido_lock:
+        consumidor, _compartido = _compartido, None
+    if consumidor is not None:
+        consumidor.close()
@@ -0,0 +1,238 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.core.fetch_scheduler import FetchError
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+from src.utils.dataExtractor.HistoryLoader import HistoryLoader
+
+logger = logging.getLogger(__name__)
+
+
+class _Entrada:
+    """
+    Serie cacheada de un (proveedor, activo, intervalo)
+    """
+    __slots__ = ('frame', 'desde', 'duracion', 'expira', 'bytes')
+
+    def __init__(self, frame, desde, duracion):
+        self.frame = frame
+        self.desde = desde
+        self.duracion = duracion
+        self.expira = None
+        self.bytes = 0
+
+
+class CandleCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, tail_ttl=30, history_workers=4, store=None):
+        """
+        Caché en memoria de velas OHLCV con expulsión LRU
+
+        Las velas cerradas nunca se vuelven a pedir: cuando la entrada expira
+        solo se descarga desde la última vela (la vela abierta) en adelante.
+        La entrada expira al cierre de la vela abierta o, como máximo, pasados
+        tail_ttl segundos (para refrescar el precio de la vela abierta).
+
+        Parameters:
+        - max_bytes: memoria máxima ocupada por los DataFrames cacheados
+        - tail_ttl: segundos máximos que se sirve la vela abierta sin refrescar
+        - history_workers: ventanas en paralelo al descargar rangos largos (HistoryLoader)
+        - store: CandleStore opcional; las velas cerradas se leen y guardan en disco
+          (salvo las de los fetchers con use_store = False, como la grabación y la reproducción)
+        """
+        self.max_bytes = max_bytes
+        self.history_workers = history_workers
+        self.store = store
+        self.tail_ttl = pd.Timedelta(seconds=tail_ttl)
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'tail_refreshes': 0,
+            'bypass': 0,
+            'evictions': 0,
+        }
+
+    def get_data(self, fetcher, start_time=None, end_time=None, limit=500):
+        """
+        Mismo contrato que fetcher.get_data pero sirviendo desde la caché
+
+        Parameters:
+        - fetcher: YahooFinanceDataFetcher (o cualquier fetcher con asset, interval y get_data)
+        - start_time: Tiempo de inicio opcional en milisegundos
+        - end_time: Tiempo de fin opcional en milisegundos (las consultas con
+          end_time no se cachean)
+        - limit: Número de velas a recuperar
+
+        Returns:
+        - DataFrame con datos OHLCV (copia, con índice desde 0)
+
+        Raises:
+        - FetchError si falla la descarga (si solo falla el refresco de la vela
+          abierta se sirve lo cacheado)
+        """
+        if end_time:
+            self._contar('bypass')
+            return fetcher.get_data(start_time=start_time, end_time=end_time, limit=limit)
+
+        clave = self._clave(fetcher)
+        ahora = pd.Timestamp.now(tz='UTC')
+        desde = self._desde(fetcher, start_time, limit)
+
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+
+        if entrada is None or entrada.desde > desde:
+            self._contar('misses')
+            # Rangos mayores que lo que admite una petición se descargan por ventanas en paralelo
+            frame = self._loader(fetcher).get_history(self._to_ms(desde))
+            if frame.empty:
+                return frame
+            entrada = _Entrada(frame.reset_index(drop=True), desde, self._duracion(fetcher))
+            self._guardar(clave, entrada, ahora)
+        elif ahora >= entrada.expira:
+            # Solo se pide desde la vela abierta: las cerradas ya están en caché
+            ultima = entrada.frame['time'].iloc[-1]
+            try:
+                cola = self._loader(fetcher).get_history(self._to_ms(ultima))
+            except FetchError as e:
+                # Se sirve lo cacheado sin renovar la expiración: la siguiente petición reintenta
+                logger.warning(f"No se pudo refrescar {fetcher.asset} {fetcher.interval}: {e}")
+                return self._recortar(entrada, desde, limit)
+            self._contar('tail_refreshes')
+            if not cola.empty:
+                cerradas = entrada.frame[entrada.frame['time'] < cola['time'].iloc[0]]
+                frame = pd.concat([cerradas, cola], ignore_index=True)
+                entrada = _Entrada(frame, entrada.desde, entrada.duracion)
+            self._guardar(clave, entrada, ahora)
+        else:
+            self._contar('hits')
+
+        return self._recortar(entrada, desde, limit)
+
+    @staticmethod
+    def _recortar(entrada, desde, limit):
+        """
+        Últimas `limit` velas de la entrada desde `desde` (copia, con índice desde 0)
+        """
+        frame = entrada.frame
+        frame = frame[frame['time'] >= desde]
+        if len(frame) > limit:
+            frame = frame.tail(limit)
+        return frame.reset_index(drop=True).copy()
+
+    def is_cold(self, fetcher, start_time=None, limit=500):
+        """
+        Indica si get_data tendría que descargar toda la serie (ni en memoria ni en disco)
+
+        Parameters:
+        - fetcher, start_time, limit: mismos argumentos que get_data
+
+        Returns:
+        - True si la serie no está en la caché ni en el almacén desde el inicio pedido
+        """
+        desde = self._desde(fetcher, start_time, limit)
+        with self._lock:
+            entrada = self._entradas.get(self._clave(fetcher))
+        if entrada is not None and entrada.desde <= desde:
+            return False
+        store = self._store(fetcher)
+        if store is None:
+            return True
+        cobertura = store.coverage(type(fetcher).__name__, fetcher.asset, fetcher.interval)
+        return cobertura is None or cobertura[0] > self._to_ms(desde)
+
+    def put(self, fetcher, frame, start_time=None, limit=500):
+        """
+        Inserta una serie descargada fuera de la caché (por ejemplo en una
+        descarga multi-ticker) y guarda sus velas cerradas en el almacén
+
+        Parameters:
+        - fetcher: fetcher de la serie
+        - frame: DataFrame con datos OHLCV desde el inicio pedido hasta ahora
+        - start_time, limit: mismos argumentos que get_data
+        """
+        if frame.empty:
+            return
+        desde = self._desde(fetcher, start_time, limit)
+        self._loader(fetcher).save(frame, self._to_ms(desde))
+        entrada = _Entrada(frame.reset_index(drop=True), desde, self._duracion(fetcher))
+        self._guardar(self._clave(fetcher), entrada, pd.Timestamp.now(tz='UTC'))
+
+    @staticmethod
+    def _clave(fetcher):
+        return (type(fetcher).__name__, fetcher.asset, fetcher.interval)
+
+    @staticmethod
+    def _desde(fetcher, start_time, limit):
+        if start_time:
+            return pd.to_datetime(start_time, unit='ms', utc=True)
+        return pd.Timestamp(fetcher._calculate_start_date(limit))
+
+    def _store(self, fetcher):
+        # Grabar y reproducir necesitan que cada descarga llegue al fetcher, no al disco
+        return self.store if getattr(fetcher, 'use_store', True) else None
+
+    def _loader(self, fetcher):
+        return HistoryLoader(fetcher, self.history_workers, self._store(fetcher))
+
+    def _duracion(self, fetcher):
+        try:
+            return interval_to_timedelta(fetcher.interval)
+        except ValueError:
+            if not hasattr(fetcher, '_map_interval'):
+                raise
+            # Intervalo desconocido: el proveedor sirve el intervalo al que lo mapea
+            return interval_to_timedelta(fetcher._map_interval(fetcher.interval))
+
+    def _guardar(self, clave, entrada, ahora):
+        """
+        Inserta o reemplaza la entrada, recalcula su expiración y aplica el LRU
+        """
+        cierre = entrada.frame['time'].iloc[-1] + entrada.duracion
+        entrada.expira = min(cierre, ahora + self.tail_ttl) if cierre > ahora else ahora + self.tail_ttl
+        entrada.bytes = int(entrada.frame.memory_usage(index=True).sum())
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= anterior.bytes
+            self._entradas[clave] = entrada
+            self._bytes += entrada.bytes
+            while self._bytes > self.max_bytes and len(self._entradas) > 1:
+                _, expulsada = self._entradas.popitem(last=False)
+                self._bytes -= expulsada.bytes
+                self._stats['evictions'] += 1
+
+    def _contar(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    @staticmethod
+    def _to_ms(timestamp):
+        return int(pd.Timestamp(timestamp).timestamp() * 1000)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Contadores de uso de la caché
+
+        Returns:
+        - Diccionario con hits, misses, refrescos de cola, expulsiones y memoria usada
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entradas)
+            stats['bytes'] = self._bytes
+        consultas = stats['hits'] + stats['misses'] + stats['tail_refreshes']
+        stats['hit_ratio'] = stats['hits'] / consultas if consultas else 0.0
+        return stats
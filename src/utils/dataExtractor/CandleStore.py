@@ -0,0 +1,230 @@
+import json
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+# Columnas guardadas: time en milisegundos epoch (int64) y el resto en float64
+COLUMNS = ['time', 'open', 'high', 'low', 'close', 'volume', 'buy_volume', 'sell_volume', 'volume_delta']
+_DTYPES = {columna: np.float64 for columna in COLUMNS}
+_DTYPES['time'] = np.int64
+
+
+def path_segment(texto):
+    """
+    Nombre de directorio o fichero reversible para un símbolo o intervalo
+
+    Codifica como en una URL todo lo que no es alfanumérico (la / de BTC/USDT
+    pasa a %2F y no coincide con BTC_USDT) y los puntos de "." y "..", de
+    modo que nunca sale del directorio padre. Las mayúsculas también se
+    codifican (1M -> 1%4D, distinto de 1m): en sistemas de ficheros que no
+    distinguen mayúsculas dos series nunca comparten directorio
+    """
+    segmento = ''.join(f"%{ord(c):02X}" if 'A' <= c <= 'Z' else quote(c, safe='') for c in str(texto))
+    if segmento in ('', '.', '..'):
+        segmento = segmento.replace('.', '%2E') or '%00'
+    return segmento
+
+
+class CandleStore:
+    def __init__(self, root):
+        """
+        Almacén local de velas cerradas en disco, en formato columnar
+
+        Cada serie vive en root/<proveedor>/<activo>/<intervalo>/ con un fichero
+        binario por columna (<columna>.bin, sin cabecera) que se lee con np.memmap,
+        de forma que una lectura por rango solo toca las páginas del rango pedido.
+        Las velas nuevas se añaden al final de los ficheros (append-only); solo
+        cuando se descarga historia anterior al inicio guardado se reescribe la
+        serie: todas las columnas se escriben como una generación nueva
+        (<columna>.<generación>.bin) y el cambio a esa generación se hace al
+        reemplazar meta.json, de forma que una escritura interrumpida deja la
+        serie anterior intacta (nunca columnas de generaciones distintas).
+
+        meta.json guarda el rango cubierto [desde, hasta) en milisegundos y la
+        generación de los ficheros: los huecos sin velas dentro de ese rango
+        (fines de semana, festivos) ya se consultaron y no se vuelven a pedir
+        al proveedor.
+
+        Parameters:
+        - root: directorio raíz del almacén
+        """
+        self.root = Path(root)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def read(self, provider, asset, interval, start_time=None, end_time=None):
+        """
+        Lee las velas guardadas con start_time <= time < end_time
+
+        Parameters:
+        - provider, asset, interval: serie a leer
+        - start_time: Tiempo de inicio opcional en milisegundos
+        - end_time: Tiempo de fin opcional en milisegundos
+
+        Returns:
+        - DataFrame con datos OHLCV (time UTC) o vacío si no hay velas
+        """
+        directorio = self._directorio(provider, asset, interval)
+        with self._lock(directorio):
+            columnas = self._abrir(directorio, self._leer_meta(directorio))
+            if columnas is None:
+                return pd.DataFrame()
+            tiempos = columnas['time']
+            desde = 0 if start_time is None else int(np.searchsorted(tiempos, start_time, side='left'))
+            hasta = len(tiempos) if end_time is None else int(np.searchsorted(tiempos, end_time, side='left'))
+            # Copia del tramo: el DataFrame no depende de los ficheros mapeados
+            datos = {columna: np.array(valores[desde:hasta]) for columna, valores in columnas.items()}
+        df = pd.DataFrame(datos, columns=COLUMNS)
+        df['time'] = pd.to_datetime(df['time'], unit='ms', utc=True)
+        return df
+
+    def coverage(self, provider, asset, interval):
+        """
+        Rango consultado al proveedor y guardado
+
+        Returns:
+        - (desde, hasta) en milisegundos o None si la serie no existe
+        """
+        directorio = self._directorio(provider, asset, interval)
+        with self._lock(directorio):
+            meta = self._leer_meta(directorio)
+        if meta is None:
+            return None
+        return meta['desde'], meta['hasta']
+
+    def append(self, provider, asset, interval, df, desde, hasta):
+        """
+        Guarda velas cerradas y amplía el rango cubierto a [desde, hasta)
+
+        Las velas posteriores a la última guardada se añaden al final; las
+        anteriores a la primera guardada provocan una reescritura de la serie.
+        Las velas que ya estaban guardadas se ignoran.
+
+        Parameters:
+        - provider, asset, interval: serie a escribir
+        - df: DataFrame con time (datetime) y columnas OHLCV, solo velas cerradas
+        - desde: inicio en milisegundos del rango consultado que cubre df
+        - hasta: fin (exclusivo) en milisegundos del rango consultado que cubre df
+        """
+        directorio = self._directorio(provider, asset, interval)
+        nuevas = self._to_columns(df)
+        with self._lock(directorio):
+            directorio.mkdir(parents=True, exist_ok=True)
+            meta = self._leer_meta(directorio)
+            generacion = meta.get('generacion', 0) if meta is not None else 0
+            columnas = self._abrir(directorio, meta)
+            tiempos = columnas['time'] if columnas is not None else np.empty(0, dtype=np.int64)
+
+            if len(tiempos):
+                antes = nuevas['time'] < tiempos[0]
+                despues = nuevas['time'] > tiempos[-1]
+            else:
+                antes = np.zeros(len(nuevas['time']), dtype=bool)
+                despues = np.ones(len(nuevas['time']), dtype=bool)
+
+            if antes.any():
+                combinadas = {
+                    columna: np.concatenate([nuevas[columna][antes], columnas[columna], nuevas[columna][despues]])
+                    for columna in COLUMNS
+                }
+                generacion = self._reescribir(directorio, combinadas, generacion)
+            elif despues.any():
+                for columna in COLUMNS:
+                    ruta = self._fichero(directorio, columna, generacion)
+                    if ruta.exists():
+                        # Descarta restos de una escritura interrumpida antes de añadir
+                        os.truncate(ruta, len(tiempos) * np.dtype(_DTYPES[columna]).itemsize)
+                    with open(ruta, 'ab') as fichero:
+                        fichero.write(np.ascontiguousarray(nuevas[columna][despues]).tobytes())
+
+            if meta is not None:
+                desde, hasta = min(desde, meta['desde']), max(hasta, meta['hasta'])
+            # Al escribir meta.json se pasa a la generación nueva (si se reescribió)
+            self._escribir_meta(directorio, {'desde': int(desde), 'hasta': int(hasta), 'generacion': generacion})
+            self._borrar_otras_generaciones(directorio, generacion)
+
+    @staticmethod
+    def _fichero(directorio, columna, generacion):
+        # La generación 0 conserva los nombres de los almacenes anteriores
+        return directorio / (f"{columna}.bin" if generacion == 0 else f"{columna}.{generacion}.bin")
+
+    def _abrir(self, directorio, meta):
+        """
+        Mapea en memoria los ficheros de columnas de la generación de meta (None si la serie no existe)
+        """
+        generacion = meta.get('generacion', 0) if meta is not None else 0
+        rutas = {columna: self._fichero(directorio, columna, generacion) for columna in COLUMNS}
+        if not rutas['time'].exists():
+            return None
+        # Tras un append interrumpido algunas columnas pueden ser más largas:
+        # solo se leen las filas completas en todas las columnas
+        filas = min(ruta.stat().st_size // np.dtype(_DTYPES[columna]).itemsize for columna, ruta in rutas.items())
+        if filas == 0:
+            return {columna: np.empty(0, dtype=_DTYPES[columna]) for columna in COLUMNS}
+        return {
+            columna: np.memmap(ruta, dtype=_DTYPES[columna], mode='r', shape=(filas,))
+            for columna, ruta in rutas.items()
+        }
+
+    def _reescribir(self, directorio, columnas, generacion):
+        """
+        Escribe todas las columnas como la generación siguiente
+
+        Returns:
+        - La generación nueva (activa cuando se escriba meta.json)
+        """
+        nueva = generacion + 1
+        for columna in COLUMNS:
+            with open(self._fichero(directorio, columna, nueva), 'wb') as fichero:
+                fichero.write(np.ascontiguousarray(columnas[columna]).tobytes())
+                fichero.flush()
+                os.fsync(fichero.fileno())
+        return nueva
+
+    def _borrar_otras_generaciones(self, directorio, generacion):
+        # Ficheros de generaciones anteriores o de una reescritura interrumpida
+        actuales = {self._fichero(directorio, columna, generacion).name for columna in COLUMNS}
+        for ruta in directorio.glob('*.bin'):
+            if ruta.name not in actuales:
+                try:
+                    ruta.unlink()
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _to_columns(df):
+        if df.empty:
+            return {columna: np.empty(0, dtype=_DTYPES[columna]) for columna in COLUMNS}
+        tiempos = df['time']
+        if tiempos.dt.tz is None:
+            tiempos = tiempos.dt.tz_localize('UTC')
+        columnas = {'time': tiempos.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('datetime64[ms]').astype(np.int64)}
+        for columna in COLUMNS[1:]:
+            columnas[columna] = df[columna].to_numpy(dtype=float) if columna in df else np.full(len(df), np.nan)
+        return columnas
+
+    @staticmethod
+    def _leer_meta(directorio):
+        try:
+            with open(directorio / 'meta.json') as fichero:
+                return json.load(fichero)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _escribir_meta(directorio, meta):
+        temporal = directorio / 'meta.json.tmp'
+        with open(temporal, 'w') as fichero:
+            json.dump(meta, fichero)
+        os.replace(temporal, directorio / 'meta.json')
+
+    def _directorio(self, provider, asset, interval):
+        return self.root.joinpath(*(path_segment(parte) for parte in (provider, asset, interval)))
+
+    def _lock(self, directorio):
+        with self._locks_lock:
+            return self._locks.setdefault(directorio, threading.Lock())
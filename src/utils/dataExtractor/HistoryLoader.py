@@ -0,0 +1,280 @@
+import contextvars
+import copy
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+from src.core.fetch_scheduler import FetchError
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+from src.utils.dataExtractor.resampling import RESAMPLED_INTERVALS, resample_ohlcv
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryLoader:
+    def __init__(self, fetcher, max_workers=4, store=None):
+        """
+        Descarga historiales largos partiendo el rango en ventanas del tamaño
+        que admite el proveedor y pidiéndolas en paralelo
+
+        Con un CandleStore se leen del disco las velas ya guardadas y solo se
+        descargan los huecos (antes del inicio guardado y desde la última vela
+        cerrada); las velas cerradas descargadas se añaden al almacén.
+
+        Parameters:
+        - fetcher: YahooFinanceDataFetcher o BinanceDataFetcher (debe tener history_limits())
+        - max_workers: número máximo de ventanas descargándose a la vez
+        - store: CandleStore opcional
+        """
+        self.fetcher = fetcher
+        self.max_workers = max_workers
+        self.store = store
+
+    def get_history(self, start_time, end_time=None):
+        """
+        Obtiene todas las velas entre start_time y end_time
+
+        Parameters:
+        - start_time: Tiempo de inicio en milisegundos
+        - end_time: Tiempo de fin opcional en milisegundos (por defecto ahora)
+
+        Returns:
+        - DataFrame con datos OHLCV sin duplicados en time, ordenado y con índice desde 0
+
+        Raises:
+        - FetchError si falla la descarga de alguna ventana
+        """
+        fetcher = self.fetcher
+        interval = fetcher.interval
+        # Los intervalos reagrupados se descargan en el intervalo base y se agregan al final,
+        # para que los cortes entre ventanas no partan velas
+        reagrupar = hasattr(fetcher, '_map_interval') and interval in RESAMPLED_INTERVALS
+        if reagrupar:
+            fetcher = copy.copy(fetcher)
+            fetcher.interval = RESAMPLED_INTERVALS[interval]
+
+        ahora = pd.Timestamp(datetime.now(pytz.UTC))
+        inicio = pd.to_datetime(start_time, unit='ms', utc=True)
+        fin = pd.to_datetime(end_time, unit='ms', utc=True) if end_time else ahora
+        if inicio >= fin:
+            return pd.DataFrame()
+
+        if self.store is None:
+            ventanas = self._descargar(fetcher, [(inicio, fin)], ahora)[0]
+            self._comprobar(ventanas)
+            partes = [parte for _, _, parte in ventanas]
+        else:
+            partes = self._descargar_con_store(fetcher, inicio, fin, ahora)
+
+        partes = [parte for parte in partes if not parte.empty]
+        if not partes:
+            return pd.DataFrame()
+        df = pd.concat(partes, ignore_index=True)
+        if df['time'].dt.tz is None:
+            df['time'] = df['time'].dt.tz_localize('UTC')
+        # keep='last': lo recién descargado prevalece sobre lo guardado
+        df = df.drop_duplicates(subset='time', keep='last').sort_values('time')
+        df = df[(df['time'] >= inicio) & (df['time'] < fin)].reset_index(drop=True)
+        if reagrupar:
+            df = resample_ohlcv(df, interval)
+        return df
+
+    def _descargar_con_store(self, fetcher, inicio, fin, ahora):
+        """
+        Lee del almacén lo guardado, descarga los huecos y guarda las velas cerradas
+
+        Returns:
+        - Lista de DataFrames (guardado primero, descargas después)
+
+        Raises:
+        - FetchError si falla la descarga de alguna ventana (lo descargado
+          antes de la ventana fallida se guarda igualmente)
+        """
+        serie = (type(fetcher).__name__, fetcher.asset, fetcher.interval)
+        cobertura = self.store.coverage(*serie)
+        if cobertura is None:
+            # (desde, hasta, extremo contiguo a lo guardado: 'inicio', 'fin' o None)
+            huecos = [(inicio, fin, None)]
+        else:
+            # Los huecos se amplían hasta el rango guardado para que la cobertura siga siendo contigua
+            desde, hasta = (pd.to_datetime(t, unit='ms', utc=True) for t in cobertura)
+            huecos = []
+            # La cobertura empieza en la primera vela guardada: un tramo anterior
+            # más corto que una vela no puede contener ninguna
+            if inicio <= desde - interval_to_timedelta(fetcher.interval):
+                huecos.append((inicio, desde, 'fin'))
+            if fin > hasta:
+                huecos.append((hasta, fin, 'inicio'))
+
+        descargas = self._descargar(fetcher, [hueco[:2] for hueco in huecos], ahora) if huecos else []
+        for (_, _, contiguo), ventanas in zip(huecos, descargas):
+            self._guardar_ventanas(fetcher, ventanas, contiguo, ahora)
+        for ventanas in descargas:
+            self._comprobar(ventanas)
+
+        partes = [parte for ventanas in descargas for _, _, parte in ventanas]
+        return [self.store.read(*serie, self._to_ms(inicio), self._to_ms(fin))] + partes
+
+    def save(self, df, start_time, end_time=None):
+        """
+        Guarda en el almacén las velas cerradas de una descarga hecha fuera del
+        loader (por ejemplo una descarga multi-ticker)
+
+        Solo se marca como cubierto el rango entre la primera vela y el cierre
+        de la última vela cerrada de df
+
+        Parameters:
+        - df: DataFrame con datos OHLCV descargados para [start_time, end_time)
+        - start_time: Tiempo de inicio en milisegundos de la descarga; debe ser
+          contiguo al rango ya guardado (o la serie no debe existir)
+        - end_time: Tiempo de fin opcional en milisegundos (por defecto ahora)
+        """
+        if self.store is None:
+            return
+        ahora = pd.Timestamp(datetime.now(pytz.UTC))
+        fin = pd.to_datetime(end_time, unit='ms', utc=True) if end_time else ahora
+        self._guardar(self.fetcher, df, pd.to_datetime(start_time, unit='ms', utc=True), fin, ahora)
+
+    def _guardar_ventanas(self, fetcher, ventanas, contiguo, ahora):
+        """
+        Guarda las ventanas descargadas de un hueco sin cubrir nunca una ventana fallida o vacía
+
+        Se toman las ventanas con velas consecutivas desde el extremo contiguo
+        a lo guardado (desde el final si la serie no existe) hasta la primera
+        fallida o vacía: así la cobertura sigue siendo contigua y lo no
+        descargado se vuelve a pedir en la siguiente carga
+
+        Parameters:
+        - ventanas: lista de (desde, hasta, DataFrame o FetchError) del hueco, en orden
+        - contiguo: 'inicio' o 'fin' si ese extremo del hueco toca el rango guardado, None si no hay nada guardado
+        """
+        orden = ventanas if contiguo == 'inicio' else ventanas[::-1]
+        validas = []
+        for ventana in orden:
+            if isinstance(ventana[2], FetchError) or ventana[2].empty:
+                break
+            validas.append(ventana)
+        if not validas:
+            return
+        if contiguo != 'inicio':
+            validas.reverse()
+        parte = pd.concat([ventana[2] for ventana in validas], ignore_index=True)
+        desde, hasta = validas[0][0], validas[-1][1]
+        self._guardar(
+            fetcher, parte, desde, hasta, ahora,
+            ajustar_desde=contiguo != 'inicio', ajustar_hasta=contiguo != 'fin'
+        )
+
+    def _guardar(self, fetcher, parte, desde, hasta, ahora, ajustar_desde=True, ajustar_hasta=True):
+        """
+        Añade al almacén las velas cerradas de parte, descargada para [desde, hasta)
+
+        Con ajustar_desde / ajustar_hasta el rango cubierto se recorta a la
+        primera vela y al cierre de la última vela cerrada: un tramo sin velas
+        en un extremo no se da por cubierto (puede ser una respuesta incompleta)
+        """
+        if parte.empty:
+            return
+        desde = max(desde, self._inicio_disponible(fetcher, ahora, hasta))
+        duracion = interval_to_timedelta(fetcher.interval)
+        tiempos = parte['time'] if parte['time'].dt.tz is not None else parte['time'].dt.tz_localize('UTC')
+        cerradas = (tiempos + duracion <= ahora).to_numpy()
+        if ajustar_desde:
+            desde = max(desde, tiempos.min())
+        if ajustar_hasta or hasta + duracion > ahora:
+            # Solo queda cubierto hasta el cierre de la última vela cerrada
+            if not cerradas.any():
+                return
+            hasta = min(hasta, tiempos[cerradas].max() + duracion)
+        if desde >= hasta:
+            return
+        serie = (type(fetcher).__name__, fetcher.asset, fetcher.interval)
+        self.store.append(*serie, parte[cerradas], self._to_ms(desde), self._to_ms(hasta))
+
+    def _descargar(self, fetcher, rangos, ahora):
+        """
+        Descarga cada rango por ventanas en paralelo
+
+        Una ventana fallida no detiene el resto: queda con su FetchError y el
+        llamante decide (ver _comprobar)
+
+        Returns:
+        - Lista con, por rango, la lista de sus ventanas (desde, hasta, DataFrame
+          o FetchError si la descarga falló); DataFrame vacío si el proveedor no tiene datos
+        """
+        ventana, _ = fetcher.history_limits()
+        limite = math.ceil(ventana / interval_to_timedelta(fetcher.interval)) + 1
+
+        ventanas = []
+        for numero, (desde, hasta) in enumerate(rangos):
+            disponible = self._inicio_disponible(fetcher, ahora, hasta)
+            if desde < disponible:
+                logger.warning(
+                    f"{fetcher.asset} {fetcher.interval}: el proveedor solo sirve historia desde "
+                    f"{disponible}, no se descarga desde {desde}"
+                )
+                desde = disponible
+            ventanas.extend((numero, rango) for rango in self.split_range(desde, hasta, ventana))
+
+        def descargar(ventana_rango):
+            desde, hasta = ventana_rango[1]
+            try:
+                return fetcher.get_data(start_time=self._to_ms(desde), end_time=self._to_ms(hasta), limit=limite)
+            except FetchError as e:
+                return e
+
+        if len(ventanas) <= 1:
+            resultados = [descargar(v) for v in ventanas]
+        else:
+            # Cada ventana corre en una copia del contexto: conserva la prioridad de descarga (fetch_priority)
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ventanas))) as pool:
+                futuros = [pool.submit(contextvars.copy_context().run, descargar, v) for v in ventanas]
+                resultados = [futuro.result() for futuro in futuros]
+
+        return [
+            [(desde, hasta, r) for (n, (desde, hasta)), r in zip(ventanas, resultados) if n == numero]
+            for numero in range(len(rangos))
+        ]
+
+    @staticmethod
+    def _comprobar(ventanas):
+        """
+        Lanza el error de la primera ventana fallida: una historia con huecos no se sirve
+        """
+        for _, _, parte in ventanas:
+            if isinstance(parte, FetchError):
+                raise parte
+
+    @staticmethod
+    def _inicio_disponible(fetcher, ahora, hasta):
+        """
+        Primer instante que el proveedor puede servir (límite de antigüedad)
+        """
+        _, antiguedad = fetcher.history_limits()
+        if antiguedad is None:
+            return pd.Timestamp.min.tz_localize('UTC')
+        return min(ahora - antiguedad, hasta)
+
+    @staticmethod
+    def split_range(inicio, fin, ventana):
+        """
+        Parte [inicio, fin) en ventanas consecutivas de como máximo `ventana`
+
+        Returns:
+        - Lista de tuplas (desde, hasta)
+        """
+        ventanas = []
+        desde = inicio
+        while desde < fin:
+            hasta = min(desde + ventana, fin)
+            ventanas.append((desde, hasta))
+            desde = hasta
+        return ventanas
+
+    @staticmethod
+    def _to_ms(timestamp):
+        return int(pd.Timestamp(timestamp).timestamp() * 1000)
@@ -0,0 +1,308 @@
+"""
+Grabación y reproducción de las respuestas de los proveedores de velas
+
+- Grabación: recording_fetcher(clase) envuelve un fetcher (YahooFinanceDataFetcher,
+  YahooChartDataFetcher...) y guarda cada respuesta de get_data y get_data_multi,
+  con la petición y su latencia, en un ResponseLog.
+- Reproducción: ReplayDataFetcher sirve esas respuestas sin red, esperando la
+  latencia grabada dividida por speed más una latencia fija.
+
+Una petición idéntica a una grabada (start_time, end_time, limit) recibe las
+respuestas grabadas en el mismo orden (la última se repite), incluidas las
+vacías; cualquier otra se sirve recortando la unión de todas las velas grabadas
+de la serie. Así una ejecución con los mismos parámetros es determinista y
+reproduce también las respuestas lentas o anómalas.
+
+Ninguno de los dos usa el CandleStore (use_store = False): la grabación debe
+ver cada descarga completa y la reproducción no puede depender de lo que haya
+en disco de ejecuciones anteriores.
+
+Formato: un fichero por serie, <raíz>/<activo>/<intervalo>.rec, con un registro
+MessagePack por respuesta (se añaden al final). Las columnas van como arrays
+binarios (time en ms int64, el resto float64) comprimidos con zlib.
+"""
+import functools
+import logging
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import msgpack
+import numpy as np
+import pandas as pd
+
+from src.core.config import DATA_RECORD_DIR, DATA_REPLAY_SPEED, DATA_REPLAY_LATENCY_SECONDS
+from src.core.metrics import stage
+from src.utils.dataExtractor.CandleStore import COLUMNS, path_segment
+from src.utils.dataExtractor.YahooFinanceDataFetcher import YahooFinanceDataFetcher
+
+logger = logging.getLogger(__name__)
+
+
+def _empaquetar(df):
+    """
+    Columnas del DataFrame como bytes comprimidos (time en ms y el resto en float64)
+    """
+    if df is None or df.empty:
+        return b""
+    tiempos = df['time']
+    if tiempos.dt.tz is None:
+        tiempos = tiempos.dt.tz_localize('UTC')
+    partes = [tiempos.dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('datetime64[ms]').astype(np.int64).tobytes()]
+    for columna in COLUMNS[1:]:
+        valores = df[columna].to_numpy(dtype=np.float64) if columna in df else np.full(len(df), np.nan)
+        partes.append(valores.tobytes())
+    return zlib.compress(b"".join(partes), 1)
+
+
+def _desempaquetar(datos, filas):
+    if not filas:
+        return pd.DataFrame()
+    buffer = zlib.decompress(datos)
+    tiempos = np.frombuffer(buffer, dtype=np.int64, count=filas)
+    valores = np.frombuffer(buffer, dtype=np.float64, offset=8 * filas).reshape(len(COLUMNS) - 1, filas)
+    df = pd.DataFrame(dict(zip(COLUMNS[1:], valores)), columns=COLUMNS[1:])
+    df.insert(0, 'time', pd.to_datetime(tiempos, unit='ms', utc=True))
+    return df
+
+
+class _Grabacion:
+    """
+    Respuestas grabadas de una serie y el cursor de reproducción de cada petición
+    """
+
+    def __init__(self, entradas):
+        self.entradas = entradas
+        self.por_peticion = {}
+        for indice, entrada in enumerate(entradas):
+            self.por_peticion.setdefault(entrada['peticion'], []).append(indice)
+        self.cursores = {}
+        self._union = None
+        latencias = [entrada['latencia'] for entrada in entradas]
+        self.latencia = float(np.median(latencias)) if latencias else 0.0
+
+    def siguiente(self, peticion):
+        indices = self.por_peticion.get(peticion)
+        if not indices:
+            return None
+        cursor = self.cursores.get(peticion, 0)
+        self.cursores[peticion] = min(cursor + 1, len(indices) - 1)
+        return self.entradas[indices[cursor]]
+
+    def union(self):
+        """
+        Todas las velas grabadas de la serie (la última respuesta gana en cada vela)
+        """
+        if self._union is None:
+            frames = [entrada['frame'] for entrada in self.entradas if not entrada['frame'].empty]
+            if frames:
+                union = pd.concat(frames, ignore_index=True)
+                union = union.drop_duplicates('time', keep='last').sort_values('time', ignore_index=True)
+            else:
+                union = pd.DataFrame()
+            self._union = union
+        return self._union
+
+
+class ResponseLog:
+    def __init__(self, root):
+        """
+        Respuestas grabadas en disco, un fichero por (activo, intervalo)
+
+        Parameters:
+        - root: directorio de la grabación
+        """
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._grabaciones = {}
+
+    def append(self, asset, interval, peticion, df, latencia):
+        """
+        Añade una respuesta al fichero de la serie
+
+        Parameters:
+        - peticion: (start_time, end_time, limit) de la llamada
+        - df: DataFrame devuelto (vacío si el proveedor no devolvió datos)
+        - latencia: segundos que tardó la respuesta
+        """
+        registro = msgpack.packb({
+            "at": time.time(),
+            "request": list(peticion),
+            "latency": latencia,
+            "rows": 0 if df is None else len(df),
+            "data": _empaquetar(df),
+        }, use_bin_type=True)
+        ruta = self._ruta(asset, interval)
+        with self._lock:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            with open(ruta, 'ab') as fichero:
+                fichero.write(registro)
+            # La grabación en memoria (si se estaba reproduciendo) ya no está completa
+            self._grabaciones.pop(ruta, None)
+
+    def entries(self, asset, interval):
+        """
+        Respuestas grabadas de la serie en orden: dicts con peticion, latencia y frame
+        """
+        return self._grabacion(asset, interval).entradas
+
+    def replay(self, asset, interval, peticion):
+        """
+        Respuesta a reproducir para una petición
+
+        Returns:
+        - (DataFrame, latencia grabada en segundos); DataFrame vacío si la serie no se grabó
+        """
+        with self._lock:
+            grabacion = self._grabacion_locked(asset, interval)
+            entrada = grabacion.siguiente(peticion)
+            if entrada is not None:
+                return entrada['frame'].copy(), entrada['latencia']
+            union = grabacion.union()
+            latencia = grabacion.latencia
+        return self._recortar(union, *peticion), latencia
+
+    def rewind(self):
+        """
+        Vuelve a reproducir cada petición desde su primera respuesta grabada
+        """
+        with self._lock:
+            for grabacion in self._grabaciones.values():
+                grabacion.cursores.clear()
+
+    @staticmethod
+    def _recortar(union, start_time, end_time, limit):
+        # Mismo criterio que get_data: velas en [start_time, end_time) y las últimas limit
+        if union.empty:
+            return pd.DataFrame()
+        tiempos = union['time']
+        desde = 0 if start_time is None else int(tiempos.searchsorted(pd.Timestamp(start_time, unit='ms', tz='UTC')))
+        hasta = len(union) if end_time is None else int(tiempos.searchsorted(pd.Timestamp(end_time, unit='ms', tz='UTC')))
+        return union.iloc[max(desde, hasta - limit):hasta].reset_index(drop=True)
+
+    def _grabacion(self, asset, interval):
+        with self._lock:
+            return self._grabacion_locked(asset, interval)
+
+    def _grabacion_locked(self, asset, interval):
+        ruta = self._ruta(asset, interval)
+        grabacion = self._grabaciones.get(ruta)
+        if grabacion is None:
+            grabacion = self._grabaciones[ruta] = _Grabacion(self._leer(ruta))
+        return grabacion
+
+    @staticmethod
+    def _leer(ruta):
+        if not ruta.exists():
+            return []
+        entradas = []
+        with open(ruta, 'rb') as fichero:
+            for registro in msgpack.Unpacker(fichero, raw=False):
+                peticion = registro["request"]
+                entradas.append({
+                    'peticion': (peticion[0], peticion[1], peticion[2]),
+                    'latencia': registro["latency"],
+                    'frame': _desempaquetar(registro["data"], registro["rows"]),
+                })
+        return entradas
+
+    def _ruta(self, asset, interval):
+        # Mismo nombre reversible que el CandleStore: sin separadores ni segmentos . / ..
+        return self.root / path_segment(asset) / f"{path_segment(interval)}.rec"
+
+
+# Grabación por defecto (DATA_RECORD_DIR), compartida por la grabación y la reproducción
+response_log = ResponseLog(DATA_RECORD_DIR)
+
+
+class _RecordingMixin:
+    """
+    Graba cada respuesta de get_data y get_data_multi del fetcher al que envuelve
+    """
+    log = response_log
+    use_store = False
+
+    def get_data(self, start_time=None, end_time=None, limit=500):
+        inicio = time.perf_counter()
+        df = super().get_data(start_time, end_time, limit)
+        self._grabar((start_time, end_time, limit), df, time.perf_counter() - inicio)
+        return df
+
+    @classmethod
+    def get_data_multi(cls, assets, interval="1h", start_time=None, end_time=None, limit=500):
+        inicio = time.perf_counter()
+        frames = super().get_data_multi(assets, interval, start_time, end_time, limit)
+        # Una sola descarga: cada serie graba la latencia de la petición conjunta
+        latencia = time.perf_counter() - inicio
+        for asset, frame in frames.items():
+            cls(asset=asset, interval=interval)._grabar((start_time, end_time, limit), frame, latencia)
+        return frames
+
+    def _grabar(self, peticion, df, latencia):
+        try:
+            self.log.append(self.asset, self.interval, peticion, df, latencia)
+        except Exception as e:
+            # Un fallo al grabar no debe romper la respuesta
+            logger.warning(f"No se pudo grabar la respuesta de {self.asset} {self.interval}: {e}")
+
+
+@functools.lru_cache(maxsize=None)
+def recording_fetcher(fetcher_class):
+    """
+    Subclase de fetcher_class que graba cada respuesta (una clase por fetcher envuelto)
+
+    Parameters:
+    - fetcher_class: clase con la interfaz de YahooFinanceDataFetcher
+
+    Returns:
+    - Clase Recording<fetcher_class>
+    """
+    return type(f"Recording{fetcher_class.__name__}", (_RecordingMixin, fetcher_class), {})
+
+
+class ReplayDataFetcher(YahooFinanceDataFetcher):
+    """
+    Sirve las respuestas de un ResponseLog sin red, con la interfaz de YahooFinanceDataFetcher
+
+    La espera de cada respuesta es latencia grabada / speed (speed 0: sin
+    esperar) más latency segundos
+    """
+    log = response_log
+    use_store = False
+    speed = DATA_REPLAY_SPEED
+    latency = DATA_REPLAY_LATENCY_SECONDS
+
+    def get_data(self, start_time=None, end_time=None, limit=500):
+        """
+        Misma firma y resultado que YahooFinanceDataFetcher.get_data
+        """
+        with stage("upstream"):
+            df, latencia = self.log.replay(self.asset, self.interval, (start_time, end_time, limit))
+            self._esperar(latencia)
+        if df.empty:
+            logger.warning(f"Respuesta grabada vacía (o serie sin grabar) para {self.asset} con intervalo {self.interval}")
+        return df
+
+    @classmethod
+    def get_data_multi(cls, assets, interval="1h", start_time=None, end_time=None, limit=500):
+        """
+        Misma firma y resultado que YahooFinanceDataFetcher.get_data_multi
+
+        Una sola espera (la mayor de las latencias grabadas), como una descarga conjunta
+        """
+        resultado = {}
+        latencia = 0.0
+        with stage("upstream_multi"):
+            for asset in assets:
+                df, grabada = cls.log.replay(asset, interval, (start_time, end_time, limit))
+                resultado[asset] = df
+                latencia = max(latencia, grabada)
+            cls._esperar(latencia)
+        return resultado
+
+    @classmethod
+    def _esperar(cls, latencia):
+        espera = (latencia / cls.speed if cls.speed > 0 else 0.0) + cls.latency
+        if espera > 0:
+            time.sleep(espera)
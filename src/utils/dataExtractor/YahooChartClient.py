@@ -0,0 +1,358 @@
+"""
+Cliente HTTP asíncrono del endpoint chart de Yahoo Finance (/v8/finance/chart)
+
+Un único httpx.AsyncClient con un pool de conexiones keep-alive sirve todas las
+descargas: la conexión y el TLS se negocian una vez por conexión del pool y no
+en cada petición. El cliente vive en un event loop propio (un hilo), así lo
+usan igual el código síncrono (los fetchers en los hilos de I/O) y las
+corrutinas de otro event loop, y las descargas concurrentes no ocupan un hilo
+cada una.
+
+La respuesta JSON se decodifica directamente en arrays de NumPy (ChartData),
+sin el DataFrame intermedio de yfinance. La URL base es configurable
+(YAHOO_CHART_BASE_URL) para apuntar a un servidor local con respuestas grabadas.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import quote
+
+import httpx
+import numpy as np
+
+from src.core.config import YAHOO_CHART_BASE_URL, YAHOO_CHART_MAX_CONNECTIONS, YAHOO_CHART_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+# httpx registra cada petición en INFO; las descargas ya se cuentan en las métricas de upstream
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Columnas de precio y volumen de indicators.quote
+QUOTE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+# Yahoo rechaza a menudo los User-Agent de librerías HTTP
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+    'Accept': 'application/json',
+}
+
+
+class YahooChartError(Exception):
+    """
+    Error de datos del endpoint (símbolo inexistente, intervalo o rango no válido): no se reintenta
+    """
+
+
+class YahooChartUnavailable(Exception):
+    """
+    Límite de peticiones (429), error del servidor (5xx) o de red: transitorio
+    """
+
+
+class ChartData:
+    """
+    Velas de una respuesta del endpoint chart en arrays de NumPy
+
+    Attributes:
+    - symbol, timezone (zona horaria del mercado), gmtoffset (segundos)
+    - time: int64 con la apertura de cada vela en segundos UTC
+    - open, high, low, close, volume: float64 (NaN donde Yahoo no da valor)
+    """
+
+    __slots__ = ('symbol', 'timezone', 'gmtoffset', 'time') + QUOTE_COLUMNS
+
+    def __init__(self, symbol, timezone, gmtoffset, time, open, high, low, close, volume):
+        self.symbol = symbol
+        self.timezone = timezone
+        self.gmtoffset = gmtoffset
+        self.time = time
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+
+    def __len__(self):
+        return len(self.time)
+
+    def take(self, indices):
+        """
+        ChartData con las filas indicadas (array de posiciones o máscara)
+        """
+        return ChartData(
+            self.symbol, self.timezone, self.gmtoffset, self.time[indices],
+            *(getattr(self, columna)[indices] for columna in QUOTE_COLUMNS)
+        )
+
+
+def _columna(valores, n):
+    if not valores:
+        return np.full(n, np.nan)
+    # None (sin cotización) se convierte en NaN
+    return np.asarray(valores, dtype=np.float64)
+
+
+def decode_chart(contenido):
+    """
+    Decodifica una respuesta del endpoint chart
+
+    Parameters:
+    - contenido: cuerpo de la respuesta (bytes o str)
+
+    Returns:
+    - ChartData sin las filas sin precios (todas las OHLC vacías)
+
+    Raises:
+    - YahooChartError si la respuesta trae un error o no tiene resultado
+    """
+    try:
+        datos = json.loads(contenido)
+    except ValueError as e:
+        raise YahooChartUnavailable(f"Respuesta no válida del endpoint chart: {e}") from e
+    chart = datos.get('chart') or {}
+    error = chart.get('error')
+    if error:
+        raise YahooChartError(f"{error.get('code')}: {error.get('description')}")
+    resultado = (chart.get('result') or [None])[0]
+    if resultado is None:
+        raise YahooChartError("Respuesta del endpoint chart sin resultado")
+
+    meta = resultado.get('meta') or {}
+    tiempos = np.asarray(resultado.get('timestamp') or [], dtype=np.int64)
+    quote_ = (((resultado.get('indicators') or {}).get('quote')) or [{}])[0]
+    columnas = [_columna(quote_.get(columna), len(tiempos)) for columna in QUOTE_COLUMNS]
+    datos = ChartData(meta.get('symbol'), meta.get('exchangeTimezoneName') or 'UTC', meta.get('gmtoffset') or 0,
+                      tiempos, *columnas)
+    if not len(datos):
+        return datos
+    precios = np.column_stack((datos.open, datos.high, datos.low, datos.close))
+    con_precio = ~np.isnan(precios).all(axis=1)
+    return datos if con_precio.all() else datos.take(con_precio)
+
+
+def merge_live_row(datos, segundos, intradia):
+    """
+    Une la última fila con la anterior cuando Yahoo devuelve la vela en curso por separado
+
+    Intradía: la última fila trae la hora de la última cotización y cae dentro
+    de la vela anterior (máximo, mínimo, cierre y volumen se acumulan en ella).
+    Diario: las dos últimas filas son del mismo día de mercado y se queda la
+    última (igual que yfinance).
+
+    Parameters:
+    - datos: ChartData
+    - segundos: duración del intervalo pedido en segundos
+    - intradia: True para intervalos de minutos u horas
+    """
+    if len(datos) < 2:
+        return datos
+    anterior, ultima = int(datos.time[-2]), int(datos.time[-1])
+    if intradia:
+        if ultima == anterior or ultima >= anterior + segundos:
+            return datos
+        for columna, combinar in (('high', np.fmax), ('low', np.fmin)):
+            valores = getattr(datos, columna)
+            valores[-2] = combinar(valores[-2], valores[-1])
+        if np.isnan(datos.open[-2]):
+            datos.open[-2] = datos.open[-1]
+        datos.close[-2] = datos.close[-1]
+        datos.volume[-2] = np.nansum([datos.volume[-2], datos.volume[-1]])
+        return datos.take(slice(None, -1))
+    dia = 86400
+    if (anterior + datos.gmtoffset) // dia == (ultima + datos.gmtoffset) // dia:
+        return datos.take(np.r_[np.arange(len(datos) - 2), len(datos) - 1])
+    return datos
+
+
+def _resolver(tarea, futuro):
+    if futuro.cancelled():
+        return
+    if tarea.cancelled():
+        futuro.cancel()
+    elif tarea.exception() is not None:
+        futuro.set_exception(tarea.exception())
+    else:
+        futuro.set_result(tarea.result())
+
+
+class YahooChartClient:
+    """
+    Cliente del endpoint chart con un pool de conexiones compartido y su propio event loop
+    """
+
+    def __init__(self, base_url=YAHOO_CHART_BASE_URL, max_connections=YAHOO_CHART_MAX_CONNECTIONS,
+                 timeout=YAHOO_CHART_TIMEOUT_SECONDS):
+        """
+        Parameters:
+        - base_url: URL base del endpoint (https://query2.finance.yahoo.com o un servidor local)
+        - max_connections: conexiones máximas del pool (también las keep-alive)
+        - timeout: segundos máximos por petición
+        """
+        self.base_url = base_url.rstrip('/')
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._loop = None
+        self._hilo = None
+        self._http = None
+        self._stats = {'requests': 0, 'errors': 0, 'bytes': 0}
+
+    def _arrancar(self):
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                hilo = threading.Thread(target=loop.run_forever, name='yahoo-chart', daemon=True)
+                hilo.start()
+                self._loop, self._hilo = loop, hilo
+            return self._loop
+
+    def _cliente(self):
+        # Solo desde el loop del cliente: el pool de conexiones queda ligado a él
+        if self._http is None:
+            self._http = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=_HEADERS,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+            )
+        return self._http
+
+    def submit(self, coro_fn, *args, **kwargs):
+        """
+        Ejecuta coro_fn(*args, **kwargs) en el loop del cliente desde cualquier hilo
+
+        La corrutina corre en una copia del contexto de quien llama (prioridad
+        de descarga, desglose de tiempos de la petición)
+
+        Returns:
+        - concurrent.futures.Future con el resultado; cancelarlo cancela la corrutina
+        """
+        loop = self._arrancar()
+        futuro = Future()
+        tareas = []
+
+        def lanzar():
+            if futuro.cancelled():
+                return
+            tarea = loop.create_task(coro_fn(*args, **kwargs))
+            tareas.append(tarea)
+            tarea.add_done_callback(lambda t: _resolver(t, futuro))
+
+        def cancelar(f):
+            if f.cancelled() and tareas:
+                loop.call_soon_threadsafe(tareas[0].cancel)
+
+        futuro.add_done_callback(cancelar)
+        loop.call_soon_threadsafe(lanzar, context=contextvars.copy_context())
+        return futuro
+
+    def run(self, coro_fn, *args, **kwargs):
+        """
+        Versión bloqueante de submit (para los hilos de I/O); no debe llamarse desde el loop del cliente
+        """
+        return self.submit(coro_fn, *args, **kwargs).result()
+
+    async def run_async(self, coro_fn, *args, **kwargs):
+        """
+        Espera coro_fn en el loop del cliente desde otro event loop
+        """
+        return await asyncio.wrap_future(self.submit(coro_fn, *args, **kwargs))
+
+    async def fetch(self, symbol, interval, start, end):
+        """
+        Una petición al endpoint chart (debe ejecutarse en el loop del cliente, ver submit)
+
+        Parameters:
+        - symbol: símbolo de Yahoo
+        - interval: intervalo de Yahoo (1m, 15m, 1h, 1d, 1wk...)
+        - start, end: inicio y fin en segundos UTC
+
+        Returns:
+        - ChartData
+
+        Raises:
+        - YahooChartUnavailable en errores transitorios, YahooChartError en errores de datos
+        """
+        params = {
+            'period1': int(start),
+            'period2': int(end),
+            'interval': interval,
+            'includePrePost': 'false',
+            'events': 'div,splits',
+        }
+        self._contar('requests')
+        try:
+            respuesta = await self._cliente().get(f"/v8/finance/chart/{quote(symbol, safe='')}", params=params)
+        except httpx.HTTPError as e:
+            self._contar('errors')
+            raise YahooChartUnavailable(f"{symbol}: {type(e).__name__}: {e}") from e
+        self._contar('bytes', len(respuesta.content))
+        if respuesta.status_code == 429 or respuesta.status_code >= 500:
+            self._contar('errors')
+            raise YahooChartUnavailable(f"{symbol}: HTTP {respuesta.status_code}")
+        if respuesta.status_code >= 400:
+            self._contar('errors')
+            try:
+                # Los 4xx del endpoint traen el error en el cuerpo (chart.error)
+                decode_chart(respuesta.content)
+            except (YahooChartError, YahooChartUnavailable) as e:
+                raise YahooChartError(f"{symbol}: HTTP {respuesta.status_code} {e}") from e
+            raise YahooChartError(f"{symbol}: HTTP {respuesta.status_code}")
+        return decode_chart(respuesta.content)
+
+    def _contar(self, stat, cantidad=1):
+        with self._lock:
+            self._stats[stat] += cantidad
+
+    def stats(self):
+        """
+        Peticiones, errores y bytes recibidos
+        """
+        with self._lock:
+            stats = dict(self._stats)
+        stats['base_url'] = self.base_url
+        stats['max_connections'] = self.max_connections
+        return stats
+
+    def close(self):
+        """
+        Cierra las conexiones del pool y detiene el loop del cliente
+        """
+        with self._lock:
+            loop, hilo, self._loop, self._hilo = self._loop, self._hilo, None, None
+        if loop is None:
+            return
+        if self._http is not None:
+            http, self._http = self._http, None
+            asyncio.run_coroutine_threadsafe(http.aclose(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        hilo.join(timeout=5)
+        loop.close()
+
+
+_compartido = None
+_compartido_lock = threading.Lock()
+
+
+def shared_chart_client():
+    """
+    Cliente compartido por todos los fetchers del endpoint chart (se crea en el primer uso)
+    """
+    global _compartido
+    with _compartido_lock:
+        if _compartido is None:
+            _compartido = YahooChartClient()
+        return _compartido
+
+
+def close_shared_chart_client():
+    """
+    Cierra el cliente compartido si se llegó a crear
+    """
+    global _compartido
+    with _compartido_lock:
+        cliente, _compartido = _compartido, None
+    if cliente is not None:
+        cliente.close()
@@ -0,0 +1,154 @@
+"""
+Velas de Yahoo Finance a través del cliente HTTP asíncrono del endpoint chart
+
+Misma interfaz y formato de salida que YahooFinanceDataFetcher (get_data,
+get_data_multi, history_limits...); solo cambia el transporte: sin yf.Ticker
+por petición, con un pool de conexiones keep-alive compartido (ver
+YahooChartClient) y decodificación directa a arrays de NumPy.
+"""
+import asyncio
+import logging
+from datetime import datetime
+
+import pandas as pd
+import pytz
+
+from src.core import fetch_scheduler
+from src.core.metrics import stage, UPSTREAM_REQUESTS, UPSTREAM_ERRORS
+from src.utils.dataExtractor.YahooChartClient import YahooChartError, merge_live_row, shared_chart_client
+from src.utils.dataExtractor.YahooFinanceDataFetcher import YahooFinanceDataFetcher
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+from src.utils.dataExtractor.resampling import resample_ohlcv
+
+logger = logging.getLogger(__name__)
+
+# Intervalos que Yahoo sirve mal en el endpoint chart: se piden en otro y se agregan
+# (al pedir 30m devuelve velas de 60m; yfinance hace lo mismo)
+_CONSULTA = {'30m': '15m'}
+
+
+class YahooChartDataFetcher(YahooFinanceDataFetcher):
+    def __init__(self, asset="GC=F", interval="1h", client=None):
+        """
+        Parameters:
+        - asset: Símbolo del activo (por defecto "GC=F" para Oro)
+        - interval: Intervalo de tiempo (1m, 5m, 15m, 1h, 1d, etc.)
+        - client: YahooChartClient (por defecto el compartido)
+        """
+        super().__init__(asset=asset, interval=interval)
+        self.client = client
+
+    def _chart_client(self):
+        return self.client if self.client is not None else shared_chart_client()
+
+    def get_data(self, start_time=None, end_time=None, limit=500):
+        """
+        Misma firma y resultado que YahooFinanceDataFetcher.get_data
+
+        Bloquea el hilo que llama hasta la respuesta; la petición se hace en el
+        loop del cliente
+        """
+        return self._chart_client().run(self.get_data_async, start_time, end_time, limit)
+
+    async def get_data_async(self, start_time=None, end_time=None, limit=500):
+        """
+        Versión asíncrona de get_data
+
+        Debe ejecutarse en el loop del cliente: desde otro event loop se
+        espera con client.run_async(fetcher.get_data_async, ...)
+        """
+        try:
+            inicio, fin = self._rango(start_time, end_time, limit)
+            yf_interval = self._map_interval(self.interval)
+            consulta = _CONSULTA.get(yf_interval, yf_interval)
+            intradia = consulta.endswith(('m', 'h'))
+
+            # Descargar con turno del planificador (límite de peticiones, prioridad y reintentos)
+            with stage("upstream"):
+                datos = await fetch_scheduler.call_async(
+                    "yahoo",
+                    self._upstream_chart,
+                    consulta,
+                    inicio,
+                    fin,
+                    retryable=self.is_transient_error
+                )
+            segundos = interval_to_timedelta(consulta).total_seconds() if intradia else 0
+            datos = merge_live_row(datos, segundos, intradia)
+
+            if not len(datos):
+                UPSTREAM_ERRORS.inc(provider="yahoo", kind="chart", reason="empty")
+                logger.warning(f"No se obtuvieron datos para {self.asset} con intervalo {self.interval}")
+                return pd.DataFrame()
+
+            tiempos = pd.to_datetime(datos.time, unit='s', utc=True)
+            if not intradia:
+                # Como yfinance: las velas diarias o mayores empiezan a medianoche del mercado
+                tiempos = tiempos.tz_convert(datos.timezone).normalize()
+            ticks_frame = self._ticks_from_arrays(tiempos, datos.open, datos.high, datos.low, datos.close, datos.volume)
+            if consulta != yf_interval:
+                ticks_frame = resample_ohlcv(ticks_frame, yf_interval, base=consulta)
+
+            # Limitar a la cantidad de registros solicitada
+            if len(ticks_frame) > limit:
+                ticks_frame = ticks_frame.tail(limit)
+
+            return ticks_frame
+
+        except YahooChartError as e:
+            logger.warning(f"Sin datos de {self.asset} {self.interval}: {e}")
+            raise fetch_scheduler.FetchError(f"Sin datos de {self.asset} {self.interval}: {e}") from e
+        except Exception as e:
+            logger.exception(f"Error obteniendo o procesando datos de {self.asset} {self.interval}: {e}")
+            raise fetch_scheduler.FetchError(f"Error obteniendo datos de {self.asset} {self.interval}: {e}") from e
+
+    @classmethod
+    def get_data_multi(cls, assets, interval="1h", start_time=None, end_time=None, limit=500):
+        """
+        Misma firma y resultado que YahooFinanceDataFetcher.get_data_multi
+
+        Una petición por activo, todas a la vez en el loop del cliente y
+        sobre las mismas conexiones (sin yf.download ni un hilo por activo)
+        """
+        fetchers = {asset: cls(asset=asset, interval=interval) for asset in assets}
+        if not fetchers:
+            return {}
+
+        async def descargar():
+            return await asyncio.gather(
+                *(fetcher.get_data_async(start_time, end_time, limit) for fetcher in fetchers.values()),
+                return_exceptions=True
+            )
+
+        frames = shared_chart_client().run(descargar)
+        # Como yf.download: un activo que falla queda vacío sin afectar al resto
+        return {
+            asset: pd.DataFrame() if isinstance(frame, BaseException) else frame.reset_index(drop=True)
+            for asset, frame in zip(fetchers, frames)
+        }
+
+    async def _upstream_chart(self, interval, inicio, fin):
+        """
+        Una petición al endpoint chart, contada en las métricas de upstream (cada reintento cuenta)
+        """
+        UPSTREAM_REQUESTS.inc(provider="yahoo", kind="chart")
+        try:
+            return await self._chart_client().fetch(self.asset, interval, inicio, fin)
+        except Exception:
+            UPSTREAM_ERRORS.inc(provider="yahoo", kind="chart", reason="error")
+            raise
+
+    def _rango(self, start_time, end_time, limit):
+        """
+        Inicio y fin de la petición en segundos UTC
+        """
+        inicio = start_time // 1000 if start_time else int(self._calculate_start_date(limit).timestamp())
+        fin = end_time // 1000 if end_time else int(datetime.now(pytz.UTC).timestamp())
+        return inicio, fin
+
+    @staticmethod
+    def is_transient_error(error):
+        """
+        Errores que se reintentan: todos salvo los de datos (símbolo o rango no válidos)
+        """
+        return not isinstance(error, YahooChartError)
@@ -1,9 +1,29 @@
+import logging
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import pytz
 import yfinance as yf
+from yfinance.exceptions import YFException, YFRateLimitError
+from src.core import fetch_scheduler
+from src.core.metrics import stage, UPSTREAM_REQUESTS, UPSTREAM_ERRORS
+from src.utils.dataExtractor.resampling import RESAMPLED_INTERVALS, resample_ohlcv
+
+logger = logging.getLogger(__name__)
 
 class YahooFinanceDataFetcher:
+    # Límites de Yahoo Finance por intervalo: (ventana máxima por petición, antigüedad máxima)
+    # Con un pequeño margen respecto a los límites publicados (1m: 7/30 días, intradía: 60 días, 1h: 730 días)
+    HISTORY_LIMITS = {
+        '1m': (pd.Timedelta(days=7), pd.Timedelta(days=29)),
+        '2m': (pd.Timedelta(days=59), pd.Timedelta(days=59)),
+        '5m': (pd.Timedelta(days=59), pd.Timedelta(days=59)),
+        '15m': (pd.Timedelta(days=59), pd.Timedelta(days=59)),
+        '30m': (pd.Timedelta(days=59), pd.Timedelta(days=59)),
+        '90m': (pd.Timedelta(days=59), pd.Timedelta(days=59)),
+        '1h': (pd.Timedelta(days=365), pd.Timedelta(days=729)),
+    }
+
     def __init__(self, asset="GC=F", interval="1h"):
         """
         Inicializa el fetcher de datos de Yahoo Finance
@@ -25,7 +45,10 @@ class YahooFinanceDataFetcher:
         - limit: Número de velas a recuperar (por defecto: 500)
         
         Returns:
-        - DataFrame con datos OHLCV
+        - DataFrame con datos OHLCV (vacío si Yahoo no devuelve velas)
+
+        Raises:
+        - fetch_scheduler.FetchError si la descarga falla
         """
         try:
             # Convertir milisegundos a datetime si se proporcionan
@@ -47,42 +70,27 @@ class YahooFinanceDataFetcher:
             yf_interval = self._map_interval(self.interval)
             
             # Descargar datos históricos
-            df = ticker.history(
-                start=start_date,
-                end=end_date,
-                interval=yf_interval,
-                auto_adjust=False
-            )
+            # (con turno del planificador: límite de peticiones, prioridad y reintentos)
+            with stage("upstream"):
+                df = fetch_scheduler.call(
+                    "yahoo",
+                    self._upstream,
+                    "history",
+                    ticker.history,
+                    start=start_date,
+                    end=end_date,
+                    interval=yf_interval,
+                    auto_adjust=False,
+                    retryable=self.is_transient_error
+                )
             
             if df.empty:
-                print(f"No se obtuvieron datos para {self.asset} con intervalo {self.interval}")
+                UPSTREAM_ERRORS.inc(provider="yahoo", kind="history", reason="empty")
+                logger.warning(f"No se obtuvieron datos para {self.asset} con intervalo {self.interval}")
                 return pd.DataFrame()
             
             # Renombrar y reorganizar columnas para coincidir con el formato de Binance
-            ticks_frame = pd.DataFrame()
-            ticks_frame['time'] = df.index.values  # Usar .values para evitar problemas de índice
-            ticks_frame['open'] = df['Open'].values.astype(float)
-            ticks_frame['high'] = df['High'].values.astype(float)
-            ticks_frame['low'] = df['Low'].values.astype(float)
-            ticks_frame['close'] = df['Close'].values.astype(float)
-            ticks_frame['volume'] = df['Volume'].values.astype(float)
-            
-            # Resetear el índice para tener 'time' como columna
-            ticks_frame = ticks_frame.reset_index(drop=True)
-            
-            # Asegurar que time sea timezone-aware
-            if ticks_frame['time'].dt.tz is None:
-                ticks_frame['time'] = ticks_frame['time'].dt.tz_localize('UTC')
-            else:
-                ticks_frame['time'] = ticks_frame['time'].dt.tz_convert('UTC')
-            
-            # Estimación de buy_volume y sell_volume (50% cada uno)
-            # Yahoo Finance no provee esta información directamente
-            ticks_frame['buy_volume'] = ticks_frame['volume'] * 0.5
-            ticks_frame['sell_volume'] = ticks_frame['volume'] * 0.5
-            
-            # Calcular delta de volumen
-            ticks_frame['volume_delta'] = ticks_frame['buy_volume'] - ticks_frame['sell_volume']
+            ticks_frame = self._to_ticks_frame(df)
             
             # Limitar a la cantidad de registros solicitada
             if len(ticks_frame) > limit:
@@ -91,10 +99,151 @@ class YahooFinanceDataFetcher:
             return ticks_frame
             
         except Exception as e:
-            print(f"Error obteniendo o procesando datos: {e}")
-            import traceback
-            traceback.print_exc()
-            return pd.DataFrame()
+            logger.exception(f"Error obteniendo o procesando datos de {self.asset} {self.interval}: {e}")
+            raise fetch_scheduler.FetchError(f"Error obteniendo datos de {self.asset} {self.interval}: {e}") from e
+
+    @classmethod
+    def get_data_multi(cls, assets, interval="1h", start_time=None, end_time=None, limit=500):
+        """
+        Obtiene datos de varios activos con una sola descarga multi-ticker de yfinance
+
+        Parameters:
+        - assets: Lista de símbolos
+        - interval: Intervalo de tiempo común a todos los activos
+        - start_time: Tiempo de inicio opcional en milisegundos
+        - end_time: Tiempo de fin opcional en milisegundos
+        - limit: Número de velas a recuperar por activo (por defecto: 500)
+
+        Returns:
+        - Diccionario símbolo -> DataFrame con datos OHLCV (vacío si no hubo datos para ese símbolo)
+        """
+        fetchers = {asset: cls(asset=asset, interval=interval) for asset in assets}
+        resultado = {asset: pd.DataFrame() for asset in assets}
+        if not fetchers:
+            return resultado
+        fetcher = next(iter(fetchers.values()))
+        try:
+            start_date = pd.to_datetime(start_time, unit='ms') if start_time else fetcher._calculate_start_date(limit)
+            end_date = pd.to_datetime(end_time, unit='ms') if end_time else datetime.now(pytz.UTC)
+
+            with stage("upstream_multi"):
+                df = fetch_scheduler.call(
+                    "yahoo",
+                    cls._upstream,
+                    "download",
+                    yf.download,
+                    tickers=list(fetchers),
+                    start=start_date,
+                    end=end_date,
+                    interval=fetcher._map_interval(interval),
+                    auto_adjust=False,
+                    group_by='ticker',
+                    threads=True,
+                    progress=False,
+                    retryable=cls.is_transient_error
+                )
+        except Exception as e:
+            logger.warning(f"Error en la descarga multi-ticker: {e}")
+            return resultado
+
+        if df.empty:
+            UPSTREAM_ERRORS.inc(provider="yahoo", kind="download", reason="empty")
+            return resultado
+
+        for asset, fetcher in fetchers.items():
+            if not isinstance(df.columns, pd.MultiIndex):
+                datos = df
+            elif asset in df.columns.get_level_values(0):
+                datos = df[asset]
+            else:
+                continue
+            # Cada activo tiene su propio calendario: se quitan las filas de otros mercados
+            datos = datos.dropna(subset=['Open', 'High', 'Low', 'Close'], how='all')
+            if datos.empty:
+                continue
+            ticks_frame = fetcher._to_ticks_frame(datos)
+            if len(ticks_frame) > limit:
+                ticks_frame = ticks_frame.tail(limit).reset_index(drop=True)
+            resultado[asset] = ticks_frame
+        return resultado
+
+    @staticmethod
+    def _upstream(kind, fn, *args, **kwargs):
+        """
+        Una petición a Yahoo Finance, contada en las métricas de upstream (cada reintento cuenta)
+        """
+        UPSTREAM_REQUESTS.inc(provider="yahoo", kind=kind)
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            UPSTREAM_ERRORS.inc(provider="yahoo", kind=kind, reason="error")
+            raise
+
+    @staticmethod
+    def is_transient_error(error):
+        """
+        Errores que se reintentan: red y límite de peticiones
+
+        Los errores de datos de yfinance (ticker sin precios, periodo no
+        válido...) se repetirían igual y no se reintentan
+        """
+        return isinstance(error, YFRateLimitError) or not isinstance(error, YFException)
+
+    def _to_ticks_frame(self, df):
+        """
+        Convierte la salida de yfinance al formato de Binance (time UTC, OHLCV y volúmenes estimados)
+        
+        Parameters:
+        - df: DataFrame de yfinance con índice de fechas y columnas Open/High/Low/Close/Volume
+        
+        Returns:
+        - DataFrame con datos OHLCV (reagrupado si el intervalo se construye localmente)
+        """
+        return self._ticks_from_arrays(
+            df.index.values,  # Usar .values para evitar problemas de índice
+            df['Open'].values,
+            df['High'].values,
+            df['Low'].values,
+            df['Close'].values,
+            df['Volume'].values
+        )
+
+    def _ticks_from_arrays(self, time, open, high, low, close, volume):
+        """
+        Construye el DataFrame de velas a partir de arrays (fechas y OHLCV)
+        
+        Returns:
+        - DataFrame con time (UTC), OHLCV y volúmenes estimados (reagrupado si
+          el intervalo se construye localmente)
+        """
+        ticks_frame = pd.DataFrame({
+            'time': time,
+            'open': np.asarray(open, dtype=float),
+            'high': np.asarray(high, dtype=float),
+            'low': np.asarray(low, dtype=float),
+            'close': np.asarray(close, dtype=float),
+            'volume': np.asarray(volume, dtype=float),
+        })
+        
+        # Asegurar que time sea timezone-aware
+        if ticks_frame['time'].dt.tz is None:
+            ticks_frame['time'] = ticks_frame['time'].dt.tz_localize('UTC')
+        else:
+            ticks_frame['time'] = ticks_frame['time'].dt.tz_convert('UTC')
+        
+        # Estimación de buy_volume y sell_volume (50% cada uno)
+        # Yahoo Finance no provee esta información directamente
+        ticks_frame['buy_volume'] = ticks_frame['volume'] * 0.5
+        ticks_frame['sell_volume'] = ticks_frame['volume'] * 0.5
+        
+        # Calcular delta de volumen
+        ticks_frame['volume_delta'] = ticks_frame['buy_volume'] - ticks_frame['sell_volume']
+        
+        # Reagrupar localmente los intervalos que Yahoo no ofrece (2h, 4h, 3d, etc.)
+        if self.interval in RESAMPLED_INTERVALS:
+            ticks_frame = resample_ohlcv(ticks_frame, self.interval)
+        
+        return ticks_frame
 
     def _map_interval(self, interval):
         """
@@ -114,13 +263,13 @@ class YahooFinanceDataFetcher:
             '15m': '15m',
             '30m': '30m',
             '1h': '1h',
-            '2h': '1h',  # Yahoo no tiene 2h, usar 1h
-            '4h': '1h',  # Yahoo no tiene 4h, usar 1h
-            '6h': '1h',  # Yahoo no tiene 6h, usar 1h
-            '8h': '1h',  # Yahoo no tiene 8h, usar 1h
-            '12h': '1h', # Yahoo no tiene 12h, usar 1h
+            '2h': '1h',  # Yahoo no tiene 2h: se descarga 1h y se reagrupa
+            '4h': '1h',  # Yahoo no tiene 4h: se descarga 1h y se reagrupa
+            '6h': '1h',  # Yahoo no tiene 6h: se descarga 1h y se reagrupa
+            '8h': '1h',  # Yahoo no tiene 8h: se descarga 1h y se reagrupa
+            '12h': '1h', # Yahoo no tiene 12h: se descarga 1h y se reagrupa
             '1d': '1d',
-            '3d': '1d',  # Yahoo no tiene 3d, usar 1d
+            '3d': '1d',  # Yahoo no tiene 3d: se descarga 1d y se reagrupa
             '1w': '1wk',
             '1M': '1mo'
         }
@@ -157,6 +306,16 @@ class YahooFinanceDataFetcher:
         else:
             return now - pd.Timedelta(days=30)
 
+    def history_limits(self):
+        """
+        Límites del proveedor para descargas de historia larga (ver HistoryLoader)
+        
+        Returns:
+        - (ventana máxima por petición, antigüedad máxima o None si no hay límite)
+        """
+        yf_interval = self._map_interval(self.interval)
+        return self.HISTORY_LIMITS.get(yf_interval, (pd.Timedelta(days=3650), None))
+
     @staticmethod
     def calculate_time_increment(interval):
         """
@@ -0,0 +1,31 @@
+"""
+Utilidades de intervalos temporales de velas
+"""
+import pandas as pd
+
+
+def interval_to_timedelta(interval):
+    """
+    Duración de una vela para un intervalo estilo Binance o Yahoo Finance
+
+    Parameters:
+    - interval: Intervalo (1m, 5m, 1h, 60m, 1d, 1w, 1wk, 1M, 1mo, etc.)
+
+    Returns:
+    - pd.Timedelta con la duración de la vela
+    """
+    if interval.endswith('mo'):
+        return pd.Timedelta(days=30 * int(interval[:-2]))
+    if interval.endswith('wk'):
+        return pd.Timedelta(weeks=int(interval[:-2]))
+    if interval.endswith('M'):
+        return pd.Timedelta(days=30 * int(interval[:-1]))
+    if interval.endswith('m'):
+        return pd.Timedelta(minutes=int(interval[:-1]))
+    if interval.endswith('h'):
+        return pd.Timedelta(hours=int(interval[:-1]))
+    if interval.endswith('d'):
+        return pd.Timedelta(days=int(interval[:-1]))
+    if interval.endswith('w'):
+        return pd.Timedelta(weeks=int(interval[:-1]))
+    raise ValueError(f"Intervalo no soportado: {interval}")
@@ -0,0 +1,116 @@
+"""
+Proveedores de velas del servicio
+
+Un proveedor es una clase fetcher con la interfaz de YahooFinanceDataFetcher
+(constructor (asset, interval), get_data, get_data_multi, history_limits...):
+
+- yfinance: YahooFinanceDataFetcher (yf.Ticker por petición)
+- chart: YahooChartDataFetcher (cliente asíncrono del endpoint chart)
+- record: el proveedor DATA_RECORD_UPSTREAM grabando cada respuesta en DATA_RECORD_DIR
+- replay: ReplayDataFetcher, las respuestas grabadas sin red
+
+El proveedor por defecto es DATA_PROVIDER; use_provider() lo cambia para el
+contexto en curso (una petición con ?provider=). Una petición solo puede elegir
+los proveedores de REQUEST_PROVIDERS: record y replay escriben y leen ficheros
+del servidor y solo se activan por configuración. Las cachés separan las series
+por clase de fetcher, así que los proveedores no comparten velas.
+"""
+import contextvars
+from contextlib import contextmanager
+
+from src.core.config import DATA_PROVIDER, DATA_RECORD_UPSTREAM
+from src.utils.dataExtractor.RecordReplay import ReplayDataFetcher, recording_fetcher
+from src.utils.dataExtractor.YahooChartDataFetcher import YahooChartDataFetcher
+from src.utils.dataExtractor.YahooFinanceDataFetcher import YahooFinanceDataFetcher
+
+# Nombre -> función que devuelve la clase fetcher (se resuelve en cada uso)
+_PROVEEDORES = {
+    "yfinance": lambda: YahooFinanceDataFetcher,
+    "chart": lambda: YahooChartDataFetcher,
+    "record": lambda: recording_fetcher(provider_class(DATA_RECORD_UPSTREAM)),
+    "replay": lambda: ReplayDataFetcher,
+}
+
+# Proveedores que una petición puede elegir con ?provider= o X-Data-Provider
+REQUEST_PROVIDERS = ("yfinance", "chart")
+
+_por_defecto = DATA_PROVIDER
+_proveedor = contextvars.ContextVar("proveedor_datos", default=None)
+
+
+def register_provider(name, factory):
+    """
+    Añade (o sustituye) un proveedor
+
+    Parameters:
+    - name: nombre para DATA_PROVIDER y ?provider=
+    - factory: función sin argumentos que devuelve la clase fetcher
+
+    Returns:
+    - La función anterior del proveedor (None si no existía)
+    """
+    anterior = _PROVEEDORES.get(name)
+    _PROVEEDORES[name] = factory
+    return anterior
+
+
+def providers():
+    return tuple(_PROVEEDORES)
+
+
+def validate_provider(name):
+    """
+    Lanza ValueError si el proveedor no existe
+    """
+    if name not in _PROVEEDORES:
+        raise ValueError(f"Proveedor de datos desconocido: {name}. Use {', '.join(_PROVEEDORES)}")
+    return name
+
+
+def validate_request_provider(name):
+    """
+    Lanza ValueError si el proveedor no se puede elegir desde una petición
+    """
+    if name not in REQUEST_PROVIDERS:
+        raise ValueError(f"Proveedor de datos no permitido en la petición: {name}. Use {', '.join(REQUEST_PROVIDERS)}")
+    return validate_provider(name)
+
+
+def current_provider():
+    """
+    Proveedor del contexto en curso (use_provider) o el proveedor por defecto
+    """
+    return _proveedor.get() or _por_defecto
+
+
+def provider_class(name=None):
+    """
+    Clase fetcher de un proveedor (por defecto el del contexto en curso)
+    """
+    return _PROVEEDORES[validate_provider(name or current_provider())]()
+
+
+@contextmanager
+def use_provider(name):
+    """
+    Usa otro proveedor en el contexto en curso (y en las tareas e hilos que lo copian)
+    """
+    token = _proveedor.set(validate_provider(name))
+    try:
+        yield name
+    finally:
+        _proveedor.reset(token)
+
+
+@contextmanager
+def default_provider(name):
+    """
+    Cambia el proveedor por defecto de todo el proceso mientras dura el bloque
+    (incluidos los trabajos que no heredan el contexto, como el precálculo)
+    """
+    global _por_defecto
+    anterior, _por_defecto = _por_defecto, validate_provider(name)
+    try:
+        yield name
+    finally:
+        _por_defecto = anterior
@@ -0,0 +1,125 @@
+"""
+Reagrupación local de velas OHLCV para intervalos que el proveedor no ofrece
+(Yahoo Finance no tiene 2h/4h/6h/8h/12h ni 3d)
+"""
+import numpy as np
+import pandas as pd
+
+from src.utils.dataExtractor.intervals import interval_to_timedelta
+
+# Intervalo derivado -> intervalo base que se descarga
+RESAMPLED_INTERVALS = {
+    '2h': '1h',
+    '4h': '1h',
+    '6h': '1h',
+    '8h': '1h',
+    '12h': '1h',
+    '3d': '1d',
+}
+
+# Columnas que se suman al agregar (además de open/high/low/close)
+_SUM_COLUMNS = ['volume', 'buy_volume', 'sell_volume', 'volume_delta']
+
+_HORA = pd.Timedelta(hours=1).value
+
+
+def base_interval(interval):
+    """
+    Intervalo base y factor de agregación para un intervalo derivado
+
+    Returns:
+    - (intervalo base, velas base por vela derivada) o None si no se reagrupa
+    """
+    base = RESAMPLED_INTERVALS.get(interval)
+    if base is None:
+        return None
+    return base, int(interval_to_timedelta(interval) / interval_to_timedelta(base))
+
+
+def _es_corte(huecos, duracion_base):
+    """
+    Huecos entre velas base que separan sesiones: faltan más de una vela y más
+    de una hora (cierre nocturno, fin de semana), no una vela suelta sin datos
+    ni la pausa diaria de una hora de los futuros
+    """
+    return huecos - duracion_base > max(duracion_base, _HORA)
+
+
+def _grupos_sesion(tiempos, duracion, duracion_base):
+    """
+    Inicio (ns) de la vela derivada de cada vela base con alineación 'session'
+    """
+    corte = np.r_[False, _es_corte(np.diff(tiempos), duracion_base)]
+    sesion = np.cumsum(corte)
+    # Desfase de la rejilla de cada sesión: su apertura módulo la duración
+    aperturas = tiempos[corte] % duracion
+    if len(aperturas):
+        # Antes del primer corte no se conoce la apertura: se usa la de la sesión siguiente
+        desfases = np.r_[aperturas[0], aperturas]
+    else:
+        desfases = np.zeros(1, dtype=np.int64)
+    desfase = desfases[sesion]
+    return desfase + (tiempos - desfase) // duracion * duracion
+
+
+def resample_ohlcv(df, interval, alineacion=None, base=None):
+    """
+    Agrega velas base a un intervalo mayor de forma vectorizada
+
+    Alineación de las velas:
+    - 'session': las velas empiezan en la apertura de cada sesión, como en los
+      gráficos de futuros y acciones. Una sesión empieza tras un corte real
+      (ver _es_corte; una vela base que falta no lo es) y las velas siguen la
+      rejilla que marca su apertura. Lo anterior al primer corte de la ventana
+      usa la rejilla de la siguiente sesión (o la de 'epoch' si no hay cortes,
+      p. ej. en mercados de 24h), así las velas no dependen de dónde empiece
+      la ventana descargada
+    - 'epoch': las velas se alinean a múltiplos del intervalo desde 1970-01-01
+      UTC (convención de Binance)
+    Por defecto 'epoch' para velas derivadas de un día o más (días UTC, aunque
+    la base sea intradía) y 'session' para el resto.
+
+    Parameters:
+    - df: DataFrame con time (UTC), open, high, low, close y volumen, ordenado por time
+    - interval: intervalo derivado (ver RESAMPLED_INTERVALS)
+    - alineacion: 'session', 'epoch' o None
+    - base: intervalo de las velas de df; por defecto el de RESAMPLED_INTERVALS
+      (permite agregar cualquier intervalo múltiplo, p. ej. 15m -> 4h)
+
+    Returns:
+    - DataFrame con las mismas columnas de precio/volumen agregadas; time es
+      el inicio de cada vela derivada
+    """
+    if base is None:
+        base = RESAMPLED_INTERVALS.get(interval)
+    if base is None:
+        raise ValueError(f"Intervalo sin reagrupación local: {interval}")
+    if df.empty:
+        return df
+
+    duracion = interval_to_timedelta(interval).value
+    duracion_base = interval_to_timedelta(base).value
+    if alineacion is None:
+        alineacion = 'epoch' if duracion >= pd.Timedelta(days=1).value else 'session'
+
+    tiempos = df['time'].dt.tz_convert('UTC').dt.tz_localize(None).to_numpy().astype('datetime64[ns]').astype(np.int64)
+    if alineacion == 'session':
+        grupos = _grupos_sesion(tiempos, duracion, duracion_base)
+    elif alineacion == 'epoch':
+        grupos = tiempos // duracion * duracion
+    else:
+        raise ValueError(f"Alineación no soportada: {alineacion}")
+
+    inicios = np.flatnonzero(np.r_[True, grupos[1:] != grupos[:-1]])
+    finales = np.r_[inicios[1:], len(grupos)] - 1
+
+    resultado = pd.DataFrame()
+    resultado['time'] = pd.to_datetime(grupos[inicios], unit='ns', utc=True)
+    resultado['open'] = df['open'].to_numpy(dtype=float)[inicios]
+    resultado['high'] = np.fmax.reduceat(df['high'].to_numpy(dtype=float), inicios)
+    resultado['low'] = np.fmin.reduceat(df['low'].to_numpy(dtype=float), inicios)
+    resultado['close'] = df['close'].to_numpy(dtype=float)[finales]
+    for columna in _SUM_COLUMNS:
+        if columna in df:
+            resultado[columna] = np.add.reduceat(np.nan_to_num(df[columna].to_numpy(dtype=float)), inicios)
+    return resultado
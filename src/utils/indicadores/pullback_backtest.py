@@ -0,0 +1,306 @@
+"""
+Backtest vectorizado de las señales de pullbacks
+
+Un único recorrido de paso_pullback registra, por vela, la tendencia, los
+rangos y las rupturas de estructura; el resto (señales, posición, stops,
+curva de capital y operaciones) se calcula con operaciones de NumPy sobre
+arrays, sin bucles por vela.
+
+Sin mirar al futuro:
+- tendencia[t] se conoce al cierre de la vela t
+- un alto/bajo en la vela i (y su POC) se confirma al cierre de i+1
+- rangoAlto/rangoBajo tras el paso i se conocen al cierre de i+1
+Las señales conocidas al cierre de t se ejecutan a la apertura de t+1.
+"""
+import numpy as np
+
+from src.utils.indicadores.pullback_engine import paso_pullback, estado_inicial
+
+# Reglas de entrada disponibles
+# - tendencia: largo/corto cuando la tendencia pasa a 1/-1
+# - ruptura: largo/corto en cada alto/bajo de estructura confirmado
+# - pullback: largo si en tendencia 1 la vela toca el rangoBajo y cierra por encima
+#   (corto si en tendencia -1 toca el rangoAlto y cierra por debajo)
+ENTRY_RULES = ('tendencia', 'ruptura', 'pullback')
+
+# Lados operados
+DIRECTIONS = ('long', 'short', 'both')
+
+# Stops disponibles: rango (rangoBajo para largos, rangoAlto para cortos) o ninguno
+STOP_RULES = ('rango', 'none')
+
+# Motivos de cierre de una operación
+EXIT_REASONS = ('senal', 'stop', 'fin')
+
+
+def pullback_states(high, low, parte_alta, parte_baja, minimum_tresure=0.21):
+    """
+    Recorre la detección y guarda el estado de cada vela
+
+    Parameters:
+    - high, low, parte_alta, parte_baja: arrays de igual longitud
+    - minimum_tresure: recorrido mínimo (%) de los altos/bajos (ver supera_umbral)
+
+    Returns:
+    - diccionario de arrays por vela:
+      tendencia, rangoAlto, rangoBajo (estado tras procesar la vela) y
+      ruptura (1/-1 en la vela que confirma un alto/bajo, 0 en el resto)
+    """
+    n = len(high)
+    ruptura = np.zeros(n, dtype=np.int8)
+    if n == 0:
+        return {'tendencia': np.zeros(0, dtype=np.int8), 'rangoAlto': np.empty(0), 'rangoBajo': np.empty(0), 'ruptura': ruptura}
+
+    # Listas de Python: el acceso por posición es mucho más rápido que sobre arrays
+    high = np.asarray(high, dtype=float).tolist()
+    low = np.asarray(low, dtype=float).tolist()
+    parte_alta = np.asarray(parte_alta, dtype=float).tolist()
+    parte_baja = np.asarray(parte_baja, dtype=float).tolist()
+
+    # Solo se guardan los cambios: los rangos cambian con cada marcador y la
+    # tendencia rara vez; el valor por vela se rellena después con NumPy
+    estado = estado_inicial(high, low)
+    cambios_rango = [(0, estado[0], estado[1])]
+    cambios_tendencia = [(0, 0)]
+    tendencia_actual = 0
+    for i in range(1, n - 1):
+        estado, marcadores = paso_pullback(i, high, low, parte_alta, parte_baja, estado, minimum_tresure)
+        if marcadores:
+            cambios_rango.append((i, estado[0], estado[1]))
+            ruptura[i + 1] = 1 if marcadores[0][0] == 'altos' else -1
+        if estado[2] != tendencia_actual:
+            tendencia_actual = estado[2]
+            cambios_tendencia.append((i, tendencia_actual))
+
+    indices, alto, bajo = (np.asarray(columna) for columna in zip(*cambios_rango))
+    posiciones = np.searchsorted(indices, np.arange(n), side='right') - 1
+    indices_tendencia, valores_tendencia = (np.asarray(columna) for columna in zip(*cambios_tendencia))
+    tendencia = valores_tendencia[np.searchsorted(indices_tendencia, np.arange(n), side='right') - 1]
+    return {
+        'tendencia': tendencia.astype(np.int8),
+        'rangoAlto': alto[posiciones].astype(float),
+        'rangoBajo': bajo[posiciones].astype(float),
+        'ruptura': ruptura
+    }
+
+
+def entry_signals(estados, low, high, close, entry='tendencia', direction='both', exit_on_trend=False):
+    """
+    Señales conocidas al cierre de cada vela
+
+    Parameters:
+    - estados: salida de pullback_states
+    - low, high, close: arrays de precios
+    - entry: regla de entrada (ver ENTRY_RULES)
+    - direction: lados operados (ver DIRECTIONS); las señales del lado no operado cierran la posición
+    - exit_on_trend: cerrar la posición cuando la tendencia se gira en contra
+
+    Returns:
+    - array float: 1 (largo), -1 (corto), 0 (cerrar) o NaN (sin cambios)
+    """
+    if entry not in ENTRY_RULES:
+        raise ValueError(f"Regla de entrada no soportada: {entry}. Use una de {ENTRY_RULES}")
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Dirección no soportada: {direction}. Use una de {DIRECTIONS}")
+
+    tendencia = estados['tendencia']
+    n = len(tendencia)
+    anterior = np.r_[0, tendencia[:-1]]
+    giro = (tendencia != anterior) & (tendencia != 0)
+
+    senal = np.zeros(n, dtype=np.int8)
+    if entry == 'tendencia':
+        senal[giro] = tendencia[giro]
+    elif entry == 'ruptura':
+        senal = estados['ruptura'].copy()
+    else:
+        # Rangos conocidos al cierre de t: estado tras el paso t-1
+        alto = np.r_[np.nan, estados['rangoAlto'][:-1]]
+        bajo = np.r_[np.nan, estados['rangoBajo'][:-1]]
+        senal[(tendencia == 1) & (low <= bajo) & (close > bajo)] = 1
+        senal[(tendencia == -1) & (high >= alto) & (close < alto)] = -1
+
+    objetivo = np.full(n, np.nan)
+    if exit_on_trend:
+        objetivo[giro] = 0
+    if direction == 'long':
+        objetivo[senal == -1] = 0
+        objetivo[senal == 1] = 1
+    elif direction == 'short':
+        objetivo[senal == 1] = 0
+        objetivo[senal == -1] = -1
+    else:
+        objetivo[senal != 0] = senal[senal != 0]
+    return objetivo
+
+
+def simulate(open_, high, low, close, objetivo, stop_largo=None, stop_corto=None, fee=0.0, slippage=0.0):
+    """
+    Simula las señales sin bucles por vela
+
+    La señal del cierre de t fija la posición desde la apertura de t+1. Un stop
+    tocado durante la vela cierra la operación al nivel del stop (o a la
+    apertura si abre más allá) y la posición queda plana hasta la siguiente señal.
+
+    Parameters:
+    - open_, high, low, close: arrays de precios
+    - objetivo: salida de entry_signals
+    - stop_largo, stop_corto: nivel de stop vigente durante cada vela (NaN = sin stop)
+    - fee, slippage: coste por lado como fracción del precio
+
+    Returns:
+    - (barras, operaciones): diccionarios de arrays por vela
+      (position, equity, drawdown, stopped) y por operación
+      (entry_index, exit_index, direction, entry_price, exit_price, return, exit_reason)
+    """
+    open_ = np.asarray(open_, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    coste = fee + slippage
+
+    # Posición deseada y segmento (cada señal abre uno) desplazados una vela
+    hay_senal = ~np.isnan(objetivo)
+    segmento = np.r_[0, np.cumsum(hay_senal)[:-1]]
+    indices = np.where(hay_senal, np.arange(n), 0)
+    np.maximum.accumulate(indices, out=indices)
+    rellenado = np.where(np.cumsum(hay_senal) > 0, objetivo[indices], 0)
+    deseada = np.r_[0, rellenado[:-1]].astype(np.int8)
+
+    # Stops tocados (solo cuenta el primero de cada segmento)
+    precio_stop = np.full(n, np.nan)
+    tocado = np.zeros(n, dtype=bool)
+    if stop_largo is not None:
+        largo = (deseada == 1) & (low <= stop_largo)
+        tocado |= largo
+        precio_stop[largo] = np.minimum(open_[largo], stop_largo[largo])
+    if stop_corto is not None:
+        corto = (deseada == -1) & (high >= stop_corto)
+        tocado |= corto
+        precio_stop[corto] = np.maximum(open_[corto], stop_corto[corto])
+
+    previos = np.cumsum(tocado) - tocado
+    inicios = np.flatnonzero(np.diff(segmento, prepend=-1))
+    base = np.repeat(previos[inicios], np.diff(np.r_[inicios, n]))
+    activa = (previos - base) == 0
+    posicion = np.where(activa, deseada, 0).astype(np.int8)
+    parado = tocado & activa
+
+    # Posición efectiva al cierre de la vela anterior (un stop la deja plana)
+    previa = np.r_[0, np.where(parado, 0, posicion)[:-1]]
+    cierre_previo = np.r_[open_[:1], close[:-1]]
+    fin = np.where(parado, precio_stop, close)
+
+    hueco = previa * (open_ / cierre_previo - 1)
+    vela = posicion * (fin / open_ - 1)
+    lados = np.abs(posicion - previa) + parado * np.abs(posicion)
+    multiplicador = (1 + hueco) * (1 + vela) - lados * coste
+    equity = np.cumprod(multiplicador)
+    drawdown = equity / np.maximum.accumulate(equity) - 1 if n else equity
+
+    # Operaciones: empiezan cuando cambia la posición y terminan con stop, señal o al final
+    entradas = np.flatnonzero((posicion != 0) & (posicion != previa))
+    siguiente_inicio = np.r_[(posicion != 0)[1:] & (posicion != previa)[1:], True]
+    siguiente_plana = np.r_[posicion[1:] == 0, True]
+    salidas = np.flatnonzero((posicion != 0) & (parado | siguiente_inicio | siguiente_plana))
+
+    direccion = posicion[entradas].astype(np.int8)
+    precio_entrada = open_[entradas]
+    ultima = salidas == n - 1
+    motivo = np.where(parado[salidas], 1, np.where(ultima, 2, 0)).astype(np.int8)
+    precio_salida = np.where(
+        motivo == 1,
+        precio_stop[salidas],
+        np.where(ultima, close[salidas], open_[np.minimum(salidas + 1, n - 1)])
+    )
+    # Las operaciones que siguen abiertas al final no pagan la salida
+    retorno = direccion * (precio_salida / precio_entrada - 1) - coste * (2 - (motivo == 2))
+
+    barras = {'position': posicion, 'equity': equity, 'drawdown': drawdown, 'stopped': parado}
+    operaciones = {
+        'entry_index': entradas,
+        'exit_index': salidas,
+        'direction': direccion,
+        'entry_price': precio_entrada,
+        'exit_price': precio_salida,
+        'return': retorno,
+        'exit_reason': np.asarray(EXIT_REASONS, dtype=object)[motivo],
+    }
+    return barras, operaciones
+
+
+def summarize(barras, operaciones):
+    """
+    Métricas del backtest
+
+    Returns:
+    - diccionario con total_return, max_drawdown, trades, win_rate, avg_win,
+      avg_loss, expectancy, profit_factor y exposure (valores None si no aplican)
+    """
+    retornos = operaciones['return']
+    ganadoras = retornos[retornos > 0]
+    perdedoras = retornos[retornos <= 0]
+    equity = barras['equity']
+    perdidas = -perdedoras.sum()
+    return {
+        'total_return': float(equity[-1] - 1) if len(equity) else 0.0,
+        'max_drawdown': float(barras['drawdown'].min()) if len(equity) else 0.0,
+        'trades': int(len(retornos)),
+        'win_rate': float(len(ganadoras) / len(retornos)) if len(retornos) else None,
+        'avg_win': float(ganadoras.mean()) if len(ganadoras) else None,
+        'avg_loss': float(perdedoras.mean()) if len(perdedoras) else None,
+        'expectancy': float(retornos.mean()) if len(retornos) else None,
+        'profit_factor': float(ganadoras.sum() / perdidas) if perdidas > 0 else None,
+        'exposure': float(np.mean(barras['position'] != 0)) if len(equity) else 0.0,
+    }
+
+
+def backtest_states(estados, open_, high, low, close, entry='tendencia', direction='both', stop='rango',
+                    exit_on_trend=False, fee=0.0, slippage=0.0):
+    """
+    Backtest a partir de los estados ya calculados (pullback_states)
+
+    Permite probar varias reglas sobre la misma detección sin repetirla.
+
+    Returns:
+    - (barras, operaciones, resumen): ver simulate y summarize
+    """
+    if stop not in STOP_RULES:
+        raise ValueError(f"Stop no soportado: {stop}. Use uno de {STOP_RULES}")
+    objetivo = entry_signals(estados, low, high, close, entry, direction, exit_on_trend)
+
+    stop_largo = stop_corto = None
+    if stop == 'rango':
+        # Nivel vigente durante t: conocido al cierre de t-1 (estado tras el paso t-2)
+        stop_largo = np.r_[np.nan, np.nan, estados['rangoBajo'][:-2]][:len(close)]
+        stop_corto = np.r_[np.nan, np.nan, estados['rangoAlto'][:-2]][:len(close)]
+
+    barras, operaciones = simulate(open_, high, low, close, objetivo, stop_largo, stop_corto, fee, slippage)
+    return barras, operaciones, summarize(barras, operaciones)
+
+
+def run_backtest(open_, high, low, close, entry='tendencia', direction='both', stop='rango',
+                 exit_on_trend=False, fee=0.0, slippage=0.0, minimum_tresure=0.21):
+    """
+    Backtest de las señales de pullbacks sobre arrays OHLC
+
+    Parameters:
+    - open_, high, low, close: arrays de precios de igual longitud
+    - entry: regla de entrada (ver ENTRY_RULES)
+    - direction: long, short o both
+    - stop: rango (rangoBajo/rangoAlto conocido al cierre de la vela anterior) o none
+    - exit_on_trend: cerrar la posición cuando la tendencia se gira en contra
+    - fee, slippage: coste por lado como fracción del precio
+    - minimum_tresure: recorrido mínimo (%) de los altos/bajos de la detección
+
+    Returns:
+    - (barras, operaciones, resumen): ver simulate y summarize
+    """
+    open_ = np.asarray(open_, dtype=float)
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    close = np.asarray(close, dtype=float)
+
+    estados = pullback_states(high, low, np.maximum(open_, close), np.minimum(open_, close), minimum_tresure)
+    return backtest_states(estados, open_, high, low, close, entry, direction, stop, exit_on_trend, fee, slippage)
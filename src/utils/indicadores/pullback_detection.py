@@ -1,17 +1,95 @@
 import math
 import numpy as np
+from src.utils.indicadores.pullback_engine import (
+    detect_pullbacks_arrays,
+    detect_pullback_markers,
+    supera_umbral,
+    MARKER_COLUMNS
+)
+
+# Modos de detección disponibles
+MODES = ('legacy', 'fast', 'verify')
+
 
 class PullbackDetection:
-    def __init__(self, data, minimum_tresure=0.21):
+    def __init__(self, data, minimum_tresure=0.21, mode='legacy'):
+        if mode not in MODES:
+            raise ValueError(f"Modo de detección no soportado: {mode}. Use uno de {MODES}")
         self.data = data
         self.minimum_tresure = minimum_tresure
+        self.mode = mode
 
 
     def detect_pullbacks(self, data, minimum_tresure=None):
         # Usar el valor proporcionado o el del constructor
         if minimum_tresure is None:
             minimum_tresure = self.minimum_tresure
-            
+
+        if self.mode == 'fast':
+            return self._detect_pullbacks_fast(data, minimum_tresure)
+        if self.mode == 'verify':
+            return self._detect_pullbacks_verify(data, minimum_tresure)
+        return self._detect_pullbacks_legacy(data, minimum_tresure)
+
+    def detect_pullback_markers(self, data, minimum_tresure=None):
+        """
+        Detección con salida dispersa: no añade columnas a data
+
+        Siempre usa el motor de arrays (idéntico al legacy).
+
+        Returns:
+        - (marcadores, rangos): lista de (tipo, index, precio) y diccionario de rangos
+        """
+        if minimum_tresure is None:
+            minimum_tresure = self.minimum_tresure
+        if 'parteAlta' in data and 'parteBaja' in data:
+            parte_alta = data['parteAlta'].to_numpy(dtype=float)
+            parte_baja = data['parteBaja'].to_numpy(dtype=float)
+        else:
+            open_ = data['open'].to_numpy(dtype=float)
+            close = data['close'].to_numpy(dtype=float)
+            parte_alta = np.maximum(open_, close)
+            parte_baja = np.minimum(open_, close)
+        return detect_pullback_markers(
+            data['high'].to_numpy(dtype=float),
+            data['low'].to_numpy(dtype=float),
+            parte_alta,
+            parte_baja,
+            minimum_tresure=minimum_tresure
+        )
+
+    def _detect_pullbacks_fast(self, data, minimum_tresure):
+        """
+        Detección sobre arrays de NumPy (ver pullback_engine)
+        Escribe las columnas de marcadores y tendencia en data y lo devuelve
+        """
+        columnas, rangos = detect_pullbacks_arrays(
+            data['open'].to_numpy(dtype=float),
+            data['high'].to_numpy(dtype=float),
+            data['low'].to_numpy(dtype=float),
+            data['close'].to_numpy(dtype=float),
+            parte_alta=data['parteAlta'].to_numpy(dtype=float) if 'parteAlta' in data else None,
+            parte_baja=data['parteBaja'].to_numpy(dtype=float) if 'parteBaja' in data else None,
+            tendencia_inicial=data['tendencia'].to_numpy() if 'tendencia' in data else None,
+            minimum_tresure=minimum_tresure
+        )
+        for columna, valores in columnas.items():
+            data[columna] = valores
+        return data, rangos
+
+    def _detect_pullbacks_verify(self, data, minimum_tresure):
+        """
+        Ejecuta ambos motores y falla si el resultado no es idéntico
+        Devuelve el resultado del modo legacy
+        """
+        data_fast, rangos_fast = self._detect_pullbacks_fast(data.copy(), minimum_tresure)
+        data_legacy, rangos_legacy = self._detect_pullbacks_legacy(data, minimum_tresure)
+        diferencias = compare_results(data_legacy, rangos_legacy, data_fast, rangos_fast)
+        if diferencias:
+            raise AssertionError(f"El motor fast difiere del legacy en: {', '.join(diferencias)}")
+        return data_legacy, rangos_legacy
+
+    def _detect_pullbacks_legacy(self, data, minimum_tresure):
         #configuracion inicial 
         rangoAlto=data.iloc[0]["high"]
         rangoBajo=data.iloc[0]["low"]
@@ -37,54 +115,49 @@ class PullbackDetection:
             # Alto de estructura mayor (rompe rangos) - detección de pullback
             if(current_candle["high"]>=previous_candle["high"] and tendencia==1):
                if (current_candle["high"]>next_candle["high"] ):     
-                   data.loc[i, 'altos'] = current_candle["high"]
-                   rangoAlto=current_candle["high"]
                    index=indexPocs[np.argmin(pocAltosArray)]
-                   rangoBajo = min(pocAltosArray)
-                   data.loc[index, 'pocAltos'] = rangoBajo
-                   data.loc[index+1:, 'pocAltos'] = math.nan
-                   RealRangoAlto = rangoAlto
-                   RealRangoBajo = rangoBajo
- 
-                   if data.iloc[index]["pocAltos"]!=data.iloc[index]["altos"] and not math.isnan(data.iloc[index]["altos"]):
-                        data.loc[index, 'pocAltos'] = math.nan
-                        pocAltosArray.pop(0)
-                        indexPocs.pop(0)
-                        index=indexPocs[np.argmin(pocAltosArray)]
-                        rangoBajo = min(pocAltosArray)
-                        data.loc[index, 'pocAltos'] = rangoBajo
-                        RealRangoBajo = rangoBajo
- 
+                   pocCandidato = min(pocAltosArray)
+                   # El POC cae sobre una vela que ya es alto: se descarta y se busca en el resto
+                   if pocCandidato!=data.iloc[index]["altos"] and not math.isnan(data.iloc[index]["altos"]):
+                        index=indexPocs[1:][np.argmin(pocAltosArray[1:])]
+                        pocCandidato = min(pocAltosArray[1:])
 
-                   pocAltosArray=[]
-                   pocBajosArray=[]
-                   indexPocs=[]
+                   # Solo rompe la estructura si el recorrido desde el POC alcanza el umbral
+                   if supera_umbral(current_candle["high"], pocCandidato, minimum_tresure):
+                       data.loc[i, 'altos'] = current_candle["high"]
+                       rangoAlto=current_candle["high"]
+                       rangoBajo = pocCandidato
+                       data.loc[index, 'pocAltos'] = rangoBajo
+                       data.loc[index+1:, 'pocAltos'] = math.nan
+                       RealRangoAlto = rangoAlto
+                       RealRangoBajo = rangoBajo
+
+                       pocAltosArray=[]
+                       pocBajosArray=[]
+                       indexPocs=[]
                     
 
             # Bajo de estructura mayor (rompe rangos) - detección de pullback
             if(current_candle["low"]<=previous_candle["low"]  and tendencia==-1):
                 if (current_candle["low"]<next_candle["low"]   ):
-                    data.loc[i, 'bajos'] = current_candle["low"]
-                    rangoBajo=current_candle["low"]
                     index=indexPocs[np.argmax(pocBajosArray)]
-                    rangoAlto = max(pocBajosArray)
-                    data.loc[index, 'pocBajos'] = rangoAlto
-                    data.loc[index+1:, 'pocBajos'] = math.nan
-                    RealRangoAlto = rangoAlto
-                    RealRangoBajo = rangoBajo
-                    
-                    if data.iloc[index]["pocBajos"]!=data.iloc[index]["bajos"] and not math.isnan(data.iloc[index]["bajos"]):
-                        data.loc[index, 'pocBajos'] = math.nan
-                        pocBajosArray.pop(0)
-                        indexPocs.pop(0)
-                        index=indexPocs[np.argmax(pocBajosArray)]
-                        rangoAlto = max(pocBajosArray)
+                    pocCandidato = max(pocBajosArray)
+                    if pocCandidato!=data.iloc[index]["bajos"] and not math.isnan(data.iloc[index]["bajos"]):
+                        index=indexPocs[1:][np.argmax(pocBajosArray[1:])]
+                        pocCandidato = max(pocBajosArray[1:])
+
+                    if supera_umbral(current_candle["low"], pocCandidato, minimum_tresure):
+                        data.loc[i, 'bajos'] = current_candle["low"]
+                        rangoBajo=current_candle["low"]
+                        rangoAlto = pocCandidato
                         data.loc[index, 'pocBajos'] = rangoAlto
+                        data.loc[index+1:, 'pocBajos'] = math.nan
                         RealRangoAlto = rangoAlto
+                        RealRangoBajo = rangoBajo
 
-                    pocAltosArray=[]
-                    pocBajosArray=[]
-                    indexPocs=[]      
+                        pocAltosArray=[]
+                        pocBajosArray=[]
+                        indexPocs=[]      
 
             pocBajosArray.append(current_candle["high"])
             pocAltosArray.append(current_candle["low"])
@@ -117,3 +190,23 @@ class PullbackDetection:
             'minimum_tresure': minimum_tresure
         }
         return data, rangos
+
+
+def compare_results(data_a, rangos_a, data_b, rangos_b):
+    """
+    Compara bit a bit dos resultados de detect_pullbacks
+
+    Returns:
+    - Lista con los nombres de las columnas/rangos que difieren (vacía si son idénticos)
+    """
+    diferencias = []
+    for columna in MARKER_COLUMNS + ['tendencia']:
+        a = data_a[columna].to_numpy(dtype=float)
+        b = data_b[columna].to_numpy(dtype=float)
+        if a.shape != b.shape or not np.array_equal(a.view(np.int64), b.view(np.int64)):
+            diferencias.append(columna)
+    for clave in ('rangoAlto', 'rangoBajo', 'tendencia', 'minimum_tresure'):
+        a, b = rangos_a[clave], rangos_b[clave]
+        if not (a == b or (isinstance(a, float) and math.isnan(a) and math.isnan(b))):
+            diferencias.append(f"rangos.{clave}")
+    return diferencias
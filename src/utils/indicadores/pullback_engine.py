@@ -0,0 +1,213 @@
+"""
+Motor de detección de pullbacks sobre arrays de NumPy
+
+Reproduce exactamente la lógica de PullbackDetection.detect_pullbacks (modo
+legacy) pero sin recorrer el DataFrame con iloc/loc: trabaja sobre arrays
+planos y escribe los resultados en arrays preasignados.
+
+Observaciones sobre la lógica original que permiten el recorrido lineal:
+- pocAltosArray/pocBajosArray/indexPocs siempre contienen las velas
+  contiguas desde el último reinicio hasta la vela anterior, por lo que se
+  representan con el índice de inicio del segmento.
+- La limpieza data.loc[index+1:, 'pocAltos'] nunca encuentra valores previos
+  (todos los POC anteriores quedan antes del segmento actual), así que no es
+  necesario ejecutarla.
+"""
+import math
+import numpy as np
+
+# Columnas de marcadores que produce el motor
+MARKER_COLUMNS = ['altos', 'bajos', 'pocAltos', 'pocBajos', 'circulosAzul', 'circulosNaranja']
+
+# Tipos de marcador de la salida dispersa (los círculos se derivan de ellos:
+# circulosAzul = altos/bajos y circulosNaranja = pocAltos/pocBajos)
+MARKER_TYPES = ['altos', 'bajos', 'pocAltos', 'pocBajos']
+
+
+def _segment_min(values, start, end):
+    """
+    Replica np.argmin(lista) + min(lista) del modo legacy sobre values[start:end]
+
+    Returns:
+    - (índice absoluto, valor mínimo)
+    """
+    segment = np.asarray(values[start:end], dtype=float)
+    k = int(np.argmin(segment))
+    value = segment[k]
+    if math.isnan(value):
+        # np.argmin apunta al primer NaN, pero min() de Python lo ignora salvo al inicio
+        value = min(segment.tolist())
+    return start + k, value
+
+
+def _segment_max(values, start, end):
+    """
+    Replica np.argmax(lista) + max(lista) del modo legacy sobre values[start:end]
+
+    Returns:
+    - (índice absoluto, valor máximo)
+    """
+    segment = np.asarray(values[start:end], dtype=float)
+    k = int(np.argmax(segment))
+    value = segment[k]
+    if math.isnan(value):
+        value = max(segment.tolist())
+    return start + k, value
+
+
+def supera_umbral(extremo, poc, minimum_tresure):
+    """
+    Indica si el recorrido entre el POC y el nuevo alto/bajo alcanza el umbral
+
+    El recorrido se mide en % sobre el POC: |extremo - poc| / |poc| * 100.
+    Con minimum_tresure <= 0 (o precios NaN) se aceptan todos los altos/bajos.
+    """
+    if not minimum_tresure or minimum_tresure <= 0:
+        return True
+    if poc == 0:
+        return True
+    return not (abs(extremo - poc) / abs(poc) * 100 < minimum_tresure)
+
+
+def paso_pullback(i, high, low, parte_alta, parte_baja, estado, minimum_tresure=0.0):
+    """
+    Procesa la vela i (requiere las velas i-1 e i+1)
+
+    Parameters:
+    - high, low, parte_alta, parte_baja: secuencias indexables por posición
+    - estado: tupla (rango_alto, rango_bajo, tendencia, inicio_segmento, tipo_segmento);
+      tipo_segmento es 1/-1 si el segmento lo abrió un alto/bajo y 0 al inicio
+    - minimum_tresure: recorrido mínimo (%) entre el POC y el alto/bajo para
+      marcarlo (ver supera_umbral); por debajo la vela no rompe la estructura
+
+    Returns:
+    - (nuevo estado, marcadores): marcadores es una lista de (columna, index, valor)
+      con las celdas que se marcan en esta vela
+    """
+    rango_alto, rango_bajo, tendencia, inicio_segmento, tipo_segmento = estado
+
+    if rango_alto <= parte_alta[i]:
+        tendencia = 1
+    elif rango_bajo >= parte_baja[i]:
+        tendencia = -1
+
+    # Alto de estructura mayor (rompe rangos)
+    if tendencia == 1 and high[i] >= high[i - 1] and high[i] > high[i + 1]:
+        index, poc = _segment_min(low, inicio_segmento, i)
+        # El POC cae sobre una vela que ya es alto: se descarta y se busca en el resto
+        if index == inicio_segmento and tipo_segmento == 1 and poc != high[index]:
+            index, poc = _segment_min(low, inicio_segmento + 1, i)
+        if supera_umbral(high[i], poc, minimum_tresure):
+            marcadores = [('altos', i, high[i]), ('pocAltos', index, poc)]
+            return (high[i], poc, tendencia, i, 1), marcadores
+
+    # Bajo de estructura mayor (rompe rangos)
+    if tendencia == -1 and low[i] <= low[i - 1] and low[i] < low[i + 1]:
+        index, poc = _segment_max(high, inicio_segmento, i)
+        if index == inicio_segmento and tipo_segmento == -1 and poc != low[index]:
+            index, poc = _segment_max(high, inicio_segmento + 1, i)
+        if supera_umbral(low[i], poc, minimum_tresure):
+            marcadores = [('bajos', i, low[i]), ('pocBajos', index, poc)]
+            return (poc, low[i], tendencia, i, -1), marcadores
+
+    return (rango_alto, rango_bajo, tendencia, inicio_segmento, tipo_segmento), []
+
+
+def estado_inicial(high, low):
+    """
+    Estado de la detección antes de procesar la vela 1
+    """
+    return (high[0], low[0], 0, 0, 0)
+
+
+def detect_pullbacks_arrays(open_, high, low, close, parte_alta=None, parte_baja=None,
+                            tendencia_inicial=None, minimum_tresure=0.21):
+    """
+    Detecta pullbacks sobre arrays OHLC
+
+    Parameters:
+    - open_, high, low, close: arrays de precios (float64) de igual longitud
+    - parte_alta, parte_baja: cuerpo de la vela; si no se indican se calculan
+      como max/min(open, close)
+    - tendencia_inicial: array con la tendencia de entrada (se conservan la
+      primera y la última vela, igual que en el modo legacy)
+    - minimum_tresure: recorrido mínimo (%) de los altos/bajos (ver supera_umbral)
+
+    Returns:
+    - (columnas, rangos): diccionario de arrays por columna y diccionario de rangos
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    if parte_alta is None:
+        parte_alta = np.maximum(open_, close)
+    if parte_baja is None:
+        parte_baja = np.minimum(open_, close)
+    parte_alta = np.asarray(parte_alta, dtype=float)
+    parte_baja = np.asarray(parte_baja, dtype=float)
+
+    n = len(high)
+    salida = {
+        'altos': np.full(n, np.nan),
+        'bajos': np.full(n, np.nan),
+        'pocAltos': np.full(n, np.nan),
+        'pocBajos': np.full(n, np.nan),
+    }
+    if tendencia_inicial is None:
+        tendencia_col = np.zeros(n, dtype=np.int64)
+    else:
+        tendencia_col = np.array(tendencia_inicial, copy=True)
+
+    # configuracion inicial (IndexError si no hay velas, igual que legacy)
+    estado = estado_inicial(high, low)
+
+    for i in range(1, n - 1):
+        estado, marcadores = paso_pullback(i, high, low, parte_alta, parte_baja, estado, minimum_tresure)
+        for columna, index, valor in marcadores:
+            salida[columna][index] = valor
+        tendencia_col[i] = estado[2]
+
+    # Círculos AZUL en todas las Y, NARANJA en todos los POC (bajos/pocBajos prevalecen)
+    salida['tendencia'] = tendencia_col
+    salida['circulosAzul'] = np.where(np.isnan(salida['bajos']), salida['altos'], salida['bajos'])
+    salida['circulosNaranja'] = np.where(np.isnan(salida['pocBajos']), salida['pocAltos'], salida['pocBajos'])
+
+    return salida, _rangos(estado, minimum_tresure)
+
+
+def detect_pullback_markers(high, low, parte_alta, parte_baja, minimum_tresure=0.21):
+    """
+    Detecta pullbacks y devuelve solo los marcadores (salida dispersa)
+
+    Mismo resultado que detect_pullbacks_arrays pero sin columnas por vela:
+    la memoria es proporcional al número de marcadores, no al de velas.
+
+    Parameters:
+    - high, low, parte_alta, parte_baja: arrays de igual longitud
+    - minimum_tresure: recorrido mínimo (%) de los altos/bajos (ver supera_umbral)
+
+    Returns:
+    - (marcadores, rangos): lista de (tipo, index, precio) ordenada por index
+      y diccionario de rangos
+    """
+    high = np.asarray(high, dtype=float)
+    low = np.asarray(low, dtype=float)
+    parte_alta = np.asarray(parte_alta, dtype=float)
+    parte_baja = np.asarray(parte_baja, dtype=float)
+
+    estado = estado_inicial(high, low)
+    marcadores = []
+    for i in range(1, len(high) - 1):
+        estado, nuevos = paso_pullback(i, high, low, parte_alta, parte_baja, estado, minimum_tresure)
+        marcadores.extend(nuevos)
+    marcadores.sort(key=lambda marcador: marcador[1])
+    return marcadores, _rangos(estado, minimum_tresure)
+
+
+def _rangos(estado, minimum_tresure):
+    rango_alto, rango_bajo, tendencia = estado[:3]
+    return {
+        'rangoBajo': rango_bajo,
+        'rangoAlto': rango_alto,
+        'tendencia': tendencia,
+        'minimum_tresure': minimum_tresure
+    }
@@ -0,0 +1,299 @@
+"""
+Detector de pullbacks incremental
+
+Mantiene entre llamadas el estado del bucle de detect_pullbacks (rangoAlto,
+rangoBajo, tendencia y el segmento pocAltosArray/pocBajosArray/indexPocs)
+para procesar solo las velas nuevas en cada actualización.
+
+La vela i solo se puede procesar cuando llega la vela i+1, por lo que la
+última vela recibida siempre queda pendiente. Si la vela abierta (o las
+últimas `profundidad_revision` velas) cambian, se deshacen los pasos que
+dependían de ellas y se emiten los marcadores retractados.
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+from src.utils.indicadores.pullback_engine import paso_pullback, estado_inicial
+
+# Umbral de velas descartables antes de recortar el buffer
+_RECORTE_MINIMO = 256
+
+
+class IncrementalPullbackDetection:
+    def __init__(self, minimum_tresure=0.21, profundidad_revision=2):
+        """
+        Inicializa el detector vacío
+
+        Parameters:
+        - minimum_tresure: recorrido mínimo (%) de los altos/bajos (ver supera_umbral)
+        - profundidad_revision: número de velas finales que se pueden revisar
+          (la vela abierta y las anteriores) sin reconstruir el detector
+        """
+        if profundidad_revision < 1:
+            raise ValueError("profundidad_revision debe ser al menos 1")
+        self.minimum_tresure = minimum_tresure
+        self.profundidad_revision = profundidad_revision
+        self._reset()
+
+    def _reset(self):
+        # Índice absoluto de la primera vela del buffer
+        self._offset = 0
+        self._time = []
+        self._high = []
+        self._low = []
+        self._parte_alta = []
+        self._parte_baja = []
+        # Estado tras procesar las velas 1.._siguiente-1
+        self._estado = None
+        self._siguiente = 1
+        # (vela, estado previo, marcadores) de los últimos pasos, para poder deshacerlos
+        self._pasos = deque(maxlen=self.profundidad_revision)
+
+    def __len__(self):
+        return self._offset + len(self._time)
+
+    @property
+    def rangos(self):
+        """
+        Rangos actuales con el mismo formato que PullbackDetection.detect_pullbacks
+        """
+        estado = self._estado_actual()
+        if estado is None:
+            return {}
+        return {
+            'rangoBajo': estado[1],
+            'rangoAlto': estado[0],
+            'tendencia': estado[2],
+            'minimum_tresure': self.minimum_tresure
+        }
+
+    @property
+    def last_time(self):
+        return self._time[-1] if self._time else None
+
+    def _estado_actual(self):
+        if self._estado is not None:
+            return self._estado
+        if self._time:
+            return estado_inicial(self._high, self._low)
+        return None
+
+    def update(self, new_candles):
+        """
+        Incorpora velas nuevas o revisadas y procesa solo lo necesario
+
+        Las velas con time igual a una de las últimas `profundidad_revision`
+        velas la reemplazan; las posteriores a la última se añaden y las más
+        antiguas se ignoran (se asume que las velas cerradas no cambian).
+
+        Parameters:
+        - new_candles: DataFrame con columnas time, open, high, low, close
+          (parteAlta/parteBaja opcionales), ordenado por time
+
+        Returns:
+        - Lista de eventos {'event': 'add'|'remove', 'marker', 'index', 'time', 'price'}
+        """
+        if new_candles is None or len(new_candles) == 0:
+            return []
+
+        times = new_candles['time'].tolist()
+        high = new_candles['high'].to_numpy(dtype=float)
+        low = new_candles['low'].to_numpy(dtype=float)
+        if 'parteAlta' in new_candles and 'parteBaja' in new_candles:
+            parte_alta = new_candles['parteAlta'].to_numpy(dtype=float)
+            parte_baja = new_candles['parteBaja'].to_numpy(dtype=float)
+        else:
+            open_ = new_candles['open'].to_numpy(dtype=float)
+            close = new_candles['close'].to_numpy(dtype=float)
+            parte_alta = np.maximum(open_, close)
+            parte_baja = np.minimum(open_, close)
+        return self.update_arrays(times, high.tolist(), low.tolist(), parte_alta.tolist(), parte_baja.tolist())
+
+    def update_arrays(self, times, high, low, parte_alta, parte_baja):
+        """
+        Igual que update pero con secuencias ya extraídas (sin DataFrame)
+
+        Pensado para llamadas muy frecuentes con pocas velas (replay vela a vela)
+
+        Parameters:
+        - times: tiempos de las velas (comparables entre sí), en orden
+        - high, low, parte_alta, parte_baja: secuencias de float de igual longitud
+
+        Returns:
+        - Lista de eventos como en update
+        """
+        retractados = []
+        revisables = self._indices_revisables()
+        for k, t in enumerate(times):
+            vela = (t, high[k], low[k], parte_alta[k], parte_baja[k])
+            if self._time and t <= self._time[-1]:
+                index = revisables.get(t)
+                if index is None or self._vela(index) == vela:
+                    continue
+                retractados.extend(self._deshacer_desde(index))
+                self._asignar(index, vela)
+            else:
+                self._anexar(vela)
+        eventos = self._eventos(retractados, self._procesar())
+        self._recortar()
+        return eventos
+
+    def _indices_revisables(self):
+        n = len(self)
+        inicio = max(self._offset, n - self.profundidad_revision)
+        return {self._time[i - self._offset]: i for i in range(inicio, n)}
+
+    def _vela(self, index):
+        j = index - self._offset
+        return (self._time[j], self._high[j], self._low[j], self._parte_alta[j], self._parte_baja[j])
+
+    def _asignar(self, index, vela):
+        j = index - self._offset
+        self._time[j], self._high[j], self._low[j], self._parte_alta[j], self._parte_baja[j] = vela
+
+    def _anexar(self, vela):
+        self._time.append(vela[0])
+        self._high.append(vela[1])
+        self._low.append(vela[2])
+        self._parte_alta.append(vela[3])
+        self._parte_baja.append(vela[4])
+
+    def _deshacer_desde(self, index):
+        """
+        Deshace los pasos que leen la vela index (pasos index-1 en adelante)
+
+        Returns:
+        - Marcadores (columna, index, valor) que se retiran
+        """
+        retractados = []
+        while self._siguiente - 1 >= max(index - 1, 1):
+            if not self._pasos:
+                raise ValueError(
+                    f"No se puede revisar la vela {index}: supera la profundidad de revisión "
+                    f"({self.profundidad_revision})"
+                )
+            vela, estado_previo, marcadores = self._pasos.pop()
+            retractados.extend(marcadores)
+            self._estado = estado_previo
+            self._siguiente = vela
+        if self._siguiente == 1:
+            # El estado inicial depende de la vela 0, se recalcula al procesar
+            self._estado = None
+        return retractados
+
+    def _procesar(self):
+        """
+        Procesa todas las velas que ya tienen vela siguiente
+
+        Returns:
+        - Marcadores (columna, index, valor) confirmados
+        """
+        confirmados = []
+        n = len(self)
+        if self._siguiente + 1 >= n:
+            return confirmados
+        if self._estado is None:
+            self._estado = estado_inicial(self._high, self._low)
+
+        offset = self._offset
+        estado = self._estado
+        for i in range(self._siguiente, n - 1):
+            # paso_pullback trabaja con índices relativos al buffer
+            rango_alto, rango_bajo, tendencia, inicio, tipo = estado
+            relativo = (rango_alto, rango_bajo, tendencia, inicio - offset, tipo)
+            relativo, marcadores = paso_pullback(
+                i - offset, self._high, self._low, self._parte_alta, self._parte_baja, relativo,
+                self.minimum_tresure
+            )
+            marcadores = [(columna, index + offset, valor) for columna, index, valor in marcadores]
+            self._pasos.append((i, estado, marcadores))
+            estado = relativo[:3] + (relativo[3] + offset, relativo[4])
+            confirmados.extend(marcadores)
+        self._estado = estado
+        self._siguiente = n - 1
+        return confirmados
+
+    def _recortar(self):
+        """
+        Descarta las velas que ningún paso futuro o revisable puede leer
+        """
+        if not self._pasos:
+            return
+        conservar = min(estado[3] for _, estado, _ in self._pasos)
+        conservar = min(conservar, self._estado[3])
+        descartables = conservar - self._offset
+        if descartables < _RECORTE_MINIMO or descartables < len(self._time) // 2:
+            return
+        for buffer in (self._time, self._high, self._low, self._parte_alta, self._parte_baja):
+            del buffer[:descartables]
+        self._offset = conservar
+
+    def _eventos(self, retractados, confirmados):
+        """
+        Compensa retractados y confirmados que coinciden y construye los eventos
+        """
+        def clave(marcador):
+            columna, index, valor = marcador
+            return (columna, index, None if math.isnan(valor) else float(valor))
+
+        claves_retractadas = {clave(m) for m in retractados}
+        claves_confirmadas = {clave(m) for m in confirmados}
+        eventos = []
+        for accion, marcadores, otros in (
+            ('remove', retractados, claves_confirmadas),
+            ('add', confirmados, claves_retractadas),
+        ):
+            for marcador in marcadores:
+                if clave(marcador) in otros:
+                    continue
+                columna, index, valor = marcador
+                eventos.append({
+                    'event': accion,
+                    'marker': columna,
+                    'index': index,
+                    'time': self._time[index - self._offset],
+                    'price': None if math.isnan(valor) else float(valor)
+                })
+        return eventos
+
+    def snapshot(self):
+        """
+        Exporta el estado completo del detector (serializable con pickle)
+        """
+        return {
+            'minimum_tresure': self.minimum_tresure,
+            'profundidad_revision': self.profundidad_revision,
+            'offset': self._offset,
+            'time': list(self._time),
+            'high': list(self._high),
+            'low': list(self._low),
+            'parte_alta': list(self._parte_alta),
+            'parte_baja': list(self._parte_baja),
+            'estado': self._estado,
+            'siguiente': self._siguiente,
+            'pasos': [(vela, estado, list(marcadores)) for vela, estado, marcadores in self._pasos]
+        }
+
+    def restore(self, snapshot):
+        """
+        Restaura el estado exportado con snapshot()
+        """
+        self.minimum_tresure = snapshot['minimum_tresure']
+        self.profundidad_revision = snapshot['profundidad_revision']
+        self._reset()
+        self._offset = snapshot['offset']
+        self._time = list(snapshot['time'])
+        self._high = list(snapshot['high'])
+        self._low = list(snapshot['low'])
+        self._parte_alta = list(snapshot['parte_alta'])
+        self._parte_baja = list(snapshot['parte_baja'])
+        self._estado = snapshot['estado']
+        self._siguiente = snapshot['siguiente']
+        self._pasos.extend((vela, estado, list(marcadores)) for vela, estado, marcadores in snapshot['pasos'])
+        return self
+
+    @classmethod
+    def from_snapshot(cls, snapshot):
+        return cls(snapshot['minimum_tresure'], snapshot['profundidad_revision']).restore(snapshot)
@@ -0,0 +1,139 @@
+"""
+Replay vela a vela de la detección de pullbacks
+
+detect_pullbacks coloca cada marcador en la vela donde está el alto, el bajo
+o el POC, pero esa vela no sabía que lo era: un alto en i se confirma con la
+vela i+1 y su POC puede quedar muchas velas atrás. Con la vela abierta,
+además, los marcadores aparecen y desaparecen mientras se forma.
+
+El replay alimenta un IncrementalPullbackDetection con la historia vela a vela
+(opcionalmente también con los estados intermedios de cada vela) y anota,
+para cada marcador, cuándo apareció por primera vez, cuándo se retiró y
+cuándo quedó definitivo. Cada paso solo procesa la última vela, así que el
+coste es lineal en el número de velas.
+"""
+import math
+import statistics
+
+import numpy as np
+
+from src.utils.indicadores.pullback_engine import MARKER_TYPES
+from src.utils.indicadores.pullback_incremental import IncrementalPullbackDetection
+
+# Columnas de la tabla de marcadores del replay
+REPLAY_COLUMNS = ['marker', 'index', 'price', 'first_seen', 'confirmed_at', 'removals', 'final']
+
+
+def intrabar_path(open_, high, low, close):
+    """
+    Estados intermedios de una vela hasta su cierre (open, high, low, close)
+
+    Sin datos de menor intervalo se supone el recorrido habitual: una vela
+    alcista pasa antes por el mínimo (O-L-H-C) y una bajista por el máximo (O-H-L-C)
+    """
+    if close >= open_:
+        return [
+            (open_, open_, open_, open_),
+            (open_, open_, low, low),
+            (open_, high, low, high),
+            (open_, high, low, close),
+        ]
+    return [
+        (open_, open_, open_, open_),
+        (open_, high, open_, high),
+        (open_, high, low, low),
+        (open_, high, low, close),
+    ]
+
+
+def replay_pullbacks(open_, high, low, close, minimum_tresure=0.21, intrabar=True):
+    """
+    Reproduce la detección vela a vela y registra la vida de cada marcador
+
+    Parameters:
+    - open_, high, low, close: arrays de precios de igual longitud
+    - minimum_tresure: umbral de la detección
+    - intrabar: enviar también los estados intermedios de cada vela
+      (la vela abierta) antes de su cierre
+
+    Returns:
+    - (marcadores, resumen): diccionario de arrays con REPLAY_COLUMNS (un
+      elemento por marcador que llegó a mostrarse) y diccionario de métricas
+      (ver summarize_replay)
+    """
+    open_ = np.asarray(open_, dtype=float).tolist()
+    high = np.asarray(high, dtype=float).tolist()
+    low = np.asarray(low, dtype=float).tolist()
+    close = np.asarray(close, dtype=float).tolist()
+
+    detector = IncrementalPullbackDetection(minimum_tresure=minimum_tresure)
+    # (marcador, index, precio) -> [first_seen, confirmed_at, removals, visible]
+    registro = {}
+    for k in range(len(close)):
+        estados = intrabar_path(open_[k], high[k], low[k], close[k]) if intrabar else [
+            (open_[k], high[k], low[k], close[k])
+        ]
+        for o, h, l, c in estados:
+            eventos = detector.update_arrays([k], [h], [l], [max(o, c)], [min(o, c)])
+            for evento in eventos:
+                if evento['marker'] not in MARKER_TYPES:
+                    continue
+                clave = (evento['marker'], evento['index'], evento['price'])
+                if evento['event'] == 'add':
+                    entrada = registro.get(clave)
+                    if entrada is None:
+                        registro[clave] = [k, k, 0, True]
+                    else:
+                        entrada[1] = k
+                        entrada[3] = True
+                else:
+                    entrada = registro[clave]
+                    entrada[2] += 1
+                    entrada[3] = False
+
+    claves = sorted(registro, key=lambda clave: (clave[1], clave[0]))
+    marcadores = {
+        'marker': np.array([clave[0] for clave in claves], dtype=object),
+        'index': np.array([clave[1] for clave in claves], dtype=np.int64),
+        'price': np.array([math.nan if clave[2] is None else clave[2] for clave in claves], dtype=float),
+        'first_seen': np.array([registro[clave][0] for clave in claves], dtype=np.int64),
+        'confirmed_at': np.array([registro[clave][1] for clave in claves], dtype=np.int64),
+        'removals': np.array([registro[clave][2] for clave in claves], dtype=np.int64),
+        'final': np.array([registro[clave][3] for clave in claves], dtype=bool),
+    }
+    return marcadores, summarize_replay(marcadores, len(close))
+
+
+def summarize_replay(marcadores, velas):
+    """
+    Métricas de repintado y latencia de confirmación
+
+    - repaint_rate: fracción de los marcadores mostrados que se retiraron alguna vez
+    - vanished: marcadores mostrados que no están en el resultado final (un
+      marcador que cambia de vela o de precio cuenta como retirado y nuevo)
+    - lag_*: velas entre la vela del marcador y su aparición definitiva (por tipo)
+    - first_seen_lag_mean: velas hasta la primera aparición (media)
+    """
+    mostrados = len(marcadores['marker'])
+    finales = marcadores['final']
+    repintados = int(np.count_nonzero(marcadores['removals'] > 0))
+    resumen = {
+        'candles': velas,
+        'markers_shown': mostrados,
+        'markers_final': int(np.count_nonzero(finales)),
+        'repainted': repintados,
+        'repaint_rate': repintados / mostrados if mostrados else None,
+        'vanished': int(mostrados - np.count_nonzero(finales)),
+        'first_seen_lag_mean': float(np.mean(marcadores['first_seen'] - marcadores['index'])) if mostrados else None,
+        'lag': {},
+    }
+    retraso = marcadores['confirmed_at'] - marcadores['index']
+    for tipo in MARKER_TYPES:
+        valores = retraso[finales & (marcadores['marker'] == tipo)].tolist()
+        resumen['lag'][tipo] = {
+            'count': len(valores),
+            'mean': statistics.fmean(valores) if valores else None,
+            'median': statistics.median(valores) if valores else None,
+            'max': max(valores) if valores else None,
+        }
+    return resumen
@@ -0,0 +1,84 @@
+"""
+Series OHLC sintéticas con semilla para los tests de la detección
+
+Además de paseos aleatorios generan los casos límite del modo legacy:
+precios repetidos (empates de high/low y de los POC), tramos planos y NaN.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+# Tipos de serie disponibles
+KINDS = ('random', 'ties', 'flat', 'nan')
+
+
+def ohlc(seed, n=300, kind='random'):
+    """
+    Genera n velas OHLC reproducibles
+
+    Parameters:
+    - seed: semilla del generador
+    - n: número de velas
+    - kind: random (paseo aleatorio), ties (precios redondeados a un tick
+      grande: muchos empates), flat (tramos de velas idénticas) o nan
+      (velas con high/low a NaN)
+
+    Returns:
+    - (open_, high, low, close): arrays float64
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Tipo de serie no soportado: {kind}. Use uno de {KINDS}")
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = np.r_[100.0, close[:-1]]
+    high = np.maximum(open_, close) * (1 + rng.exponential(0.004, n))
+    low = np.minimum(open_, close) * (1 - rng.exponential(0.004, n))
+
+    if kind == 'ties':
+        open_, high, low, close = (np.round(serie * 2) / 2 for serie in (open_, high, low, close))
+    elif kind == 'flat':
+        for inicio in rng.choice(n - 10, size=max(n // 50, 1), replace=False):
+            largo = int(rng.integers(2, 10))
+            precio = close[inicio]
+            for serie in (open_, high, low, close):
+                serie[inicio:inicio + largo] = precio
+    elif kind == 'nan':
+        huecos = rng.choice(np.arange(1, n - 1), size=max(n // 40, 1), replace=False)
+        high[huecos] = np.nan
+        low[huecos] = np.nan
+    return open_, high, low, close
+
+
+def ohlc_frame(seed, n=300, kind='random'):
+    """
+    ohlc como DataFrame con time horario y las columnas que prepara el servicio
+    antes de detect_pullbacks (parteAlta/parteBaja, marcadores a NaN y tendencia)
+    """
+    open_, high, low, close = ohlc(seed, n, kind)
+    df = pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=n, freq='h', tz='UTC'),
+        'open': open_,
+        'high': high,
+        'low': low,
+        'close': close,
+    })
+    df['parteAlta'] = np.maximum(open_, close)
+    df['parteBaja'] = np.minimum(open_, close)
+    for columna in ('altos', 'bajos', 'pocAltos', 'pocBajos', 'circulosAzul', 'circulosNaranja'):
+        df[columna] = np.nan
+    df['tendencia'] = 0
+    return df
+
+
+def mismos_rangos(a, b):
+    """
+    Compara dos diccionarios de rangos (NaN es igual a NaN)
+    """
+    if a.keys() != b.keys():
+        return False
+    return all(
+        a[clave] == b[clave]
+        or (isinstance(a[clave], float) and isinstance(b[clave], float) and math.isnan(a[clave]) and math.isnan(b[clave]))
+        for clave in a
+    )
@@ -0,0 +1,125 @@
+"""
+CandleStore: cobertura, append, reescrituras por generaciones y nombres de serie
+"""
+import json
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from src.utils.dataExtractor.CandleStore import CandleStore, path_segment
+
+HORA_MS = 3600000
+SERIE = ('Stub', 'BTC/USDT', '1h')
+
+
+def _velas(desde, n):
+    """
+    n velas horarias empezando en la hora desde (en horas epoch)
+    """
+    tiempos = pd.to_datetime((desde + np.arange(n)) * HORA_MS, unit='ms', utc=True)
+    precios = 100.0 + desde + np.arange(n)
+    return pd.DataFrame({
+        'time': tiempos, 'open': precios, 'high': precios + 1, 'low': precios - 1,
+        'close': precios + 0.5, 'volume': np.ones(n),
+    })
+
+
+def _ficheros(store):
+    return sorted(ruta.name for ruta in store._directorio(*SERIE).glob('*.bin'))
+
+
+def test_serie_inexistente(tmp_path):
+    store = CandleStore(tmp_path)
+    assert store.coverage(*SERIE) is None
+    assert store.read(*SERIE).empty
+
+
+def test_append_y_lectura_por_rango(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append(*SERIE, _velas(100, 10), 100 * HORA_MS, 110 * HORA_MS)
+    store.append(*SERIE, _velas(108, 5), 110 * HORA_MS, 113 * HORA_MS)
+
+    assert store.coverage(*SERIE) == (100 * HORA_MS, 113 * HORA_MS)
+    df = store.read(*SERIE)
+    assert len(df) == 13
+    # Las velas ya guardadas se ignoran: sin duplicados y en orden
+    assert df['time'].is_monotonic_increasing and df['time'].is_unique
+    tramo = store.read(*SERIE, 104 * HORA_MS, 107 * HORA_MS)
+    assert list(tramo['open']) == [204.0, 205.0, 206.0]
+
+
+def test_cobertura_incluye_rangos_sin_velas(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append(*SERIE, _velas(100, 5), 90 * HORA_MS, 120 * HORA_MS)
+    assert store.coverage(*SERIE) == (90 * HORA_MS, 120 * HORA_MS)
+    store.append(*SERIE, _velas(130, 0), 120 * HORA_MS, 130 * HORA_MS)
+    assert store.coverage(*SERIE) == (90 * HORA_MS, 130 * HORA_MS)
+
+
+def test_velas_anteriores_reescriben_en_una_generacion_nueva(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append(*SERIE, _velas(100, 5), 100 * HORA_MS, 105 * HORA_MS)
+    assert 'time.bin' in _ficheros(store)
+
+    store.append(*SERIE, _velas(95, 5), 95 * HORA_MS, 100 * HORA_MS)
+    meta = json.loads((store._directorio(*SERIE) / 'meta.json').read_text())
+    assert meta == {'desde': 95 * HORA_MS, 'hasta': 105 * HORA_MS, 'generacion': 1}
+    # Solo quedan los ficheros de la generación activa
+    assert _ficheros(store) == sorted(f"{columna}.1.bin" for columna in store.read(*SERIE).columns)
+    assert list(store.read(*SERIE)['open']) == [195.0 + i for i in range(10)]
+
+    # Los append posteriores siguen en la generación activa
+    store.append(*SERIE, _velas(105, 2), 105 * HORA_MS, 107 * HORA_MS)
+    assert len(CandleStore(tmp_path).read(*SERIE)) == 12
+
+
+def test_reescritura_interrumpida_deja_la_serie_anterior(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append(*SERIE, _velas(100, 5), 100 * HORA_MS, 105 * HORA_MS)
+    # Ficheros de una generación que no llegó a activarse en meta.json
+    directorio = store._directorio(*SERIE)
+    (directorio / 'time.1.bin').write_bytes(b'\0' * 16)
+
+    assert len(store.read(*SERIE)) == 5
+    store.append(*SERIE, _velas(105, 1), 105 * HORA_MS, 106 * HORA_MS)
+    assert not (directorio / 'time.1.bin').exists()
+    assert len(store.read(*SERIE)) == 6
+
+
+def test_append_interrumpido_solo_lee_filas_completas(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append(*SERIE, _velas(100, 5), 100 * HORA_MS, 105 * HORA_MS)
+    directorio = store._directorio(*SERIE)
+    with open(directorio / 'time.bin', 'ab') as fichero:
+        fichero.write(np.int64(105 * HORA_MS).tobytes())
+
+    assert len(store.read(*SERIE)) == 5
+    store.append(*SERIE, _velas(105, 2), 105 * HORA_MS, 107 * HORA_MS)
+    df = store.read(*SERIE)
+    assert len(df) == 7 and df['time'].is_unique
+
+
+def test_path_segment_reversible_y_dentro_del_directorio():
+    for texto in ['BTC/USDT', 'BTC_USDT', 'GC=F', '^GSPC', '1h', '.', '..', '', 'a b']:
+        segmento = path_segment(texto)
+        assert '/' not in segmento and segmento not in ('', '.', '..')
+        if texto:
+            assert unquote(segmento) == texto
+    assert path_segment('BTC/USDT') != path_segment('BTC_USDT')
+
+
+def test_path_segment_no_depende_de_mayusculas():
+    textos = ['1m', '1M', 'BTC/USDT', 'btc/usdt', 'GC=F', 'gc=f']
+    segmentos = [path_segment(texto) for texto in textos]
+    # Distintos aun comparando sin mayúsculas (sistemas de ficheros case-insensitive)
+    assert len({segmento.casefold() for segmento in segmentos}) == len(textos)
+    assert [unquote(segmento) for segmento in segmentos] == textos
+
+
+def test_series_que_solo_difieren_en_mayusculas(tmp_path):
+    store = CandleStore(tmp_path)
+    store.append('Stub', 'X', '1m', _velas(100, 3), 100 * HORA_MS, 103 * HORA_MS)
+    store.append('Stub', 'X', '1M', _velas(200, 5), 200 * HORA_MS, 205 * HORA_MS)
+    assert len(store.read('Stub', 'X', '1m')) == 3
+    assert len(store.read('Stub', 'X', '1M')) == 5
@@ -0,0 +1,85 @@
+"""
+Respuesta condicional del dashboard: ETag, 304, since y coalescencia de la descarga
+"""
+import asyncio
+
+import pandas as pd
+import pytest
+
+from benchmarks.stub_provider import offline_provider
+from src.core.fetch_scheduler import FetchError
+from src.services.estrategia_bran_v1.estrategia_bran_v1_service import EstrategiaBranV1Service
+from src.utils.dataExtractor.CandleCache import CandleCache
+
+
+@pytest.fixture
+def servicio():
+    servicio = EstrategiaBranV1Service()
+    # Sin almacén en disco: cada prueba empieza con la caché fría
+    servicio.candle_cache = CandleCache(store=None)
+    return servicio
+
+
+def _pedir(servicio, **kwargs):
+    parametros = dict(asset="GC=F", interval="1h", limit=200, response_format="columnar")
+    parametros.update(kwargs)
+    return servicio.get_dashboard_data_conditional_async(**parametros)
+
+
+def test_etag_y_304(servicio):
+    with offline_provider(candles=5000):
+        etag, resultado = asyncio.run(_pedir(servicio))
+        assert resultado["success"] and etag.startswith('"')
+
+        # Mismas velas: 304 (sin cuerpo) con el mismo ETag
+        assert asyncio.run(_pedir(servicio, if_none_match=etag)) == (etag, None)
+        assert asyncio.run(_pedir(servicio, if_none_match=f'"otro", W/{etag}')) == (etag, None)
+
+        # Otros parámetros de respuesta: otra versión
+        etag_records, resultado = asyncio.run(_pedir(servicio, response_format="records", if_none_match=etag))
+        assert resultado is not None and etag_records != etag
+
+
+def test_since_solo_devuelve_velas_nuevas(servicio):
+    with offline_provider(candles=5000):
+        etag, completo = asyncio.run(_pedir(servicio))
+        tiempos = completo["data"]["time"]
+        since = tiempos[-10]
+        etag_since, parcial = asyncio.run(_pedir(servicio, since=since, if_none_match=etag))
+
+    assert parcial is not None and etag_since != etag
+    assert parcial["data"]["time"] == tiempos[-10:]
+    # La detección usa toda la ventana: las columnas coinciden con el tramo final
+    assert parcial["data"]["close"] == completo["data"]["close"][-10:]
+
+
+def test_peticiones_concurrentes_comparten_la_descarga(servicio):
+    async def concurrentes():
+        formatos = ["columnar", "records"] * 4
+        return await asyncio.gather(*(_pedir(servicio, response_format=formato) for formato in formatos))
+
+    with offline_provider(candles=5000, latency=0.2) as proveedor:
+        respuestas = asyncio.run(concurrentes())
+
+    assert proveedor.requests == 1
+    assert all(resultado["success"] for _, resultado in respuestas)
+    assert len({etag for etag, _ in respuestas}) == 2
+
+
+def test_descarga_fallida_devuelve_el_error_sin_reintentar(servicio):
+    llamadas = []
+
+    def falla(*args):
+        llamadas.append(args)
+        raise FetchError("proveedor caído")
+
+    servicio._fetch_candles = falla
+    etag, resultado = asyncio.run(_pedir(servicio))
+    assert etag is None
+    assert resultado == {"success": False, "error": "proveedor caído", "data": None}
+    assert len(llamadas) == 1
+
+    servicio._fetch_candles = lambda *args: llamadas.append(args) or pd.DataFrame()
+    etag, resultado = asyncio.run(_pedir(servicio))
+    assert etag is None and not resultado["success"]
+    assert len(llamadas) == 2
@@ -0,0 +1,196 @@
+"""
+Cobertura del CandleStore al cargar historia con HistoryLoader: lo que no se
+descargó (ventanas fallidas o vacías) nunca queda marcado como cubierto
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core.fetch_scheduler import FetchError
+from src.utils.dataExtractor.CandleStore import CandleStore
+from src.utils.dataExtractor.HistoryLoader import HistoryLoader
+
+HORA = pd.Timedelta(hours=1)
+DIA_MS = 86400000
+
+
+class StubFetcher:
+    """
+    Velas horarias sintéticas con ventanas de 10 días; las peticiones que
+    empiezan en `fallos` lanzan FetchError y las de `vacias` no devuelven velas
+    """
+
+    def __init__(self, asset="X", interval="1h"):
+        self.asset = asset
+        self.interval = interval
+        self.fallos = set()
+        self.vacias = set()
+        self.peticiones = []
+
+    def history_limits(self):
+        return pd.Timedelta(days=10), None
+
+    def get_data(self, start_time=None, end_time=None, limit=500):
+        self.peticiones.append((start_time, end_time))
+        if start_time in self.fallos:
+            raise FetchError(f"fallo simulado en {start_time}")
+        if start_time in self.vacias:
+            return pd.DataFrame()
+        desde = pd.to_datetime(start_time, unit='ms', utc=True).ceil('h')
+        hasta = pd.to_datetime(end_time, unit='ms', utc=True)
+        tiempos = pd.date_range(desde, hasta, freq='h', inclusive='left')
+        precios = 100 + (tiempos.asi8 // 10**9 % 997) / 10
+        return pd.DataFrame({
+            'time': tiempos,
+            'open': precios,
+            'high': precios + 1,
+            'low': precios - 1,
+            'close': precios + 0.5,
+            'volume': np.ones(len(tiempos)),
+        })
+
+
+def _ms(timestamp):
+    return int(timestamp.timestamp() * 1000)
+
+
+@pytest.fixture
+def ahora():
+    return pd.Timestamp.now(tz='UTC')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CandleStore(tmp_path)
+
+
+def _cobertura(store, fetcher):
+    return store.coverage(type(fetcher).__name__, fetcher.asset, fetcher.interval)
+
+
+def test_carga_completa_cubre_hasta_la_ultima_vela_cerrada(store, ahora):
+    fetcher = StubFetcher()
+    inicio = _ms(ahora) - 25 * DIA_MS
+    df = HistoryLoader(fetcher, store=store).get_history(inicio)
+
+    desde, hasta = _cobertura(store, fetcher)
+    assert desde == _ms(df['time'].iloc[0])
+    # La vela abierta no se guarda ni se cubre
+    assert hasta == _ms(df['time'].iloc[-1]) == _ms(ahora.floor('h'))
+
+    fetcher.peticiones.clear()
+    HistoryLoader(fetcher, store=store).get_history(inicio)
+    # Solo se pide desde la vela abierta en adelante
+    assert [peticion[0] for peticion in fetcher.peticiones] == [hasta]
+
+
+def test_ventana_fallida_al_inicio_no_queda_cubierta(store, ahora):
+    fetcher = StubFetcher()
+    inicio = _ms(ahora) - 25 * DIA_MS
+    fetcher.fallos.add(inicio)
+    with pytest.raises(FetchError):
+        HistoryLoader(fetcher, store=store).get_history(inicio)
+
+    # Se guardan las ventanas posteriores a la fallida, no la fallida
+    desde, _ = _cobertura(store, fetcher)
+    assert desde >= inicio + 10 * DIA_MS
+
+    fetcher.fallos.clear()
+    fetcher.peticiones.clear()
+    df = HistoryLoader(fetcher, store=store).get_history(inicio)
+    assert fetcher.peticiones[0][0] == inicio
+    assert max(peticion[1] for peticion in fetcher.peticiones[:-1]) == desde
+    assert _cobertura(store, fetcher)[0] == _ms(df['time'].iloc[0])
+    assert len(df) == len(StubFetcher().get_data(inicio, _ms(ahora)))
+
+
+def test_ventana_fallida_en_medio_del_relleno(store, ahora):
+    fetcher = StubFetcher()
+    reciente = _ms(ahora) - 5 * DIA_MS
+    HistoryLoader(fetcher, store=store).get_history(reciente)
+    guardado = _cobertura(store, fetcher)
+
+    # Relleno hacia atrás en tres ventanas; falla la del medio
+    inicio = guardado[0] - 30 * DIA_MS
+    fetcher.fallos.add(inicio + 10 * DIA_MS)
+    with pytest.raises(FetchError):
+        HistoryLoader(fetcher, store=store).get_history(inicio)
+
+    # Solo la ventana contigua a lo guardado amplía la cobertura
+    desde, hasta = _cobertura(store, fetcher)
+    assert desde == guardado[0] - 10 * DIA_MS
+    assert hasta >= guardado[1]
+    tiempos = store.read(type(fetcher).__name__, fetcher.asset, fetcher.interval)['time']
+    assert (tiempos.diff().dropna() == HORA).all()
+
+    fetcher.fallos.clear()
+    fetcher.peticiones.clear()
+    HistoryLoader(fetcher, store=store).get_history(inicio)
+    assert fetcher.peticiones[0][0] == inicio
+    assert _cobertura(store, fetcher)[0] == inicio
+
+
+def test_respuesta_vacia_no_queda_cubierta(store, ahora):
+    fetcher = StubFetcher()
+    inicio = _ms(ahora) - 25 * DIA_MS
+    HistoryLoader(fetcher, store=store).get_history(inicio + 20 * DIA_MS)
+    guardado = _cobertura(store, fetcher)
+
+    # El proveedor responde sin velas (posible fallo silencioso): no se da por cubierto
+    fetcher.vacias.add(inicio)
+    HistoryLoader(fetcher, store=store).get_history(inicio)
+    assert _cobertura(store, fetcher)[0] == guardado[0] - 10 * DIA_MS
+
+    fetcher.vacias.clear()
+    fetcher.peticiones.clear()
+    HistoryLoader(fetcher, store=store).get_history(inicio)
+    assert fetcher.peticiones[0][0] == inicio
+
+
+def test_sin_store_un_fallo_se_propaga(ahora):
+    fetcher = StubFetcher()
+    inicio = _ms(ahora) - 25 * DIA_MS
+    fetcher.fallos.add(inicio + 10 * DIA_MS)
+    with pytest.raises(FetchError):
+        HistoryLoader(fetcher).get_history(inicio)
+
+
+def test_cache_sirve_lo_cacheado_si_falla_el_refresco(store, ahora):
+    from src.utils.dataExtractor.CandleCache import CandleCache
+
+    fetcher = StubFetcher()
+    cache = CandleCache(tail_ttl=0, store=store)
+    inicio = _ms(ahora) - 5 * DIA_MS
+    df = cache.get_data(fetcher, start_time=inicio, limit=100)
+    assert len(df) == 100
+
+    def falla(*args, **kwargs):
+        raise FetchError("fallo simulado")
+
+    fetcher.get_data = falla
+    assert cache.get_data(fetcher, start_time=inicio, limit=100).equals(df)
+
+
+def test_split_range_en_ventanas_consecutivas():
+    inicio = pd.Timestamp('2024-01-01', tz='UTC')
+    ventanas = HistoryLoader.split_range(inicio, inicio + pd.Timedelta(days=25), pd.Timedelta(days=10))
+    assert ventanas == [
+        (inicio, inicio + pd.Timedelta(days=10)),
+        (inicio + pd.Timedelta(days=10), inicio + pd.Timedelta(days=20)),
+        (inicio + pd.Timedelta(days=20), inicio + pd.Timedelta(days=25)),
+    ]
+    assert HistoryLoader.split_range(inicio, inicio, pd.Timedelta(days=10)) == []
+
+
+def test_historia_por_ventanas_sin_huecos_ni_duplicados(ahora):
+    fetcher = StubFetcher()
+    inicio = _ms(ahora) - 45 * DIA_MS
+    df = HistoryLoader(fetcher, max_workers=3).get_history(inicio)
+
+    # Cinco ventanas de como máximo 10 días, contiguas
+    assert len(fetcher.peticiones) == 5
+    peticiones = sorted(fetcher.peticiones)
+    assert all(a[1] == b[0] for a, b in zip(peticiones, peticiones[1:]))
+    assert df['time'].is_unique and (df['time'].diff().dropna() == HORA).all()
+    assert df['time'].iloc[0] >= pd.to_datetime(inicio, unit='ms', utc=True)
+    assert len(df) == len(StubFetcher().get_data(inicio, _ms(ahora)))
@@ -0,0 +1,67 @@
+"""
+Respuestas precalculadas de la watchlist: se sirven cuando las velas de la
+petición son exactamente las del precálculo
+"""
+import asyncio
+
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from benchmarks.stub_provider import offline_provider
+from src.services.estrategia_bran_v1.estrategia_bran_v1_service import EstrategiaBranV1Service
+from src.services.estrategia_bran_v1.precompute import PrecomputeScheduler, parse_watchlist
+from src.utils.dataExtractor.CandleCache import CandleCache
+
+
+@pytest.fixture
+def servicio():
+    servicio = EstrategiaBranV1Service()
+    servicio.candle_cache = CandleCache(store=None)
+    # Sin arrancar el scheduler: los trabajos se ejecutan a mano con run()
+    servicio.precompute = PrecomputeScheduler(
+        servicio, BackgroundScheduler(), [("GC=F", "1h")], limit=200, formats=("columnar",), jitter_seconds=0
+    )
+    return servicio
+
+
+def _pedir(servicio, **kwargs):
+    parametros = dict(asset="GC=F", interval="1h", limit=200, response_format="columnar")
+    parametros.update(kwargs)
+    return asyncio.run(servicio.get_dashboard_data_conditional_async(**parametros))
+
+
+def test_se_sirve_con_las_mismas_velas(servicio):
+    with offline_provider(candles=5000):
+        servicio.precompute.run("GC=F", "1h")
+        df = servicio._fetch_candles("GC=F", "1h", 200, None)
+        precalculado = servicio.precompute.get(df, "GC=F", "1h", 0.21, "columnar")
+        assert precalculado is not None and precalculado["success"]
+
+        # Ruta condicional (dashboard) y ruta normal, sin start_time
+        etag, resultado = _pedir(servicio)
+        assert resultado is precalculado and etag is not None
+        assert asyncio.run(servicio.get_dashboard_data_async("GC=F", "1h", 200, response_format="columnar")) is precalculado
+
+        # Con start_time: misma ventana de velas, misma respuesta
+        inicio = int(df['time'].iloc[0].value // 10**6)
+        assert _pedir(servicio, start_time=inicio)[1] is precalculado
+
+
+def test_no_se_sirve_con_otras_velas_u_otra_respuesta(servicio):
+    with offline_provider(candles=5000):
+        servicio.precompute.run("GC=F", "1h")
+        precalculado = _pedir(servicio)[1]
+
+        assert _pedir(servicio, limit=100)[1] is not precalculado
+        assert _pedir(servicio, sparse=True)[1] is not precalculado
+        assert _pedir(servicio, minimum_tresure=0.5)[1] is not precalculado
+        assert _pedir(servicio, response_format="records")[1] is not precalculado
+
+        # La vela abierta cambia: la respuesta precalculada ya no corresponde
+        df = servicio._fetch_candles("GC=F", "1h", 200, None)
+        df.loc[df.index[-1], 'close'] += 1
+        assert servicio.precompute.get(df, "GC=F", "1h", 0.21, "columnar") is None
+
+
+def test_parse_watchlist():
+    assert parse_watchlist("GC=F:1h, EURUSD=X:4h,,MSFT") == [("GC=F", "1h"), ("EURUSD=X", "4h"), ("MSFT", "1h")]
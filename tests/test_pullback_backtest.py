@@ -0,0 +1,162 @@
+"""
+El backtest vectorizado da el mismo resultado que una simulación vela a vela
+"""
+import numpy as np
+import pytest
+
+from src.utils.indicadores.pullback_backtest import (
+    DIRECTIONS,
+    ENTRY_RULES,
+    EXIT_REASONS,
+    pullback_states,
+    run_backtest,
+)
+from src.utils.indicadores.pullback_engine import estado_inicial, paso_pullback
+from tests.series import ohlc
+
+
+def _estados_bucle(high, low, parte_alta, parte_baja, minimum_tresure):
+    """
+    Estado tras cada vela y rupturas, avanzando paso_pullback vela a vela
+    """
+    n = len(high)
+    estado = estado_inicial(high, low)
+    tendencia = [0] * n
+    alto = [estado[0]] * n
+    bajo = [estado[1]] * n
+    ruptura = [0] * n
+    for i in range(1, n - 1):
+        estado, marcadores = paso_pullback(i, high, low, parte_alta, parte_baja, estado, minimum_tresure)
+        tendencia[i], alto[i], bajo[i] = estado[2], estado[0], estado[1]
+        if marcadores:
+            ruptura[i + 1] = 1 if marcadores[0][0] == 'altos' else -1
+    if n > 1:
+        tendencia[n - 1], alto[n - 1], bajo[n - 1] = tendencia[n - 2], alto[n - 2], bajo[n - 2]
+    return tendencia, alto, bajo, ruptura
+
+
+def _objetivo_bucle(tendencia, alto, bajo, ruptura, low, high, close, entry, direction, exit_on_trend):
+    objetivo = []
+    for t in range(len(close)):
+        anterior = tendencia[t - 1] if t > 0 else 0
+        giro = tendencia[t] != anterior and tendencia[t] != 0
+        senal = 0
+        if entry == 'tendencia':
+            senal = tendencia[t] if giro else 0
+        elif entry == 'ruptura':
+            senal = ruptura[t]
+        elif t > 0:
+            if tendencia[t] == 1 and low[t] <= bajo[t - 1] and close[t] > bajo[t - 1]:
+                senal = 1
+            elif tendencia[t] == -1 and high[t] >= alto[t - 1] and close[t] < alto[t - 1]:
+                senal = -1
+        valor = 0 if exit_on_trend and giro else None
+        if senal and (direction == 'both' or senal == (1 if direction == 'long' else -1)):
+            valor = senal
+        elif senal:
+            valor = 0
+        objetivo.append(valor)
+    return objetivo
+
+
+def _simular_bucle(open_, high, low, close, objetivo, stop_largo, stop_corto, coste):
+    n = len(close)
+    posiciones, parados, equity = [], [], []
+    operaciones = []
+    deseada, parada, previa, capital, abierta = 0, False, 0, 1.0, None
+    for t in range(n):
+        if t > 0 and objetivo[t - 1] is not None:
+            deseada, parada = objetivo[t - 1], False
+        posicion = 0 if parada else deseada
+        # La operación anterior termina a la apertura si cambia la posición
+        if abierta is not None and posicion != previa:
+            operaciones.append(abierta + (t - 1, open_[t], 'senal'))
+            abierta = None
+        if posicion != 0 and posicion != previa:
+            abierta = (t, posicion, open_[t])
+
+        fin, tocado = close[t], False
+        if stop_largo is not None and posicion == 1 and low[t] <= stop_largo[t]:
+            fin, tocado = min(open_[t], stop_largo[t]), True
+        elif stop_corto is not None and posicion == -1 and high[t] >= stop_corto[t]:
+            fin, tocado = max(open_[t], stop_corto[t]), True
+
+        cierre_previo = close[t - 1] if t > 0 else open_[0]
+        hueco = previa * (open_[t] / cierre_previo - 1)
+        vela = posicion * (fin / open_[t] - 1)
+        lados = abs(posicion - previa) + (abs(posicion) if tocado else 0)
+        capital *= (1 + hueco) * (1 + vela) - lados * coste
+
+        if tocado:
+            operaciones.append(abierta + (t, fin, 'stop'))
+            abierta = None
+            parada = True
+        posiciones.append(posicion)
+        parados.append(tocado)
+        equity.append(capital)
+        previa = 0 if tocado else posicion
+    if abierta is not None:
+        operaciones.append(abierta + (n - 1, close[n - 1], 'fin'))
+
+    retornos = [
+        direccion * (salida / entrada - 1) - coste * (1 if motivo == 'fin' else 2)
+        for _, direccion, entrada, _, salida, motivo in operaciones
+    ]
+    return posiciones, parados, equity, operaciones, retornos
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("minimum_tresure", [0.0, 0.21, 1.0])
+def test_estados_igual_que_bucle(seed, minimum_tresure):
+    open_, high, low, close = ohlc(seed, n=500)
+    parte_alta, parte_baja = np.maximum(open_, close), np.minimum(open_, close)
+    estados = pullback_states(high, low, parte_alta, parte_baja, minimum_tresure)
+    tendencia, alto, bajo, ruptura = _estados_bucle(
+        high.tolist(), low.tolist(), parte_alta.tolist(), parte_baja.tolist(), minimum_tresure
+    )
+    assert estados['tendencia'].tolist() == tendencia
+    assert estados['rangoAlto'].tolist() == alto
+    assert estados['rangoBajo'].tolist() == bajo
+    assert estados['ruptura'].tolist() == ruptura
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("entry", ENTRY_RULES)
+@pytest.mark.parametrize("direction", DIRECTIONS)
+@pytest.mark.parametrize("stop", ['rango', 'none'])
+@pytest.mark.parametrize("exit_on_trend", [False, True])
+def test_backtest_igual_que_bucle(seed, entry, direction, stop, exit_on_trend):
+    open_, high, low, close = ohlc(seed, n=500)
+    fee, slippage, minimum_tresure = 0.0005, 0.0002, 0.21
+    barras, operaciones, resumen = run_backtest(
+        open_, high, low, close, entry=entry, direction=direction, stop=stop,
+        exit_on_trend=exit_on_trend, fee=fee, slippage=slippage, minimum_tresure=minimum_tresure
+    )
+
+    tendencia, alto, bajo, ruptura = _estados_bucle(
+        high.tolist(), low.tolist(), np.maximum(open_, close).tolist(), np.minimum(open_, close).tolist(),
+        minimum_tresure
+    )
+    objetivo = _objetivo_bucle(tendencia, alto, bajo, ruptura, low, high, close, entry, direction, exit_on_trend)
+    stop_largo = stop_corto = None
+    if stop == 'rango':
+        # Nivel vigente durante t: estado tras la vela t-2
+        stop_largo = [np.nan, np.nan] + bajo[:-2]
+        stop_corto = [np.nan, np.nan] + alto[:-2]
+    posiciones, parados, equity, esperadas, retornos = _simular_bucle(
+        open_.tolist(), high.tolist(), low.tolist(), close.tolist(),
+        objetivo, stop_largo, stop_corto, fee + slippage
+    )
+
+    assert barras['position'].tolist() == posiciones
+    assert barras['stopped'].tolist() == parados
+    assert barras['equity'].tolist() == equity
+    assert operaciones['entry_index'].tolist() == [operacion[0] for operacion in esperadas]
+    assert operaciones['direction'].tolist() == [operacion[1] for operacion in esperadas]
+    assert operaciones['entry_price'].tolist() == [operacion[2] for operacion in esperadas]
+    assert operaciones['exit_index'].tolist() == [operacion[3] for operacion in esperadas]
+    assert operaciones['exit_price'].tolist() == [operacion[4] for operacion in esperadas]
+    assert operaciones['exit_reason'].tolist() == [operacion[5] for operacion in esperadas]
+    assert operaciones['return'].tolist() == retornos
+    assert resumen['trades'] == len(esperadas)
+    assert set(operaciones['exit_reason']) <= set(EXIT_REASONS)
@@ -0,0 +1,46 @@
+"""
+Equivalencia bit a bit entre el motor legacy y el motor de arrays (fast)
+"""
+import pytest
+
+from src.utils.indicadores.pullback_detection import PullbackDetection, compare_results
+from tests.series import KINDS, ohlc_frame
+
+SEEDS = range(4)
+THRESHOLDS = [0.0, 0.21, 1.0, 5.0]
+
+
+def _detectar(df, minimum_tresure, mode):
+    return PullbackDetection(df, minimum_tresure=minimum_tresure, mode=mode).detect_pullbacks(df)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("minimum_tresure", THRESHOLDS)
+def test_fast_identico_a_legacy(kind, seed, minimum_tresure):
+    df = ohlc_frame(seed, kind=kind)
+    data_legacy, rangos_legacy = _detectar(df.copy(), minimum_tresure, 'legacy')
+    data_fast, rangos_fast = _detectar(df.copy(), minimum_tresure, 'fast')
+    assert compare_results(data_legacy, rangos_legacy, data_fast, rangos_fast) == []
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_verify_devuelve_legacy(kind):
+    df = ohlc_frame(7, kind=kind)
+    data_verify, rangos_verify = _detectar(df.copy(), 0.21, 'verify')
+    data_legacy, rangos_legacy = _detectar(df.copy(), 0.21, 'legacy')
+    assert compare_results(data_legacy, rangos_legacy, data_verify, rangos_verify) == []
+
+
+@pytest.mark.parametrize("n", [3, 4, 10])
+def test_series_cortas(n):
+    df = ohlc_frame(0, n=n)
+    data_legacy, rangos_legacy = _detectar(df.copy(), 0.21, 'legacy')
+    data_fast, rangos_fast = _detectar(df.copy(), 0.21, 'fast')
+    assert compare_results(data_legacy, rangos_legacy, data_fast, rangos_fast) == []
+
+
+def test_modo_desconocido():
+    with pytest.raises(ValueError):
+        PullbackDetection(ohlc_frame(0, n=10), mode='turbo')
+
@@ -0,0 +1,102 @@
+"""
+El detector incremental acaba con los mismos marcadores y rangos que la detección por lotes
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.utils.indicadores.pullback_engine import detect_pullback_markers
+from src.utils.indicadores.pullback_incremental import IncrementalPullbackDetection
+from tests.series import KINDS, mismos_rangos, ohlc
+
+THRESHOLDS = [0.0, 0.21, 1.0]
+
+
+def _lote(open_, high, low, close, minimum_tresure):
+    marcadores, rangos = detect_pullback_markers(
+        high, low, np.maximum(open_, close), np.minimum(open_, close), minimum_tresure
+    )
+    return {(tipo, index, _precio(precio)) for tipo, index, precio in marcadores}, rangos
+
+
+def _precio(precio):
+    return None if precio is None or precio != precio else float(precio)
+
+
+def _aplicar(vigentes, eventos):
+    for evento in eventos:
+        clave = (evento['marker'], evento['index'], evento['price'])
+        if evento['event'] == 'add':
+            assert clave not in vigentes
+            vigentes.add(clave)
+        else:
+            vigentes.remove(clave)
+
+
+def _frame(open_, high, low, close, desde, hasta):
+    return pd.DataFrame({
+        'time': np.arange(desde, min(hasta, len(close))),
+        'open': open_[desde:hasta],
+        'high': high[desde:hasta],
+        'low': low[desde:hasta],
+        'close': close[desde:hasta],
+    })
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("minimum_tresure", THRESHOLDS)
+@pytest.mark.parametrize("bloque", [1, 7, 300])
+def test_por_bloques_igual_que_lote(kind, seed, minimum_tresure, bloque):
+    open_, high, low, close = ohlc(seed, kind=kind)
+    detector = IncrementalPullbackDetection(minimum_tresure=minimum_tresure)
+    vigentes = set()
+    for desde in range(0, len(close), bloque):
+        _aplicar(vigentes, detector.update(_frame(open_, high, low, close, desde, desde + bloque)))
+
+    marcadores, rangos = _lote(open_, high, low, close, minimum_tresure)
+    assert vigentes == marcadores
+    assert mismos_rangos(detector.rangos, rangos)
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("seed", range(3))
+def test_vela_abierta_revisada(kind, seed):
+    # Cada vela llega primero a medio formar (revisión de la vela abierta) y después cerrada
+    open_, high, low, close = ohlc(seed, kind=kind)
+    detector = IncrementalPullbackDetection(minimum_tresure=0.21)
+    vigentes = set()
+    for k in range(len(close)):
+        parcial = _frame(open_, high, low, close, k, k + 1)
+        parcial[['high', 'low', 'close']] = open_[k]
+        _aplicar(vigentes, detector.update(parcial))
+        _aplicar(vigentes, detector.update(_frame(open_, high, low, close, k, k + 1)))
+
+    marcadores, rangos = _lote(open_, high, low, close, 0.21)
+    assert vigentes == marcadores
+    assert mismos_rangos(detector.rangos, rangos)
+
+
+def test_velas_anteriores_a_la_revision_se_ignoran():
+    open_, high, low, close = ohlc(0, n=50)
+    detector = IncrementalPullbackDetection(profundidad_revision=2)
+    detector.update(_frame(open_, high, low, close, 0, 50))
+    rangos = dict(detector.rangos)
+    antigua = _frame(open_, high, low, close, 45, 46)
+    antigua['high'] += 1
+    assert detector.update(antigua) == []
+    assert detector.rangos == rangos
+
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_snapshot_y_restore(kind):
+    open_, high, low, close = ohlc(5, n=600, kind=kind)
+    detector = IncrementalPullbackDetection(minimum_tresure=0.21)
+    vigentes = set()
+    _aplicar(vigentes, detector.update(_frame(open_, high, low, close, 0, 400)))
+    restaurado = IncrementalPullbackDetection.from_snapshot(detector.snapshot())
+    _aplicar(vigentes, restaurado.update(_frame(open_, high, low, close, 400, 600)))
+
+    marcadores, rangos = _lote(open_, high, low, close, 0.21)
+    assert vigentes == marcadores
+    assert mismos_rangos(restaurado.rangos, rangos)
@@ -0,0 +1,27 @@
+"""
+Salida dispersa: los marcadores equivalen a las columnas densas del motor de arrays
+"""
+import numpy as np
+import pytest
+
+from src.utils.indicadores.pullback_engine import MARKER_TYPES, detect_pullback_markers, detect_pullbacks_arrays
+from tests.series import KINDS, mismos_rangos, ohlc
+
+THRESHOLDS = [0.0, 0.21, 1.0, 5.0]
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("minimum_tresure", THRESHOLDS)
+def test_marcadores_dispersos_identicos_a_columnas(kind, minimum_tresure):
+    open_, high, low, close = ohlc(3, kind=kind)
+    columnas, rangos = detect_pullbacks_arrays(open_, high, low, close, minimum_tresure=minimum_tresure)
+    marcadores, rangos_dispersos = detect_pullback_markers(
+        high, low, np.maximum(open_, close), np.minimum(open_, close), minimum_tresure
+    )
+
+    densas = {tipo: np.full(len(close), np.nan) for tipo in MARKER_TYPES}
+    for tipo, index, precio in marcadores:
+        densas[tipo][index] = precio
+    for tipo in MARKER_TYPES:
+        assert np.array_equal(densas[tipo].view(np.int64), columnas[tipo].view(np.int64))
+    assert mismos_rangos(rangos_dispersos, rangos)
@@ -0,0 +1,47 @@
+"""
+Los marcadores finales del replay coinciden con la detección sobre la historia completa
+"""
+import math
+
+import numpy as np
+import pytest
+
+from src.utils.indicadores.pullback_engine import detect_pullback_markers
+from src.utils.indicadores.pullback_replay import replay_pullbacks
+from tests.series import KINDS, ohlc
+
+
+def _finales(marcadores):
+    return {
+        (tipo, int(index), None if math.isnan(precio) else float(precio))
+        for tipo, index, precio, final in zip(
+            marcadores['marker'], marcadores['index'], marcadores['price'], marcadores['final']
+        )
+        if final
+    }
+
+
+@pytest.mark.parametrize("kind", KINDS)
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("minimum_tresure", [0.0, 0.21, 1.0])
+@pytest.mark.parametrize("intrabar", [False, True])
+def test_finales_igual_que_deteccion(kind, seed, minimum_tresure, intrabar):
+    open_, high, low, close = ohlc(seed, kind=kind)
+    marcadores, resumen = replay_pullbacks(open_, high, low, close, minimum_tresure=minimum_tresure, intrabar=intrabar)
+    esperados, _ = detect_pullback_markers(
+        high, low, np.maximum(open_, close), np.minimum(open_, close), minimum_tresure
+    )
+
+    assert _finales(marcadores) == {
+        (tipo, index, None if math.isnan(precio) else float(precio)) for tipo, index, precio in esperados
+    }
+    assert resumen['markers_final'] == len(esperados)
+    assert resumen['candles'] == len(close)
+
+
+def test_sin_intrabar_no_repinta():
+    # Con velas cerradas los marcadores solo se confirman: nada se retira
+    open_, high, low, close = ohlc(1)
+    marcadores, resumen = replay_pullbacks(open_, high, low, close, intrabar=False)
+    assert resumen['repainted'] == 0
+    assert marcadores['final'].all()
@@ -0,0 +1,134 @@
+"""
+Reagrupación local de velas: agregados y alineación estable de las velas derivadas
+"""
+import asyncio
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.stub_provider import offline_provider
+from src.services.estrategia_bran_v1.estrategia_bran_v1_service import EstrategiaBranV1Service
+from src.utils.dataExtractor.CandleCache import CandleCache
+from src.utils.dataExtractor.resampling import base_interval, resample_ohlcv
+
+
+def _velas(tiempos):
+    tiempos = pd.DatetimeIndex(tiempos)
+    n = len(tiempos)
+    precios = 100 + np.sin(np.arange(n)) * 5
+    return pd.DataFrame({
+        'time': tiempos,
+        'open': precios,
+        'high': precios + 1 + np.arange(n) % 3,
+        'low': precios - 1 - np.arange(n) % 2,
+        'close': precios + 0.5,
+        'volume': np.arange(1, n + 1, dtype=float),
+    })
+
+
+def _continuas(desde, n, freq='1h'):
+    return _velas(pd.date_range(desde, periods=n, freq=freq, tz='UTC'))
+
+
+def _sesiones(dias, apertura='14:30', velas=7):
+    """
+    Velas horarias de una sesión diaria de acciones (14:30-21:30 UTC), solo días laborables
+    """
+    tiempos = []
+    for dia in pd.bdate_range('2024-03-04', periods=dias, tz='UTC'):
+        inicio = dia + pd.Timedelta(apertura + ':00')
+        tiempos.extend(inicio + pd.Timedelta(hours=h) for h in range(velas))
+    return _velas(tiempos)
+
+
+def test_base_interval():
+    assert base_interval('4h') == ('1h', 4)
+    assert base_interval('3d') == ('1d', 3)
+    assert base_interval('1h') is None
+
+
+def test_agregados_ohlcv():
+    df = _continuas('2024-01-01', 8)
+    resultado = resample_ohlcv(df, '4h')
+    assert list(resultado['time']) == list(pd.to_datetime(['2024-01-01 00:00', '2024-01-01 04:00'], utc=True))
+    for fila, tramo in zip(resultado.itertuples(), (df.iloc[:4], df.iloc[4:])):
+        assert fila.open == tramo['open'].iloc[0]
+        assert fila.high == tramo['high'].max()
+        assert fila.low == tramo['low'].min()
+        assert fila.close == tramo['close'].iloc[-1]
+        assert fila.volume == tramo['volume'].sum()
+
+
+@pytest.mark.parametrize("interval", ['2h', '4h', '6h', '8h', '12h'])
+def test_mercado_24h_no_depende_del_inicio_de_la_ventana(interval):
+    df = _continuas('2024-01-01', 200)
+    completo = resample_ohlcv(df, interval)
+    duracion = pd.Timedelta(interval)
+    assert (completo['time'] == completo['time'].dt.floor(interval)).all()
+    for recorte in range(1, 12):
+        parcial = resample_ohlcv(df.iloc[recorte:].reset_index(drop=True), interval)
+        # Salvo la primera vela (parcial), las velas coinciden con las de la ventana completa
+        comunes = completo[completo['time'] >= parcial['time'].iloc[0] + duracion]
+        pd.testing.assert_frame_equal(
+            parcial.iloc[1:].reset_index(drop=True), comunes.reset_index(drop=True)
+        )
+
+
+def test_una_vela_que_falta_no_desplaza_la_rejilla():
+    df = _continuas('2024-01-01', 48)
+    sin_vela = df.drop(index=9).reset_index(drop=True)
+    tiempos = resample_ohlcv(sin_vela, '4h')['time']
+    assert list(tiempos) == list(resample_ohlcv(df, '4h')['time'])
+
+
+def test_sesiones_empiezan_en_la_apertura():
+    df = _sesiones(5)
+    resultado = resample_ohlcv(df, '2h')
+    assert set(resultado['time'].dt.strftime('%H:%M')) == {'14:30', '16:30', '18:30', '20:30'}
+    # Una ventana que empieza a mitad de sesión usa la misma rejilla
+    parcial = resample_ohlcv(df.iloc[3:].reset_index(drop=True), '2h')
+    assert set(parcial['time']) <= set(resultado['time'])
+
+
+def test_alineacion_desconocida():
+    with pytest.raises(ValueError):
+        resample_ohlcv(_continuas('2024-01-01', 4), '4h', alineacion='mercado')
+    with pytest.raises(ValueError):
+        resample_ohlcv(_continuas('2024-01-01', 4), '5h')
+
+
+@pytest.mark.parametrize("base, freq", [('15m', '15min'), ('1h', '1h')])
+def test_velas_diarias_son_dias_utc(base, freq):
+    # Empieza a mitad de día: la primera vela diaria sigue siendo la del día UTC
+    df = _continuas('2024-01-01 13:15', 4 * 24 * 4 if base == '15m' else 4 * 24, freq=freq)
+    resultado = resample_ohlcv(df, '1d', base=base)
+    assert (resultado['time'] == resultado['time'].dt.normalize()).all()
+    segundo = df[(df['time'] >= '2024-01-02') & (df['time'] < '2024-01-03')]
+    fila = resultado[resultado['time'] == pd.Timestamp('2024-01-02', tz='UTC')].iloc[0]
+    assert fila['open'] == segundo['open'].iloc[0] and fila['close'] == segundo['close'].iloc[-1]
+
+
+def test_4h_desde_15m_en_rejilla_utc():
+    df = _continuas('2024-01-01 13:15', 200, freq='15min')
+    tiempos = resample_ohlcv(df, '4h', base='15m')['time']
+    assert (tiempos.dt.hour % 4 == 0).all() and (tiempos.dt.minute == 0).all()
+
+
+def test_3d_desde_diarias():
+    df = _continuas('2024-01-01', 12, freq='1D')
+    tiempos = resample_ohlcv(df, '3d')['time']
+    assert list(tiempos.diff().dropna().unique()) == [pd.Timedelta(days=3)]
+    assert (tiempos.astype('int64') % pd.Timedelta(days=3).value == 0).all()
+
+
+def test_multi_timeframe_con_una_descarga():
+    servicio = EstrategiaBranV1Service()
+    servicio.candle_cache = CandleCache(store=None)
+    with offline_provider(candles=20000) as proveedor:
+        resultado = asyncio.run(servicio.get_multi_timeframe_async("GC=F", ["15m", "1h", "4h", "1d"], limit=2000))
+
+    assert resultado["success"], resultado.get("error")
+    assert proveedor.requests == 1
+    diarias = pd.to_datetime(resultado["timeframes"]["1d"]["data"]["time"], unit='ms', utc=True)
+    assert (diarias == diarias.normalize()).all()
@@ -0,0 +1,113 @@
+"""
+SingleFlight: llamadas concurrentes con la misma clave comparten una ejecución
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+
+import pytest
+
+from src.core.single_flight import SingleFlight
+
+
+def test_do_comparte_una_ejecucion():
+    single_flight = SingleFlight()
+    ejecuciones = []
+    liberar = threading.Event()
+
+    def calcular():
+        ejecuciones.append(1)
+        liberar.wait(5)
+        return {"valor": 1}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futuros = [pool.submit(single_flight.do, "clave", calcular) for _ in range(8)]
+        while single_flight.stats()["shared"] < 7:
+            time.sleep(0.01)
+        liberar.set()
+        resultados = [futuro.result() for futuro in futuros]
+
+    assert len(ejecuciones) == 1
+    assert all(resultado is resultados[0] for resultado in resultados)
+    assert single_flight.stats() == {"executions": 1, "shared": 7, "timeouts": 0, "in_flight": 0}
+
+
+def test_claves_distintas_y_llamadas_sucesivas_no_se_comparten():
+    single_flight = SingleFlight()
+    assert single_flight.do("a", lambda: 1) == 1
+    assert single_flight.do("b", lambda: 2) == 2
+    # Terminada la ejecución, la misma clave vuelve a ejecutar
+    assert single_flight.do("a", lambda: 3) == 3
+    assert single_flight.stats()["executions"] == 3
+
+
+def test_la_excepcion_del_lider_llega_a_todos():
+    single_flight = SingleFlight()
+    liberar = threading.Event()
+
+    def fallar():
+        liberar.wait(5)
+        raise ValueError("fallo")
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futuros = [pool.submit(single_flight.do, "clave", fallar) for _ in range(3)]
+        while single_flight.stats()["shared"] < 2:
+            time.sleep(0.01)
+        liberar.set()
+        for futuro in futuros:
+            with pytest.raises(ValueError):
+                futuro.result()
+    assert single_flight.stats()["in_flight"] == 0
+
+
+def test_timeout_de_las_llamadas_en_espera():
+    single_flight = SingleFlight()
+    liberar = threading.Event()
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        lider = pool.submit(single_flight.do, "clave", lambda: liberar.wait(5) and "hecho")
+        while single_flight.stats()["in_flight"] == 0:
+            time.sleep(0.01)
+        with pytest.raises(FuturesTimeoutError):
+            single_flight.do("clave", lambda: "no se ejecuta", timeout=0.05)
+        liberar.set()
+        assert lider.result() == "hecho"
+    assert single_flight.stats()["timeouts"] == 1
+
+
+def test_do_async_comparte_una_ejecucion():
+    single_flight = SingleFlight()
+    ejecuciones = []
+
+    async def calcular():
+        ejecuciones.append(1)
+        await asyncio.sleep(0.05)
+        return object()
+
+    async def concurrentes():
+        return await asyncio.gather(*(single_flight.do_async("clave", calcular) for _ in range(8)))
+
+    resultados = asyncio.run(concurrentes())
+    assert len(ejecuciones) == 1
+    assert all(resultado is resultados[0] for resultado in resultados)
+
+
+def test_do_async_sobrevive_a_la_cancelacion_del_lider():
+    single_flight = SingleFlight()
+
+    async def calcular():
+        await asyncio.sleep(0.05)
+        return "hecho"
+
+    async def escenario():
+        lider = asyncio.ensure_future(single_flight.do_async("clave", calcular))
+        await asyncio.sleep(0)
+        espera = asyncio.ensure_future(single_flight.do_async("clave", calcular))
+        await asyncio.sleep(0)
+        # El cliente del líder se desconecta: la llamada en espera recibe el resultado igualmente
+        lider.cancel()
+        return await espera
+
+    assert asyncio.run(escenario()) == "hecho"
+    assert single_flight.stats()["executions"] == 1